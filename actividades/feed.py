@@ -0,0 +1,200 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from core.versiones import leer_version, subir_version
+
+
+FEED_CACHE_TIMEOUT = 60 * 10
+FEED_VERSION_KEY = 'actividades:feed:version'
+
+# Cambia si cambia la forma del JSON: los ETag emitidos antes dejan de valer.
+FORMATO_FEED = 2
+
+
+def version_feed():
+    return leer_version(FEED_VERSION_KEY)
+
+
+def invalidar_feed():
+    """Invalida las huellas y los feeds cacheados de todos los procesos."""
+    subir_version(FEED_VERSION_KEY)
+
+
+def huella_ventana(parametros, actividades, detalles):
+    """
+    Huella barata de lo que devolvería el feed para esta ventana: los
+    parámetros, la última `actualizada_en` y el total de actividades, y el
+    total y el mayor id de los detalles de ensayo. Los cambios que no dejan
+    rastro en esas columnas (participantes, nombres de clientes, estado de
+    una solicitud) suben la versión del feed desde las señales.
+    """
+    resumen_actividades = actividades.order_by().aggregate(total=Count('pk'), ultima=Max('actualizada_en'))
+    resumen_detalles = detalles.order_by().aggregate(total=Count('pk'), ultimo=Max('pk'))
+
+    contenido = json.dumps([
+        FORMATO_FEED,
+        version_feed(),
+        sorted(parametros.lists()),
+        resumen_actividades['total'],
+        resumen_actividades['ultima'].isoformat() if resumen_actividades['ultima'] else None,
+        resumen_detalles['total'],
+        resumen_detalles['ultimo'],
+    ])
+    return hashlib.sha256(contenido.encode()).hexdigest()[:32]
+
+
+def respuesta_feed(request, huella, construir):
+    """
+    Responde 304 si el cliente ya tiene esta huella; si no, sirve el feed
+    de la caché o lo arma con `construir()` (que devuelve bytes).
+    """
+    etag = f'"{huella}"'
+    respuesta = get_conditional_response(request, etag=etag)
+    if respuesta is None:
+        clave = f'actividades:feed:{huella}'
+        contenido = cache.get(clave)
+        if contenido is None:
+            contenido = construir()
+            cache.set(clave, contenido, FEED_CACHE_TIMEOUT)
+        respuesta = HttpResponse(contenido, content_type='application/json')
+
+    respuesta['ETag'] = etag
+    # El navegador guarda la respuesta pero la revalida en cada visita.
+    patch_cache_control(respuesta, private=True, no_cache=True)
+    return respuesta
+
+
+class TablaValores:
+    """Valores distintos de una columna; cada fila guarda su posición."""
+
+    def __init__(self):
+        self.valores = []
+        self._posiciones = {}
+
+    def posicion(self, valor):
+        if valor is None or valor == '':
+            return None
+        posicion = self._posiciones.get(valor)
+        if posicion is None:
+            posicion = self._posiciones[valor] = len(self.valores)
+            self.valores.append(valor)
+        return posicion
+
+
+class FeedCalendario:
+    """
+    Eventos del calendario en columnas: por cada campo una lista con un
+    valor por evento. Los textos que se repiten (categorías, colores,
+    clientes, proyectos y responsables) van una sola vez en su tabla y las
+    filas guardan la posición. Las fechas de las actividades van en
+    segundos desde epoch. `expandirFeed` en calendario.html lo convierte
+    de vuelta en eventos de FullCalendar. `token` es el punto de partida
+    para pedir después solo los cambios (`actividades.sincronizacion`).
+    """
+
+    COLUMNAS_ACTIVIDADES = (
+        'id', 'titulo', 'inicio', 'fin', 'todo_el_dia', 'color', 'clase', 'estado', 'prioridad',
+        'descripcion', 'ubicacion', 'cliente', 'proyecto', 'categoria',
+        'es_automatica', 'bloquea_agenda', 'permite_edicion_manual', 'participantes',
+    )
+    COLUMNAS_ENSAYOS = (
+        'id', 'solicitud', 'codigo_solicitud', 'inicio', 'entrega', 'estado', 'color',
+        'descripcion', 'cliente', 'muestra', 'servicio', 'tecnico', 'tecnico_id',
+    )
+
+    def __init__(self, proyecto=None, token=None):
+        self.token = token
+        self.categorias = TablaValores()
+        self.colores = TablaValores()
+        self.clientes = TablaValores()
+        self.proyectos = TablaValores()
+        self.responsables = TablaValores()
+        self.actividades = {columna: [] for columna in self.COLUMNAS_ACTIVIDADES}
+        self.ensayos = {columna: [] for columna in self.COLUMNAS_ENSAYOS}
+        self.proyecto = self._posicion_proyecto(proyecto)
+
+    def _posicion_proyecto(self, proyecto):
+        if proyecto is None:
+            return None
+        return self.proyectos.posicion((proyecto['nombre_proyecto'], proyecto['codigo_proyecto'] or ''))
+
+    def _agregar(self, columnas, **valores):
+        for columna, lista in columnas.items():
+            lista.append(valores[columna])
+
+    def agregar(self, evento):
+        """Agrega un evento de `FuenteEventos.eventos()`."""
+        if evento['tipo'] == 'actividad':
+            self._agregar_actividad(evento)
+        else:
+            self._agregar_ensayo(evento)
+
+    def _agregar_actividad(self, fila):
+        proyecto = None
+        if fila['proyecto__nombre_proyecto'] is not None:
+            proyecto = (fila['proyecto__nombre_proyecto'], fila['proyecto__codigo_proyecto'] or '')
+
+        self._agregar(
+            self.actividades,
+            id=fila['id'],
+            titulo=fila['titulo'],
+            inicio=int(fila['fecha_inicio'].timestamp()),
+            fin=int(fila['fecha_fin'].timestamp()),
+            todo_el_dia=int(fila['todo_el_dia']),
+            color=self.colores.posicion(fila['color']),
+            clase=fila['clase'],
+            estado=fila['estado'],
+            prioridad=fila['prioridad'],
+            descripcion=fila['descripcion'] or '',
+            ubicacion=fila['ubicacion'] or '',
+            cliente=self.clientes.posicion(fila['cliente__razon_social'] or fila['cliente_nombre_manual']),
+            proyecto=self.proyectos.posicion(proyecto),
+            categoria=self.categorias.posicion(fila['categoria__nombre']),
+            es_automatica=int(fila['es_automatica']),
+            bloquea_agenda=int(fila['bloquea_agenda']),
+            permite_edicion_manual=int(fila['permite_edicion_manual']),
+            participantes=[
+                [self.responsables.posicion(p['nombre']), p['rol'], int(p['confirmado'])]
+                for p in fila['participantes']
+            ],
+        )
+
+    def _agregar_ensayo(self, fila):
+        self._agregar(
+            self.ensayos,
+            id=fila['id'],
+            solicitud=fila['solicitud_id'],
+            codigo_solicitud=fila['solicitud__codigo_solicitud'],
+            inicio=fila['solicitud__fecha_solicitud'].isoformat(),
+            entrega=fila['fecha_entrega'].isoformat(),
+            estado=fila['estado'],
+            color=self.colores.posicion(fila['color']),
+            descripcion=fila['descripcion_ensayo'] or '',
+            cliente=self.clientes.posicion(fila['solicitud__cotizacion__cliente__razon_social']),
+            muestra=fila['muestra'],
+            servicio=fila['servicio'],
+            tecnico=self.responsables.posicion(fila['tecnico_asignado__nombre_completo']),
+            tecnico_id=fila['tecnico_asignado_id'],
+        )
+
+    def como_dict(self):
+        return {
+            'formato': FORMATO_FEED,
+            'token': self.token,
+            'categorias': self.categorias.valores,
+            'colores': self.colores.valores,
+            'clientes': self.clientes.valores,
+            'proyectos': self.proyectos.valores,
+            'responsables': self.responsables.valores,
+            'proyecto': self.proyecto,
+            'actividades': self.actividades,
+            'ensayos': self.ensayos,
+        }
+
+    def contenido(self):
+        return json.dumps(self.como_dict(), ensure_ascii=False, separators=(',', ':')).encode()
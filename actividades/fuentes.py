@@ -0,0 +1,192 @@
+import heapq
+from datetime import datetime, time
+
+from django.utils import timezone
+
+from proyectos.models import DetalleSolicitudEnsayo, Proyecto, SolicitudEnsayo
+from .intervalos import filtrar_participante, filtrar_solapamiento
+from .models import CalendarioActividad, CalendarioParticipante
+
+
+ESTADOS_ACTIVIDAD = {estado for estado, _ in CalendarioActividad.ESTADO_ACTIVIDAD}
+ESTADOS_ENSAYO = {estado for estado, _ in SolicitudEnsayo.ESTADOS}
+
+COLORES_ENSAYOS = {
+    'pendiente': '#94a3b8',
+    'proceso': '#f59e0b',
+    'finalizado': '#10b981',
+}
+
+# Los ensayos solo tienen fecha: en el calendario empiezan a esta hora.
+HORA_INICIO_ENSAYO = time(8, 0)
+
+FILAS_POR_LECTURA = 2000
+
+CAMPOS_ACTIVIDAD = (
+    'id', 'titulo', 'descripcion', 'clase', 'estado', 'prioridad',
+    'fecha_inicio', 'fecha_fin', 'todo_el_dia', 'ubicacion',
+    'es_automatica', 'bloquea_agenda', 'permite_edicion_manual',
+    'categoria__nombre', 'categoria__color',
+    'cliente__razon_social', 'cliente_nombre_manual',
+    'proyecto__nombre_proyecto', 'proyecto__codigo_proyecto',
+    'creado_por_id', 'creado_por__username', 'creado_por__first_name', 'creado_por__last_name',
+)
+
+CAMPOS_ENSAYO = (
+    'id', 'solicitud_id', 'solicitud__codigo_solicitud', 'solicitud__fecha_solicitud', 'solicitud__estado',
+    'solicitud__cotizacion__cliente__razon_social',
+    'fecha_entrega_programada', 'descripcion_ensayo',
+    'muestra__codigo_laboratorio', 'servicio_cotizado__servicio__nombre',
+    'tecnico_asignado_id', 'tecnico_asignado__nombre_completo',
+)
+
+CAMPOS_PARTICIPANTE = (
+    'actividad_id', 'trabajador_id', 'rol', 'confirmado',
+    'trabajador__nombre_completo', 'trabajador__titulo_profesional', 'trabajador__rol__nombre',
+)
+
+
+def _nombre_participante(fila):
+    # Lo mismo que str(TrabajadorProfile), sin cargar el perfil.
+    nombre = fila['trabajador__nombre_completo']
+    if fila['trabajador__titulo_profesional']:
+        nombre = f"{fila['trabajador__titulo_profesional']}. {nombre}"
+    return f"{nombre} ({fila['trabajador__rol__nombre']})"
+
+
+class FuenteEventos:
+    """
+    Actividades y detalles de ensayo de una ventana, con los filtros del
+    calendario y del Gantt aplicados una sola vez.
+
+    `eventos()` recorre ambas tablas a la vez, proyectando solo las
+    columnas que usan los feeds (`values()`), y las mezcla en una única
+    secuencia ordenada por inicio. Cada evento es un diccionario con
+    `tipo` ('actividad' o 'ensayo') e `inicio` (datetime consciente).
+
+    Un estado de actividad (PROGRAMADA, ...) deja fuera los ensayos y un
+    estado de ensayo (pendiente, ...) deja fuera las actividades. Un
+    proyecto filtra los ensayos por su cotización; sin cotización no hay
+    ensayos del proyecto. Con `cambiados_desde` solo quedan los eventos
+    modificados a partir de ese momento.
+    """
+
+    def __init__(self, inicio=None, fin=None, categoria=None, estado=None, responsable=None,
+                 proyecto=None, incluir_ensayos=True, cambiados_desde=None):
+        self.inicio = inicio
+        self.fin = fin
+        self.cambiados_desde = cambiados_desde
+        self.categoria = categoria
+        self.responsable = responsable
+        self.incluir_ensayos = incluir_ensayos
+
+        estado = (estado or '').strip()
+        self.estado_actividad = estado.upper() if estado.upper() in ESTADOS_ACTIVIDAD else None
+        self.estado_ensayo = estado.lower() if estado.lower() in ESTADOS_ENSAYO else None
+
+        self.proyecto_id = proyecto
+        self.proyecto = None
+        if proyecto:
+            self.proyecto = Proyecto.objects.filter(pk=proyecto).values(
+                'id', 'nombre_proyecto', 'codigo_proyecto', 'cotizacion_id'
+            ).first()
+
+    def actividades(self):
+        actividades = filtrar_solapamiento(
+            CalendarioActividad.objects.filter(es_visible=True), self.inicio, self.fin
+        )
+
+        if self.estado_ensayo:
+            return actividades.none()
+
+        if self.categoria:
+            actividades = actividades.filter(categoria_id=self.categoria)
+
+        if self.estado_actividad:
+            actividades = actividades.filter(estado=self.estado_actividad)
+
+        if self.responsable:
+            actividades = filtrar_participante(actividades, self.responsable)
+
+        if self.proyecto_id:
+            actividades = actividades.filter(proyecto_id=self.proyecto_id)
+
+        if self.cambiados_desde:
+            actividades = actividades.filter(actualizada_en__gte=self.cambiados_desde)
+
+        return actividades.order_by('fecha_inicio', 'id')
+
+    def detalles(self):
+        detalles = DetalleSolicitudEnsayo.objects.order_by('solicitud__fecha_solicitud', 'id')
+
+        if not self.incluir_ensayos or self.estado_actividad:
+            return detalles.none()
+
+        if self.proyecto_id:
+            if not self.proyecto or not self.proyecto['cotizacion_id']:
+                return detalles.none()
+            detalles = detalles.filter(solicitud__cotizacion_id=self.proyecto['cotizacion_id'])
+
+        if self.inicio:
+            detalles = detalles.filter(solicitud__fecha_solicitud__gte=self.inicio.date())
+
+        if self.fin:
+            detalles = detalles.filter(solicitud__fecha_solicitud__lte=self.fin.date())
+
+        if self.estado_ensayo:
+            detalles = detalles.filter(solicitud__estado=self.estado_ensayo)
+
+        if self.responsable:
+            detalles = detalles.filter(tecnico_asignado_id=self.responsable)
+
+        if self.cambiados_desde:
+            detalles = detalles.filter(actualizado_en__gte=self.cambiados_desde)
+
+        return detalles
+
+    def _participantes(self):
+        """Participantes de las actividades de la ventana, agrupados por actividad."""
+        participantes = {}
+        filas = CalendarioParticipante.objects.filter(
+            actividad__in=self.actividades().values('pk')
+        ).order_by('pk').values(*CAMPOS_PARTICIPANTE)
+
+        for fila in filas:
+            participantes.setdefault(fila['actividad_id'], []).append({
+                'id': fila['trabajador_id'],
+                'nombre': _nombre_participante(fila),
+                'rol': fila['rol'],
+                'confirmado': fila['confirmado'],
+            })
+        return participantes
+
+    def _filas_actividades(self):
+        participantes = self._participantes()
+
+        for fila in self.actividades().values(*CAMPOS_ACTIVIDAD).iterator(chunk_size=FILAS_POR_LECTURA):
+            fila['tipo'] = 'actividad'
+            fila['inicio'] = fila['fecha_inicio']
+            fila['color'] = fila['categoria__color'] or CalendarioActividad.COLORES_CLASE.get(fila['clase'], '#334155')
+            fila['participantes'] = participantes.get(fila['id'], [])
+            yield fila
+
+    def _filas_ensayos(self):
+        zona = timezone.get_current_timezone()
+
+        for fila in self.detalles().values(*CAMPOS_ENSAYO).iterator(chunk_size=FILAS_POR_LECTURA):
+            fecha = fila['solicitud__fecha_solicitud']
+            if not fecha:
+                continue
+
+            estado = (fila['solicitud__estado'] or 'pendiente').lower()
+            fila['tipo'] = 'ensayo'
+            fila['inicio'] = timezone.make_aware(datetime.combine(fecha, HORA_INICIO_ENSAYO), zona)
+            fila['estado'] = estado
+            fila['color'] = COLORES_ENSAYOS.get(estado, '#94a3b8')
+            fila['fecha_entrega'] = fila['fecha_entrega_programada'] or fecha
+            fila['servicio'] = fila['servicio_cotizado__servicio__nombre'] or fila['descripcion_ensayo'] or 'Ensayo'
+            fila['muestra'] = fila['muestra__codigo_laboratorio'] or 'Sin muestra'
+            yield fila
+
+    def eventos(self):
+        return heapq.merge(self._filas_actividades(), self._filas_ensayos(), key=lambda fila: fila['inicio'])
@@ -0,0 +1,85 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import DurationField, Exists, ExpressionWrapper, F, Func, Max, OuterRef, Value
+
+from core.versiones import leer_version, subir_version
+from .models import CalendarioActividad, CalendarioParticipante
+
+
+DURACION_CACHE_TIMEOUT = 60 * 60 * 24
+DURACION_VERSION_KEY = 'actividades:duracion_maxima:version'
+
+
+def version_duracion_maxima():
+    return leer_version(DURACION_VERSION_KEY)
+
+
+def invalidar_duracion_maxima():
+    """Obliga a todos los procesos a recalcular la duración máxima."""
+    subir_version(DURACION_VERSION_KEY)
+
+
+def duracion_maxima():
+    """
+    Cota superior de `fecha_fin - fecha_inicio` entre todas las actividades.
+    Se calcula con una consulta por versión; borrar o acortar actividades no
+    la invalida porque sigue siendo una cota válida.
+    """
+    # La versión se lee antes que los datos: si en medio se guarda una
+    # actividad más larga, la versión sube al confirmar y no se usa esta cota.
+    version = version_duracion_maxima()
+    clave = f'actividades:duracion_maxima:v{version}'
+
+    duracion = cache.get(clave)
+    if duracion is None:
+        duracion = CalendarioActividad.objects.aggregate(
+            duracion=Max(ExpressionWrapper(F('fecha_fin') - F('fecha_inicio'), output_field=DurationField()))
+        )['duracion'] or timedelta(0)
+        cache.set(clave, duracion, DURACION_CACHE_TIMEOUT)
+    return duracion
+
+
+def registrar_duraciones(duraciones):
+    """Sube la versión si alguna duración guardada supera la cota vigente."""
+    cota = cache.get(f'actividades:duracion_maxima:v{version_duracion_maxima()}')
+    # Sin cota publicada también se invalida: un proceso podría estar
+    # calculándola con datos anteriores a este guardado.
+    if cota is None or max(duraciones) > cota:
+        invalidar_duracion_maxima()
+
+
+def filtrar_solapamiento(queryset, inicio=None, fin=None):
+    """
+    Actividades de `queryset` que se cruzan con [inicio, fin].
+
+    En PostgreSQL la condición es `tstzrange(fecha_inicio, fecha_fin) && rango`,
+    que resuelve el índice GiST de la migración 0003. En los demás motores
+    se acota además `fecha_inicio` a [inicio - duración máxima, fin]: así la
+    consulta es un único tramo del índice parcial (fecha_inicio, fecha_fin)
+    en lugar de todas las actividades que empiezan antes de `fin`.
+    """
+    if inicio and fin and connection.vendor == 'postgresql':
+        from django.contrib.postgres.fields import DateTimeRangeField
+        from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
+
+        return queryset.alias(
+            rango_fechas=Func(
+                F('fecha_inicio'), F('fecha_fin'), Value('[]'),
+                function='TSTZRANGE', output_field=DateTimeRangeField(),
+            )
+        ).filter(rango_fechas__overlap=DateTimeTZRange(inicio, fin, '[]'))
+
+    if inicio:
+        queryset = queryset.filter(fecha_fin__gte=inicio, fecha_inicio__gte=inicio - duracion_maxima())
+    if fin:
+        queryset = queryset.filter(fecha_inicio__lte=fin)
+    return queryset
+
+
+def filtrar_participante(queryset, trabajador_id):
+    """Actividades en las que participa el trabajador, sin JOIN ni DISTINCT."""
+    return queryset.filter(
+        Exists(CalendarioParticipante.objects.filter(actividad=OuterRef('pk'), trabajador_id=trabajador_id))
+    )
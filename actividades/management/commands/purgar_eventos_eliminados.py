@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from actividades.sincronizacion import RETENCION_ELIMINADOS, purgar_eliminados
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las lápidas de eventos del calendario más viejas que la retención "
+        f"de la sincronización ({RETENCION_ELIMINADOS.days} días)."
+    )
+
+    def handle(self, *args, **options):
+        borradas = purgar_eliminados()
+        self.stdout.write(self.style.SUCCESS(f"{borradas} lápida(s) borrada(s)."))
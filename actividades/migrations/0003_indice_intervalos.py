@@ -0,0 +1,43 @@
+# Generated by Django 4.2.29 on 2026-10-18 11:37
+
+from django.db import migrations, models
+
+
+TABLA = 'actividades_calendarioactividad'
+
+# Índice de intervalos para el operador && de actividades.intervalos; la
+# expresión debe coincidir con la que arma filtrar_solapamiento.
+SQL_POSTGRES = [
+    f"CREATE INDEX {TABLA}_rango_gist ON {TABLA} "
+    f"USING gist (tstzrange(fecha_inicio, fecha_fin, '[]')) WHERE es_visible",
+]
+SQL_POSTGRES_REVERSA = [
+    f"DROP INDEX IF EXISTS {TABLA}_rango_gist",
+]
+
+
+def crear_indice_gist(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sentencia in SQL_POSTGRES:
+            schema_editor.execute(sentencia)
+
+
+def borrar_indice_gist(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sentencia in SQL_POSTGRES_REVERSA:
+            schema_editor.execute(sentencia)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actividades', '0002_calendarioactividad_cliente_nombre_manual'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calendarioactividad',
+            index=models.Index(condition=models.Q(('es_visible', True)), fields=['fecha_inicio', 'fecha_fin'], name='actividad_visible_rango_idx'),
+        ),
+        migrations.RunPython(crear_indice_gist, borrar_indice_gist),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.29 on 2026-10-18 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actividades', '0003_indice_intervalos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoCalendarioEliminado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('actividad', 'Actividad'), ('ensayo', 'Detalle de ensayo')], max_length=20, verbose_name='Tipo de evento')),
+                ('objeto_id', models.PositiveBigIntegerField(verbose_name='ID del registro')),
+                ('eliminado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Evento de Calendario Eliminado',
+                'verbose_name_plural': 'Eventos de Calendario Eliminados',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='calendarioactividad',
+            index=models.Index(fields=['actualizada_en'], name='actividades_actuali_740ba6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventocalendarioeliminado',
+            index=models.Index(fields=['eliminado_en'], name='actividades_elimina_069b5b_idx'),
+        ),
+    ]
@@ -60,6 +60,23 @@ class CalendarioActividad(models.Model):
         ('URGENTE', 'Urgente'),
     ]
 
+    COLORES_CLASE = {
+        'REUNION': '#2563eb',
+        'LLAMADA': '#0891b2',
+        'VISITA': '#7c3aed',
+        'RECEPCION': '#0ea5e9',
+        'ENSAYO': '#f59e0b',
+        'ENTREGA': '#ef4444',
+        'INFORME': '#10b981',
+        'SEGUIMIENTO': '#6366f1',
+        'MANTENIMIENTO': '#64748b',
+        'CAPACITACION': '#9333ea',
+        'AUDITORIA': '#b45309',
+        'INTERNO': '#475569',
+        'BLOQUEO': '#dc2626',
+        'OTRO': '#334155',
+    }
+
     titulo = models.CharField(max_length=255, verbose_name="Título")
     descripcion = models.TextField(blank=True, null=True, verbose_name="Descripción")
 
@@ -195,8 +212,14 @@ class CalendarioActividad(models.Model):
         verbose_name_plural = "Actividades de Calendario"
         ordering = ['fecha_inicio']
         indexes = [
+            models.Index(
+                fields=['fecha_inicio', 'fecha_fin'],
+                condition=models.Q(es_visible=True),
+                name='actividad_visible_rango_idx',
+            ),
             models.Index(fields=['fecha_inicio']),
             models.Index(fields=['fecha_fin']),
+            models.Index(fields=['actualizada_en']),
             models.Index(fields=['estado']),
             models.Index(fields=['tipo']),
             models.Index(fields=['clase']),
@@ -220,24 +243,7 @@ class CalendarioActividad(models.Model):
     def color_visual(self):
         if self.categoria and self.categoria.color:
             return self.categoria.color
-
-        colores = {
-            'REUNION': '#2563eb',
-            'LLAMADA': '#0891b2',
-            'VISITA': '#7c3aed',
-            'RECEPCION': '#0ea5e9',
-            'ENSAYO': '#f59e0b',
-            'ENTREGA': '#ef4444',
-            'INFORME': '#10b981',
-            'SEGUIMIENTO': '#6366f1',
-            'MANTENIMIENTO': '#64748b',
-            'CAPACITACION': '#9333ea',
-            'AUDITORIA': '#b45309',
-            'INTERNO': '#475569',
-            'BLOQUEO': '#dc2626',
-            'OTRO': '#334155',
-        }
-        return colores.get(self.clase, '#334155')
+        return self.COLORES_CLASE.get(self.clase, '#334155')
 
     def save(self, *args, **kwargs):
         if self.fecha_fin < self.fecha_inicio:
@@ -316,4 +322,29 @@ class CalendarioRecordatorio(models.Model):
         ordering = ['minutos_antes']
 
     def __str__(self):
-        return f"{self.actividad.titulo} - {self.minutos_antes} min"
\ No newline at end of file
+        return f"{self.actividad.titulo} - {self.minutos_antes} min"
+
+
+class EventoCalendarioEliminado(models.Model):
+    """
+    Lápida de una actividad o un detalle de ensayo borrado: la
+    sincronización incremental del calendario la informa a los clientes.
+    """
+    TIPO_EVENTO = [
+        ('actividad', 'Actividad'),
+        ('ensayo', 'Detalle de ensayo'),
+    ]
+
+    tipo = models.CharField(max_length=20, choices=TIPO_EVENTO, verbose_name="Tipo de evento")
+    objeto_id = models.PositiveBigIntegerField(verbose_name="ID del registro")
+    eliminado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Evento de Calendario Eliminado"
+        verbose_name_plural = "Eventos de Calendario Eliminados"
+        indexes = [
+            models.Index(fields=['eliminado_en']),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} {self.objeto_id} ({self.eliminado_en:%Y-%m-%d %H:%M})"
@@ -0,0 +1,87 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from clientes.models import Cliente
+from core.tiempo_real import publicar
+from core.transacciones import acumular_al_confirmar
+from proyectos.models import DetalleSolicitudEnsayo, MuestraDetalle, Proyecto, SolicitudEnsayo
+from servicios.models import Cotizacion, CotizacionDetalle, Servicio
+from trabajadores.models import RolTrabajador, TrabajadorProfile
+from .feed import invalidar_feed
+from .intervalos import registrar_duraciones
+from .models import CalendarioActividad, CalendarioCategoria, CalendarioParticipante
+from .sincronizacion import registrar_eliminacion
+
+
+def _invalidar_feed(modelos):
+    invalidar_feed()
+
+
+def _avisar_calendario(tipos):
+    # Solo el tipo: el calendario y el Gantt piden los cambios a sus endpoints.
+    publicar('calendario', {'eventos': sorted(tipos)})
+
+
+@receiver(post_save, sender=CalendarioActividad)
+def duracion_actividad_guardada(sender, instance, **kwargs):
+    acumular_al_confirmar(registrar_duraciones, instance.fecha_fin - instance.fecha_inicio)
+
+
+@receiver(post_delete, sender=CalendarioActividad)
+def actividad_eliminada(sender, instance, **kwargs):
+    registrar_eliminacion('actividad', instance.pk)
+
+
+@receiver(post_delete, sender=DetalleSolicitudEnsayo)
+def detalle_ensayo_eliminado(sender, instance, **kwargs):
+    registrar_eliminacion('ensayo', instance.pk)
+
+
+# Los participantes, el estado de la solicitud y la muestra se muestran en
+# el evento: tocarlos marca el evento como modificado para la sincronización.
+@receiver([post_save, post_delete], sender=CalendarioParticipante)
+def participante_modificado(sender, instance, **kwargs):
+    CalendarioActividad.objects.filter(pk=instance.actividad_id).update(actualizada_en=timezone.now())
+
+
+@receiver(post_save, sender=SolicitudEnsayo)
+def solicitud_ensayo_modificada(sender, instance, **kwargs):
+    DetalleSolicitudEnsayo.objects.filter(solicitud=instance).update(actualizado_en=timezone.now())
+
+
+@receiver(post_save, sender=MuestraDetalle)
+def muestra_modificada(sender, instance, **kwargs):
+    DetalleSolicitudEnsayo.objects.filter(muestra=instance).update(actualizado_en=timezone.now())
+
+
+# Cualquier dato que aparece en el feed del calendario invalida sus huellas.
+@receiver([post_save, post_delete], sender=CalendarioActividad)
+@receiver([post_save, post_delete], sender=CalendarioCategoria)
+@receiver([post_save, post_delete], sender=CalendarioParticipante)
+@receiver([post_save, post_delete], sender=DetalleSolicitudEnsayo)
+@receiver([post_save, post_delete], sender=SolicitudEnsayo)
+@receiver([post_save, post_delete], sender=MuestraDetalle)
+@receiver([post_save, post_delete], sender=Proyecto)
+@receiver([post_save, post_delete], sender=Cliente)
+@receiver([post_save, post_delete], sender=Cotizacion)
+@receiver([post_save, post_delete], sender=CotizacionDetalle)
+@receiver([post_save, post_delete], sender=Servicio)
+@receiver([post_save, post_delete], sender=TrabajadorProfile)
+@receiver([post_save, post_delete], sender=RolTrabajador)
+def datos_feed_modificados(sender, **kwargs):
+    acumular_al_confirmar(_invalidar_feed, sender)
+
+
+# Las páginas abiertas del calendario y del Gantt reciben un aviso en vivo.
+@receiver([post_save, post_delete], sender=CalendarioActividad)
+@receiver([post_save, post_delete], sender=CalendarioParticipante)
+def actividad_en_vivo(sender, **kwargs):
+    acumular_al_confirmar(_avisar_calendario, 'actividad')
+
+
+@receiver([post_save, post_delete], sender=DetalleSolicitudEnsayo)
+@receiver(post_save, sender=SolicitudEnsayo)
+@receiver(post_save, sender=MuestraDetalle)
+def ensayo_en_vivo(sender, **kwargs):
+    acumular_al_confirmar(_avisar_calendario, 'ensayo')
@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+from django.core import signing
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from proyectos.models import DetalleSolicitudEnsayo
+from .feed import FeedCalendario
+from .fuentes import FuenteEventos
+from .models import CalendarioActividad, EventoCalendarioEliminado
+
+
+SAL_TOKEN = 'actividades.sincronizacion'
+
+# `actualizada_en` se fija al guardar, no al confirmar: una transacción que
+# empezó antes del token puede confirmarse después con una hora anterior.
+MARGEN_SINCRONIZACION = timedelta(seconds=30)
+
+# Las lápidas se purgan pasado este plazo; un token más viejo pide recargar.
+RETENCION_ELIMINADOS = timedelta(days=7)
+
+# Con más cambios que estos sale más barato recargar la ventana entera.
+LIMITE_CAMBIOS = 500
+
+
+def crear_token(momento=None):
+    """Token firmado con el momento a partir del cual se piden cambios."""
+    momento = momento or timezone.now()
+    return signing.dumps(momento.isoformat(), salt=SAL_TOKEN)
+
+
+def leer_token(token):
+    """Momento guardado en el token, o None si no es válido o ya caducó."""
+    try:
+        momento = parse_datetime(signing.loads(token or '', salt=SAL_TOKEN))
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+
+    if momento is None or momento < timezone.now() - RETENCION_ELIMINADOS:
+        return None
+    return momento
+
+
+def registrar_eliminacion(tipo, objeto_id):
+    EventoCalendarioEliminado.objects.create(tipo=tipo, objeto_id=objeto_id)
+
+
+def purgar_eliminados(antes_de=None):
+    """Borra las lápidas más viejas que la retención; devuelve cuántas."""
+    antes_de = antes_de or timezone.now() - RETENCION_ELIMINADOS
+    borradas, _ = EventoCalendarioEliminado.objects.filter(eliminado_en__lt=antes_de).delete()
+    return borradas
+
+
+def _ids_cambiados(queryset, campo, desde):
+    ids = list(queryset.filter(**{f'{campo}__gte': desde}).values_list('pk', flat=True)[:LIMITE_CAMBIOS + 1])
+    if len(ids) > LIMITE_CAMBIOS:
+        return None
+    return set(ids)
+
+
+def sincronizar(token, **filtros):
+    """
+    Cambios del calendario desde `token` para la ventana y los filtros de
+    `FuenteEventos`.
+
+    Devuelve el token siguiente, los eventos modificados que siguen dentro
+    de la ventana (en el formato de `FeedCalendario`) y los ids que el
+    cliente debe quitar: los borrados y los modificados que ya no cumplen
+    los filtros. Con `recargar` el cliente debe pedir la ventana completa:
+    el token no es válido, caducó o hay demasiados cambios.
+    """
+    # El token siguiente se toma antes de leer: lo que cambie durante la
+    # lectura vuelve a aparecer en la próxima sincronización.
+    siguiente = crear_token()
+    recargar = {'token': siguiente, 'recargar': True, 'eventos': None, 'eliminados': None}
+
+    momento = leer_token(token)
+    if momento is None:
+        return recargar
+    desde = momento - MARGEN_SINCRONIZACION
+
+    actividades = _ids_cambiados(CalendarioActividad.objects.all(), 'actualizada_en', desde)
+    ensayos = _ids_cambiados(DetalleSolicitudEnsayo.objects.all(), 'actualizado_en', desde)
+    if actividades is None or ensayos is None:
+        return recargar
+
+    fuente = FuenteEventos(cambiados_desde=desde, **filtros)
+    feed = FeedCalendario(proyecto=fuente.proyecto, token=siguiente)
+    for evento in fuente.eventos():
+        feed.agregar(evento)
+
+    eliminados = EventoCalendarioEliminado.objects.filter(eliminado_en__gte=desde)
+    for tipo, objeto_id in eliminados.values_list('tipo', 'objeto_id'):
+        if tipo == 'actividad':
+            actividades.add(objeto_id)
+        else:
+            ensayos.add(objeto_id)
+
+    return {
+        'token': siguiente,
+        'recargar': False,
+        'eventos': feed.como_dict(),
+        'eliminados': {
+            'actividades': sorted(actividades - set(feed.actividades['id'])),
+            'ensayos': sorted(ensayos - set(feed.ensayos['id'])),
+        },
+    }
@@ -1,3 +1,450 @@
-from django.test import TestCase
+import os
+import random
+import time
+from datetime import timedelta
+from unittest import skipUnless
 
-# Create your tests here.
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, tag
+from django.urls import reverse
+from django.utils import timezone
+
+from clientes.models import Cliente
+from proyectos.models import (
+    DetalleSolicitudEnsayo,
+    MuestraDetalle,
+    Proyecto,
+    RecepcionMuestra,
+    SolicitudEnsayo,
+    TipoMuestra,
+)
+from servicios.models import Cotizacion, CotizacionDetalle, CotizacionGrupo, Servicio
+from trabajadores.models import RolTrabajador, TrabajadorProfile
+from . import intervalos, sincronizacion
+from .fuentes import FuenteEventos
+from .models import CalendarioActividad, CalendarioParticipante, EventoCalendarioEliminado
+
+
+INICIO = timezone.make_aware(timezone.datetime(2026, 1, 1))
+
+
+def crear_actividades(usuario, cantidad, dias, desde=0, duracion_maxima_horas=72, semilla=1):
+    """`cantidad` actividades repartidas en los días [desde, dias) contados desde INICIO."""
+    aleatorio = random.Random(semilla)
+    actividades = []
+    for i in range(cantidad):
+        inicio = INICIO + timedelta(minutes=aleatorio.randrange(desde * 24 * 60, dias * 24 * 60))
+        actividades.append(CalendarioActividad(
+            titulo=f'Actividad {i}',
+            fecha_inicio=inicio,
+            fecha_fin=inicio + timedelta(minutes=aleatorio.randrange(duracion_maxima_horas * 60)),
+            es_visible=i % 10 != 0,
+            creado_por=usuario,
+        ))
+    CalendarioActividad.objects.bulk_create(actividades, batch_size=2000)
+
+
+def solapadas_sin_indice(inicio, fin):
+    return set(CalendarioActividad.objects.filter(
+        es_visible=True, fecha_fin__gte=inicio, fecha_inicio__lte=fin,
+    ).values_list('pk', flat=True))
+
+
+def solapadas(inicio, fin):
+    return set(intervalos.filtrar_solapamiento(
+        CalendarioActividad.objects.filter(es_visible=True), inicio, fin,
+    ).values_list('pk', flat=True))
+
+
+class SolapamientoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@vicaf.pe', 'clave')
+        crear_actividades(cls.usuario, 400, dias=120)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_coincide_con_el_filtro_de_solapamiento(self):
+        aleatorio = random.Random(2)
+        for _ in range(30):
+            inicio = INICIO + timedelta(hours=aleatorio.randrange(-100, 120 * 24))
+            fin = inicio + timedelta(hours=aleatorio.randrange(1, 24 * 40))
+            self.assertEqual(solapadas(inicio, fin), solapadas_sin_indice(inicio, fin))
+
+    def test_una_actividad_mas_larga_amplia_la_cota(self):
+        mes = (INICIO + timedelta(days=300), INICIO + timedelta(days=330))
+        self.assertEqual(solapadas(*mes), set())
+        cota = intervalos.duracion_maxima()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            larga = CalendarioActividad.objects.create(
+                titulo='Mantenimiento anual',
+                fecha_inicio=INICIO,
+                fecha_fin=INICIO + timedelta(days=365),
+                creado_por=self.usuario,
+            )
+
+        self.assertGreater(intervalos.duracion_maxima(), cota)
+        self.assertEqual(solapadas(*mes), {larga.pk})
+
+    def test_acortar_o_borrar_no_recalcula_la_cota(self):
+        intervalos.duracion_maxima()
+        version = intervalos.version_duracion_maxima()
+
+        actividad = CalendarioActividad.objects.order_by('pk').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            actividad.fecha_fin = actividad.fecha_inicio
+            actividad.save()
+            CalendarioActividad.objects.filter(pk=actividad.pk).delete()
+
+        self.assertEqual(intervalos.version_duracion_maxima(), version)
+
+    @skipUnless(connection.vendor == 'sqlite', 'Plan de consulta de SQLite')
+    def test_el_rango_se_resuelve_con_el_indice_compuesto(self):
+        consulta = intervalos.filtrar_solapamiento(
+            CalendarioActividad.objects.filter(es_visible=True), INICIO, INICIO + timedelta(days=31),
+        ).values('pk')
+        sql, parametros = consulta.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', parametros)
+            plan = ' '.join(str(fila[-1]) for fila in cursor.fetchall())
+
+        self.assertIn('USING INDEX actividad_visible_rango_idx (fecha_inicio>? AND fecha_inicio<?)', plan)
+
+
+class CalendarioEventosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@vicaf.pe', 'clave')
+        # Las versiones de la caché se suben al confirmar la transacción
+        with cls.captureOnCommitCallbacks(execute=True):
+            rol = RolTrabajador.objects.create(nombre='Técnico')
+            cls.tecnicos = [
+                TrabajadorProfile.objects.create(
+                    user=User.objects.create_user(f'tecnico{i}', password='clave'),
+                    rol=rol,
+                    nombre_completo=f'Técnico {i}',
+                )
+                for i in range(2)
+            ]
+            cls.actividad = CalendarioActividad.objects.create(
+                titulo='Visita a obra',
+                fecha_inicio=INICIO + timedelta(days=3),
+                fecha_fin=INICIO + timedelta(days=3, hours=4),
+                creado_por=cls.usuario,
+            )
+            for tecnico in cls.tecnicos:
+                CalendarioParticipante.objects.create(actividad=cls.actividad, trabajador=tecnico)
+            CalendarioActividad.objects.create(
+                titulo='Auditoría',
+                fecha_inicio=INICIO + timedelta(days=5),
+                fecha_fin=INICIO + timedelta(days=5, hours=2),
+                creado_por=cls.usuario,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def pedir(self, encabezados=None, **parametros):
+        return self.client.get(reverse('actividades:calendario_eventos_json'), {
+            'start': INICIO.isoformat(),
+            'end': (INICIO + timedelta(days=31)).isoformat(),
+            **parametros,
+        }, headers=encabezados)
+
+    def eventos(self, **parametros):
+        respuesta = self.pedir(**parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()['actividades']['id']
+
+    def test_filtrar_por_responsable_no_duplica_actividades(self):
+        self.assertEqual(len(self.eventos()), 2)
+        self.assertEqual(self.eventos(responsable=self.tecnicos[0].pk), [self.actividad.pk])
+
+    def test_feed_en_columnas_con_tablas_compartidas(self):
+        feed = self.pedir().json()
+        actividades = feed['actividades']
+
+        self.assertEqual(actividades['titulo'], ['Visita a obra', 'Auditoría'])
+        self.assertEqual(actividades['inicio'][0], int((INICIO + timedelta(days=3)).timestamp()))
+        participantes = actividades['participantes'][0]
+        self.assertEqual(
+            sorted(feed['responsables'][responsable] for responsable, _, _ in participantes),
+            sorted(str(tecnico) for tecnico in self.tecnicos),
+        )
+        self.assertEqual(len(feed['colores']), 1)
+        self.assertEqual(feed['ensayos']['id'], [])
+
+    def test_responde_304_mientras_la_ventana_no_cambia(self):
+        respuesta = self.pedir()
+        etag = respuesta['ETag']
+        self.assertIn('no-cache', respuesta['Cache-Control'])
+
+        with self.assertNumQueries(4):
+            # Sesión, usuario y las dos consultas de la huella.
+            respuesta = self.pedir(encabezados={'If-None-Match': etag})
+        self.assertEqual(respuesta.status_code, 304)
+
+        self.assertNotEqual(self.pedir(categoria=1)['ETag'], etag)
+
+    def test_cambios_sin_rastro_en_las_actividades_cambian_la_huella(self):
+        etag = self.pedir()['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CalendarioParticipante.objects.filter(trabajador=self.tecnicos[1]).delete()
+
+        respuesta = self.pedir(encabezados={'If-None-Match': etag})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.json()['actividades']['participantes'][0]), 1)
+
+
+class EscenarioCalendarioTestCase(TestCase):
+    """Un proyecto con un detalle de ensayo hoy y tres actividades alrededor."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@vicaf.pe', 'clave')
+        hoy = timezone.localdate()
+        ahora = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.tecnico = TrabajadorProfile.objects.create(
+                user=User.objects.create_user('tecnico', password='clave'),
+                rol=RolTrabajador.objects.create(nombre='Técnico'),
+                nombre_completo='Ana Quispe',
+            )
+            cliente = Cliente.objects.create(
+                ruc='20123456789', razon_social='Constructora Andina SAC', persona_contacto='Luis',
+                celular_contacto='999999999', correo_contacto='luis@andina.pe',
+            )
+            cotizacion = Cotizacion.objects.create(
+                cliente=cliente, numero_oferta='VCF-OTE-2026-001', asunto_servicio='Ensayos de suelos',
+                persona_contacto='Luis', correo_contacto='luis@andina.pe', telefono_contacto='999999999',
+                tasa_igv=Decimal('0.18'),
+            )
+            cls.proyecto = Proyecto.objects.create(
+                cotizacion=cotizacion, cliente=cliente, nombre_proyecto='Carretera Norte', codigo_proyecto='PRY-001',
+            )
+            grupo = CotizacionGrupo.objects.create(cotizacion=cotizacion, nombre_grupo='ENSAYOS', orden=0)
+            servicio_cotizado = CotizacionDetalle.objects.create(
+                grupo=grupo, servicio=Servicio.objects.create(codigo_facturacion='ENS-001', nombre='Proctor modificado'),
+                descripcion_especifica='Proctor', cantidad=1, precio_unitario=Decimal('80.00'),
+            )
+            recepcion = RecepcionMuestra.objects.create(
+                cotizacion=cotizacion, procedencia='Cantera', responsable_cliente='Luis', telefono='999',
+                responsable_recepcion=cls.usuario,
+            )
+            muestra = MuestraDetalle.objects.create(
+                recepcion=recepcion, tipo_muestra=TipoMuestra.objects.create(sigla='SU', nombre='Suelo'),
+                descripcion='Suelo', masa_aprox=1,
+            )
+            solicitud = SolicitudEnsayo.objects.create(
+                codigo_solicitud='SOL-001', recepcion=recepcion, cotizacion=cotizacion, estado='proceso',
+                fecha_solicitud=hoy, fecha_entrega_programada=hoy + timedelta(days=5), elaborado_por=cls.tecnico,
+            )
+            cls.detalle = DetalleSolicitudEnsayo.objects.create(
+                solicitud=solicitud, muestra=muestra, servicio_cotizado=servicio_cotizado,
+                descripcion_ensayo='Proctor', norma='ASTM D1557', tecnico_asignado=cls.tecnico,
+                fecha_entrega_programada=hoy + timedelta(days=5),
+            )
+
+            cls.actividades = []
+            for dias in (-3, 1, 4):
+                actividad = CalendarioActividad.objects.create(
+                    titulo=f'Visita {dias}', fecha_inicio=ahora + timedelta(days=dias),
+                    fecha_fin=ahora + timedelta(days=dias, hours=2), proyecto=cls.proyecto, creado_por=cls.usuario,
+                )
+                CalendarioParticipante.objects.create(actividad=actividad, trabajador=cls.tecnico)
+                cls.actividades.append(actividad)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+
+class FuenteEventosTests(EscenarioCalendarioTestCase):
+
+    def test_mezcla_actividades_y_ensayos_por_inicio(self):
+        eventos = list(FuenteEventos().eventos())
+
+        self.assertEqual(
+            [(evento['tipo'], evento['id']) for evento in eventos],
+            [('actividad', self.actividades[0].pk), ('ensayo', self.detalle.pk),
+             ('actividad', self.actividades[1].pk), ('actividad', self.actividades[2].pk)],
+        )
+        self.assertEqual(eventos[0]['participantes'][0]['nombre'], str(self.tecnico))
+
+    def test_calendario_y_gantt_aplican_los_mismos_filtros(self):
+        inicio = timezone.now() - timedelta(days=30)
+        fin = timezone.now() + timedelta(days=30)
+        for filtros in [{}, {'responsable': self.tecnico.pk}, {'proyecto': self.proyecto.pk},
+                        {'estado': 'proceso'}, {'estado': 'PROGRAMADA'}]:
+            feed = self.client.get(reverse('actividades:calendario_eventos_json'), {
+                'start': inicio.isoformat(), 'end': fin.isoformat(), **filtros,
+            }).json()
+            calendario = {f'actividad-{pk}' for pk in feed['actividades']['id']}
+            calendario |= {f'ensayo-detalle-{pk}' for pk in feed['ensayos']['id']}
+
+            gantt = self.client.get(reverse('actividades:gantt_actividades_json'), filtros).json()
+            self.assertEqual({barra['id'] for barra in gantt}, calendario, filtros)
+
+    def test_gantt_no_consulta_por_actividad(self):
+        # Sesión, usuario, participantes, actividades y ensayos; fuera de
+        # PostgreSQL, además la cota de duración de `filtrar_solapamiento`.
+        with self.assertNumQueries(5 if connection.vendor == 'postgresql' else 6):
+            barras = self.client.get(reverse('actividades:gantt_actividades_json')).json()
+        self.assertEqual(len(barras), 4)
+        self.assertEqual(barras[0]['responsable'], str(self.tecnico))
+
+
+class SincronizacionCalendarioTests(EscenarioCalendarioTestCase):
+
+    def setUp(self):
+        super().setUp()
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+        CalendarioActividad.objects.update(actualizada_en=hace_una_hora)
+        DetalleSolicitudEnsayo.objects.update(actualizado_en=hace_una_hora)
+        self.token = sincronizacion.crear_token(timezone.now() - timedelta(minutes=10))
+        self.ventana = {
+            'start': (timezone.now() - timedelta(days=7)).isoformat(),
+            'end': (timezone.now() + timedelta(days=7)).isoformat(),
+        }
+
+    def sincronizar(self, token=None, **filtros):
+        return self.client.get(reverse('actividades:calendario_sincronizar_json'), {
+            'token': token or self.token, **self.ventana, **filtros,
+        }).json()
+
+    def test_sin_cambios_no_devuelve_eventos(self):
+        datos = self.sincronizar()
+
+        self.assertFalse(datos['recargar'])
+        self.assertEqual(datos['eventos']['actividades']['id'], [])
+        self.assertEqual(datos['eventos']['ensayos']['id'], [])
+        self.assertEqual(datos['eliminados'], {'actividades': [], 'ensayos': []})
+        self.assertIsNotNone(sincronizacion.leer_token(datos['token']))
+
+    def test_devuelve_modificados_y_eliminados(self):
+        modificada, movida, borrada = self.actividades
+        borrada_id = borrada.pk
+        modificada.titulo = 'Visita reprogramada'
+        modificada.save()
+        movida.fecha_inicio += timedelta(days=30)
+        movida.fecha_fin += timedelta(days=30)
+        movida.save()
+        borrada.delete()
+
+        datos = self.sincronizar()
+
+        self.assertEqual(datos['eventos']['actividades']['id'], [modificada.pk])
+        self.assertEqual(datos['eventos']['actividades']['titulo'], ['Visita reprogramada'])
+        self.assertEqual(datos['eliminados']['actividades'], sorted([movida.pk, borrada_id]))
+
+    def test_cambios_relacionados_marcan_el_evento(self):
+        participante = self.actividades[1].participantes.get()
+        participante.confirmado = True
+        participante.save()
+        solicitud = self.detalle.solicitud
+        solicitud.estado = 'finalizado'
+        solicitud.save()
+
+        datos = self.sincronizar()
+
+        self.assertEqual(datos['eventos']['actividades']['id'], [self.actividades[1].pk])
+        [[_, rol, confirmado]] = datos['eventos']['actividades']['participantes'][0]
+        self.assertEqual((rol, confirmado), ('RESPONSABLE', 1))
+        self.assertEqual(datos['eventos']['ensayos']['id'], [self.detalle.pk])
+        self.assertEqual(datos['eventos']['ensayos']['estado'], ['finalizado'])
+
+    def test_detalle_eliminado_y_filtro_de_estado(self):
+        detalle = self.detalle.pk
+        self.detalle.delete()
+        self.actividades[0].save()
+
+        datos = self.sincronizar(estado='proceso')
+
+        self.assertEqual(datos['eliminados'], {'actividades': [self.actividades[0].pk], 'ensayos': [detalle]})
+
+    def test_token_invalido_o_caducado_pide_recargar(self):
+        caducado = sincronizacion.crear_token(timezone.now() - timedelta(days=8))
+        for token in ['basura', caducado]:
+            datos = self.sincronizar(token)
+            self.assertTrue(datos['recargar'], token)
+            self.assertIsNone(datos['eventos'])
+            self.assertIsNotNone(sincronizacion.leer_token(datos['token']))
+
+    def test_el_feed_trae_el_token_de_partida(self):
+        feed = self.client.get(reverse('actividades:calendario_eventos_json'), self.ventana).json()
+        self.assertIsNotNone(sincronizacion.leer_token(feed['token']))
+
+    def test_purga_lapidas_viejas(self):
+        self.actividades[2].delete()
+        EventoCalendarioEliminado.objects.update(eliminado_en=timezone.now() - timedelta(days=8))
+        reciente = self.actividades[1].pk
+        self.actividades[1].delete()
+
+        self.assertEqual(sincronizacion.purgar_eliminados(), 1)
+        self.assertEqual(list(EventoCalendarioEliminado.objects.values_list('objeto_id', flat=True)), [reciente])
+
+
+@tag('benchmark')
+@skipUnless(os.environ.get('BENCHMARK_CALENDARIO'), 'Defina BENCHMARK_CALENDARIO=1000,10000,100000,300000')
+class RendimientoCalendarioTests(TestCase):
+    """
+    Latencia de la vista de un mes a medida que crece la tabla. La
+    densidad se mantiene en ~300 actividades por mes: al crecer la tabla
+    crece el historial, no la cantidad de actividades de cada mes.
+
+        BENCHMARK_CALENDARIO=1000,100000,300000 python manage.py test actividades --tag benchmark
+    """
+
+    POR_MES = 300
+    REPETICIONES = 20
+
+    def medir(self, consulta):
+        tiempos = []
+        for _ in range(self.REPETICIONES):
+            inicio = time.perf_counter()
+            list(consulta())
+            tiempos.append(time.perf_counter() - inicio)
+        return sorted(tiempos)[len(tiempos) // 2] * 1000
+
+    def test_la_latencia_del_mes_no_crece_con_la_tabla(self):
+        usuario = User.objects.create_superuser('admin', 'admin@vicaf.pe', 'clave')
+        tamanos = sorted(int(tamano) for tamano in os.environ['BENCHMARK_CALENDARIO'].split(','))
+
+        resultados = []
+        total = dias_previos = 0
+        for tamano in tamanos:
+            dias = max(tamano * 30 // self.POR_MES, 31)
+            crear_actividades(usuario, tamano - total, dias=dias, desde=dias_previos, semilla=tamano)
+            total, dias_previos = tamano, dias
+            cache.clear()
+
+            # Un mes a mitad del historial: el filtro sin cota recorre la
+            # mitad de la tabla por cualquiera de los dos índices simples.
+            inicio = INICIO + timedelta(days=dias // 2)
+            fin = inicio + timedelta(days=31)
+            visibles = CalendarioActividad.objects.filter(es_visible=True)
+
+            con_indice = self.medir(
+                lambda: intervalos.filtrar_solapamiento(visibles, inicio, fin).values_list('pk', flat=True)
+            )
+            sin_indice = self.medir(
+                lambda: visibles.filter(fecha_fin__gte=inicio, fecha_inicio__lte=fin).values_list('pk', flat=True)
+            )
+            resultados.append((tamano, con_indice, sin_indice))
+
+        print('\nactividades   intervalo (ms)   fin>=inicio AND inicio<=fin (ms)')
+        for tamano, con_indice, sin_indice in resultados:
+            print(f'{tamano:>11}   {con_indice:>14.2f}   {sin_indice:>32.2f}')
+
+        self.assertLess(resultados[-1][1], max(resultados[0][1] * 3, 5))
@@ -6,6 +6,7 @@ app_name = 'actividades'
 urlpatterns = [
     path('calendario/', views.calendario_dashboard, name='calendario_dashboard'),
     path('calendario/eventos/', views.calendario_eventos_json, name='calendario_eventos_json'),
+    path('calendario/sincronizar/', views.calendario_sincronizar_json, name='calendario_sincronizar_json'),
     path('calendario/evento/<int:pk>/', views.calendario_actividad_detalle_json, name='calendario_actividad_detalle_json'),
     path('calendario/evento/guardar/', views.calendario_actividad_guardar_json, name='calendario_actividad_guardar_json'),
     path('calendario/evento/<int:pk>/eliminar/', views.calendario_actividad_eliminar_json, name='calendario_actividad_eliminar_json'),
@@ -11,10 +11,13 @@ from django.utils.dateparse import parse_datetime
 from django.views.decorators.http import require_GET, require_POST
 
 from clientes.models import Cliente
-from proyectos.models import Proyecto, RecepcionMuestra, SolicitudEnsayo, InformeFinal, DetalleSolicitudEnsayo
+from proyectos.models import Proyecto, RecepcionMuestra, SolicitudEnsayo, InformeFinal
 from trabajadores.models import TrabajadorProfile
 from trabajadores.permissions import permiso_requerido, trabajador_tiene_permiso
 
+from .feed import FeedCalendario, huella_ventana, respuesta_feed
+from .fuentes import FuenteEventos
+from .sincronizacion import crear_token, sincronizar
 from .models import (
     CalendarioActividad,
     CalendarioCategoria,
@@ -69,30 +72,25 @@ def calcular_metricas_tiempo(inicio_date, fin_date, hoy=None):
 
 
 def obtener_responsable_actividad(actividad):
-    participante_responsable = actividad.participantes.filter(
-        rol='RESPONSABLE'
-    ).select_related('trabajador__user').first()
+    """Responsable de un evento de `FuenteEventos`: el participante RESPONSABLE, el primero o el creador."""
+    participantes = actividad['participantes']
+    participante = next((p for p in participantes if p['rol'] == 'RESPONSABLE'), None)
 
-    if participante_responsable:
-        return {
-            'id': participante_responsable.trabajador_id,
-            'nombre': str(participante_responsable.trabajador),
-            'rol': participante_responsable.rol,
-        }
-
-    primer_participante = actividad.participantes.select_related('trabajador__user').first()
+    if participante is None and participantes:
+        participante = participantes[0]
 
-    if primer_participante:
+    if participante:
         return {
-            'id': primer_participante.trabajador_id,
-            'nombre': str(primer_participante.trabajador),
-            'rol': primer_participante.rol,
+            'id': participante['id'],
+            'nombre': participante['nombre'],
+            'rol': participante['rol'],
         }
 
-    if getattr(actividad, 'creado_por', None):
+    if actividad['creado_por_id']:
+        nombre_completo = f"{actividad['creado_por__first_name']} {actividad['creado_por__last_name']}".strip()
         return {
-            'id': actividad.creado_por.id,
-            'nombre': actividad.creado_por.get_full_name() or actividad.creado_por.username,
+            'id': actividad['creado_por_id'],
+            'nombre': nombre_completo or actividad['creado_por__username'],
             'rol': 'CREADOR',
         }
 
@@ -143,225 +141,49 @@ def calendario_dashboard(request):
     return render(request, 'actividades/calendario.html', context)
 
 
+def filtros_calendario(parametros):
+    """Ventana y filtros del calendario como argumentos de `FuenteEventos`."""
+    start = parametros.get('start')
+    end = parametros.get('end')
+
+    return {
+        'inicio': parse_datetime(start) if start else None,
+        'fin': parse_datetime(end) if end else None,
+        'categoria': parametros.get('categoria'),
+        'estado': parametros.get('estado'),
+        'responsable': parametros.get('responsable'),
+        'proyecto': parametros.get('proyecto'),
+    }
+
+
 @login_required
 @permiso_requerido('calendario.ver')
 @require_GET
 def calendario_eventos_json(request):
-    start = request.GET.get('start')
-    end = request.GET.get('end')
-    categoria_id = request.GET.get('categoria')
-    estado = request.GET.get('estado')
-    responsable_id = request.GET.get('responsable')
-    proyecto_id = request.GET.get('proyecto')
-
-    start_dt = parse_datetime(start) if start else None
-    end_dt = parse_datetime(end) if end else None
-
-    start_date = start_dt.date() if start_dt else None
-    end_date = end_dt.date() if end_dt else None
-
-    proyecto_obj = None
-    cotizacion_id_proyecto = None
-
-    if proyecto_id:
-        proyecto_obj = Proyecto.objects.filter(pk=proyecto_id).select_related('cotizacion').first()
-        if proyecto_obj and proyecto_obj.cotizacion_id:
-            cotizacion_id_proyecto = proyecto_obj.cotizacion_id
-
-    actividades = CalendarioActividad.objects.filter(
-        es_visible=True
-    ).select_related(
-        'categoria',
-        'cliente',
-        'proyecto',
-        'recepcion',
-        'solicitud_ensayo',
-        'informe_final'
-    ).prefetch_related(
-        'participantes__trabajador'
-    )
-
-    if start_dt:
-        actividades = actividades.filter(fecha_fin__gte=start_dt)
-
-    if end_dt:
-        actividades = actividades.filter(fecha_inicio__lte=end_dt)
-
-    if categoria_id:
-        actividades = actividades.filter(categoria_id=categoria_id)
-
-    if estado and estado.upper() in ['PROGRAMADA', 'EN_CURSO', 'COMPLETADA', 'CANCELADA', 'REPROGRAMADA', 'VENCIDA']:
-        actividades = actividades.filter(estado=estado.upper())
-
-    if responsable_id:
-        actividades = actividades.filter(participantes__trabajador_id=responsable_id)
-
-    if proyecto_id:
-        actividades = actividades.filter(proyecto_id=proyecto_id)
-
-    actividades = actividades.distinct().order_by('fecha_inicio')
-
-    eventos = []
-
-    for actividad in actividades:
-        participantes = [
-            {
-                'nombre': str(p.trabajador),
-                'rol': p.rol,
-                'confirmado': p.confirmado,
-            }
-            for p in actividad.participantes.all()
-        ]
-
-        cliente_nombre = ''
-
-        if actividad.cliente:
-            cliente_nombre = actividad.cliente.razon_social
-        else:
-            cliente_nombre = actividad.cliente_nombre_manual or ''
-
-        eventos.append({
-            'id': f'actividad-{actividad.id}',
-            'title': actividad.titulo,
-            'start': actividad.fecha_inicio.isoformat(),
-            'end': actividad.fecha_fin.isoformat(),
-            'allDay': actividad.todo_el_dia,
-            'backgroundColor': actividad.color_visual,
-            'borderColor': actividad.color_visual,
-            'textColor': '#ffffff',
-            'extendedProps': {
-                'tipo': 'actividad',
-                'clase': actividad.clase,
-                'estado': actividad.estado,
-                'prioridad': actividad.prioridad,
-                'descripcion': actividad.descripcion or '',
-                'ubicacion': actividad.ubicacion or '',
-                'cliente': cliente_nombre,
-                'proyecto': actividad.proyecto.nombre_proyecto if actividad.proyecto else '',
-                'proyecto_codigo': actividad.proyecto.codigo_proyecto if actividad.proyecto else '',
-                'es_automatica': actividad.es_automatica,
-                'bloquea_agenda': actividad.bloquea_agenda,
-                'permite_edicion_manual': actividad.permite_edicion_manual,
-                'categoria': actividad.categoria.nombre if actividad.categoria else '',
-                'participantes': participantes,
-                'responsable': participantes[0]['nombre'] if participantes else 'Sin asignar',
-                'fecha_inicio_real': actividad.fecha_inicio.isoformat() if actividad.fecha_inicio else '',
-                'fecha_fin_real': actividad.fecha_fin.isoformat() if actividad.fecha_fin else '',
-                'calendar_style': 'standard',
-                'codigo_solicitud': '',
-                'muestra': '',
-                'servicio': '',
-                'render_hint': 'standard',
-            }
-        })
+    fuente = FuenteEventos(**filtros_calendario(request.GET))
 
-    detalles_ensayo = DetalleSolicitudEnsayo.objects.select_related(
-        'solicitud',
-        'solicitud__cotizacion',
-        'solicitud__cotizacion__cliente',
-        'muestra',
-        'servicio_cotizado',
-        'servicio_cotizado__servicio',
-        'tecnico_asignado'
-    ).order_by('solicitud__fecha_solicitud', 'id')
-
-    if cotizacion_id_proyecto:
-        detalles_ensayo = detalles_ensayo.filter(
-            solicitud__cotizacion_id=cotizacion_id_proyecto
-        )
+    huella = huella_ventana(request.GET, fuente.actividades(), fuente.detalles())
 
-    if start_date:
-        detalles_ensayo = detalles_ensayo.filter(
-            solicitud__fecha_solicitud__gte=start_date
-        )
+    def construir():
+        feed = FeedCalendario(proyecto=fuente.proyecto, token=crear_token())
 
-    if end_date:
-        detalles_ensayo = detalles_ensayo.filter(
-            solicitud__fecha_solicitud__lte=end_date
-        )
+        for evento in fuente.eventos():
+            feed.agregar(evento)
 
-    if estado:
-        estado_lower = estado.lower()
-        if estado_lower in ['pendiente', 'proceso', 'finalizado']:
-            detalles_ensayo = detalles_ensayo.filter(
-                solicitud__estado=estado_lower
-            )
+        return feed.contenido()
 
-    if responsable_id:
-        detalles_ensayo = detalles_ensayo.filter(
-            tecnico_asignado_id=responsable_id
-        )
+    return respuesta_feed(request, huella, construir)
 
-    colores_ensayos = {
-        'pendiente': '#94a3b8',
-        'proceso': '#f59e0b',
-        'finalizado': '#10b981',
-    }
 
-    for detalle in detalles_ensayo:
-        solicitud = detalle.solicitud
-
-        if not solicitud or not solicitud.fecha_solicitud:
-            continue
-
-        fecha_registro = solicitud.fecha_solicitud
-        fecha_entrega = detalle.fecha_entrega_programada or fecha_registro
-
-        cliente_nombre = ''
-
-        if solicitud.cotizacion and solicitud.cotizacion.cliente:
-            cliente_nombre = solicitud.cotizacion.cliente.razon_social
-
-        codigo_solicitud = solicitud.codigo_solicitud if solicitud else f'DET-{detalle.id}'
-        muestra_codigo = detalle.muestra.codigo_laboratorio if detalle.muestra else 'Sin muestra'
-
-        if detalle.servicio_cotizado and detalle.servicio_cotizado.servicio:
-            servicio_nombre = detalle.servicio_cotizado.servicio.nombre
-        else:
-            servicio_nombre = detalle.descripcion_ensayo or 'Ensayo'
-
-        tecnico_nombre = detalle.tecnico_asignado.nombre_completo if detalle.tecnico_asignado else 'Sin asignar'
-        estado_val = (solicitud.estado or 'pendiente').lower()
-        color = colores_ensayos.get(estado_val, '#94a3b8')
-
-        titulo_evento = f'{muestra_codigo} · {servicio_nombre}'
-
-        if len(titulo_evento) > 60:
-            titulo_evento = titulo_evento[:57] + '...'
-
-        eventos.append({
-            'id': f'ensayo-detalle-{detalle.id}',
-            'title': titulo_evento,
-            'start': f'{fecha_registro.isoformat()}T08:00:00',
-            'allDay': False,
-            'backgroundColor': color,
-            'borderColor': color,
-            'textColor': '#1e293b',
-            'extendedProps': {
-                'tipo': 'ensayo',
-                'clase': 'ENSAYO',
-                'estado': estado_val.upper(),
-                'descripcion': detalle.descripcion_ensayo or servicio_nombre,
-                'cliente': cliente_nombre,
-                'proyecto': proyecto_obj.nombre_proyecto if proyecto_obj else '',
-                'proyecto_codigo': proyecto_obj.codigo_proyecto if proyecto_obj else '',
-                'responsable': tecnico_nombre,
-                'codigo_solicitud': codigo_solicitud,
-                'muestra': muestra_codigo,
-                'servicio': servicio_nombre,
-                'tecnico_id': detalle.tecnico_asignado_id,
-                'detalle_id': detalle.id,
-                'solicitud_id': solicitud.id if solicitud else None,
-                'fecha_inicio_real': f'{fecha_registro.isoformat()}T08:00:00',
-                'fecha_fin_real': f'{fecha_entrega.isoformat()}T18:00:00',
-                'fecha_entrega_programada': f'{fecha_entrega.isoformat()}T18:00:00',
-                'calendar_style': 'start_only',
-                'render_hint': 'dot_label',
-                'mostrar_solo_inicio': True,
-            }
-        })
-
-    return JsonResponse(eventos, safe=False)
+@login_required
+@permiso_requerido('calendario.ver')
+@require_GET
+def calendario_sincronizar_json(request):
+    """
+    Cambios de la ventana desde el token que trajo el último feed o la
+    última sincronización. Ver `actividades.sincronizacion.sincronizar`.
+    """
+    return JsonResponse(sincronizar(request.GET.get('token'), **filtros_calendario(request.GET)))
 
 
 @login_required
@@ -773,6 +595,81 @@ def calendario_actividad_reprogramar_json(request, pk):
         }, status=500)
 
 
+def barra_gantt_actividad(actividad, hoy):
+    inicio_date = actividad['fecha_inicio'].date()
+    fin_date = actividad['fecha_fin'].date()
+    inicio_date, fin_date = normalizar_rango_fechas(inicio_date, fin_date)
+
+    metricas = calcular_metricas_tiempo(inicio_date, fin_date, hoy=hoy)
+    responsable = obtener_responsable_actividad(actividad)
+
+    estado_val = (actividad['estado'] or 'PROGRAMADA').upper()
+    estado_css = estado_val.lower().replace('_', '-')
+
+    return {
+        'id': f"actividad-{actividad['id']}",
+        'db_id': actividad['id'],
+        'name': actividad['titulo'],
+        'start': inicio_date.strftime('%Y-%m-%d'),
+        'end': fin_date.strftime('%Y-%m-%d'),
+        'progress': metricas['progreso_temporal'],
+        'progreso_temporal': metricas['progreso_temporal'],
+        'duracion_total_dias': metricas['duracion_total_dias'],
+        'dias_transcurridos': metricas['dias_transcurridos'],
+        'dias_restantes': metricas['dias_restantes'],
+        'esta_vencido': metricas['esta_vencido'] and estado_val not in ['COMPLETADA', 'CANCELADA'],
+        'responsable': responsable['nombre'],
+        'responsable_id': responsable['id'],
+        'responsable_rol': responsable['rol'],
+        'custom_class': f'estado-{estado_css}',
+        'color': actividad['color'] or '#2563eb',
+        'estado': actividad['estado'] or 'PROGRAMADA',
+        'clase': actividad['clase'] or 'OTRO',
+        'proyecto': actividad['proyecto__nombre_proyecto'] or '',
+        'cliente': actividad['cliente__razon_social'] or '',
+        'descripcion': actividad['descripcion'] or '',
+        'tipo': 'actividad',
+    }
+
+
+def barra_gantt_ensayo(ensayo, hoy, proyecto_nombre=''):
+    inicio_date, fin_date = normalizar_rango_fechas(ensayo['solicitud__fecha_solicitud'], ensayo['fecha_entrega'])
+    metricas = calcular_metricas_tiempo(inicio_date, fin_date, hoy=hoy)
+
+    estado_val = ensayo['estado']
+    codigo_solicitud = ensayo['solicitud__codigo_solicitud']
+    nombre_barra = f"{codigo_solicitud} | {ensayo['muestra']} | {ensayo['servicio']}"
+
+    return {
+        'id': f"ensayo-detalle-{ensayo['id']}",
+        'db_id': ensayo['id'],
+        'solicitud_id': ensayo['solicitud_id'],
+        'name': nombre_barra[:140],
+        'start': inicio_date.strftime('%Y-%m-%d'),
+        'end': fin_date.strftime('%Y-%m-%d'),
+        'progress': metricas['progreso_temporal'],
+        'progreso_temporal': metricas['progreso_temporal'],
+        'duracion_total_dias': metricas['duracion_total_dias'],
+        'dias_transcurridos': metricas['dias_transcurridos'],
+        'dias_restantes': metricas['dias_restantes'],
+        'esta_vencido': metricas['esta_vencido'] and estado_val != 'finalizado',
+        'responsable': ensayo['tecnico_asignado__nombre_completo'] or 'Sin asignar',
+        'responsable_id': ensayo['tecnico_asignado_id'],
+        'responsable_rol': 'TÉCNICO',
+        'custom_class': f'estado-{estado_val}',
+        'color': ensayo['color'],
+        'estado': estado_val.upper(),
+        'clase': 'ENSAYO',
+        'proyecto': proyecto_nombre,
+        'cliente': ensayo['solicitud__cotizacion__cliente__razon_social'] or '',
+        'descripcion': ensayo['descripcion_ensayo'] or ensayo['servicio'],
+        'tipo': 'ensayo',
+        'muestra': ensayo['muestra'],
+        'servicio': ensayo['servicio'],
+        'codigo_solicitud': codigo_solicitud,
+    }
+
+
 @login_required
 @permiso_requerido('gantt.ver')
 def gantt_dashboard(request):
@@ -793,180 +690,27 @@ def gantt_dashboard(request):
 @permiso_requerido('gantt.ver')
 @require_GET
 def gantt_actividades_json(request):
-    proyecto_id = request.GET.get('proyecto')
-    estado = request.GET.get('estado')
-    responsable_id = request.GET.get('responsable')
-    incluir_ensayos = request.GET.get('ensayos', 'true').lower() == 'true'
-
     hoy_dt = timezone.now()
     hoy = timezone.localdate()
-    hace_1_ano = hoy_dt - timedelta(days=365)
-    hasta_1_ano = hoy_dt + timedelta(days=365)
-
-    proyecto_obj = None
-    cotizacion_id_proyecto = None
-
-    if proyecto_id:
-        proyecto_obj = Proyecto.objects.filter(pk=proyecto_id).select_related('cotizacion').first()
-
-        if proyecto_obj and proyecto_obj.cotizacion_id:
-            cotizacion_id_proyecto = proyecto_obj.cotizacion_id
-
-    actividades = CalendarioActividad.objects.filter(
-        es_visible=True,
-        fecha_fin__gte=hace_1_ano,
-        fecha_inicio__lte=hasta_1_ano,
-    ).select_related(
-        'categoria',
-        'cliente',
-        'proyecto',
-        'recepcion',
-        'solicitud_ensayo',
-        'informe_final',
-        'creado_por',
-    ).prefetch_related(
-        'participantes__trabajador__user'
-    ).order_by('fecha_inicio', 'id')
-
-    if proyecto_id:
-        actividades = actividades.filter(proyecto_id=proyecto_id)
-
-    if estado and estado.upper() in ['PROGRAMADA', 'EN_CURSO', 'COMPLETADA', 'CANCELADA', 'REPROGRAMADA', 'VENCIDA']:
-        actividades = actividades.filter(estado=estado.upper())
-
-    if responsable_id:
-        actividades = actividades.filter(participantes__trabajador_id=responsable_id).distinct()
-
-    data = []
 
-    for actividad in actividades:
-        inicio_date = actividad.fecha_inicio.date()
-        fin_date = actividad.fecha_fin.date()
-        inicio_date, fin_date = normalizar_rango_fechas(inicio_date, fin_date)
-
-        metricas = calcular_metricas_tiempo(inicio_date, fin_date, hoy=hoy)
-        responsable = obtener_responsable_actividad(actividad)
-
-        estado_val = (actividad.estado or 'PROGRAMADA').upper()
-        estado_css = estado_val.lower().replace('_', '-')
-
-        data.append({
-            'id': f'actividad-{actividad.id}',
-            'db_id': actividad.id,
-            'name': actividad.titulo,
-            'start': inicio_date.strftime('%Y-%m-%d'),
-            'end': fin_date.strftime('%Y-%m-%d'),
-            'progress': metricas['progreso_temporal'],
-            'progreso_temporal': metricas['progreso_temporal'],
-            'duracion_total_dias': metricas['duracion_total_dias'],
-            'dias_transcurridos': metricas['dias_transcurridos'],
-            'dias_restantes': metricas['dias_restantes'],
-            'esta_vencido': metricas['esta_vencido'] and estado_val not in ['COMPLETADA', 'CANCELADA'],
-            'responsable': responsable['nombre'],
-            'responsable_id': responsable['id'],
-            'responsable_rol': responsable['rol'],
-            'custom_class': f'estado-{estado_css}',
-            'color': actividad.color_visual or '#2563eb',
-            'estado': actividad.estado or 'PROGRAMADA',
-            'clase': actividad.clase or 'OTRO',
-            'proyecto': actividad.proyecto.nombre_proyecto if actividad.proyecto else '',
-            'cliente': actividad.cliente.razon_social if actividad.cliente else '',
-            'descripcion': actividad.descripcion or '',
-            'tipo': 'actividad',
-        })
+    fuente = FuenteEventos(
+        inicio=hoy_dt - timedelta(days=365),
+        fin=hoy_dt + timedelta(days=365),
+        estado=request.GET.get('estado'),
+        responsable=request.GET.get('responsable'),
+        proyecto=request.GET.get('proyecto'),
+        incluir_ensayos=request.GET.get('ensayos', 'true').lower() == 'true',
+    )
+    proyecto_nombre = fuente.proyecto['nombre_proyecto'] if fuente.proyecto else ''
 
-    if incluir_ensayos:
-        detalles_ensayo = DetalleSolicitudEnsayo.objects.filter(
-            solicitud__fecha_solicitud__gte=hace_1_ano.date(),
-            solicitud__fecha_solicitud__lte=hasta_1_ano.date(),
-        ).select_related(
-            'solicitud',
-            'solicitud__cotizacion',
-            'solicitud__cotizacion__cliente',
-            'muestra',
-            'servicio_cotizado',
-            'servicio_cotizado__servicio',
-            'tecnico_asignado',
-        ).order_by('solicitud__fecha_solicitud', 'id')
-
-        if cotizacion_id_proyecto:
-            detalles_ensayo = detalles_ensayo.filter(solicitud__cotizacion_id=cotizacion_id_proyecto)
-
-        if estado:
-            estado_lower = estado.lower()
-
-            if estado_lower in ['pendiente', 'proceso', 'finalizado']:
-                detalles_ensayo = detalles_ensayo.filter(solicitud__estado=estado_lower)
-
-            elif estado.upper() in ['PROGRAMADA', 'EN_CURSO', 'COMPLETADA', 'CANCELADA', 'REPROGRAMADA', 'VENCIDA']:
-                detalles_ensayo = detalles_ensayo.none()
-
-        if responsable_id:
-            detalles_ensayo = detalles_ensayo.filter(tecnico_asignado_id=responsable_id)
-
-        colores_ensayos = {
-            'pendiente': '#94a3b8',
-            'proceso': '#f59e0b',
-            'finalizado': '#10b981',
-        }
+    data = []
 
-        for detalle in detalles_ensayo:
-            solicitud = detalle.solicitud
-            inicio_date = solicitud.fecha_solicitud if solicitud and solicitud.fecha_solicitud else hoy
-            fin_date = detalle.fecha_entrega_programada or inicio_date
-            inicio_date, fin_date = normalizar_rango_fechas(inicio_date, fin_date)
-
-            metricas = calcular_metricas_tiempo(inicio_date, fin_date, hoy=hoy)
-
-            estado_val = (solicitud.estado or 'pendiente').lower()
-            color = colores_ensayos.get(estado_val, '#94a3b8')
-
-            cliente_nombre = ''
-
-            if solicitud and solicitud.cotizacion and solicitud.cotizacion.cliente:
-                cliente_nombre = solicitud.cotizacion.cliente.razon_social
-
-            muestra_codigo = detalle.muestra.codigo_laboratorio if detalle.muestra else 'Sin muestra'
-
-            if detalle.servicio_cotizado and detalle.servicio_cotizado.servicio:
-                servicio_nombre = detalle.servicio_cotizado.servicio.nombre
-            else:
-                servicio_nombre = detalle.descripcion_ensayo or 'Ensayo'
-
-            responsable_nombre = detalle.tecnico_asignado.nombre_completo if detalle.tecnico_asignado else 'Sin asignar'
-
-            codigo_solicitud = solicitud.codigo_solicitud if solicitud else f'DET-{detalle.id}'
-            nombre_barra = f'{codigo_solicitud} | {muestra_codigo} | {servicio_nombre}'
-
-            data.append({
-                'id': f'ensayo-detalle-{detalle.id}',
-                'db_id': detalle.id,
-                'solicitud_id': solicitud.id if solicitud else None,
-                'name': nombre_barra[:140],
-                'start': inicio_date.strftime('%Y-%m-%d'),
-                'end': fin_date.strftime('%Y-%m-%d'),
-                'progress': metricas['progreso_temporal'],
-                'progreso_temporal': metricas['progreso_temporal'],
-                'duracion_total_dias': metricas['duracion_total_dias'],
-                'dias_transcurridos': metricas['dias_transcurridos'],
-                'dias_restantes': metricas['dias_restantes'],
-                'esta_vencido': metricas['esta_vencido'] and estado_val != 'finalizado',
-                'responsable': responsable_nombre,
-                'responsable_id': detalle.tecnico_asignado_id,
-                'responsable_rol': 'TÉCNICO',
-                'custom_class': f'estado-{estado_val}',
-                'color': color,
-                'estado': estado_val.upper(),
-                'clase': 'ENSAYO',
-                'proyecto': proyecto_obj.nombre_proyecto if proyecto_obj else '',
-                'cliente': cliente_nombre,
-                'descripcion': detalle.descripcion_ensayo or servicio_nombre,
-                'tipo': 'ensayo',
-                'muestra': muestra_codigo,
-                'servicio': servicio_nombre,
-                'codigo_solicitud': codigo_solicitud,
-            })
+    for evento in fuente.eventos():
+        if evento['tipo'] == 'actividad':
+            data.append(barra_gantt_actividad(evento, hoy))
+        else:
+            data.append(barra_gantt_ensayo(evento, hoy, proyecto_nombre))
 
     data.sort(key=lambda x: (x['start'], x['name']))
 
-    return JsonResponse(data, safe=False)
\ No newline at end of file
+    return JsonResponse(data, safe=False)
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.29 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['creado_en', 'id'], name='clientes_cl_creado__a7058b_idx'),
+        ),
+    ]
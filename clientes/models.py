@@ -4,6 +4,8 @@ from django.db import models, transaction
 from django.conf import settings
 from django.urls import reverse 
 
+from core.correlativos import siguiente_codigo
+
 class Cliente(models.Model):
     """
     Modelo principal para almacenar la información de las empresas/clientes.
@@ -97,6 +99,7 @@ class Cliente(models.Model):
         indexes = [
             models.Index(fields=['codigo_confidencial']),
             models.Index(fields=['ruc']),
+            models.Index(fields=['creado_en', 'id']),
         ]
 
     def __str__(self):
@@ -106,27 +109,15 @@ class Cliente(models.Model):
         return reverse('clientes:cliente_detail', kwargs={'pk': self.pk})
 
     def save(self, *args, **kwargs):
-        """Genera el código confidencial de forma segura y robusta."""
+        """Genera el código confidencial con el correlativo anual de clientes."""
         if not self.codigo_confidencial:
             with transaction.atomic():
                 anio = datetime.datetime.now().strftime('%y')
-                prefijo = f"CLI-{anio}-"
-                
-                ultimo_cliente = Cliente.objects.filter(
-                    codigo_confidencial__startswith=prefijo
-                ).select_for_update().order_by('codigo_confidencial').last()
-
-                if ultimo_cliente:
-                    try:
-                        partes = ultimo_cliente.codigo_confidencial.split('-')
-                        ultimo_num = int(partes[-1])
-                        nuevo_num = str(ultimo_num + 1).zfill(4)
-                    except (ValueError, IndexError):
-                        nuevo_num = "0001"
-                else:
-                    nuevo_num = "0001"
-
-                self.codigo_confidencial = f"{prefijo}{nuevo_num}"
+                self.codigo_confidencial = siguiente_codigo(
+                    f"CLI-{anio}-",
+                    Cliente.objects.all(),
+                    'codigo_confidencial',
+                )
                 super().save(*args, **kwargs)
         else:
             super().save(*args, **kwargs)
\ No newline at end of file
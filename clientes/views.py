@@ -2,12 +2,12 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
 from django.contrib import messages
-from django.db.models import Q
 from django.db import IntegrityError
-from django.core.paginator import Paginator
 from django.http import JsonResponse, HttpResponseForbidden
 import logging
 
+from core.busqueda import filtrar_busqueda
+from core.paginacion import con_enlaces, paginar
 from trabajadores.permissions import permiso_requerido, trabajador_tiene_permiso
 from .models import Cliente
 
@@ -19,23 +19,13 @@ logger = logging.getLogger(__name__)
 @permiso_requerido('clientes.ver')
 def lista_clientes(request):
     query = request.GET.get('q')
-    clientes = Cliente.objects.all().select_related('creado_por').order_by('-creado_en')
+    clientes = Cliente.objects.all().select_related('creado_por').order_by('-creado_en', '-id')
 
     if query:
-        clientes = clientes.filter(
-            Q(codigo_confidencial__icontains=query) |
-            Q(razon_social__icontains=query) |
-            Q(ruc__icontains=query) |
-            Q(persona_contacto__icontains=query) |
-            Q(correo_contacto__icontains=query)
-        ).distinct()
-
-    paginator = Paginator(clientes, 9)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+        clientes = filtrar_busqueda(clientes, 'cliente', query)
 
     context = {
-        'clientes': page_obj,
+        'clientes': paginar(request, clientes, 9, contar_total=True),
         'query': query,
     }
 
@@ -56,13 +46,7 @@ def buscar_clientes_api(request):
             logger.warning(f"Intento de XSS en buscar_clientes_api por usuario {request.user.username}")
             return JsonResponse({'error': 'Caracteres no permitidos detectados.'}, status=400)
 
-        clientes_qs = Cliente.objects.filter(
-            Q(codigo_confidencial__icontains=query) |
-            Q(razon_social__icontains=query) |
-            Q(ruc__icontains=query) |
-            Q(persona_contacto__icontains=query) |
-            Q(correo_contacto__icontains=query)
-        ).only(
+        clientes_qs = paginar(request, filtrar_busqueda(Cliente.objects.all(), 'cliente', query, ordenar=True).only(
             'pk',
             'codigo_confidencial',
             'razon_social',
@@ -71,7 +55,7 @@ def buscar_clientes_api(request):
             'correo_contacto',
             'creado_en',
             'logo_empresa'
-        )[:10]
+        ), 10)
 
         resultados = []
 
@@ -92,7 +76,7 @@ def buscar_clientes_api(request):
                 f"Consulta larga en buscar_clientes_api por usuario {request.user.username}: {query[:50]}..."
             )
 
-        return JsonResponse(resultados, safe=False)
+        return con_enlaces(JsonResponse(resultados, safe=False), request, clientes_qs)
 
     except Exception as e:
         logger.error(f"Error en buscar_clientes_api por usuario {request.user.username}: {str(e)}")
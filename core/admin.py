@@ -1,3 +1,32 @@
 from django.contrib import admin
+from .models import Correlativo, DocumentoBusqueda, IndicadorDiario, TrabajoPDF
 
-# Register your models here.
+
+@admin.register(TrabajoPDF)
+class TrabajoPDFAdmin(admin.ModelAdmin):
+    list_display = ('tipo', 'objeto_id', 'estado', 'intentos', 'creado_en', 'finalizado_en')
+    list_filter = ('tipo', 'estado')
+    search_fields = ('nombre_archivo', 'objeto_id')
+    ordering = ('-creado_en',)
+
+
+@admin.register(IndicadorDiario)
+class IndicadorDiarioAdmin(admin.ModelAdmin):
+    list_display = ('indicador', 'fecha', 'clave', 'fecha_vencimiento', 'valor')
+    list_filter = ('indicador',)
+    date_hierarchy = 'fecha'
+    ordering = ('-fecha', 'indicador', 'clave')
+
+
+@admin.register(Correlativo)
+class CorrelativoAdmin(admin.ModelAdmin):
+    list_display = ('serie', 'ultimo', 'actualizado_en')
+    search_fields = ('serie',)
+    readonly_fields = ('serie', 'actualizado_en')
+
+
+@admin.register(DocumentoBusqueda)
+class DocumentoBusquedaAdmin(admin.ModelAdmin):
+    list_display = ('tipo', 'objeto_id', 'contenido')
+    list_filter = ('tipo',)
+    search_fields = ('contenido',)
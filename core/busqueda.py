@@ -0,0 +1,191 @@
+import re
+import unicodedata
+
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery
+from django.db.models.expressions import RawSQL
+
+from clientes.models import Cliente
+from proyectos.models import Proyecto
+from servicios.models import Cotizacion, Servicio
+from .models import DocumentoBusqueda
+from .transacciones import acumular_al_confirmar
+
+
+# Cada tipo define su modelo, los campos que se buscan (pueden cruzar
+# relaciones) y, en `depende_de`, las relaciones cuyo cambio obliga a
+# reindexarlo: al renombrar un cliente cambian sus cotizaciones y proyectos.
+FUENTES_BUSQUEDA = {
+    'cotizacion': {
+        'modelo': Cotizacion,
+        'campos': ['numero_oferta', 'asunto_servicio', 'cliente__razon_social'],
+        'depende_de': {'cliente': 'cliente_id'},
+    },
+    'cliente': {
+        'modelo': Cliente,
+        'campos': ['codigo_confidencial', 'razon_social', 'ruc', 'persona_contacto', 'correo_contacto'],
+    },
+    'servicio': {
+        'modelo': Servicio,
+        'campos': ['nombre', 'codigo_facturacion'],
+    },
+    'proyecto': {
+        'modelo': Proyecto,
+        'campos': ['nombre_proyecto', 'codigo_proyecto', 'cliente__razon_social'],
+        'depende_de': {'cliente': 'cliente_id'},
+    },
+}
+
+TABLA_FTS = f'{DocumentoBusqueda._meta.db_table}_fts'
+
+# Con el tokenizador trigram, FTS5 solo indexa términos de 3 o más caracteres.
+MINIMO_FTS = 3
+
+_fts_disponible = None
+
+
+def normalizar_texto(texto):
+    """Minúsculas y sin tildes ni diéresis: 'Compactación' -> 'compactacion'."""
+    texto = unicodedata.normalize('NFKD', str(texto or '').lower())
+    return ''.join(caracter for caracter in texto if not unicodedata.combining(caracter))
+
+
+def normalizar_busqueda(texto):
+    return normalizar_texto(texto).strip()
+
+
+def componer_documento(valores):
+    # Un salto de línea separa los campos: un término sin saltos no puede
+    # coincidir a caballo entre dos campos, igual que con icontains.
+    return normalizar_texto('\n'.join(str(valor) for valor in valores if valor))
+
+
+def campos_indexados(tipo):
+    """Campos propios del modelo que alimentan el documento de `tipo`."""
+    return {campo.split('__')[0] for campo in FUENTES_BUSQUEDA[tipo]['campos']}
+
+
+def indexar(tipo, ids):
+    """Regenera los documentos de los registros `ids`; borra los que ya no existen."""
+    ids = {int(i) for i in ids if i}
+    if not ids:
+        return 0
+
+    fuente = FUENTES_BUSQUEDA[tipo]
+    filas = fuente['modelo'].objects.filter(pk__in=ids).values_list('pk', *fuente['campos'])
+    documentos = [
+        DocumentoBusqueda(tipo=tipo, objeto_id=pk, contenido=componer_documento(valores))
+        for pk, *valores in filas
+    ]
+
+    with transaction.atomic():
+        DocumentoBusqueda.objects.filter(tipo=tipo, objeto_id__in=ids).delete()
+        DocumentoBusqueda.objects.bulk_create(documentos, batch_size=500)
+
+    return len(documentos)
+
+
+def reconstruir_indice(tipo):
+    """Regenera todos los documentos de `tipo` desde cero."""
+    fuente = FUENTES_BUSQUEDA[tipo]
+    filas = fuente['modelo'].objects.values_list('pk', *fuente['campos']).iterator()
+
+    with transaction.atomic():
+        DocumentoBusqueda.objects.filter(tipo=tipo).delete()
+        DocumentoBusqueda.objects.bulk_create(
+            (
+                DocumentoBusqueda(tipo=tipo, objeto_id=pk, contenido=componer_documento(valores))
+                for pk, *valores in filas
+            ),
+            batch_size=500,
+        )
+
+    return DocumentoBusqueda.objects.filter(tipo=tipo).count()
+
+
+def _indexar_pendientes(pendientes):
+    por_tipo = {}
+    for tipo, objeto_id in pendientes:
+        por_tipo.setdefault(tipo, set()).add(objeto_id)
+
+    for tipo, fuente in FUENTES_BUSQUEDA.items():
+        for origen, campo in fuente.get('depende_de', {}).items():
+            if origen in por_tipo:
+                dependientes = fuente['modelo'].objects.filter(
+                    **{f'{campo}__in': por_tipo[origen]}
+                ).values_list('pk', flat=True)
+                por_tipo.setdefault(tipo, set()).update(dependientes)
+
+    for tipo, ids in por_tipo.items():
+        indexar(tipo, ids)
+
+
+def programar_indexacion(tipo, *ids):
+    """
+    Reindexa los registros cuando la transacción actual se confirme.
+    Dentro de un bloque atómico cada registro se reindexa una sola vez.
+    """
+    acumular_al_confirmar(_indexar_pendientes, *((tipo, objeto_id) for objeto_id in ids if objeto_id))
+
+
+def _usa_fts():
+    global _fts_disponible
+    if _fts_disponible is None:
+        _fts_disponible = (
+            connection.vendor == 'sqlite'
+            and TABLA_FTS in connection.introspection.table_names()
+        )
+    return _fts_disponible
+
+
+def _ids_coincidentes(tipo, termino):
+    """Subconsulta con los `objeto_id` de `tipo` cuyo documento contiene `termino`."""
+    if _usa_fts() and len(termino) >= MINIMO_FTS:
+        # CROSS JOIN fija el orden en SQLite: se parte de las coincidencias
+        # FTS y se llega a cada documento por su rowid.
+        frase = '"' + termino.replace('"', '""') + '"'
+        return RawSQL(
+            f'SELECT d.objeto_id FROM {TABLA_FTS} f '
+            f'CROSS JOIN {DocumentoBusqueda._meta.db_table} d ON d.id = f.rowid '
+            f'WHERE {TABLA_FTS} MATCH %s AND d.tipo = %s',
+            [frase, tipo],
+        )
+
+    # En PostgreSQL el índice GIN gin_trgm_ops resuelve este LIKE '%...%'.
+    return DocumentoBusqueda.objects.filter(tipo=tipo, contenido__contains=termino).values('objeto_id')
+
+
+def _rango_postgres(tipo, termino):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+    palabras = re.findall(r'\w+', termino)
+    if not palabras:
+        return None
+
+    consulta = SearchQuery(' & '.join(f'{palabra}:*' for palabra in palabras), config='simple', search_type='raw')
+    return Subquery(
+        DocumentoBusqueda.objects.filter(tipo=tipo, objeto_id=OuterRef('pk')).annotate(
+            rango=SearchRank(SearchVector('contenido', config='simple'), consulta)
+        ).values('rango')[:1]
+    )
+
+
+def filtrar_busqueda(queryset, tipo, termino, ordenar=False):
+    """
+    Filtra `queryset` a los registros cuyo documento contiene `termino`.
+    Con `ordenar`, en PostgreSQL los resultados se ordenan primero por
+    relevancia (SearchRank) y luego por el orden que ya tenía el queryset.
+    """
+    termino = normalizar_busqueda(termino)
+    if not termino:
+        return queryset
+
+    queryset = queryset.filter(pk__in=_ids_coincidentes(tipo, termino))
+
+    if ordenar and connection.vendor == 'postgresql':
+        rango = _rango_postgres(tipo, termino)
+        if rango is not None:
+            orden = queryset.query.order_by or queryset.model._meta.ordering
+            queryset = queryset.annotate(rango_busqueda=rango).order_by('-rango_busqueda', *orden)
+
+    return queryset
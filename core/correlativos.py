@@ -0,0 +1,76 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Correlativo
+
+
+def _incrementar(serie, cantidad):
+    """
+    Avanza el contador de `serie` y devuelve el nuevo último número, o None
+    si la serie aún no existe. El UPDATE deja la fila bloqueada hasta el
+    fin de la transacción: otro proceso que reserve en la misma serie
+    espera en vez de leer el mismo número.
+    """
+    actualizadas = Correlativo.objects.filter(serie=serie).update(
+        ultimo=F('ultimo') + cantidad,
+        actualizado_en=timezone.now(),
+    )
+    if not actualizadas:
+        return None
+    return Correlativo.objects.filter(serie=serie).values_list('ultimo', flat=True).get()
+
+
+def ultimo_usado(queryset, campo, prefijo):
+    """
+    Mayor número ya usado en `campo` con `prefijo`. Solo se consulta al
+    crear una serie, para que el contador continúe los códigos existentes.
+    """
+    ultimo = 0
+    valores = queryset.filter(**{f'{campo}__startswith': prefijo}).values_list(campo, flat=True)
+    for valor in valores.iterator():
+        sufijo = valor[len(prefijo):]
+        if sufijo.isdigit():
+            ultimo = max(ultimo, int(sufijo))
+    return ultimo
+
+
+def reservar(serie, cantidad=1, inicial=None):
+    """
+    Reserva `cantidad` números consecutivos de `serie` y devuelve el primero.
+
+    Debe llamarse dentro de la transacción que guarda el documento: si ésta
+    se revierte, el contador también, y la serie no queda con huecos.
+    `inicial` devuelve el último número ya usado cuando la serie es nueva.
+    """
+    with transaction.atomic():
+        ultimo = _incrementar(serie, cantidad)
+        if ultimo is None:
+            ultimo = (inicial() if inicial else 0) + cantidad
+            try:
+                with transaction.atomic():
+                    Correlativo.objects.create(serie=serie, ultimo=ultimo)
+            except IntegrityError:
+                # Otro proceso creó la serie al mismo tiempo.
+                ultimo = _incrementar(serie, cantidad)
+    return ultimo - cantidad + 1
+
+
+def reservar_codigos(prefijo, cantidad, queryset, campo, ancho=4):
+    """
+    Devuelve `cantidad` códigos consecutivos `prefijo` + número con `ancho`
+    dígitos. La serie se siembra con los códigos de `campo` en `queryset`.
+    """
+    if cantidad <= 0:
+        return []
+
+    primero = reservar(
+        prefijo,
+        cantidad,
+        inicial=lambda: ultimo_usado(queryset, campo, prefijo),
+    )
+    return [f'{prefijo}{numero:0{ancho}d}' for numero in range(primero, primero + cantidad)]
+
+
+def siguiente_codigo(prefijo, queryset, campo, ancho=4):
+    return reservar_codigos(prefijo, 1, queryset, campo, ancho)[0]
@@ -0,0 +1,86 @@
+from django.db.models import Count, Q
+
+from clientes.models import Cliente
+from proyectos.models import IncidenciaSolicitud
+from .indicadores import leer_indicadores
+
+
+ETAPAS_PROYECTO = [
+    'pendiente',
+    'en_curso',
+    'muestras_asignadas',
+    'muestras_validadas',
+    'finalizado',
+    'cancelado',
+]
+
+SIN_RANGO = (None, None)
+
+
+def resumen_tablero(rango_cotizaciones=SIN_RANGO, rango_ensayos=SIN_RANGO, rango_proyectos=SIN_RANGO, hoy=None):
+    """
+    Bloques del tablero leídos de IndicadorDiario en una sola consulta.
+    Cada rango es una tupla (fecha_inicio, fecha_fin) y se aplica al mismo
+    grupo de indicadores que los filtros 1, 2 y 3 del tablero.
+    """
+    datos = leer_indicadores({
+        'cotizaciones': rango_cotizaciones,
+        'solicitudes': rango_ensayos,
+        'informes': rango_ensayos,
+        'ensayos': SIN_RANGO,
+        'proyectos': rango_proyectos,
+        'proyectos_cobertura': rango_proyectos,
+        'recepciones': rango_proyectos,
+        'muestras': SIN_RANGO,
+    }, hoy=hoy)
+
+    cotizaciones = datos['cotizaciones']
+    solicitudes = datos['solicitudes']
+    ensayos = datos['ensayos']
+    informes = datos['informes']
+    proyectos = datos['proyectos']
+    cobertura = datos['proyectos_cobertura']
+
+    resumen_proyectos = {etapa: proyectos.get(etapa, 0) for etapa in ETAPAS_PROYECTO}
+    resumen_proyectos['total'] = sum(resumen_proyectos.values())
+    for clave in ('con_muestras', 'con_solicitud', 'con_informe'):
+        resumen_proyectos[clave] = cobertura.get(clave, 0)
+
+    return {
+        'cotizaciones': {
+            'total': sum(cotizaciones.values()),
+            'pendientes': cotizaciones.get('Pendiente', 0),
+            'aceptadas': cotizaciones.get('Aceptada', 0),
+        },
+        'proyectos': resumen_proyectos,
+        'recepciones': {
+            'recepciones': datos['recepciones'].get('', 0),
+            'muestras': datos['muestras'].get('', 0),
+        },
+        'solicitudes': {
+            'total': sum(solicitudes.get(estado, 0) for estado in ('pendiente', 'proceso', 'finalizado')),
+            'pendiente': solicitudes.get('pendiente', 0),
+            'proceso': solicitudes.get('proceso', 0),
+            'finalizado': solicitudes.get('finalizado', 0),
+            'vencidas': solicitudes.get('pendiente__vencido', 0) + solicitudes.get('proceso__vencido', 0),
+            'ensayos': ensayos.get('sin_entrega', 0) + ensayos.get('entregado', 0),
+            'ensayos_vencidos': ensayos.get('sin_entrega__vencido', 0),
+        },
+        'informes': {
+            'total': informes.get('pendiente', 0) + informes.get('enviado', 0),
+            'pendientes_envio': informes.get('pendiente', 0),
+            'enviados': informes.get('enviado', 0),
+        },
+    }
+
+
+def resumen_clientes():
+    return {'total': Cliente.objects.count()}
+
+
+def resumen_incidencias():
+    return IncidenciaSolicitud.objects.aggregate(
+        total=Count('id'),
+        autorizadas=Count('id', filter=Q(esta_autorizada=True)),
+        pendientes=Count('id', filter=Q(esta_autorizada=False)),
+    )
@@ -0,0 +1,82 @@
+import csv
+import datetime
+import io
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+# Filas que se leen de la base de datos por viaje y que se escriben por
+# bloque de la respuesta: la memoria no depende del total exportado.
+FILAS_POR_BLOQUE = 2000
+
+# Excel y LibreOffice toman como fórmula el texto que empieza con uno de
+# estos caracteres; con una comilla delante se muestra tal cual.
+INICIOS_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def fechas_filtro(request):
+    """
+    (fecha_inicio, fecha_fin) de los filtros de una lista y su exportación,
+    o (None, None) si falta alguna o no es una fecha válida.
+    """
+    try:
+        inicio = parse_date(request.GET.get('fecha_inicio') or '')
+        fin = parse_date(request.GET.get('fecha_fin') or '')
+    except ValueError:
+        return None, None
+    if inicio is None or fin is None:
+        return None, None
+    return inicio, fin
+
+
+def celda(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'Sí' if valor else 'No'
+    if isinstance(valor, datetime.datetime):
+        if timezone.is_aware(valor):
+            valor = timezone.localtime(valor)
+        return valor.strftime('%Y-%m-%d %H:%M')
+    if isinstance(valor, datetime.date):
+        return valor.isoformat()
+    if isinstance(valor, str) and valor.startswith(INICIOS_FORMULA):
+        return f"'{valor}"
+    return valor
+
+
+def _bloques_csv(encabezados, filas, filas_por_bloque):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    # El BOM hace que Excel abra el archivo como UTF-8.
+    buffer.write('\ufeff')
+    escritor.writerow(encabezados)
+
+    pendientes = 1
+    for fila in filas:
+        escritor.writerow([celda(valor) for valor in fila])
+        pendientes += 1
+        if pendientes >= filas_por_bloque:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pendientes = 0
+
+    if pendientes:
+        yield buffer.getvalue()
+
+
+def respuesta_csv(nombre_archivo, encabezados, filas, filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Descarga CSV que se genera mientras se envía. `filas` debe ser un
+    iterable perezoso, por ejemplo un `values_list(...).iterator()`.
+    """
+    respuesta = StreamingHttpResponse(
+        _bloques_csv(encabezados, filas, filas_por_bloque),
+        content_type='text/csv; charset=utf-8',
+    )
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return respuesta
@@ -0,0 +1,285 @@
+from datetime import date, datetime
+
+from django.db import transaction
+from django.db.models import (
+    BooleanField,
+    Case,
+    CharField,
+    Count,
+    DateField,
+    Exists,
+    F,
+    OuterRef,
+    Q,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from proyectos.models import (
+    Proyecto,
+    RecepcionMuestra,
+    MuestraDetalle,
+    SolicitudEnsayo,
+    DetalleSolicitudEnsayo,
+    InformeFinal,
+)
+from servicios.models import Cotizacion
+from .models import IndicadorDiario
+from .transacciones import acumular_al_confirmar
+
+
+def filtro_rango(campo, fecha_inicio=None, fecha_fin=None):
+    """
+    Devuelve el Q del rango de fechas sobre `campo`.
+    Para campos DateTime se debe pasar el lookup con `__date`.
+    """
+    if fecha_inicio and fecha_fin:
+        return Q(**{f'{campo}__range': [fecha_inicio, fecha_fin]})
+    if fecha_inicio:
+        return Q(**{f'{campo}__gte': fecha_inicio})
+    if fecha_fin:
+        return Q(**{f'{campo}__lte': fecha_fin})
+    return Q()
+
+
+def anotar_etapa_proyecto(queryset):
+    """
+    Anota la etapa del tablero a partir de `Proyecto.etapa_operativa`;
+    los proyectos cancelados se cuentan aparte.
+    """
+    return queryset.annotate(
+        etapa=Case(
+            When(estado='CANCELADO', then=Value('cancelado')),
+            When(etapa_operativa='ENSAYOS_EN_PROCESO', then=Value('en_curso')),
+            When(etapa_operativa='PENDIENTE_INFORME', then=Value('muestras_validadas')),
+            When(etapa_operativa='INFORME_EMITIDO', then=Value('finalizado')),
+            When(etapa_operativa='MUESTRAS_REGISTRADAS', then=Value('muestras_asignadas')),
+            default=Value('pendiente'),
+            output_field=CharField(),
+        )
+    )
+
+
+def _proyectos_cobertura():
+    return Proyecto.objects.annotate(
+        _tiene_muestras=Exists(
+            MuestraDetalle.objects.filter(recepcion__cotizacion_id=OuterRef('cotizacion_id'))
+        ),
+        _con_solicitud=Exists(
+            SolicitudEnsayo.objects.filter(cotizacion_id=OuterRef('cotizacion_id'))
+        ),
+        _con_informe=Exists(
+            InformeFinal.objects.filter(solicitud__cotizacion_id=OuterRef('cotizacion_id'))
+        ),
+    )
+
+
+# Cada indicador define el campo que fija su día, cómo obtener la clave y,
+# opcionalmente, la fecha de vencimiento para calcular atrasos sin recorrer
+# los registros originales.
+FUENTES_INDICADORES = {
+    'cotizaciones': {
+        'campo_fecha': 'fecha_creacion',
+        'es_datetime': True,
+        'queryset': lambda: Cotizacion.objects.annotate(_clave=F('estado')),
+    },
+    'proyectos': {
+        'campo_fecha': 'fecha_inicio',
+        'es_datetime': False,
+        'queryset': lambda: anotar_etapa_proyecto(Proyecto.objects.all()).annotate(_clave=F('etapa')),
+    },
+    'proyectos_cobertura': {
+        'campo_fecha': 'fecha_inicio',
+        'es_datetime': False,
+        'queryset': _proyectos_cobertura,
+        'claves': {
+            'con_muestras': Q(_tiene_muestras=True),
+            'con_solicitud': Q(_con_solicitud=True),
+            'con_informe': Q(_con_informe=True),
+        },
+    },
+    'recepciones': {
+        'campo_fecha': 'fecha_recepcion',
+        'es_datetime': True,
+        'queryset': lambda: RecepcionMuestra.objects.annotate(_clave=Value('')),
+    },
+    'muestras': {
+        'campo_fecha': 'recepcion__fecha_recepcion',
+        'es_datetime': True,
+        'queryset': lambda: MuestraDetalle.objects.annotate(_clave=Value('')),
+    },
+    'solicitudes': {
+        'campo_fecha': 'fecha_solicitud',
+        'es_datetime': False,
+        'campo_vencimiento': 'fecha_entrega_programada',
+        'queryset': lambda: SolicitudEnsayo.objects.annotate(_clave=F('estado')),
+    },
+    'ensayos': {
+        'campo_fecha': 'solicitud__fecha_solicitud',
+        'es_datetime': False,
+        'campo_vencimiento': 'fecha_entrega_programada',
+        'queryset': lambda: DetalleSolicitudEnsayo.objects.annotate(
+            _clave=Case(
+                When(fecha_entrega_real__isnull=True, then=Value('sin_entrega')),
+                default=Value('entregado'),
+                output_field=CharField(),
+            )
+        ),
+    },
+    'informes': {
+        'campo_fecha': 'fecha_emision',
+        'es_datetime': True,
+        'queryset': lambda: InformeFinal.objects.annotate(_clave=F('estado_envio')),
+    },
+}
+
+
+def fecha_indicador(valor):
+    """Normaliza una fecha o datetime al día local con el que se agrupa."""
+    if isinstance(valor, datetime):
+        return timezone.localdate(valor) if timezone.is_aware(valor) else valor.date()
+    if isinstance(valor, date):
+        return valor
+    return None
+
+
+def _filas_indicador(indicador, fechas=None):
+    fuente = FUENTES_INDICADORES[indicador]
+    campo = fuente['campo_fecha']
+    queryset = fuente['queryset']()
+
+    if fechas is not None:
+        lookup = f'{campo}__date__in' if fuente['es_datetime'] else f'{campo}__in'
+        queryset = queryset.filter(**{lookup: fechas})
+
+    queryset = queryset.annotate(
+        _fecha=TruncDate(campo) if fuente['es_datetime'] else F(campo),
+    ).order_by()
+
+    if 'claves' in fuente:
+        agregados = {clave: Count('id', filter=filtro) for clave, filtro in fuente['claves'].items()}
+        for fila in queryset.values('_fecha').annotate(**agregados):
+            for clave in fuente['claves']:
+                if fila[clave]:
+                    yield IndicadorDiario(indicador=indicador, fecha=fila['_fecha'], clave=clave, valor=fila[clave])
+        return
+
+    campo_vencimiento = fuente.get('campo_vencimiento')
+    queryset = queryset.annotate(
+        _vencimiento=F(campo_vencimiento) if campo_vencimiento else Value(None, output_field=DateField()),
+    )
+
+    for fila in queryset.values('_fecha', '_clave', '_vencimiento').annotate(valor=Count('id')):
+        if fila['_fecha'] is None:
+            continue
+        yield IndicadorDiario(
+            indicador=indicador,
+            fecha=fila['_fecha'],
+            clave=fila['_clave'] or '',
+            fecha_vencimiento=fila['_vencimiento'],
+            valor=fila['valor'],
+        )
+
+
+def recalcular_indicador(indicador, fechas=None):
+    """
+    Recalcula las filas de un indicador para los días indicados
+    (o para todo el histórico si `fechas` es None).
+    """
+    if fechas is not None:
+        fechas = sorted({f for f in fechas if f})
+        if not fechas:
+            return 0
+
+    filas = list(_filas_indicador(indicador, fechas))
+
+    with transaction.atomic():
+        existentes = IndicadorDiario.objects.filter(indicador=indicador)
+        if fechas is not None:
+            existentes = existentes.filter(fecha__in=fechas)
+        existentes.delete()
+        IndicadorDiario.objects.bulk_create(filas, batch_size=500)
+
+    return len(filas)
+
+
+def _recalcular_dias(pendientes):
+    dias = {}
+    for indicador, fecha in pendientes:
+        dias.setdefault(indicador, set()).add(fecha)
+    for indicador, fechas in dias.items():
+        recalcular_indicador(indicador, fechas)
+
+
+def programar_recalculo(indicador, *fechas):
+    """
+    Recalcula los días afectados cuando la transacción actual se confirme.
+    Dentro de un bloque atómico cada indicador se recalcula una sola vez.
+    """
+    fechas = {fecha_indicador(f) for f in fechas} - {None}
+    acumular_al_confirmar(_recalcular_dias, *((indicador, fecha) for fecha in fechas))
+
+
+def programar_recalculo_cobertura(*cotizacion_ids):
+    """La cobertura depende de muestras, solicitudes e informes de la cotización del proyecto."""
+    cotizacion_ids = {c for c in cotizacion_ids if c}
+    if not cotizacion_ids:
+        return
+
+    fechas = list(
+        Proyecto.objects.filter(cotizacion_id__in=cotizacion_ids)
+        .values_list('fecha_inicio', flat=True)
+        .distinct()
+    )
+    programar_recalculo('proyectos_cobertura', *fechas)
+
+
+def leer_indicadores(rangos, hoy=None):
+    """
+    Suma los agregados diarios de varios indicadores en una sola consulta.
+
+    `rangos` es {indicador: (fecha_inicio, fecha_fin)}; las fechas pueden ser
+    None para no acotar. Devuelve {indicador: {clave: valor}} y, para los
+    indicadores con vencimiento, las claves `<clave>__vencido` con lo que ya
+    pasó su fecha programada a `hoy`.
+    """
+    hoy = hoy or timezone.now().date()
+
+    filtro = Q(pk__in=[])
+    for indicador, (fecha_inicio, fecha_fin) in rangos.items():
+        filtro |= Q(indicador=indicador) & filtro_rango('fecha', fecha_inicio, fecha_fin)
+
+    filas = IndicadorDiario.objects.filter(filtro).annotate(
+        vencido=Case(
+            When(fecha_vencimiento__lt=hoy, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        )
+    ).order_by().values('indicador', 'clave', 'vencido').annotate(total=Sum('valor'))
+
+    resultado = {indicador: {} for indicador in rangos}
+    for fila in filas:
+        claves = resultado[fila['indicador']]
+        claves[fila['clave']] = claves.get(fila['clave'], 0) + fila['total']
+        if fila['vencido']:
+            clave_vencida = f"{fila['clave']}__vencido"
+            claves[clave_vencida] = claves.get(clave_vencida, 0) + fila['total']
+
+    return resultado
+
+
+def series_indicadores(indicadores, fecha_inicio=None, fecha_fin=None):
+    """Serie diaria {indicador: {fecha_iso: {clave: valor}}} para gráficos."""
+    filas = IndicadorDiario.objects.filter(
+        filtro_rango('fecha', fecha_inicio, fecha_fin),
+        indicador__in=indicadores,
+    ).order_by().values('indicador', 'fecha', 'clave').annotate(total=Sum('valor')).order_by('fecha')
+
+    series = {indicador: {} for indicador in indicadores}
+    for fila in filas:
+        dia = series[fila['indicador']].setdefault(fila['fecha'].isoformat(), {})
+        dia[fila['clave']] = fila['total']
+    return series
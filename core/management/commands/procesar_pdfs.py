@@ -0,0 +1,137 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import TrabajoPDF
+from core.pdf import (
+    PDF_DOCUMENTOS,
+    construir_html_trabajo,
+    eliminar_trabajos,
+    purgar_cache_pdfs,
+    renderizar_pdf,
+)
+
+
+class Command(BaseCommand):
+    help = "Procesa la cola de PDFs pendientes usando un pool de procesos para el renderizado."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="Procesos de renderizado.")
+        parser.add_argument('--intervalo', type=float, default=1.0, help="Segundos de espera cuando la cola está vacía.")
+        parser.add_argument('--max-intentos', type=int, default=3, help="Intentos antes de marcar un trabajo como fallido.")
+        parser.add_argument('--timeout-minutos', type=int, default=10, help="Minutos tras los que un trabajo en proceso se reencola.")
+        parser.add_argument('--una-vez', action='store_true', help="Procesa la cola actual y termina.")
+
+    def handle(self, *args, **options):
+        workers = max(options['workers'], 1)
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while True:
+                close_old_connections()
+                self.reencolar_colgados(options['timeout_minutos'], options['max_intentos'])
+
+                trabajos = self.tomar_trabajos(workers * 2)
+                if trabajos:
+                    self.procesar_lote(pool, trabajos, options['max_intentos'])
+                elif options['una_vez']:
+                    break
+                else:
+                    time.sleep(options['intervalo'])
+
+    def reencolar_colgados(self, timeout_minutos, max_intentos):
+        limite = timezone.now() - timedelta(minutes=timeout_minutos)
+        colgados = TrabajoPDF.objects.filter(estado='procesando', iniciado_en__lt=limite)
+
+        colgados.filter(intentos__lt=max_intentos).update(estado='pendiente')
+        colgados.filter(intentos__gte=max_intentos).update(
+            estado='error',
+            mensaje_error='Tiempo de procesamiento agotado.',
+            finalizado_en=timezone.now(),
+        )
+
+    def tomar_trabajos(self, cantidad):
+        with transaction.atomic():
+            ids = list(
+                TrabajoPDF.objects.select_for_update(skip_locked=True)
+                .filter(estado='pendiente')
+                .order_by('creado_en')
+                .values_list('id', flat=True)[:cantidad]
+            )
+            if not ids:
+                return []
+
+            TrabajoPDF.objects.filter(id__in=ids, estado='pendiente').update(
+                estado='procesando',
+                iniciado_en=timezone.now(),
+                intentos=F('intentos') + 1,
+            )
+
+        return list(
+            TrabajoPDF.objects.filter(id__in=ids, estado='procesando').select_related('solicitado_por')
+        )
+
+    def procesar_lote(self, pool, trabajos, max_intentos):
+        futuros = {}
+
+        for trabajo in trabajos:
+            try:
+                html = construir_html_trabajo(trabajo)
+            except Exception as e:
+                self.marcar_error(trabajo, e, max_intentos)
+                continue
+
+            motor = PDF_DOCUMENTOS[trabajo.tipo]['motor']
+            futuros[pool.submit(renderizar_pdf, motor, html, trabajo.base_url)] = trabajo
+
+        for futuro in as_completed(futuros):
+            trabajo = futuros[futuro]
+            try:
+                contenido = futuro.result()
+            except Exception as e:
+                self.marcar_error(trabajo, e, max_intentos)
+                continue
+
+            self.guardar_resultado(trabajo, contenido)
+
+        expulsados = purgar_cache_pdfs()
+        if expulsados:
+            self.stdout.write(f"Caché de PDFs: {expulsados} archivo(s) expulsado(s) por tamaño.")
+
+    def guardar_resultado(self, trabajo, contenido):
+        trabajo.archivo.save(trabajo.nombre_archivo, ContentFile(contenido), save=False)
+        trabajo.estado = 'listo'
+        trabajo.tamano = len(contenido)
+        trabajo.mensaje_error = ''
+        trabajo.finalizado_en = timezone.now()
+        trabajo.ultimo_acceso = trabajo.finalizado_en
+        trabajo.save(update_fields=['archivo', 'estado', 'tamano', 'mensaje_error', 'finalizado_en', 'ultimo_acceso'])
+
+        anteriores = TrabajoPDF.objects.filter(
+            tipo=trabajo.tipo,
+            objeto_id=trabajo.objeto_id,
+            estado__in=['listo', 'error'],
+            creado_en__lt=trabajo.creado_en,
+        ).exclude(pk=trabajo.pk)
+
+        if PDF_DOCUMENTOS[trabajo.tipo]['por_usuario']:
+            anteriores = anteriores.filter(solicitado_por_id=trabajo.solicitado_por_id)
+
+        eliminar_trabajos(anteriores)
+
+        self.stdout.write(f"PDF listo: {trabajo}")
+
+    def marcar_error(self, trabajo, error, max_intentos):
+        estado = 'error' if trabajo.intentos >= max_intentos else 'pendiente'
+        TrabajoPDF.objects.filter(pk=trabajo.pk).update(
+            estado=estado,
+            mensaje_error=str(error)[:2000],
+            finalizado_en=timezone.now() if estado == 'error' else None,
+        )
+        self.stderr.write(f"Error en {trabajo}: {error}")
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.busqueda import FUENTES_BUSQUEDA, reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = "Reconstruye desde cero los documentos de búsqueda (DocumentoBusqueda)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'tipos',
+            nargs='*',
+            help="Tipos a reconstruir. Por defecto, todos.",
+        )
+
+    def handle(self, *args, **options):
+        tipos = options['tipos'] or list(FUENTES_BUSQUEDA)
+
+        desconocidos = set(tipos) - set(FUENTES_BUSQUEDA)
+        if desconocidos:
+            raise CommandError(f"Tipos desconocidos: {', '.join(sorted(desconocidos))}")
+
+        for tipo in tipos:
+            documentos = reconstruir_indice(tipo)
+            self.stdout.write(f"{tipo}: {documentos} documento(s)")
+
+        self.stdout.write(self.style.SUCCESS("Índice de búsqueda reconstruido."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.indicadores import FUENTES_INDICADORES, recalcular_indicador
+
+
+class Command(BaseCommand):
+    help = "Reconstruye desde cero los agregados diarios (IndicadorDiario) del tablero."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'indicadores',
+            nargs='*',
+            help="Indicadores a reconstruir. Por defecto, todos.",
+        )
+
+    def handle(self, *args, **options):
+        indicadores = options['indicadores'] or list(FUENTES_INDICADORES)
+
+        desconocidos = set(indicadores) - set(FUENTES_INDICADORES)
+        if desconocidos:
+            raise CommandError(f"Indicadores desconocidos: {', '.join(sorted(desconocidos))}")
+
+        for indicador in indicadores:
+            filas = recalcular_indicador(indicador)
+            self.stdout.write(f"{indicador}: {filas} fila(s)")
+
+        self.stdout.write(self.style.SUCCESS("Indicadores reconstruidos."))
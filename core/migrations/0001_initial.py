@@ -0,0 +1,42 @@
+# Generated by Django 4.2.29 on 2026-10-18 10:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoPDF',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('cotizacion', 'Cotización'), ('recepcion', 'Cargo de Recepción'), ('solicitud', 'Solicitud de Ensayo')], max_length=20, verbose_name='Tipo de documento')),
+                ('objeto_id', models.PositiveBigIntegerField(verbose_name='ID del objeto origen')),
+                ('huella', models.CharField(max_length=64, verbose_name='Huella de la versión renderizada')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('listo', 'Listo'), ('error', 'Error')], default='pendiente', max_length=20, verbose_name='Estado')),
+                ('archivo', models.FileField(blank=True, null=True, upload_to='pdfs_generados/%Y/%m/', verbose_name='PDF generado')),
+                ('nombre_archivo', models.CharField(max_length=255, verbose_name='Nombre de descarga')),
+                ('base_url', models.CharField(blank=True, default='', max_length=255, verbose_name='URL base para recursos')),
+                ('intentos', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('mensaje_error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_en', models.DateTimeField(blank=True, null=True)),
+                ('finalizado_en', models.DateTimeField(blank=True, null=True)),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos_pdf', to=settings.AUTH_USER_MODEL, verbose_name='Solicitado por')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de PDF',
+                'verbose_name_plural': 'Trabajos de PDF',
+                'ordering': ['-creado_en'],
+                'indexes': [models.Index(fields=['tipo', 'objeto_id', 'huella'], name='core_trabaj_tipo_54c257_idx'), models.Index(fields=['estado', 'creado_en'], name='core_trabaj_estado_6d7fb9_idx')],
+            },
+        ),
+    ]
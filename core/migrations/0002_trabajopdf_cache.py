@@ -0,0 +1,27 @@
+# Generated by Django 4.2.29 on 2026-10-18 10:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajopdf',
+            name='tamano',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Tamaño en bytes'),
+        ),
+        migrations.AddField(
+            model_name='trabajopdf',
+            name='ultimo_acceso',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Último acceso'),
+        ),
+        migrations.AddIndex(
+            model_name='trabajopdf',
+            index=models.Index(fields=['estado', 'ultimo_acceso'], name='core_trabaj_estado_9c8ca6_idx'),
+        ),
+    ]
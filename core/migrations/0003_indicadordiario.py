@@ -0,0 +1,30 @@
+# Generated by Django 4.2.29 on 2026-10-18 10:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_trabajopdf_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicadorDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indicador', models.CharField(choices=[('cotizaciones', 'Cotizaciones por estado'), ('proyectos', 'Proyectos por etapa'), ('proyectos_cobertura', 'Proyectos con muestras, solicitud o informe'), ('recepciones', 'Recepciones de muestras'), ('muestras', 'Muestras recibidas'), ('solicitudes', 'Solicitudes de ensayo por estado'), ('ensayos', 'Ensayos por entrega'), ('informes', 'Informes por estado de envío')], max_length=30, verbose_name='Indicador')),
+                ('fecha', models.DateField(verbose_name='Día')),
+                ('clave', models.CharField(blank=True, default='', max_length=30, verbose_name='Clave')),
+                ('fecha_vencimiento', models.DateField(blank=True, null=True, verbose_name='Fecha de vencimiento')),
+                ('valor', models.PositiveIntegerField(default=0, verbose_name='Cantidad')),
+            ],
+            options={
+                'verbose_name': 'Indicador diario',
+                'verbose_name_plural': 'Indicadores diarios',
+                'ordering': ['indicador', 'fecha', 'clave'],
+                'indexes': [models.Index(fields=['indicador', 'fecha'], name='core_indica_indicad_64cb88_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.29 on 2026-10-18 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_indicadordiario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Correlativo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('serie', models.CharField(max_length=100, unique=True, verbose_name='Serie')),
+                ('ultimo', models.PositiveIntegerField(default=0, verbose_name='Último número asignado')),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Correlativo',
+                'verbose_name_plural': 'Correlativos',
+                'ordering': ['serie'],
+            },
+        ),
+    ]
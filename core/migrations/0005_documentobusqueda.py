@@ -0,0 +1,119 @@
+# Generated by Django 4.2.29 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+TABLA = 'core_documentobusqueda'
+
+SQL_POSTGRES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX {TABLA}_trgm ON {TABLA} USING gin (contenido gin_trgm_ops)",
+]
+SQL_POSTGRES_REVERSA = [
+    f"DROP INDEX IF EXISTS {TABLA}_trgm",
+]
+
+# Tabla FTS5 de contenido externo: los triggers la mantienen al día con
+# cada INSERT, UPDATE o DELETE sobre la tabla de documentos.
+SQL_SQLITE = [
+    f"CREATE VIRTUAL TABLE {TABLA}_fts USING fts5("
+    f"contenido, content='{TABLA}', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER {TABLA}_ai AFTER INSERT ON {TABLA} BEGIN "
+    f"INSERT INTO {TABLA}_fts(rowid, contenido) VALUES (new.id, new.contenido); END",
+    f"CREATE TRIGGER {TABLA}_ad AFTER DELETE ON {TABLA} BEGIN "
+    f"INSERT INTO {TABLA}_fts({TABLA}_fts, rowid, contenido) VALUES ('delete', old.id, old.contenido); END",
+    f"CREATE TRIGGER {TABLA}_au AFTER UPDATE ON {TABLA} BEGIN "
+    f"INSERT INTO {TABLA}_fts({TABLA}_fts, rowid, contenido) VALUES ('delete', old.id, old.contenido); "
+    f"INSERT INTO {TABLA}_fts(rowid, contenido) VALUES (new.id, new.contenido); END",
+]
+SQL_SQLITE_REVERSA = [
+    f"DROP TRIGGER IF EXISTS {TABLA}_ai",
+    f"DROP TRIGGER IF EXISTS {TABLA}_ad",
+    f"DROP TRIGGER IF EXISTS {TABLA}_au",
+    f"DROP TABLE IF EXISTS {TABLA}_fts",
+]
+
+# Copia de los campos de core.busqueda al momento de esta migración.
+CAMPOS = {
+    'cotizacion': ('servicios', 'Cotizacion', ['numero_oferta', 'asunto_servicio', 'cliente__razon_social']),
+    'cliente': ('clientes', 'Cliente', ['codigo_confidencial', 'razon_social', 'ruc', 'persona_contacto', 'correo_contacto']),
+    'servicio': ('servicios', 'Servicio', ['nombre', 'codigo_facturacion']),
+    'proyecto': ('proyectos', 'Proyecto', ['nombre_proyecto', 'codigo_proyecto', 'cliente__razon_social']),
+}
+
+
+def _ejecutar(schema_editor, sentencias):
+    for sentencia in sentencias:
+        schema_editor.execute(sentencia)
+
+
+def crear_indices(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _ejecutar(schema_editor, SQL_POSTGRES)
+    elif vendor == 'sqlite':
+        # SQLite sin FTS5/trigram (< 3.34) queda con la búsqueda por LIKE.
+        try:
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute("CREATE VIRTUAL TABLE temp._prueba_fts USING fts5(x, tokenize='trigram')")
+                cursor.execute("DROP TABLE temp._prueba_fts")
+        except Exception:
+            return
+        _ejecutar(schema_editor, SQL_SQLITE)
+
+
+def borrar_indices(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _ejecutar(schema_editor, SQL_POSTGRES_REVERSA)
+    elif vendor == 'sqlite':
+        _ejecutar(schema_editor, SQL_SQLITE_REVERSA)
+
+
+def poblar_documentos(apps, schema_editor):
+    DocumentoBusqueda = apps.get_model('core', 'DocumentoBusqueda')
+    for tipo, (app_label, modelo, campos) in CAMPOS.items():
+        filas = apps.get_model(app_label, modelo).objects.values_list('pk', *campos).iterator()
+        DocumentoBusqueda.objects.bulk_create(
+            (
+                DocumentoBusqueda(
+                    tipo=tipo,
+                    objeto_id=pk,
+                    contenido='\n'.join(str(valor) for valor in valores if valor).lower(),
+                )
+                for pk, *valores in filas
+            ),
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_correlativo'),
+        ('clientes', '0001_initial'),
+        ('proyectos', '0002_proyecto_etapa_operativa'),
+        ('servicios', '0005_plantillacondicionseccion_plantillacondicionitem_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('cotizacion', 'Cotización'), ('cliente', 'Cliente'), ('servicio', 'Servicio'), ('proyecto', 'Proyecto')], max_length=20, verbose_name='Tipo de registro')),
+                ('objeto_id', models.PositiveBigIntegerField(verbose_name='ID del registro')),
+                ('contenido', models.TextField(verbose_name='Texto normalizado')),
+            ],
+            options={
+                'verbose_name': 'Documento de búsqueda',
+                'verbose_name_plural': 'Documentos de búsqueda',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='documentobusqueda',
+            constraint=models.UniqueConstraint(fields=('tipo', 'objeto_id'), name='documento_busqueda_unico'),
+        ),
+        migrations.RunPython(crear_indices, borrar_indices),
+        migrations.RunPython(poblar_documentos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+import unicodedata
+
+from django.db import migrations
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(caracter for caracter in texto if not unicodedata.combining(caracter))
+
+
+def quitar_tildes(apps, schema_editor):
+    DocumentoBusqueda = apps.get_model('core', 'DocumentoBusqueda')
+    cambiados = []
+
+    for documento in DocumentoBusqueda.objects.only('pk', 'contenido').iterator():
+        contenido = _normalizar(documento.contenido)
+        if contenido != documento.contenido:
+            documento.contenido = contenido
+            cambiados.append(documento)
+
+    DocumentoBusqueda.objects.bulk_update(cambiados, ['contenido'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_documentobusqueda'),
+    ]
+
+    operations = [
+        migrations.RunPython(quitar_tildes, migrations.RunPython.noop),
+    ]
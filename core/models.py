@@ -1,3 +1,161 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class TrabajoPDF(models.Model):
+    """
+    Cola local de renderizado de PDFs.
+    El worker `procesar_pdfs` toma los trabajos pendientes y guarda el
+    archivo final en MEDIA para servirlo directamente en descargas repetidas.
+    La huella identifica el contenido del documento, así que un trabajo listo
+    funciona como entrada de caché mientras esa huella siga vigente.
+    """
+
+    TIPO_CHOICES = [
+        ('cotizacion', 'Cotización'),
+        ('recepcion', 'Cargo de Recepción'),
+        ('solicitud', 'Solicitud de Ensayo'),
+    ]
+
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('listo', 'Listo'),
+        ('error', 'Error'),
+    ]
+
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, verbose_name="Tipo de documento")
+    objeto_id = models.PositiveBigIntegerField(verbose_name="ID del objeto origen")
+    huella = models.CharField(max_length=64, verbose_name="Huella de la versión renderizada")
+
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente', verbose_name="Estado")
+    archivo = models.FileField(upload_to='pdfs_generados/%Y/%m/', blank=True, null=True, verbose_name="PDF generado")
+    nombre_archivo = models.CharField(max_length=255, verbose_name="Nombre de descarga")
+    base_url = models.CharField(max_length=255, blank=True, default='', verbose_name="URL base para recursos")
+
+    solicitado_por = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='trabajos_pdf',
+        verbose_name="Solicitado por"
+    )
+
+    tamano = models.PositiveBigIntegerField(default=0, verbose_name="Tamaño en bytes")
+    ultimo_acceso = models.DateTimeField(null=True, blank=True, verbose_name="Último acceso")
+
+    intentos = models.PositiveSmallIntegerField(default=0, verbose_name="Intentos")
+    mensaje_error = models.TextField(blank=True, default='', verbose_name="Error")
+
+    creado_en = models.DateTimeField(auto_now_add=True)
+    iniciado_en = models.DateTimeField(null=True, blank=True)
+    finalizado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Trabajo de PDF"
+        verbose_name_plural = "Trabajos de PDF"
+        ordering = ['-creado_en']
+        indexes = [
+            models.Index(fields=['tipo', 'objeto_id', 'huella']),
+            models.Index(fields=['estado', 'creado_en']),
+            models.Index(fields=['estado', 'ultimo_acceso']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.objeto_id} ({self.estado})"
+
+    @property
+    def esta_terminado(self):
+        return self.estado in ('listo', 'error')
+
+
+class IndicadorDiario(models.Model):
+    """
+    Agregado diario de los indicadores del tablero.
+    Cada fila guarda cuántos registros de un indicador caen en un día y una
+    clave (estado, etapa, etc.). Se mantiene desde señales por día afectado y
+    se reconstruye con `reconstruir_indicadores`.
+    """
+
+    INDICADOR_CHOICES = [
+        ('cotizaciones', 'Cotizaciones por estado'),
+        ('proyectos', 'Proyectos por etapa'),
+        ('proyectos_cobertura', 'Proyectos con muestras, solicitud o informe'),
+        ('recepciones', 'Recepciones de muestras'),
+        ('muestras', 'Muestras recibidas'),
+        ('solicitudes', 'Solicitudes de ensayo por estado'),
+        ('ensayos', 'Ensayos por entrega'),
+        ('informes', 'Informes por estado de envío'),
+    ]
+
+    indicador = models.CharField(max_length=30, choices=INDICADOR_CHOICES, verbose_name="Indicador")
+    fecha = models.DateField(verbose_name="Día")
+    clave = models.CharField(max_length=30, blank=True, default='', verbose_name="Clave")
+    fecha_vencimiento = models.DateField(null=True, blank=True, verbose_name="Fecha de vencimiento")
+    valor = models.PositiveIntegerField(default=0, verbose_name="Cantidad")
+
+    class Meta:
+        verbose_name = "Indicador diario"
+        verbose_name_plural = "Indicadores diarios"
+        ordering = ['indicador', 'fecha', 'clave']
+        indexes = [
+            models.Index(fields=['indicador', 'fecha']),
+        ]
+
+    def __str__(self):
+        return f"{self.indicador} {self.fecha} {self.clave}: {self.valor}"
+
+
+class Correlativo(models.Model):
+    """
+    Último número asignado de cada serie de documentos.
+    La serie es el prefijo del código (incluye el año, p. ej. 'INF-2026-').
+    Los números se reservan con `core.correlativos`, que bloquea la fila
+    hasta que termina la transacción del documento.
+    """
+
+    serie = models.CharField(max_length=100, unique=True, verbose_name="Serie")
+    ultimo = models.PositiveIntegerField(default=0, verbose_name="Último número asignado")
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Correlativo"
+        verbose_name_plural = "Correlativos"
+        ordering = ['serie']
+
+    def __str__(self):
+        return f"{self.serie}{self.ultimo}"
+
+
+class DocumentoBusqueda(models.Model):
+    """
+    Texto buscable de una cotización, cliente, servicio o proyecto.
+    Reúne en una sola columna los campos que consultan los buscadores
+    (incluidos los de tablas relacionadas, como la razón social del
+    cliente) en minúsculas y sin tildes, para que cada búsqueda ignore
+    acentos y use un índice: trigramas GIN en PostgreSQL y una tabla FTS5
+    en SQLite. Se mantiene desde señales y se reconstruye con
+    `reconstruir_busqueda`.
+    """
+
+    TIPO_CHOICES = [
+        ('cotizacion', 'Cotización'),
+        ('cliente', 'Cliente'),
+        ('servicio', 'Servicio'),
+        ('proyecto', 'Proyecto'),
+    ]
+
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, verbose_name="Tipo de registro")
+    objeto_id = models.PositiveBigIntegerField(verbose_name="ID del registro")
+    contenido = models.TextField(verbose_name="Texto normalizado")
+
+    class Meta:
+        verbose_name = "Documento de búsqueda"
+        verbose_name_plural = "Documentos de búsqueda"
+        constraints = [
+            models.UniqueConstraint(fields=['tipo', 'objeto_id'], name='documento_busqueda_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} #{self.objeto_id}"
@@ -0,0 +1,233 @@
+import datetime
+import json
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import connection
+from django.db.models import Q
+
+
+POR_PAGINA = 20
+
+# Hasta aquí se cuenta exacto; más allá el total es aproximado.
+TOPE_CONTEO = 1000
+
+SAL_CURSOR = 'core.paginacion.cursor'
+
+
+def _orden_completo(queryset, orden):
+    """
+    Orden de la paginación: el indicado, el del queryset o el del modelo,
+    terminado siempre en la clave primaria para que cada fila tenga una
+    posición única.
+    """
+    orden = list(orden or queryset.query.order_by or queryset.model._meta.ordering)
+    pk = queryset.model._meta.pk
+    if not {campo.lstrip('-') for campo in orden} & {'pk', pk.name, pk.attname}:
+        orden.append('-pk' if orden and orden[-1].startswith('-') else 'pk')
+    return orden
+
+
+def _invertir(campo):
+    return campo[1:] if campo.startswith('-') else f'-{campo}'
+
+
+def _campo_modelo(modelo, nombre):
+    """Campo del modelo al que apunta `nombre` (admite `__`), o None si es una anotación."""
+    if nombre == 'pk':
+        return modelo._meta.pk
+    campo = None
+    try:
+        for parte in nombre.split('__'):
+            campo = modelo._meta.get_field(parte)
+            modelo = campo.related_model
+    except FieldDoesNotExist:
+        return None
+    return campo
+
+
+def _valor_fila(fila, nombre):
+    if isinstance(fila, dict):
+        return fila[nombre]
+    for parte in nombre.split('__'):
+        fila = getattr(fila, parte)
+    return fila
+
+
+def _codificar(valor):
+    if isinstance(valor, (datetime.date, datetime.time)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+def crear_cursor(direccion, orden, fila):
+    valores = [_codificar(_valor_fila(fila, campo.lstrip('-'))) for campo in orden]
+    return signing.dumps([direccion, valores], salt=SAL_CURSOR, compress=True)
+
+
+def leer_cursor(cursor, modelo, orden):
+    """
+    Devuelve (direccion, valores) o (None, None) si el cursor falta o no es
+    válido: un cursor manipulado o de otra lista lleva a la primera página.
+    """
+    if not cursor:
+        return None, None
+    try:
+        direccion, valores = signing.loads(cursor, salt=SAL_CURSOR)
+        if direccion not in ('siguiente', 'anterior') or len(valores) != len(orden):
+            return None, None
+        convertidos = []
+        for campo, valor in zip(orden, valores):
+            modelo_campo = _campo_modelo(modelo, campo.lstrip('-'))
+            convertidos.append(modelo_campo.to_python(valor) if modelo_campo and valor is not None else valor)
+    except (signing.BadSignature, ValueError, TypeError, ValidationError):
+        return None, None
+    return direccion, convertidos
+
+
+def _filtro_despues(orden, valores):
+    """
+    Filas posteriores a `valores` en el `orden` dado:
+    a > x OR (a = x AND b > y) OR ... El primer campo se acota además por
+    separado para que la consulta recorra el índice desde el cursor.
+    """
+    condiciones = []
+    iguales = {}
+    for campo, valor in zip(orden, valores):
+        nombre = campo.lstrip('-')
+        operador = 'lt' if campo.startswith('-') else 'gt'
+        condiciones.append(Q(**iguales, **{f'{nombre}__{operador}': valor}))
+        iguales[nombre] = valor
+
+    primero = orden[0].lstrip('-')
+    cota = Q(**{f'{primero}__{"lte" if orden[0].startswith("-") else "gte"}': valores[0]})
+    return cota & reduce(or_, condiciones)
+
+
+def contar(queryset, tope=TOPE_CONTEO):
+    """
+    Devuelve (total, exacto). Se cuentan como mucho `tope` + 1 filas; si hay
+    más, en PostgreSQL el total es la estimación del planificador y en los
+    demás motores el propio tope.
+    """
+    queryset = queryset.order_by()
+    total = queryset[:tope + 1].count()
+    if total <= tope:
+        return total, True
+
+    if connection.vendor == 'postgresql':
+        sql, parametros = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', parametros)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return max(int(plan[0]['Plan']['Plan Rows']), total), False
+    return tope, False
+
+
+class PaginaCursor:
+    """
+    Una página de resultados paginados por cursor. Expone los mismos
+    `has_next` / `has_previous` que `Page`, pero en lugar de números de
+    página ofrece los enlaces a la página siguiente y anterior.
+    """
+
+    def __init__(self, object_list, url_siguiente=None, url_anterior=None, total=None, total_exacto=True):
+        self.object_list = object_list
+        self.url_siguiente = url_siguiente
+        self.url_anterior = url_anterior
+        self.total = total
+        self.total_exacto = total_exacto
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, indice):
+        return self.object_list[indice]
+
+    def has_next(self):
+        return self.url_siguiente is not None
+
+    def has_previous(self):
+        return self.url_anterior is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def total_texto(self):
+        if self.total is None:
+            return ''
+        return str(self.total) if self.total_exacto else f'{self.total}+'
+
+
+def con_enlaces(respuesta, request, pagina):
+    """
+    Añade a una respuesta JSON la cabecera `Link` (RFC 8288) con las
+    páginas vecinas; el cuerpo de la respuesta no cambia.
+    """
+    enlaces = [
+        f'<{request.build_absolute_uri(request.path + url)}>; rel="{relacion}"'
+        for relacion, url in (('next', pagina.url_siguiente), ('prev', pagina.url_anterior))
+        if url
+    ]
+    if enlaces:
+        respuesta['Link'] = ', '.join(enlaces)
+    return respuesta
+
+
+def _url_cursor(request, parametro, cursor):
+    parametros = request.GET.copy()
+    parametros.pop('page', None)
+    parametros[parametro] = cursor
+    return f'?{parametros.urlencode()}'
+
+
+def paginar(request, queryset, por_pagina=POR_PAGINA, orden=None, contar_total=False, parametro='cursor'):
+    """
+    Pagina `queryset` por cursor (keyset): cada página se lee con
+    WHERE (orden) > (última fila) ... LIMIT, sin OFFSET, y cuesta lo mismo
+    sea la primera o la milésima.
+
+    Los campos de `orden` (por defecto, el del queryset) no deben ser nulos;
+    se completa con la clave primaria si no la incluye. Sin `contar_total`
+    no se cuenta nada; con él, cada página ejecuta además el COUNT de
+    `contar`, limitado a TOPE_CONTEO + 1 filas.
+    """
+    orden = _orden_completo(queryset, orden)
+    direccion, valores = leer_cursor(request.GET.get(parametro), queryset.model, orden)
+    hacia_atras = direccion == 'anterior'
+
+    consulta = queryset.order_by(*(map(_invertir, orden) if hacia_atras else orden))
+    if valores is not None:
+        consulta = consulta.filter(
+            _filtro_despues([_invertir(c) for c in orden] if hacia_atras else orden, valores)
+        )
+
+    filas = list(consulta[:por_pagina + 1])
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+
+    if hacia_atras:
+        filas.reverse()
+        hay_siguiente, hay_anterior = valores is not None, hay_mas
+    else:
+        hay_siguiente, hay_anterior = hay_mas, valores is not None
+
+    url_siguiente = url_anterior = None
+    if filas and hay_siguiente:
+        url_siguiente = _url_cursor(request, parametro, crear_cursor('siguiente', orden, filas[-1]))
+    if filas and hay_anterior:
+        url_anterior = _url_cursor(request, parametro, crear_cursor('anterior', orden, filas[0]))
+
+    total, exacto = contar(queryset) if contar_total else (None, True)
+    return PaginaCursor(filas, url_siguiente, url_anterior, total, exacto)
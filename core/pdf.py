@@ -0,0 +1,211 @@
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.http import FileResponse, Http404, JsonResponse
+from django.shortcuts import render
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import TrabajoPDF
+
+logger = logging.getLogger(__name__)
+
+
+PDF_DOCUMENTOS = {
+    'cotizacion': {
+        'constructor': 'servicios.views.construir_html_pdf_cotizacion',
+        'motor': 'xhtml2pdf',
+        'permiso': 'cotizaciones.ver',
+        'adjunto': True,
+        'por_usuario': False,
+    },
+    'recepcion': {
+        'constructor': 'proyectos.views.construir_html_pdf_recepcion',
+        'motor': 'weasyprint',
+        'permiso': 'muestras.ver',
+        'adjunto': False,
+        'por_usuario': True,
+    },
+    'solicitud': {
+        'constructor': 'proyectos.views.construir_html_pdf_ensayo',
+        'motor': 'weasyprint',
+        'permiso': 'ensayos.ver',
+        'adjunto': False,
+        'por_usuario': True,
+    },
+}
+
+
+def link_callback(uri, rel):
+    """
+    Convierte rutas de recursos HTML (CSS, imágenes) a rutas del sistema de archivos.
+    Esto es necesario para que xhtml2pdf pueda incrustar archivos STATIC y MEDIA.
+    """
+    if uri.startswith(settings.MEDIA_URL):
+        path = os.path.join(settings.MEDIA_ROOT, uri.replace(settings.MEDIA_URL, ""))
+    elif uri.startswith(settings.STATIC_URL):
+        path = os.path.join(settings.STATIC_ROOT, uri.replace(settings.STATIC_URL, ""))
+    else:
+        return uri
+
+    if not os.path.isfile(path):
+        return uri
+
+    return path
+
+
+def renderizar_pdf(motor, html, base_url=''):
+    """
+    Convierte HTML a bytes de PDF. No toca la base de datos, por lo que
+    puede ejecutarse dentro de un pool de procesos.
+    """
+    if motor == 'xhtml2pdf':
+        from xhtml2pdf import pisa
+
+        buffer = io.BytesIO()
+        pisa_status = pisa.CreatePDF(html, dest=buffer, link_callback=link_callback)
+        if pisa_status.err:
+            raise RuntimeError('Tuvimos errores al generar el PDF.')
+        return buffer.getvalue()
+
+    if motor == 'weasyprint':
+        from weasyprint import HTML
+
+        return HTML(string=html, base_url=base_url or None).write_pdf()
+
+    raise ValueError(f'Motor de PDF no soportado: {motor}')
+
+
+def construir_html_trabajo(trabajo):
+    documento = PDF_DOCUMENTOS[trabajo.tipo]
+    constructor = import_string(documento['constructor'])
+    return constructor(trabajo.objeto_id, trabajo.base_url, trabajo.solicitado_por)
+
+
+def archivo_disponible(trabajo):
+    return bool(
+        trabajo.estado == 'listo' and
+        trabajo.archivo and
+        trabajo.archivo.storage.exists(trabajo.archivo.name)
+    )
+
+
+def encolar_pdf(tipo, objeto_id, huella, nombre_archivo, base_url='', user=None):
+    """
+    Devuelve el trabajo vigente para esa versión del documento o crea uno nuevo.
+    Los trabajos con error o cuyo archivo ya no existe se vuelven a encolar.
+    """
+    trabajo = TrabajoPDF.objects.filter(
+        tipo=tipo,
+        objeto_id=objeto_id,
+        huella=huella,
+        estado__in=['pendiente', 'procesando', 'listo'],
+    ).order_by('-creado_en').first()
+
+    if trabajo and (trabajo.estado != 'listo' or archivo_disponible(trabajo)):
+        return trabajo
+
+    return TrabajoPDF.objects.create(
+        tipo=tipo,
+        objeto_id=objeto_id,
+        huella=huella,
+        nombre_archivo=nombre_archivo,
+        base_url=base_url,
+        solicitado_por=user if user and user.is_authenticated else None,
+    )
+
+
+def eliminar_trabajos(trabajos):
+    for trabajo in trabajos:
+        if trabajo.archivo:
+            trabajo.archivo.delete(save=False)
+        trabajo.delete()
+
+
+def invalidar_pdfs(tipo, objeto_id, excepto_huella=None):
+    """Elimina los PDFs ya generados de un objeto que cambió."""
+    trabajos = TrabajoPDF.objects.filter(tipo=tipo, objeto_id=objeto_id, estado__in=['listo', 'error'])
+    if excepto_huella:
+        trabajos = trabajos.exclude(huella=excepto_huella)
+    eliminar_trabajos(trabajos)
+
+
+def purgar_cache_pdfs(limite_bytes=None):
+    """
+    Mantiene el total de PDFs en disco por debajo de PDF_CACHE_MAX_BYTES,
+    expulsando primero los que llevan más tiempo sin descargarse.
+    """
+    if limite_bytes is None:
+        limite_bytes = settings.PDF_CACHE_MAX_BYTES
+
+    listos = TrabajoPDF.objects.filter(estado='listo')
+    total = listos.aggregate(total=Sum('tamano'))['total'] or 0
+    if total <= limite_bytes:
+        return 0
+
+    expulsados = []
+    candidatos = listos.order_by(F('ultimo_acceso').asc(nulls_first=True), 'finalizado_en')
+    for trabajo in candidatos.iterator():
+        if total <= limite_bytes:
+            break
+        total -= trabajo.tamano
+        expulsados.append(trabajo)
+
+    eliminar_trabajos(expulsados)
+    return len(expulsados)
+
+
+def respuesta_archivo_pdf(trabajo):
+    if not archivo_disponible(trabajo):
+        raise Http404("El archivo no está disponible.")
+
+    TrabajoPDF.objects.filter(pk=trabajo.pk).update(ultimo_acceso=timezone.now())
+
+    return FileResponse(
+        trabajo.archivo.open('rb'),
+        as_attachment=PDF_DOCUMENTOS[trabajo.tipo]['adjunto'],
+        filename=trabajo.nombre_archivo,
+        content_type='application/pdf',
+    )
+
+
+def datos_estado_trabajo(trabajo):
+    return {
+        'id': trabajo.id,
+        'tipo': trabajo.tipo,
+        'estado': trabajo.estado,
+        'listo': trabajo.estado == 'listo',
+        'error': trabajo.mensaje_error if trabajo.estado == 'error' else '',
+        'url_estado': reverse('pdf_estado', args=[trabajo.id]),
+        'url_descarga': reverse('pdf_descargar', args=[trabajo.id]) if trabajo.estado == 'listo' else '',
+    }
+
+
+def solicitar_pdf(request, tipo, objeto_id, huella, nombre_archivo):
+    """
+    Punto de entrada de las vistas de PDF: si la versión ya está renderizada
+    la sirve desde disco; si no, la encola y responde de inmediato.
+    """
+    trabajo = encolar_pdf(
+        tipo=tipo,
+        objeto_id=objeto_id,
+        huella=huella,
+        nombre_archivo=nombre_archivo,
+        base_url=request.build_absolute_uri('/'),
+        user=request.user,
+    )
+
+    if trabajo.estado == 'listo':
+        return respuesta_archivo_pdf(trabajo)
+
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest' or 'application/json' in request.headers.get('accept', ''):
+        return JsonResponse(datos_estado_trabajo(trabajo), status=202)
+
+    return render(request, 'core/pdf_en_proceso.html', {
+        'trabajo': trabajo,
+        'estado_json': datos_estado_trabajo(trabajo),
+    }, status=202)
@@ -0,0 +1,159 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+from proyectos.models import (
+    Proyecto,
+    RecepcionMuestra,
+    MuestraDetalle,
+    SolicitudEnsayo,
+    DetalleSolicitudEnsayo,
+    InformeFinal,
+)
+from clientes.models import Cliente
+from proyectos.etapas import etapas_operativas_actualizadas
+from servicios.models import Cotizacion, Servicio
+from .busqueda import campos_indexados, programar_indexacion
+from .indicadores import programar_recalculo, programar_recalculo_cobertura
+from .tiempo_real import reiniciar_backend
+
+
+def _guardar_valores_anteriores(instance, *campos):
+    """Guarda en la instancia los valores previos de los campos que fijan el día."""
+    anteriores = None
+    if instance.pk:
+        anteriores = type(instance)._default_manager.filter(pk=instance.pk).values(*campos).first()
+    instance._indicadores_anteriores = anteriores or {}
+
+
+def _anterior(instance, campo):
+    return getattr(instance, '_indicadores_anteriores', {}).get(campo)
+
+
+@receiver(post_save, sender=Cotizacion)
+@receiver(post_delete, sender=Cotizacion)
+def indicadores_cotizacion(sender, instance, **kwargs):
+    programar_recalculo('cotizaciones', instance.fecha_creacion)
+
+
+@receiver(pre_delete, sender=Cotizacion)
+def indicadores_cotizacion_eliminada(sender, instance, **kwargs):
+    programar_recalculo_cobertura(instance.pk)
+
+
+@receiver(pre_save, sender=Proyecto)
+def proyecto_antes_de_guardar(sender, instance, **kwargs):
+    _guardar_valores_anteriores(instance, 'fecha_inicio')
+
+
+@receiver(post_save, sender=Proyecto)
+@receiver(post_delete, sender=Proyecto)
+def indicadores_proyecto(sender, instance, **kwargs):
+    fechas = (instance.fecha_inicio, _anterior(instance, 'fecha_inicio'))
+    programar_recalculo('proyectos', *fechas)
+    programar_recalculo('proyectos_cobertura', *fechas)
+
+
+@receiver(pre_save, sender=RecepcionMuestra)
+def recepcion_antes_de_guardar(sender, instance, **kwargs):
+    _guardar_valores_anteriores(instance, 'fecha_recepcion')
+
+
+@receiver(post_save, sender=RecepcionMuestra)
+@receiver(post_delete, sender=RecepcionMuestra)
+def indicadores_recepcion(sender, instance, **kwargs):
+    fechas = (instance.fecha_recepcion, _anterior(instance, 'fecha_recepcion'))
+    programar_recalculo('recepciones', *fechas)
+    programar_recalculo('muestras', *fechas)
+
+
+@receiver(post_save, sender=MuestraDetalle)
+@receiver(post_delete, sender=MuestraDetalle)
+def indicadores_muestra(sender, instance, **kwargs):
+    recepcion = RecepcionMuestra.objects.filter(pk=instance.recepcion_id).values(
+        'fecha_recepcion', 'cotizacion_id'
+    ).first()
+    if not recepcion:
+        return
+
+    programar_recalculo('muestras', recepcion['fecha_recepcion'])
+    programar_recalculo_cobertura(recepcion['cotizacion_id'])
+
+
+@receiver(pre_save, sender=SolicitudEnsayo)
+def solicitud_antes_de_guardar(sender, instance, **kwargs):
+    _guardar_valores_anteriores(instance, 'fecha_solicitud', 'cotizacion_id')
+
+
+@receiver(post_save, sender=SolicitudEnsayo)
+@receiver(post_delete, sender=SolicitudEnsayo)
+def indicadores_solicitud(sender, instance, **kwargs):
+    fechas = (instance.fecha_solicitud, _anterior(instance, 'fecha_solicitud'))
+    programar_recalculo('solicitudes', *fechas)
+    programar_recalculo('ensayos', *fechas)
+    programar_recalculo_cobertura(instance.cotizacion_id, _anterior(instance, 'cotizacion_id'))
+
+
+@receiver(post_save, sender=DetalleSolicitudEnsayo)
+@receiver(post_delete, sender=DetalleSolicitudEnsayo)
+def indicadores_detalle_solicitud(sender, instance, **kwargs):
+    fecha = SolicitudEnsayo.objects.filter(pk=instance.solicitud_id).values_list(
+        'fecha_solicitud', flat=True
+    ).first()
+    programar_recalculo('ensayos', fecha)
+
+
+@receiver(pre_save, sender=InformeFinal)
+def informe_antes_de_guardar(sender, instance, **kwargs):
+    _guardar_valores_anteriores(instance, 'fecha_emision')
+
+
+@receiver(post_save, sender=InformeFinal)
+@receiver(post_delete, sender=InformeFinal)
+def indicadores_informe(sender, instance, **kwargs):
+    programar_recalculo('informes', instance.fecha_emision, _anterior(instance, 'fecha_emision'))
+
+    cotizacion_id = SolicitudEnsayo.objects.filter(pk=instance.solicitud_id).values_list(
+        'cotizacion_id', flat=True
+    ).first()
+    programar_recalculo_cobertura(cotizacion_id)
+
+
+@receiver(etapas_operativas_actualizadas)
+def indicadores_etapa_proyecto(sender, proyectos, **kwargs):
+    programar_recalculo('proyectos', *(fecha_inicio for _, fecha_inicio in proyectos))
+
+
+TIPOS_BUSQUEDA = {
+    Cotizacion: 'cotizacion',
+    Cliente: 'cliente',
+    Servicio: 'servicio',
+    Proyecto: 'proyecto',
+}
+
+
+@receiver(post_save, sender=Cotizacion)
+@receiver(post_save, sender=Cliente)
+@receiver(post_save, sender=Servicio)
+@receiver(post_save, sender=Proyecto)
+def busqueda_registro_guardado(sender, instance, update_fields=None, **kwargs):
+    tipo = TIPOS_BUSQUEDA[sender]
+    # Guardados parciales que no tocan campos buscables (totales, etapa...)
+    # no cambian el documento.
+    if update_fields is not None and not campos_indexados(tipo) & set(update_fields):
+        return
+    programar_indexacion(tipo, instance.pk)
+
+
+@receiver(post_delete, sender=Cotizacion)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_delete, sender=Servicio)
+@receiver(post_delete, sender=Proyecto)
+def busqueda_registro_eliminado(sender, instance, **kwargs):
+    programar_indexacion(TIPOS_BUSQUEDA[sender], instance.pk)
+
+
+@receiver(setting_changed)
+def backend_tiempo_real_cambiado(setting, **kwargs):
+    if setting == 'TIEMPO_REAL_BACKEND':
+        reiniciar_backend()
@@ -1,3 +1,909 @@
-from django.test import TestCase
+import asyncio
+import io
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from actividades.models import CalendarioActividad
+from clientes.models import Cliente
+from proyectos.models import (
+    DetalleSolicitudEnsayo,
+    InformeFinal,
+    MuestraDetalle,
+    Proyecto,
+    RecepcionMuestra,
+    SolicitudEnsayo,
+    TipoMuestra,
+)
+from servicios.lineas import LineasCotizacion
+from servicios.models import Cotizacion, CotizacionDetalle, Servicio
+from trabajadores.models import RolTrabajador, TrabajadorProfile
+from . import tiempo_real
+from .busqueda import filtrar_busqueda
+from .correlativos import reservar_codigos, siguiente_codigo
+from .dashboard import resumen_tablero
+from .exportacion import celda
+from .indicadores import FUENTES_INDICADORES, leer_indicadores, recalcular_indicador
+from .management.commands.procesar_pdfs import Command as ProcesarPdfs
+from .models import Correlativo, DocumentoBusqueda, IndicadorDiario, TrabajoPDF
+from .paginacion import contar, crear_cursor, leer_cursor, paginar
+from .pdf import encolar_pdf, purgar_cache_pdfs
+from .transacciones import acumular_al_confirmar
+from .versiones import leer_version, subir_version
+
+
+class VersionesCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_una_version_expulsada_no_vuelve_a_un_valor_usado(self):
+        usadas = [leer_version('prueba:version')]
+        subir_version('prueba:version')
+        usadas.append(leer_version('prueba:version'))
+
+        # La caché expulsa la clave de versión (límite de entradas, reinicio).
+        cache.delete('prueba:version')
+        recreada = leer_version('prueba:version')
+
+        self.assertGreater(usadas[1], usadas[0])
+        self.assertGreater(recreada, max(usadas))
+
+    def test_subir_sin_clave_tambien_da_una_version_nueva(self):
+        anterior = leer_version('prueba:version')
+        cache.delete('prueba:version')
+        subir_version('prueba:version')
+
+        self.assertGreater(leer_version('prueba:version'), anterior)
+
+
+class AcumularAlConfirmarTests(TestCase):
+
+    def setUp(self):
+        self.llamadas = []
+
+    def registrar(self, valores):
+        self.llamadas.append(set(valores))
+
+    def test_una_sola_llamada_por_transaccion(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            acumular_al_confirmar(self.registrar, 1, 2)
+            with transaction.atomic():
+                acumular_al_confirmar(self.registrar, 3)
+            acumular_al_confirmar(self.registrar, 2)
+
+        self.assertEqual(self.llamadas, [{1, 2, 3}])
+
+    def test_un_savepoint_revertido_no_deja_su_lote(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    acumular_al_confirmar(self.registrar, 1)
+                    raise ValueError
+            except ValueError:
+                pass
+            # El lote del savepoint se descartó con él: estos valores
+            # no pueden ir a parar a un callback que ya no se ejecutará.
+            acumular_al_confirmar(self.registrar, 2)
+
+        self.assertEqual(self.llamadas, [{2}])
+
+    def test_despues_de_confirmar_se_abre_otro_lote(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            acumular_al_confirmar(self.registrar, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            acumular_al_confirmar(self.registrar, 2)
+
+        self.assertEqual(self.llamadas, [{1}, {2}])
+
+class CeldaCsvTests(SimpleTestCase):
+
+    def test_el_texto_que_empieza_como_formula_lleva_comilla(self):
+        for texto in ('=1+1', '+51 999', '-2', '@SUMA(A1)', '\t=1'):
+            with self.subTest(texto=texto):
+                self.assertEqual(celda(texto), f"'{texto}")
+
+    def test_numeros_y_texto_normal_no_cambian(self):
+        self.assertEqual(celda('Ensayo = 2'), 'Ensayo = 2')
+        self.assertEqual(celda(Decimal('-5.00')), Decimal('-5.00'))
+        self.assertEqual(celda(-3), -3)
+
+class CorrelativoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@vicaf.pe', 'clave')
+        cls.cliente = Cliente.objects.create(
+            ruc='20123456789', razon_social='Cliente de Prueba SAC', persona_contacto='Contacto',
+            celular_contacto='999999999', correo_contacto='contacto@cliente.pe',
+        )
+        with cls.captureOnCommitCallbacks(execute=True):
+            for numero in ('VCF-OTE-2026-007', 'VCF-OTE-2026-012', 'VCF-OTE-2026-BORRADOR', 'VCF-OTE-2025-090'):
+                cls.cotizacion = cls.crear_cotizacion(numero)
+
+    @classmethod
+    def crear_cotizacion(cls, numero):
+        return Cotizacion.objects.create(
+            cliente=cls.cliente, numero_oferta=numero, asunto_servicio='Ensayos',
+            persona_contacto='Contacto', correo_contacto='contacto@cliente.pe',
+            telefono_contacto='999999999', tasa_igv=Decimal('0.18'),
+        )
+
+    def reservar(self, cantidad=1):
+        return reservar_codigos('VCF-OTE-2026-', cantidad, Cotizacion.objects.all(), 'numero_oferta', ancho=3)
+
+    def test_una_serie_nueva_continua_los_codigos_existentes(self):
+        self.assertEqual(self.reservar(), ['VCF-OTE-2026-013'])
+        self.assertEqual(Correlativo.objects.get(serie='VCF-OTE-2026-').ultimo, 13)
+
+    def test_reserva_un_bloque_contiguo_sin_repetir_numeros(self):
+        self.assertEqual(self.reservar(3), ['VCF-OTE-2026-013', 'VCF-OTE-2026-014', 'VCF-OTE-2026-015'])
+        self.assertEqual(self.reservar(2), ['VCF-OTE-2026-016', 'VCF-OTE-2026-017'])
+        self.assertEqual(self.reservar(0), [])
+
+        # Ya sembrada, la serie no vuelve a leer los códigos existentes.
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.reservar(), ['VCF-OTE-2026-018'])
+        tabla = Cotizacion._meta.db_table
+        self.assertEqual([c['sql'] for c in consultas if tabla in c['sql']], [])
+
+    def test_una_transaccion_revertida_devuelve_sus_numeros(self):
+        self.reservar()
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.assertEqual(self.reservar(2), ['VCF-OTE-2026-014', 'VCF-OTE-2026-015'])
+            raise RuntimeError('El documento no se guardó.')
+
+        self.assertEqual(self.reservar(), ['VCF-OTE-2026-014'])
+
+    def test_una_serie_creada_en_una_transaccion_revertida_se_vuelve_a_sembrar(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.reservar()
+            raise RuntimeError('El documento no se guardó.')
+
+        self.assertFalse(Correlativo.objects.filter(serie='VCF-OTE-2026-').exists())
+        self.assertEqual(self.reservar(), ['VCF-OTE-2026-013'])
+
+    def test_muestras_en_lote_reservan_un_bloque_por_sigla(self):
+        suelo = TipoMuestra.objects.create(nombre='Suelo', sigla='SU')
+        agregado = TipoMuestra.objects.create(nombre='Agregado', sigla='AG')
+        recepcion = RecepcionMuestra.objects.create(
+            cotizacion=self.cotizacion, procedencia='Obra', responsable_cliente='Contacto',
+            telefono='999999999', responsable_recepcion=self.usuario,
+        )
+
+        def muestra(tipo, **datos):
+            return MuestraDetalle(
+                recepcion=recepcion, tipo_muestra=tipo, descripcion='Muestra', masa_aprox=Decimal('1.00'), **datos
+            )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            primera = muestra(suelo)
+            primera.save()
+            MuestraDetalle.crear_en_lote([
+                muestra(suelo), muestra(agregado), muestra(suelo), muestra(suelo, codigo_laboratorio='MANUAL-1'),
+            ])
+            siguiente = muestra(agregado)
+            siguiente.save()
+
+        prefijo_suelo = MuestraDetalle.prefijo_laboratorio('SU')
+        prefijo_agregado = MuestraDetalle.prefijo_laboratorio('AG')
+        self.assertEqual(primera.codigo_laboratorio, f'{prefijo_suelo}0001')
+        self.assertEqual(
+            list(MuestraDetalle.objects.order_by('pk').values_list('codigo_laboratorio', flat=True)),
+            [
+                f'{prefijo_suelo}0001', f'{prefijo_suelo}0002', f'{prefijo_agregado}0001',
+                f'{prefijo_suelo}0003', 'MANUAL-1', f'{prefijo_agregado}0002',
+            ],
+        )
+        self.assertEqual(
+            siguiente_codigo(prefijo_suelo, MuestraDetalle.objects.all(), 'codigo_laboratorio'),
+            f'{prefijo_suelo}0004',
+        )
+
+
+class DatosLaboratorio:
+    """Cotizaciones, proyectos, muestras, solicitudes e informes mínimos para el tablero."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hoy = timezone.localdate()
+        cls.usuario = User.objects.create_superuser('admin', 'admin@vicaf.pe', 'clave')
+        cls.jefe = TrabajadorProfile.objects.create(
+            user=cls.usuario, rol=RolTrabajador.objects.create(nombre='Jefe de Laboratorio'),
+            nombre_completo='Ana Quispe',
+        )
+        cls.cliente = Cliente.objects.create(
+            ruc='20123456789', razon_social='Cliente de Prueba SAC', persona_contacto='Contacto',
+            celular_contacto='999999999', correo_contacto='contacto@cliente.pe',
+        )
+        cls.servicio = Servicio.objects.create(codigo_facturacion='ENS-001', nombre='Proctor modificado')
+        cls.tipo_muestra = TipoMuestra.objects.create(nombre='Suelo', sigla='SU')
+
+    def setUp(self):
+        # Los informes guardan su código QR en MEDIA.
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def dia(self, dias):
+        return self.hoy + timedelta(days=dias)
+
+    def momento(self, dias):
+        return timezone.now() + timedelta(days=dias)
+
+    def crear_cotizacion(self, numero, **datos):
+        cotizacion = Cotizacion.objects.create(
+            cliente=self.cliente, numero_oferta=numero, asunto_servicio='Ensayos',
+            persona_contacto='Contacto', correo_contacto='contacto@cliente.pe',
+            telefono_contacto='999999999', tasa_igv=Decimal('0.18'), **datos,
+        )
+        LineasCotizacion([
+            {'tipo_fila': 'servicio', 'servicio_id': self.servicio.pk, 'cantidad': '1', 'precio_unitario': '100'},
+        ]).guardar(cotizacion)
+        return cotizacion
+
+    def crear_proyecto(self, cotizacion, **datos):
+        return Proyecto.objects.create(
+            cotizacion=cotizacion, cliente=self.cliente, nombre_proyecto='Carretera',
+            codigo_proyecto=f'PRY-{cotizacion.pk:04d}', **datos,
+        )
+
+    def crear_recepcion(self, cotizacion, **datos):
+        return RecepcionMuestra.objects.create(
+            cotizacion=cotizacion, procedencia='Obra', responsable_cliente='Contacto',
+            telefono='999999999', responsable_recepcion=self.usuario, **datos,
+        )
+
+    def crear_muestra(self, recepcion):
+        return MuestraDetalle.objects.create(
+            recepcion=recepcion, tipo_muestra=self.tipo_muestra, descripcion='Muestra', masa_aprox=Decimal('1.00'),
+        )
+
+    def crear_solicitud(self, recepcion, **datos):
+        datos = {'fecha_entrega_programada': self.dia(7), **datos}
+        return SolicitudEnsayo.objects.create(
+            codigo_solicitud=f'SOL-{recepcion.pk:04d}', recepcion=recepcion,
+            cotizacion_id=recepcion.cotizacion_id, elaborado_por=self.jefe, **datos,
+        )
+
+    def crear_ensayo(self, solicitud, muestra, **datos):
+        datos = {'fecha_entrega_programada': solicitud.fecha_entrega_programada, **datos}
+        return DetalleSolicitudEnsayo.objects.create(
+            solicitud=solicitud, muestra=muestra,
+            servicio_cotizado=CotizacionDetalle.objects.filter(grupo__cotizacion_id=solicitud.cotizacion_id).first(),
+            descripcion_ensayo='Proctor modificado', norma='ASTM D1557', **datos,
+        )
+
+    def crear_informe(self, solicitud, **datos):
+        return InformeFinal.objects.create(
+            solicitud=solicitud, archivo_pdf='informes_finales/pdfs/informe.pdf', responsable_firma=self.jefe, **datos,
+        )
+
+
+class IndicadorDiarioTests(DatosLaboratorio, TestCase):
+
+    def indicadores(self, *nombres):
+        filas = IndicadorDiario.objects.order_by('indicador', 'fecha', 'clave', 'fecha_vencimiento')
+        if nombres:
+            filas = filas.filter(indicador__in=nombres)
+        return list(filas.values_list('indicador', 'fecha', 'clave', 'fecha_vencimiento', 'valor'))
+
+    def assertCoincideConRecalculo(self):
+        incrementales = self.indicadores()
+        self.assertTrue(incrementales)
+        for indicador in FUENTES_INDICADORES:
+            recalcular_indicador(indicador)
+        self.assertEqual(self.indicadores(), incrementales)
+
+    def test_las_senales_mantienen_lo_mismo_que_un_recalculo_completo(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cotizacion = self.crear_cotizacion('VCF-OTE-2026-001')
+            otra = self.crear_cotizacion('VCF-OTE-2026-002', estado='Aceptada')
+            proyecto = self.crear_proyecto(cotizacion, fecha_inicio=self.dia(-3))
+            recepcion = self.crear_recepcion(cotizacion, fecha_recepcion=self.momento(-2))
+            muestras = [self.crear_muestra(recepcion) for _ in range(3)]
+            solicitud = self.crear_solicitud(recepcion, fecha_solicitud=self.dia(-1), fecha_entrega_programada=self.dia(-1))
+            ensayo = self.crear_ensayo(solicitud, muestras[0])
+            informe = self.crear_informe(solicitud)
+        self.assertCoincideConRecalculo()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Cotizacion.objects.get(pk=otra.pk).save()
+            cotizacion.estado = 'Aceptada'
+            cotizacion.save()
+            solicitud.estado = 'proceso'
+            solicitud.save()
+            ensayo.fecha_entrega_real = self.hoy
+            ensayo.save()
+            informe.estado_envio = 'enviado'
+            informe.save()
+        self.assertCoincideConRecalculo()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            informe.delete()
+            ensayo.delete()
+            muestras[2].delete()
+            proyecto.delete()
+            otra.delete()
+        self.assertCoincideConRecalculo()
+
+    def test_cambiar_la_fecha_recalcula_el_dia_anterior_y_el_nuevo(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cotizacion = self.crear_cotizacion('VCF-OTE-2026-001')
+            proyecto = self.crear_proyecto(cotizacion, fecha_inicio=self.dia(-10))
+            recepcion = self.crear_recepcion(cotizacion, fecha_recepcion=self.momento(-10))
+            self.crear_muestra(recepcion)
+            informe = self.crear_informe(self.crear_solicitud(recepcion), fecha_emision=self.momento(-10))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            proyecto.fecha_inicio = self.dia(-3)
+            proyecto.save()
+            recepcion.fecha_recepcion = self.momento(-3)
+            recepcion.save()
+            informe.fecha_emision = self.momento(-3)
+            informe.save()
+
+        filas = self.indicadores('proyectos', 'recepciones', 'muestras', 'informes')
+        self.assertEqual([(indicador, fecha) for indicador, fecha, *_ in filas], [
+            ('informes', self.dia(-3)),
+            ('muestras', self.dia(-3)),
+            ('proyectos', self.dia(-3)),
+            ('recepciones', self.dia(-3)),
+        ])
+        self.assertCoincideConRecalculo()
+
+    def test_leer_indicadores_separa_lo_vencido(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cotizacion = self.crear_cotizacion('VCF-OTE-2026-001')
+            for entrega, estado in ((-2, 'pendiente'), (5, 'pendiente'), (-1, 'proceso'), (-1, 'finalizado')):
+                recepcion = self.crear_recepcion(cotizacion)
+                solicitud = self.crear_solicitud(recepcion, estado=estado, fecha_entrega_programada=self.dia(entrega))
+                self.crear_ensayo(solicitud, self.crear_muestra(recepcion))
+
+        rangos = {'solicitudes': (None, None), 'ensayos': (None, None)}
+        self.assertEqual(leer_indicadores(rangos, hoy=self.hoy), {
+            'solicitudes': {
+                'pendiente': 2, 'pendiente__vencido': 1,
+                'proceso': 1, 'proceso__vencido': 1,
+                'finalizado': 1, 'finalizado__vencido': 1,
+            },
+            'ensayos': {'sin_entrega': 4, 'sin_entrega__vencido': 3},
+        })
+        # Antes de la primera entrega programada nada está vencido.
+        self.assertEqual(leer_indicadores(rangos, hoy=self.dia(-5)), {
+            'solicitudes': {'pendiente': 2, 'proceso': 1, 'finalizado': 1},
+            'ensayos': {'sin_entrega': 4},
+        })
+
+    def test_la_cobertura_sigue_a_muestras_solicitudes_e_informes(self):
+        def cobertura():
+            return leer_indicadores({'proyectos_cobertura': (None, None)})['proyectos_cobertura']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cotizacion = self.crear_cotizacion('VCF-OTE-2026-001')
+            self.crear_proyecto(cotizacion)
+            recepcion = self.crear_recepcion(cotizacion)
+        self.assertEqual(cobertura(), {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crear_muestra(recepcion)
+        self.assertEqual(cobertura(), {'con_muestras': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            solicitud = self.crear_solicitud(recepcion)
+        self.assertEqual(cobertura(), {'con_muestras': 1, 'con_solicitud': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            informe = self.crear_informe(solicitud)
+        self.assertEqual(cobertura(), {'con_muestras': 1, 'con_solicitud': 1, 'con_informe': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            informe.delete()
+        self.assertEqual(cobertura(), {'con_muestras': 1, 'con_solicitud': 1})
+
+
+class ResumenTableroTests(DatosLaboratorio, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crear_cotizacion('VCF-OTE-2026-001', estado='Aceptada')
+            self.crear_cotizacion('VCF-OTE-2026-002')
+            cotizacion = self.crear_cotizacion('VCF-OTE-2026-003', estado='Aceptada')
+            self.crear_proyecto(cotizacion)
+            recepcion = self.crear_recepcion(cotizacion)
+            muestras = [self.crear_muestra(recepcion) for _ in range(2)]
+            solicitud = self.crear_solicitud(recepcion, fecha_entrega_programada=self.dia(-1))
+            for muestra in muestras:
+                self.crear_ensayo(solicitud, muestra)
+            self.crear_informe(solicitud)
+
+    def test_bloques_del_tablero_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            resumen = resumen_tablero(hoy=self.hoy)
+
+        self.assertEqual(resumen, {
+            'cotizaciones': {'total': 3, 'pendientes': 1, 'aceptadas': 2},
+            'proyectos': {
+                'pendiente': 0, 'en_curso': 1, 'muestras_asignadas': 0, 'muestras_validadas': 0,
+                'finalizado': 0, 'cancelado': 0, 'total': 1,
+                'con_muestras': 1, 'con_solicitud': 1, 'con_informe': 1,
+            },
+            'recepciones': {'recepciones': 1, 'muestras': 2},
+            'solicitudes': {
+                'total': 1, 'pendiente': 1, 'proceso': 0, 'finalizado': 0, 'vencidas': 1,
+                'ensayos': 2, 'ensayos_vencidos': 2,
+            },
+            'informes': {'total': 1, 'pendientes_envio': 1, 'enviados': 0},
+        })
+
+    def test_cada_rango_filtra_su_bloque(self):
+        futuro = (self.dia(1), None)
+        resumen = resumen_tablero(rango_cotizaciones=futuro, rango_ensayos=futuro, hoy=self.hoy)
+
+        self.assertEqual(resumen['cotizaciones']['total'], 0)
+        self.assertEqual(resumen['solicitudes']['total'], 0)
+        self.assertEqual(resumen['informes']['total'], 0)
+        # Los ensayos no se acotan por fecha y los proyectos tienen su propio rango.
+        self.assertEqual(resumen['solicitudes']['ensayos'], 2)
+        self.assertEqual(resumen['proyectos']['total'], 1)
+
+
+class PaginacionCursorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Precios repetidos: el primer campo del orden tiene empates.
+        for numero, precio in enumerate(['30', '10', '20', '10', '30', '10', '20'], start=1):
+            Servicio.objects.create(
+                codigo_facturacion=f'ENS-{numero:03}', nombre=f'Ensayo {numero}', precio_base=Decimal(precio),
+            )
+
+    def _pagina(self, cursor=None, **kwargs):
+        parametros = {'cursor': cursor} if cursor else {}
+        return paginar(RequestFactory().get('/servicios/', parametros), Servicio.objects.all(), **kwargs)
+
+    def _cursor(self, url):
+        return QueryDict(url.lstrip('?'))['cursor']
+
+    def test_adelante_y_atras_recorren_el_orden_exacto_con_empates(self):
+        for orden in (['precio_base'], ['-precio_base']):
+            with self.subTest(orden=orden):
+                esperado = list(Servicio.objects.order_by(*orden, '-pk' if orden[0].startswith('-') else 'pk'))
+
+                paginas = [self._pagina(por_pagina=2, orden=orden)]
+                while paginas[-1].has_next():
+                    paginas.append(self._pagina(self._cursor(paginas[-1].url_siguiente), por_pagina=2, orden=orden))
+                self.assertEqual([fila for pagina in paginas for fila in pagina], esperado)
+                self.assertFalse(paginas[0].has_previous())
+
+                atras = [paginas[-1]]
+                while atras[-1].has_previous():
+                    atras.append(self._pagina(self._cursor(atras[-1].url_anterior), por_pagina=2, orden=orden))
+                self.assertEqual([fila for pagina in reversed(atras) for fila in pagina], esperado)
+                self.assertEqual([list(p) for p in reversed(atras)], [list(p) for p in paginas])
+
+    def test_cursor_manipulado_o_de_otra_lista_vuelve_a_la_primera_pagina(self):
+        primera = self._pagina(por_pagina=2, orden=['precio_base'])
+        cursor = self._cursor(primera.url_siguiente)
+
+        # Firma rota.
+        self.assertEqual(list(self._pagina(cursor[:-2] + 'xx', por_pagina=2, orden=['precio_base'])), list(primera))
+        # Cursor de otra lista: otro número de campos y otros tipos.
+        otra = crear_cursor('siguiente', ['fecha_creacion', 'cliente__razon_social', 'pk'], {
+            'fecha_creacion': 'no es una fecha', 'cliente__razon_social': 'x', 'pk': 1,
+        })
+        self.assertEqual(list(self._pagina(otra, por_pagina=2, orden=['precio_base'])), list(primera))
+        distinta = crear_cursor('siguiente', ['precio_base', 'pk'], {'precio_base': 'abc', 'pk': 1})
+        self.assertEqual(list(self._pagina(distinta, por_pagina=2, orden=['precio_base'])), list(primera))
+        self.assertEqual(leer_cursor(distinta, Servicio, ['precio_base', 'pk']), (None, None))
+
+    def test_fechas_y_decimales_vuelven_del_cursor_con_su_tipo(self):
+        momento = timezone.now().replace(microsecond=123456)
+        fila = {'fecha_creacion': momento, 'monto_total': Decimal('1234.50'), 'pk': 7}
+        orden = ['-fecha_creacion', 'monto_total', 'pk']
+
+        direccion, valores = leer_cursor(crear_cursor('anterior', orden, fila), Cotizacion, orden)
+
+        self.assertEqual(direccion, 'anterior')
+        self.assertEqual(valores, [momento, Decimal('1234.50'), 7])
+        self.assertIsInstance(valores[1], Decimal)
+
+    def test_contar_se_detiene_en_el_tope(self):
+        self.assertEqual(contar(Servicio.objects.all(), tope=10), (7, True))
+
+        total, exacto = contar(Servicio.objects.all(), tope=3)
+        self.assertFalse(exacto)
+        self.assertGreaterEqual(total, 3)
+        if connection.vendor != 'postgresql':
+            self.assertEqual(total, 3)
+
+        pagina = self._pagina(por_pagina=2, contar_total=True)
+        self.assertEqual((pagina.total, pagina.total_texto), (7, '7'))
+
+
+class BusquedaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Los documentos de búsqueda se escriben al confirmar la transacción.
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.cliente = Cliente.objects.create(
+                ruc='20123456789', razon_social='Constructora Andina SAC', persona_contacto='Contacto',
+                celular_contacto='999999999', correo_contacto='contacto@andina.pe',
+            )
+            cls.cotizacion = Cotizacion.objects.create(
+                cliente=cls.cliente, numero_oferta='VCF-OTE-2026-001', asunto_servicio='Ensayos de suelos',
+                persona_contacto='Contacto', correo_contacto='contacto@andina.pe',
+                telefono_contacto='999999999', tasa_igv=Decimal('0.18'),
+            )
+            cls.proyecto = Proyecto.objects.create(
+                cotizacion=cls.cotizacion, cliente=cls.cliente,
+                nombre_proyecto='Carretera Central', codigo_proyecto='PRY-001',
+            )
+
+    def buscar(self, modelo, tipo, termino):
+        return list(filtrar_busqueda(modelo.objects.all(), tipo, termino))
+
+    def test_la_busqueda_se_resuelve_en_la_tabla_de_documentos(self):
+        for termino in ('andina', 'an'):
+            with self.subTest(termino=termino):
+                self.assertEqual(self.buscar(Cotizacion, 'cotizacion', termino), [self.cotizacion])
+        self.assertEqual(self.buscar(Cotizacion, 'cotizacion', 'inexistente'), [])
+
+        # Sin documento, el registro ya no aparece aunque sus campos coincidan.
+        DocumentoBusqueda.objects.filter(tipo='cotizacion', objeto_id=self.cotizacion.pk).delete()
+        self.assertEqual(self.buscar(Cotizacion, 'cotizacion', 'andina'), [])
+
+    def test_renombrar_un_cliente_reindexa_sus_cotizaciones_y_proyectos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cliente.razon_social = 'Minera del Sur SAA'
+            self.cliente.save()
+
+        self.assertEqual(self.buscar(Cotizacion, 'cotizacion', 'minera'), [self.cotizacion])
+        self.assertEqual(self.buscar(Proyecto, 'proyecto', 'minera'), [self.proyecto])
+        self.assertEqual(self.buscar(Cotizacion, 'cotizacion', 'andina'), [])
+        self.assertEqual(self.buscar(Proyecto, 'proyecto', 'andina'), [])
+
+
+    def test_ignora_tildes_y_mayusculas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            proctor = Servicio.objects.create(codigo_facturacion='ENS-001', nombre='Compactación Proctor modificado')
+            humedad = Servicio.objects.create(codigo_facturacion='ENS-002', nombre='ensayo de humedad')
+
+        self.assertEqual(self.buscar(Servicio, 'servicio', 'compactacion'), [proctor])
+        self.assertEqual(self.buscar(Servicio, 'servicio', 'COMPACTACIÓN'), [proctor])
+        self.assertEqual(self.buscar(Servicio, 'servicio', 'ENSAYO'), [humedad])
+
+
+class BackendPrueba(tiempo_real.BackendMemoria):
+    """Guarda lo publicado para revisarlo en las pruebas."""
+
+    publicados = []
+
+    def publicar(self, canal, datos):
+        self.publicados.append((canal, datos))
+        super().publicar(canal, datos)
+
+
+class BackendMemoriaTests(SimpleTestCase):
+
+    def test_reparte_solo_a_los_canales_suscritos(self):
+        backend = tiempo_real.BackendMemoria()
+
+        async def escenario():
+            calendario = backend.suscribir(['calendario'])
+            proyectos = backend.suscribir(['proyectos'])
+
+            # Los guardados publican desde otro hilo que el del event loop.
+            hilo = threading.Thread(target=backend.publicar, args=('calendario', {'eventos': ['actividad']}))
+            hilo.start()
+            hilo.join()
+
+            recibidos = await calendario.recibir(1), await proyectos.recibir(0.05)
+            calendario.cerrar()
+            proyectos.cerrar()
+            return recibidos
+
+        recibidos_calendario, recibidos_proyectos = asyncio.run(escenario())
+
+        self.assertEqual(recibidos_calendario, [('calendario', {'eventos': ['actividad']})])
+        self.assertEqual(recibidos_proyectos, [])
+        self.assertEqual(backend._suscripciones, set())
+
+    @override_settings(TIEMPO_REAL_BACKEND='core.tiempo_real.BackendMemoria')
+    def test_flujo_sse(self):
+        backend = tiempo_real.obtener_backend()
+
+        async def escenario():
+            flujo = tiempo_real._flujo_sse(['proyectos'])
+            inicio = await flujo.__anext__()
+            siguiente = asyncio.ensure_future(flujo.__anext__())
+            await asyncio.sleep(0)
+            backend.publicar('proyectos', {'proyectos': [7]})
+            mensaje = await siguiente
+            await flujo.aclose()
+            return inicio, mensaje
+
+        inicio, mensaje = asyncio.run(escenario())
+
+        self.assertEqual(inicio, f'retry: {tiempo_real.REINTENTO_MS}\n\n')
+        self.assertEqual(mensaje, 'event: proyectos\ndata: {"proyectos": [7]}\n\n')
+        self.assertEqual(backend._suscripciones, set())
+
+
+def _publicar_en_otro_hilo(backend, canal, datos):
+    # NOTIFY se envía al confirmar: se publica desde una conexión propia en autocommit.
+    try:
+        backend.publicar(canal, datos)
+    finally:
+        connection.close()
+
+
+def _cortar_conexion(pid):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+    finally:
+        connection.close()
+
+
+@skipUnless(connection.vendor == 'postgresql', 'LISTEN/NOTIFY solo existe en PostgreSQL')
+class BackendPostgresTests(TransactionTestCase):
+
+    def setUp(self):
+        self.backend = tiempo_real.BackendPostgres()
+        self.backend.ESPERA_ESCUCHA = 0.1
+        self.backend.REINTENTO_INICIAL = 0.1
+
+    def tearDown(self):
+        self.backend.detener_escucha()
+
+    async def _publicar_y_recibir(self, suscripcion, datos):
+        await asyncio.to_thread(_publicar_en_otro_hilo, self.backend, 'calendario', datos)
+        return await suscripcion.recibir(5)
+
+    def test_notify_llega_y_sobrevive_a_una_caida_de_la_escucha(self):
+        async def escenario():
+            suscripcion = self.backend.suscribir(['calendario'])
+            await asyncio.to_thread(self.backend.escuchando.wait, 5)
+            primero = await self._publicar_y_recibir(suscripcion, {'eventos': ['actividad']})
+
+            # Se cae la conexión de LISTEN: la escucha se reabre sola y
+            # avisa a las páginas para que se pongan al día.
+            pid = self.backend.pid_escucha
+            await asyncio.to_thread(_cortar_conexion, pid)
+            reconexion = await suscripcion.recibir(5)
+            segundo = await self._publicar_y_recibir(suscripcion, {'eventos': ['ensayo']})
+
+            suscripcion.cerrar()
+            return primero, pid, reconexion, segundo
+
+        primero, pid, reconexion, segundo = asyncio.run(escenario())
+
+        self.assertEqual(primero, [('calendario', {'eventos': ['actividad']})])
+        self.assertEqual(reconexion, [('calendario', {'eventos': ['actividad', 'ensayo']})])
+        self.assertEqual(segundo, [('calendario', {'eventos': ['ensayo']})])
+        self.assertNotEqual(self.backend.pid_escucha, pid)
+
+
+@override_settings(TIEMPO_REAL_BACKEND='core.tests.BackendPrueba')
+class AvisosEnVivoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@vicaf.pe', 'clave')
+        cls.cliente = Cliente.objects.create(
+            ruc='20123456789', razon_social='Cliente de Prueba SAC', persona_contacto='Contacto',
+            celular_contacto='999999999', correo_contacto='contacto@cliente.pe',
+        )
+
+    def setUp(self):
+        BackendPrueba.publicados = []
+
+    def test_una_transaccion_publica_un_aviso(self):
+        ahora = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            for horas in range(3):
+                CalendarioActividad.objects.create(
+                    titulo=f'Visita {horas}', fecha_inicio=ahora + timedelta(hours=horas),
+                    fecha_fin=ahora + timedelta(hours=horas + 1), creado_por=self.usuario,
+                )
+
+        self.assertEqual(BackendPrueba.publicados, [('calendario', {'eventos': ['actividad']})])
+
+    def test_proyecto_nuevo_avisa_al_panel(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cotizacion = Cotizacion.objects.create(
+                cliente=self.cliente, numero_oferta='VCF-OTE-2026-001', asunto_servicio='Ensayos',
+                persona_contacto='Contacto', correo_contacto='contacto@cliente.pe',
+                telefono_contacto='999999999', tasa_igv=Decimal('0.18'),
+            )
+            proyecto = Proyecto.objects.create(
+                cotizacion=cotizacion, cliente=self.cliente, nombre_proyecto='Carretera', codigo_proyecto='PRY-001',
+            )
+
+        self.assertIn(('proyectos', {'proyectos': [proyecto.pk]}), BackendPrueba.publicados)
+
+    def test_endpoint_pide_permiso_y_bajo_wsgi_no_abre_flujo(self):
+        url = reverse('eventos_en_vivo')
+
+        tecnico = TrabajadorProfile.objects.create(
+            user=User.objects.create_user('tecnico', password='clave'),
+            rol=RolTrabajador.objects.create(nombre='Técnico'),
+            nombre_completo='Ana Quispe',
+        )
+        self.client.force_login(tecnico.user)
+        self.assertEqual(self.client.get(url, {'canales': 'calendario'}).status_code, 403)
+
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get(url, {'canales': 'desconocido'}).status_code, 403)
+        self.assertEqual(self.client.get(url, {'canales': 'calendario,proyectos'}).status_code, 204)
+
+
+class ColaPdfTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@vicaf.pe', 'clave')
+        cls.otro = User.objects.create_superuser('otro', 'otro@vicaf.pe', 'clave')
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def trabajo(self, **datos):
+        datos = {'tipo': 'cotizacion', 'objeto_id': 1, 'huella': 'v1', 'nombre_archivo': 'doc.pdf', **datos}
+        return TrabajoPDF.objects.create(**datos)
+
+    def listo(self, trabajo, contenido=b'%PDF-1.4'):
+        trabajo.archivo.save(trabajo.nombre_archivo, ContentFile(contenido), save=False)
+        trabajo.estado = 'listo'
+        trabajo.tamano = len(contenido)
+        trabajo.finalizado_en = timezone.now()
+        trabajo.save()
+        return trabajo
+
+    def comando(self):
+        return ProcesarPdfs(stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_encolar_reutiliza_la_version_vigente(self):
+        pendiente = encolar_pdf('cotizacion', 1, 'v1', 'doc.pdf')
+        self.assertEqual(encolar_pdf('cotizacion', 1, 'v1', 'doc.pdf'), pendiente)
+
+        self.listo(pendiente)
+        self.assertEqual(encolar_pdf('cotizacion', 1, 'v1', 'doc.pdf'), pendiente)
+
+        # Otra versión del documento es otro trabajo.
+        self.assertNotEqual(encolar_pdf('cotizacion', 1, 'v2', 'doc.pdf'), pendiente)
+
+    def test_encolar_reintenta_errores_y_archivos_perdidos(self):
+        fallido = self.trabajo(estado='error')
+        self.assertNotEqual(encolar_pdf('cotizacion', 1, 'v1', 'doc.pdf'), fallido)
+
+        perdido = self.listo(self.trabajo(huella='v2'))
+        perdido.archivo.delete(save=False)
+        nuevo = encolar_pdf('cotizacion', 1, 'v2', 'doc.pdf', user=self.usuario)
+        self.assertNotEqual(nuevo, perdido)
+        self.assertEqual((nuevo.estado, nuevo.solicitado_por), ('pendiente', self.usuario))
+
+    def test_reencola_los_trabajos_colgados(self):
+        hace_rato = timezone.now() - timedelta(minutes=30)
+        colgado = self.trabajo(estado='procesando', iniciado_en=hace_rato, intentos=1)
+        agotado = self.trabajo(estado='procesando', iniciado_en=hace_rato, intentos=3)
+        reciente = self.trabajo(estado='procesando', iniciado_en=timezone.now(), intentos=1)
+
+        self.comando().reencolar_colgados(timeout_minutos=10, max_intentos=3)
+
+        for trabajo in (colgado, agotado, reciente):
+            trabajo.refresh_from_db()
+        self.assertEqual(colgado.estado, 'pendiente')
+        self.assertEqual(agotado.estado, 'error')
+        self.assertEqual(agotado.mensaje_error, 'Tiempo de procesamiento agotado.')
+        self.assertEqual(reciente.estado, 'procesando')
+
+    @mock.patch('core.management.commands.procesar_pdfs.construir_html_trabajo', return_value='<p>PDF</p>')
+    def test_reintenta_hasta_el_maximo_de_intentos(self, construir):
+        trabajo = self.trabajo()
+        comando = self.comando()
+
+        with ThreadPoolExecutor(max_workers=1) as pool, \
+                mock.patch('core.management.commands.procesar_pdfs.renderizar_pdf', side_effect=RuntimeError('falló')):
+            for intento in range(1, 4):
+                tomados = comando.tomar_trabajos(2)
+                self.assertEqual(tomados, [trabajo])
+                comando.procesar_lote(pool, tomados, max_intentos=3)
+
+                trabajo.refresh_from_db()
+                self.assertEqual(trabajo.intentos, intento)
+                self.assertEqual(trabajo.estado, 'error' if intento == 3 else 'pendiente')
+
+        self.assertEqual(trabajo.mensaje_error, 'falló')
+        self.assertEqual(comando.tomar_trabajos(2), [])
+
+    @mock.patch('core.management.commands.procesar_pdfs.construir_html_trabajo', return_value='<p>PDF</p>')
+    def test_guarda_el_pdf_y_descarta_las_versiones_anteriores(self, construir):
+        anterior = self.listo(self.trabajo(huella='v1'))
+        trabajo = self.trabajo(huella='v2')
+        comando = self.comando()
+
+        with ThreadPoolExecutor(max_workers=1) as pool, \
+                mock.patch('core.management.commands.procesar_pdfs.renderizar_pdf', return_value=b'%PDF-v2'):
+            comando.procesar_lote(pool, comando.tomar_trabajos(2), max_intentos=3)
+
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.tamano), ('listo', 7))
+        with trabajo.archivo.open('rb') as archivo:
+            self.assertEqual(archivo.read(), b'%PDF-v2')
+        self.assertFalse(TrabajoPDF.objects.filter(pk=anterior.pk).exists())
+        self.assertFalse(anterior.archivo.storage.exists(anterior.archivo.name))
+
+    @override_settings(PDF_CACHE_MAX_BYTES=15)
+    def test_la_cache_expulsa_los_menos_descargados(self):
+        ahora = timezone.now()
+        reciente = self.listo(self.trabajo(objeto_id=1), b'0123456789')
+        antiguo = self.listo(self.trabajo(objeto_id=2), b'0123456789')
+        sin_descargas = self.listo(self.trabajo(objeto_id=3), b'0123456789')
+        TrabajoPDF.objects.filter(pk=reciente.pk).update(ultimo_acceso=ahora - timedelta(hours=1))
+        TrabajoPDF.objects.filter(pk=antiguo.pk).update(ultimo_acceso=ahora - timedelta(hours=2))
+        TrabajoPDF.objects.filter(pk=sin_descargas.pk).update(ultimo_acceso=None)
+
+        self.assertEqual(purgar_cache_pdfs(), 2)
+
+        self.assertQuerySetEqual(TrabajoPDF.objects.all(), [reciente])
+        self.assertTrue(reciente.archivo.storage.exists(reciente.archivo.name))
+        for expulsado in (antiguo, sin_descargas):
+            self.assertFalse(expulsado.archivo.storage.exists(expulsado.archivo.name))
+
+        # Por debajo del límite no se toca nada.
+        self.assertEqual(purgar_cache_pdfs(), 0)
+
+    def test_estado_y_descarga(self):
+        trabajo = self.trabajo(solicitado_por=self.usuario)
+        self.client.force_login(self.usuario)
+
+        respuesta = self.client.get(reverse('pdf_estado', args=[trabajo.pk]))
+        self.assertEqual(respuesta.json()['estado'], 'pendiente')
+        self.assertEqual(respuesta.json()['url_descarga'], '')
+        self.assertEqual(self.client.get(reverse('pdf_descargar', args=[trabajo.pk])).status_code, 404)
+
+        self.listo(trabajo)
+        respuesta = self.client.get(reverse('pdf_estado', args=[trabajo.pk]))
+        self.assertEqual(respuesta.json()['url_descarga'], reverse('pdf_descargar', args=[trabajo.pk]))
+
+        respuesta = self.client.get(reverse('pdf_descargar', args=[trabajo.pk]))
+        self.assertEqual(b''.join(respuesta.streaming_content), b'%PDF-1.4')
+        trabajo.refresh_from_db()
+        self.assertIsNotNone(trabajo.ultimo_acceso)
+
+    def test_documentos_personalizados_solo_para_quien_los_pidio(self):
+        recepcion = self.listo(self.trabajo(tipo='recepcion', solicitado_por=self.usuario))
+        cotizacion = self.listo(self.trabajo(tipo='cotizacion', solicitado_por=self.usuario))
+
+        self.client.force_login(self.otro)
+        for nombre in ('pdf_estado', 'pdf_descargar'):
+            self.assertEqual(self.client.get(reverse(nombre, args=[recepcion.pk])).status_code, 403)
+            self.assertEqual(self.client.get(reverse(nombre, args=[cotizacion.pk])).status_code, 200)
+
+        self.client.force_login(self.usuario)
+        self.assertEqual(self.client.get(reverse('pdf_descargar', args=[recepcion.pk])).status_code, 200)
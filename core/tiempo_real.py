@@ -0,0 +1,250 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+
+from django.conf import settings
+from django.db import connection, connections
+from django.http import StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+# Permisos que dan acceso a cada canal (basta con uno).
+PERMISOS_CANALES = {
+    'calendario': ('calendario.ver', 'gantt.ver'),
+    'proyectos': ('proyectos.ver',),
+}
+
+# Sin mensajes, cada tanto se envía un comentario para que los proxies no
+# corten la conexión por inactividad.
+LATIDO_SEGUNDOS = 15
+
+# Django 4.2 no avisa cuando el navegador se desconecta: cada flujo se
+# cierra solo pasado este tiempo y EventSource vuelve a conectarse.
+DURACION_FLUJO_SEGUNDOS = 5 * 60
+REINTENTO_MS = 3000
+
+# Mensajes que una suscripción guarda sin leer. Si el navegador no los
+# retira se descartan los nuevos: cualquier aviso pendiente ya basta para
+# que la página se ponga al día.
+MENSAJES_POR_SUSCRIPCION = 100
+
+
+class Suscripcion:
+    """Cola de mensajes de una conexión SSE, atada a su event loop."""
+
+    def __init__(self, backend, canales):
+        self.backend = backend
+        self.canales = set(canales)
+        self._loop = asyncio.get_running_loop()
+        self._cola = asyncio.Queue(MENSAJES_POR_SUSCRIPCION)
+
+    def entregar(self, canal, datos):
+        # Se llama desde el hilo que publica: la cola solo se toca en su loop.
+        if canal in self.canales:
+            self._loop.call_soon_threadsafe(self._encolar, (canal, datos))
+
+    def _encolar(self, mensaje):
+        if not self._cola.full():
+            self._cola.put_nowait(mensaje)
+
+    async def recibir(self, espera):
+        """Mensajes pendientes como [(canal, datos)]; [] si pasa `espera` sin ninguno."""
+        try:
+            mensajes = [await asyncio.wait_for(self._cola.get(), espera)]
+        except asyncio.TimeoutError:
+            return []
+        while not self._cola.empty():
+            mensajes.append(self._cola.get_nowait())
+        return mensajes
+
+    def cerrar(self):
+        self.backend.desuscribir(self)
+
+
+class BackendMemoria:
+    """
+    Publicación dentro del proceso: solo llegan los mensajes publicados por
+    el mismo proceso que atiende la conexión SSE. Sirve con un único worker
+    ASGI; con varios hay que usar un backend con broker (`BackendPostgres`).
+    """
+
+    def __init__(self):
+        self._suscripciones = set()
+        self._candado = threading.Lock()
+
+    def suscribir(self, canales):
+        suscripcion = Suscripcion(self, canales)
+        with self._candado:
+            self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        with self._candado:
+            self._suscripciones.discard(suscripcion)
+
+    def repartir(self, canal, datos):
+        with self._candado:
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            suscripcion.entregar(canal, datos)
+
+    def publicar(self, canal, datos):
+        self.repartir(canal, datos)
+
+
+class BackendPostgres(BackendMemoria):
+    """
+    Publica con NOTIFY en PostgreSQL y cada proceso reparte entre sus
+    conexiones SSE lo que recibe con LISTEN. No necesita otro servicio:
+    el broker es la base de datos que ya comparten todos los workers.
+    """
+
+    CANAL_POSTGRES = 'grupovicaf_tiempo_real'
+    ESPERA_ESCUCHA = 5
+
+    # Si se cae la conexión de LISTEN se reintenta duplicando la espera.
+    REINTENTO_INICIAL = 1
+    REINTENTO_MAXIMO = 60
+
+    # Lo publicado mientras no había conexión se perdió: al reconectar cada
+    # página recibe un aviso que la hace ponerse al día por completo.
+    AVISOS_RECONEXION = {
+        'calendario': {'eventos': ['actividad', 'ensayo']},
+        'proyectos': {'proyectos': None},
+    }
+
+    def __init__(self):
+        super().__init__()
+        self._escucha = None
+        self.escuchando = threading.Event()
+        self.pid_escucha = None
+        self._detenida = threading.Event()
+
+    def suscribir(self, canales):
+        self._iniciar_escucha()
+        return super().suscribir(canales)
+
+    def publicar(self, canal, datos):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.CANAL_POSTGRES, json.dumps([canal, datos])])
+
+    def _iniciar_escucha(self):
+        with self._candado:
+            if self._escucha is None or not self._escucha.is_alive():
+                self._detenida.clear()
+                self._escucha = threading.Thread(target=self._escuchar, name='tiempo-real-listen', daemon=True)
+                self._escucha.start()
+
+    def _conectar(self):
+        # Conexión propia y en autocommit: LISTEN no puede quedar dentro
+        # de la transacción de una petición.
+        base = connections['default']
+        conexion = base.get_new_connection(base.get_connection_params())
+        conexion.autocommit = True
+        with conexion.cursor() as cursor:
+            cursor.execute(f'LISTEN {self.CANAL_POSTGRES}')
+        return conexion
+
+    def detener_escucha(self):
+        """Cierra la conexión de LISTEN (a lo sumo tras ESPERA_ESCUCHA segundos)."""
+        self._detenida.set()
+        if self._escucha is not None:
+            self._escucha.join()
+
+    def _recibir(self, conexion):
+        while not self._detenida.is_set():
+            if select.select([conexion], [], [], self.ESPERA_ESCUCHA) == ([], [], []):
+                continue
+            conexion.poll()
+            while conexion.notifies:
+                canal, datos = json.loads(conexion.notifies.pop(0).payload)
+                self.repartir(canal, datos)
+
+    def _escuchar(self):
+        espera = self.REINTENTO_INICIAL
+        reconexion = False
+        while not self._detenida.is_set():
+            try:
+                conexion = self._conectar()
+            except Exception:
+                logger.exception('No se pudo abrir la escucha de avisos en tiempo real; reintento en %s s.', espera)
+            else:
+                espera = self.REINTENTO_INICIAL
+                self.pid_escucha = conexion.get_backend_pid()
+                self.escuchando.set()
+                if reconexion:
+                    for canal, datos in self.AVISOS_RECONEXION.items():
+                        self.repartir(canal, datos)
+                try:
+                    self._recibir(conexion)
+                except Exception:
+                    logger.exception('Se cortó la escucha de avisos en tiempo real; reintento en %s s.', espera)
+                finally:
+                    self.escuchando.clear()
+                    try:
+                        conexion.close()
+                    except Exception:
+                        pass
+
+            reconexion = True
+            self._detenida.wait(espera)
+            espera = min(espera * 2, self.REINTENTO_MAXIMO)
+
+
+_backend = None
+
+
+def obtener_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.TIEMPO_REAL_BACKEND)()
+    return _backend
+
+
+def reiniciar_backend():
+    global _backend
+    _backend = None
+
+
+def publicar(canal, datos):
+    """Envía `datos` (serializable a JSON) a las páginas suscritas a `canal`."""
+    try:
+        obtener_backend().publicar(canal, datos)
+    except Exception:
+        # Un aviso perdido no debe romper el guardado que lo originó.
+        logger.exception('No se pudo publicar el aviso en vivo del canal %s.', canal)
+
+
+def suscribir(canales):
+    return obtener_backend().suscribir(canales)
+
+
+async def _flujo_sse(canales):
+    loop = asyncio.get_running_loop()
+    fin = loop.time() + DURACION_FLUJO_SEGUNDOS
+    # La suscripción nace con el flujo: si la respuesta nunca se envía,
+    # no queda ninguna cola registrada.
+    suscripcion = suscribir(canales)
+    try:
+        yield f'retry: {REINTENTO_MS}\n\n'
+        while loop.time() < fin:
+            mensajes = await suscripcion.recibir(min(LATIDO_SEGUNDOS, fin - loop.time()))
+            if not mensajes:
+                yield ': latido\n\n'
+            for canal, datos in mensajes:
+                yield f'event: {canal}\ndata: {json.dumps(datos)}\n\n'
+    finally:
+        suscripcion.cerrar()
+
+
+def respuesta_sse(canales):
+    """Flujo `text/event-stream` con los mensajes de `canales`; solo bajo ASGI."""
+    respuesta = StreamingHttpResponse(_flujo_sse(canales), content_type='text/event-stream')
+    respuesta['Cache-Control'] = 'no-cache'
+    # nginx no debe acumular el flujo antes de enviarlo.
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
@@ -0,0 +1,59 @@
+import weakref
+from threading import local
+
+from django.db import transaction
+
+
+_lotes = local()
+
+
+class _Lote:
+    """
+    Valores pendientes de `funcion` en la transacción actual. Solo la cola
+    de on_commit de Django guarda el lote: si se revierte la transacción o
+    el savepoint donde se creó, Django descarta el callback, el lote deja
+    de existir y la siguiente llamada abre uno nuevo.
+    """
+
+    def __init__(self, funcion):
+        self.funcion = funcion
+        self.valores = set()
+        self.aplicado = False
+
+    def __call__(self):
+        self.aplicado = True
+        self.funcion(self.valores)
+
+
+def _lote_vigente(funcion):
+    referencia = getattr(_lotes, 'pendientes', {}).get(funcion)
+    lote = referencia() if referencia is not None else None
+    if lote is None or lote.aplicado:
+        return None
+    return lote
+
+
+def acumular_al_confirmar(funcion, *valores):
+    """
+    Acumula `valores` y ejecuta `funcion(valores)` una sola vez cuando la
+    transacción actual se confirme. Fuera de un bloque atómico se ejecuta
+    de inmediato.
+    """
+    valores = set(valores)
+    if not valores:
+        return
+
+    if not transaction.get_connection().in_atomic_block:
+        funcion(valores)
+        return
+
+    if not hasattr(_lotes, 'pendientes'):
+        _lotes.pendientes = {}
+
+    lote = _lote_vigente(funcion)
+    if lote is None:
+        lote = _Lote(funcion)
+        _lotes.pendientes[funcion] = weakref.ref(lote)
+        transaction.on_commit(lote)
+
+    lote.valores.update(valores)
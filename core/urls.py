@@ -7,4 +7,7 @@ urlpatterns = [
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
     path('dashboard/', views.dashboard_view, name='dashboard'),
     path('administracion/', views.dashboard_view_analitycs, name='administracion'),
+    path('pdf/<int:pk>/estado/', views.estado_trabajo_pdf, name='pdf_estado'),
+    path('pdf/<int:pk>/descargar/', views.descargar_trabajo_pdf, name='pdf_descargar'),
+    path('eventos/', views.eventos_en_vivo, name='eventos_en_vivo'),
 ]
@@ -0,0 +1,30 @@
+import time
+
+from django.core.cache import cache
+
+
+def _version_nueva(anterior=None):
+    # Basada en el reloj: nunca repite una versión ya usada, aunque la
+    # clave se haya expulsado de la caché o dos procesos suban a la vez.
+    return max(time.time_ns(), (anterior or 0) + 1)
+
+
+def leer_version(clave):
+    """
+    Versión vigente de un grupo de entradas cacheadas. Si la clave no está
+    (primera vez, caché vaciada o expulsada) se crea una versión nueva:
+    las entradas guardadas con una versión anterior no vuelven a usarse.
+    """
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, _version_nueva(), None)
+        version = cache.get(clave)
+        if version is None:
+            # Caché que no guarda nada (DummyCache): cada lectura es nueva.
+            version = _version_nueva()
+    return version
+
+
+def subir_version(clave):
+    """Invalida en todos los procesos las entradas de la versión vigente."""
+    cache.set(clave, _version_nueva(cache.get(clave)), None)
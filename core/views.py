@@ -1,17 +1,19 @@
-from django.shortcuts import render
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.shortcuts import render, get_object_or_404
+from django.http import HttpResponse, JsonResponse, HttpResponseForbidden
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LoginView
 from django.urls import reverse_lazy
 from django.contrib import messages
-from django.db.models import Sum, Count
-from django.db.models.functions import TruncMonth
-from datetime import datetime, timedelta
 from django.utils import timezone
 from datetime import datetime, timedelta
-from django.db.models import Q
-from clientes.models import Cliente
-from proyectos.models import Proyecto, RecepcionMuestra,MuestraDetalle, SolicitudEnsayo,DetalleSolicitudEnsayo,IncidenciaSolicitud, InformeFinal
-from servicios.models import Cotizacion
+from trabajadores.permissions import trabajador_tiene_permiso
+from .dashboard import resumen_clientes, resumen_incidencias, resumen_tablero
+from .indicadores import series_indicadores
+from .models import TrabajoPDF
+from .pdf import PDF_DOCUMENTOS, datos_estado_trabajo, respuesta_archivo_pdf
+from .tiempo_real import PERMISOS_CANALES, respuesta_sse
 
 class CoreLoginView(LoginView):
     template_name = 'registration/login.html'
@@ -29,6 +31,16 @@ class CoreLoginView(LoginView):
         messages.error(self.request, 'Usuario o contraseña incorrectos. Intente de nuevo.')
         return super().form_invalid(form)
 
+def parsear_fecha_iso(valor):
+    valor = (valor or '').strip()
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
 @login_required
 def dashboard_view(request):
     def obtener_fechas(prefix):
@@ -37,234 +49,66 @@ def dashboard_view(request):
             request.GET.get(f'fin_{prefix}', '').strip()
         )
 
-    def parsear_fecha(valor):
-        if not valor:
-            return None
-        try:
-            return datetime.strptime(valor, '%Y-%m-%d').date()
-        except ValueError:
-            return None
-
-    def obtener_campo_fecha(modelo, candidatos=None):
-        if candidatos is None:
-            candidatos = [
-                'fecha_creacion',
-                'created_at',
-                'fecha',
-                'created',
-                'fecha_registro',
-                'fecha_emision',
-                'fecha_ingreso',
-                'fecha_solicitud',
-                'f_creacion',
-            ]
-        campos_modelo = {field.name for field in modelo._meta.get_fields()}
-        for campo in candidatos:
-            if campo in campos_modelo:
-                return campo
-        return None
-
-    def aplicar_filtro_rango(qs, modelo, fecha_inicio, fecha_fin, candidatos=None):
-        campo_fecha = obtener_campo_fecha(modelo, candidatos=candidatos)
-        if not campo_fecha:
-            return qs
-
-        try:
-            field = modelo._meta.get_field(campo_fecha)
-            es_datetime = field.get_internal_type() == 'DateTimeField'
-        except Exception:
-            es_datetime = False
-
-        lookup_base = f'{campo_fecha}__date' if es_datetime else campo_fecha
-
-        if fecha_inicio and fecha_fin:
-            return qs.filter(**{f'{lookup_base}__range': [fecha_inicio, fecha_fin]})
-        elif fecha_inicio:
-            return qs.filter(**{f'{lookup_base}__gte': fecha_inicio})
-        elif fecha_fin:
-            return qs.filter(**{f'{lookup_base}__lte': fecha_fin})
-
-        return qs
-
     inicio_1_raw, fin_1_raw = obtener_fechas(1)
     inicio_2_raw, fin_2_raw = obtener_fechas(2)
     inicio_3_raw, fin_3_raw = obtener_fechas(3)
 
-    inicio_1 = parsear_fecha(inicio_1_raw)
-    fin_1 = parsear_fecha(fin_1_raw)
-    inicio_2 = parsear_fecha(inicio_2_raw)
-    fin_2 = parsear_fecha(fin_2_raw)
-    inicio_3 = parsear_fecha(inicio_3_raw)
-    fin_3 = parsear_fecha(fin_3_raw)
-
-    total_clientes = Cliente.objects.count()
-
-    cotizaciones_qs = Cotizacion.objects.all()
-    cotizaciones_qs = aplicar_filtro_rango(
-        cotizaciones_qs,
-        Cotizacion,
-        inicio_1,
-        fin_1,
-        candidatos=['fecha_creacion', 'created_at', 'fecha', 'fecha_emision', 'created']
-    )
-
-    total_cotizaciones = cotizaciones_qs.count()
-    total_cotizaciones_pendientes = cotizaciones_qs.filter(estado='Pendiente').count()
-    total_cotizaciones_aceptadas = cotizaciones_qs.filter(estado='Aceptada').count()
-
-    proyectos_base_qs = Proyecto.objects.all()
-    proyectos_base_qs = aplicar_filtro_rango(
-        proyectos_base_qs,
-        Proyecto,
-        inicio_3,
-        fin_3,
-        candidatos=['fecha_creacion', 'created_at', 'fecha', 'fecha_inicio', 'created']
-    )
-
-    total_proyectos = proyectos_base_qs.count()
-
-    recepciones_qs = RecepcionMuestra.objects.all()
-    recepciones_qs = aplicar_filtro_rango(
-        recepciones_qs,
-        RecepcionMuestra,
-        inicio_3,
-        fin_3,
-        candidatos=['fecha_creacion', 'created_at', 'fecha', 'fecha_recepcion', 'created']
-    )
-    total_recepciones = recepciones_qs.count()
-
-    muestras_qs = MuestraDetalle.objects.all()
-    muestras_qs = aplicar_filtro_rango(
-        muestras_qs,
-        MuestraDetalle,
-        inicio_3,
-        fin_3,
-        candidatos=['fecha_creacion', 'created_at', 'fecha', 'created']
-    )
-    total_muestras = muestras_qs.count()
-
-    total_proyectos_pendiente = 0
-    total_proyectos_en_curso = 0
-    total_proyectos_muestras_asignadas = 0
-    total_proyectos_muestras_validadas = 0
-    total_proyectos_finalizado = 0
-    total_proyectos_cancelado = 0
-
-    proyectos_qs = proyectos_base_qs.select_related('cotizacion').prefetch_related(
-        'cotizacion__recepciones__muestras',
-        'cotizacion__solicitudes_ensayo',
-        'cotizacion__solicitudes_ensayo__informe_final'
-    )
-
-    for proyecto in proyectos_qs:
-        if proyecto.estado == 'CANCELADO':
-            total_proyectos_cancelado += 1
-            continue
-
-        cotizacion = proyecto.cotizacion
-        if not cotizacion:
-            total_proyectos_pendiente += 1
-            continue
-
-        recepciones = cotizacion.recepciones.all()
-        tiene_muestras = any(r.muestras.exists() for r in recepciones)
-
-        solicitudes = list(cotizacion.solicitudes_ensayo.all())
-        solicitud = solicitudes[0] if solicitudes else None
-
-        if solicitud:
-            if solicitud.estado in ['pendiente', 'proceso']:
-                total_proyectos_en_curso += 1
-                continue
-
-            if solicitud.estado == 'finalizado':
-                informe = InformeFinal.objects.filter(solicitud=solicitud).first()
-                if informe:
-                    total_proyectos_finalizado += 1
-                else:
-                    total_proyectos_muestras_validadas += 1
-                continue
-
-        if tiene_muestras:
-            total_proyectos_muestras_asignadas += 1
-        else:
-            total_proyectos_pendiente += 1
-
-    solicitudes_qs = SolicitudEnsayo.objects.all()
-    solicitudes_qs = aplicar_filtro_rango(
-        solicitudes_qs,
-        SolicitudEnsayo,
-        inicio_2,
-        fin_2,
-        candidatos=['fecha_creacion', 'created_at', 'fecha', 'fecha_solicitud', 'created']
-    )
-
-    total_solicitudes = solicitudes_qs.count()
-    total_ensayos_pendiente = solicitudes_qs.filter(estado='pendiente').count()
-    total_ensayos_proceso = solicitudes_qs.filter(estado='proceso').count()
-    total_ensayos_finalizado = solicitudes_qs.filter(estado='finalizado').count()
-
-    detalles_ensayo_qs = DetalleSolicitudEnsayo.objects.all()
-    detalles_ensayo_qs = aplicar_filtro_rango(
-        detalles_ensayo_qs,
-        DetalleSolicitudEnsayo,
-        inicio_2,
-        fin_2,
-        candidatos=['fecha_creacion', 'created_at', 'fecha', 'created']
-    )
-    total_ensayos = detalles_ensayo_qs.count()
-
-    incidencias_qs = IncidenciaSolicitud.objects.all()
-    incidencias_qs = aplicar_filtro_rango(
-        incidencias_qs,
-        IncidenciaSolicitud,
-        inicio_2,
-        fin_2,
-        candidatos=['fecha_creacion', 'created_at', 'fecha', 'created']
-    )
-
-    total_incidencias = incidencias_qs.count()
-    total_incidencias_autorizadas = incidencias_qs.filter(esta_autorizada=True).count()
-    total_incidencias_pendientes = incidencias_qs.filter(esta_autorizada=False).count()
-
-    informes_qs = InformeFinal.objects.all()
-    informes_qs = aplicar_filtro_rango(
-        informes_qs,
-        InformeFinal,
-        inicio_2,
-        fin_2,
-        candidatos=['fecha_creacion', 'created_at', 'fecha', 'created', 'fecha_emision']
-    )
-
-    total_informes = informes_qs.count()
-    total_informes_pendientes_envio = informes_qs.filter(estado_envio='pendiente').count()
-    total_informes_enviados = informes_qs.filter(estado_envio='enviado').count()
-
-    proyectos_con_muestras = proyectos_base_qs.filter(
-        cotizacion__recepciones__muestras__isnull=False
-    ).distinct().count()
-
-    proyectos_con_solicitud = proyectos_base_qs.filter(
-        cotizacion__solicitudes_ensayo__isnull=False
-    ).distinct().count()
-
-    proyectos_con_informe = proyectos_base_qs.filter(
-        cotizacion__solicitudes_ensayo__informe_final__isnull=False
-    ).distinct().count()
+    inicio_1 = parsear_fecha_iso(inicio_1_raw)
+    fin_1 = parsear_fecha_iso(fin_1_raw)
+    inicio_2 = parsear_fecha_iso(inicio_2_raw)
+    fin_2 = parsear_fecha_iso(fin_2_raw)
+    inicio_3 = parsear_fecha_iso(inicio_3_raw)
+    fin_3 = parsear_fecha_iso(fin_3_raw)
+
+    resumen = resumen_tablero((inicio_1, fin_1), (inicio_2, fin_2), (inicio_3, fin_3))
+    cotizaciones = resumen['cotizaciones']
+    solicitudes = resumen['solicitudes']
+    informes = resumen['informes']
+    proyectos = resumen['proyectos']
+    recepciones = resumen['recepciones']
+    incidencias = resumen_incidencias()
+
+    total_clientes = resumen_clientes()['total']
+
+    total_cotizaciones = cotizaciones['total']
+    total_cotizaciones_pendientes = cotizaciones['pendientes']
+    total_cotizaciones_aceptadas = cotizaciones['aceptadas']
+
+    total_proyectos = proyectos['total']
+    total_proyectos_pendiente = proyectos['pendiente']
+    total_proyectos_en_curso = proyectos['en_curso']
+    total_proyectos_muestras_asignadas = proyectos['muestras_asignadas']
+    total_proyectos_muestras_validadas = proyectos['muestras_validadas']
+    total_proyectos_finalizado = proyectos['finalizado']
+    total_proyectos_cancelado = proyectos['cancelado']
+
+    total_recepciones = recepciones['recepciones']
+    total_muestras = recepciones['muestras']
+
+    total_solicitudes = solicitudes['total']
+    total_ensayos_pendiente = solicitudes['pendiente']
+    total_ensayos_proceso = solicitudes['proceso']
+    total_ensayos_finalizado = solicitudes['finalizado']
+    total_ensayos = solicitudes['ensayos']
+
+    total_incidencias = incidencias['total']
+    total_incidencias_autorizadas = incidencias['autorizadas']
+    total_incidencias_pendientes = incidencias['pendientes']
+
+    total_informes = informes['total']
+    total_informes_pendientes_envio = informes['pendientes_envio']
+    total_informes_enviados = informes['enviados']
+
+    proyectos_con_muestras = proyectos['con_muestras']
+    proyectos_con_solicitud = proyectos['con_solicitud']
+    proyectos_con_informe = proyectos['con_informe']
 
     proyectos_sin_muestras = total_proyectos - proyectos_con_muestras
     proyectos_sin_solicitud = total_proyectos - proyectos_con_solicitud
     proyectos_sin_informe = total_proyectos - proyectos_con_informe
 
-    solicitudes_vencidas = solicitudes_qs.filter(
-        estado__in=['pendiente', 'proceso'],
-        fecha_entrega_programada__lt=timezone.now().date()
-    ).count()
-
-    detalles_vencidos = detalles_ensayo_qs.filter(
-        fecha_entrega_real__isnull=True,
-        fecha_entrega_programada__lt=timezone.now().date()
-    ).count()
+    solicitudes_vencidas = solicitudes['vencidas']
+    detalles_vencidos = solicitudes['ensayos_vencidos']
 
     efectividad = 0
     p_aceptadas = 0
@@ -402,4 +246,73 @@ def dashboard_view(request):
 
 @login_required
 def dashboard_view_analitycs(request):
-    return render(request, 'administracion.html')
\ No newline at end of file
+    hoy = timezone.localdate()
+    fecha_inicio = parsear_fecha_iso(request.GET.get('inicio', '')) or hoy - timedelta(days=29)
+    fecha_fin = parsear_fecha_iso(request.GET.get('fin', '')) or hoy
+    rango = (fecha_inicio, fecha_fin)
+
+    context = {
+        'indicadores_inicio': fecha_inicio,
+        'indicadores_fin': fecha_fin,
+        'indicadores_resumen': resumen_tablero(rango, rango, rango, hoy=hoy),
+        'indicadores_series': series_indicadores(
+            ['cotizaciones', 'proyectos', 'muestras', 'solicitudes', 'informes'],
+            fecha_inicio,
+            fecha_fin,
+        ),
+    }
+    return render(request, 'administracion.html', context)
+
+
+def _obtener_trabajo_pdf(request, pk):
+    trabajo = get_object_or_404(TrabajoPDF, pk=pk)
+    documento = PDF_DOCUMENTOS[trabajo.tipo]
+    if not trabajador_tiene_permiso(request.user, documento['permiso']):
+        return None
+    # Los documentos personalizados solo los ve quien los pidió.
+    if documento['por_usuario'] and trabajo.solicitado_por_id != request.user.pk:
+        return None
+    return trabajo
+
+
+@login_required
+def estado_trabajo_pdf(request, pk):
+    trabajo = _obtener_trabajo_pdf(request, pk)
+    if trabajo is None:
+        return HttpResponseForbidden("No tienes permiso para acceder a este documento.")
+    return JsonResponse(datos_estado_trabajo(trabajo))
+
+
+@login_required
+def descargar_trabajo_pdf(request, pk):
+    trabajo = _obtener_trabajo_pdf(request, pk)
+    if trabajo is None:
+        return HttpResponseForbidden("No tienes permiso para acceder a este documento.")
+    return respuesta_archivo_pdf(trabajo)
+
+
+def _canales_permitidos(user, canales):
+    return [
+        canal for canal in canales
+        if canal in PERMISOS_CANALES
+        and any(trabajador_tiene_permiso(user, permiso) for permiso in PERMISOS_CANALES[canal])
+    ]
+
+
+async def eventos_en_vivo(request):
+    """
+    Avisos en vivo (Server-Sent Events) de los canales pedidos en
+    `?canales=calendario,proyectos`. La página solo recibe qué cambió y
+    pide los datos a sus endpoints de siempre.
+    """
+    canales = [canal for canal in request.GET.get('canales', '').split(',') if canal]
+    permitidos = await sync_to_async(_canales_permitidos)(request.user, canales)
+    if not permitidos:
+        return HttpResponseForbidden("No tienes permiso para acceder a esta sección.")
+
+    # Bajo WSGI un flujo sin fin ocuparía el worker: 204 hace que
+    # EventSource no reintente y la página siga con su consulta periódica.
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    return respuesta_sse(permitidos)
@@ -11,6 +11,7 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grupovicaf.settings')
+# Apunta a la configuración de PRODUCCIÓN, igual que wsgi.py
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'grupovicaf.settings.prod')
 
 application = get_asgi_application()
@@ -62,6 +62,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'grupovicaf.wsgi.application'
+ASGI_APPLICATION = 'grupovicaf.asgi.application'
 
 # Base de Datos por defecto (local)
 DATABASES = {
@@ -71,6 +72,14 @@ DATABASES = {
     }
 }
 
+# Caché (memoria local por defecto)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'grupovicaf-default',
+    }
+}
+
 # Validadores de contraseña
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -104,6 +113,17 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Avisos en vivo (core/tiempo_real.py). En memoria solo sirve con un único
+# proceso ASGI; con varios workers, 'core.tiempo_real.BackendPostgres'.
+TIEMPO_REAL_BACKEND = os.environ.get('TIEMPO_REAL_BACKEND', 'core.tiempo_real.BackendMemoria')
+
+# PDFs generados: tamaño máximo en disco antes de expulsar los menos usados
+PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+# Una recepción envía seis campos por muestra; el límite por defecto (1000)
+# rechaza recepciones de más de ~160 muestras.
+DATA_UPLOAD_MAX_NUMBER_FIELDS = int(os.environ.get('DATA_UPLOAD_MAX_NUMBER_FIELDS', 5000))
+
 # Login / Logout
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGIN_URL = 'login'
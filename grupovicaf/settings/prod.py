@@ -54,6 +54,22 @@ DATABASES = {
     }
 }
 
+# Caché en disco: compartida por todos los workers de gunicorn del servidor.
+# Con el límite por defecto (300) el feed del calendario llena la caché
+# enseguida y cada expulsión borra un tercio de los archivos al azar.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / 'cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 10000)),
+        },
+    }
+}
+
+# Los workers comparten los avisos en vivo por LISTEN/NOTIFY de PostgreSQL
+TIEMPO_REAL_BACKEND = os.environ.get('TIEMPO_REAL_BACKEND', 'core.tiempo_real.BackendPostgres')
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -0,0 +1,92 @@
+from django.dispatch import Signal
+
+from .models import Proyecto, MuestraDetalle, SolicitudEnsayo, InformeFinal
+
+
+# Se emite después de cambiar la etapa operativa de uno o más proyectos.
+# `proyectos` es una lista de (id, fecha_inicio) con los valores afectados.
+etapas_operativas_actualizadas = Signal()
+
+
+def calcular_etapas_operativas(cotizacion_ids):
+    """
+    Calcula la etapa operativa de varias cotizaciones con tres consultas:
+    muestras registradas, última solicitud e informe de esa solicitud.
+    Devuelve {cotizacion_id: etapa}.
+    """
+    cotizacion_ids = {c for c in cotizacion_ids if c}
+    if not cotizacion_ids:
+        return {}
+
+    con_muestras = set(
+        MuestraDetalle.objects.filter(recepcion__cotizacion_id__in=cotizacion_ids)
+        .values_list('recepcion__cotizacion_id', flat=True)
+        .distinct()
+    )
+
+    ultimas_solicitudes = {}
+    solicitudes = (
+        SolicitudEnsayo.objects.filter(cotizacion_id__in=con_muestras)
+        .order_by('cotizacion_id', '-id')
+        .values_list('cotizacion_id', 'id', 'estado')
+    )
+    for cotizacion_id, solicitud_id, estado in solicitudes:
+        ultimas_solicitudes.setdefault(cotizacion_id, (solicitud_id, estado))
+
+    solicitudes_finalizadas = [
+        solicitud_id for solicitud_id, estado in ultimas_solicitudes.values() if estado == 'finalizado'
+    ]
+    con_informe = set(
+        InformeFinal.objects.filter(solicitud_id__in=solicitudes_finalizadas)
+        .values_list('solicitud_id', flat=True)
+    ) if solicitudes_finalizadas else set()
+
+    etapas = {}
+    for cotizacion_id in cotizacion_ids:
+        etapa = 'PENDIENTE_MUESTRAS'
+
+        if cotizacion_id in con_muestras:
+            etapa = 'MUESTRAS_REGISTRADAS'
+            solicitud = ultimas_solicitudes.get(cotizacion_id)
+
+            if solicitud:
+                solicitud_id, estado = solicitud
+                if estado in ['pendiente', 'proceso']:
+                    etapa = 'ENSAYOS_EN_PROCESO'
+                elif estado == 'finalizado':
+                    etapa = 'INFORME_EMITIDO' if solicitud_id in con_informe else 'PENDIENTE_INFORME'
+
+        etapas[cotizacion_id] = etapa
+
+    return etapas
+
+
+def actualizar_etapas_operativas(cotizacion_ids=None, proyecto_ids=None):
+    """
+    Recalcula y guarda la etapa de los proyectos de esas cotizaciones
+    (o de los proyectos indicados). Solo escribe las filas que cambian.
+    """
+    proyectos = Proyecto.objects.all()
+    if cotizacion_ids is not None:
+        proyectos = proyectos.filter(cotizacion_id__in={c for c in cotizacion_ids if c})
+    if proyecto_ids is not None:
+        proyectos = proyectos.filter(pk__in=proyecto_ids)
+
+    filas = list(proyectos.values_list('id', 'cotizacion_id', 'etapa_operativa', 'fecha_inicio'))
+    etapas = calcular_etapas_operativas(cotizacion_id for _, cotizacion_id, _, _ in filas)
+
+    cambios = {}
+    afectados = []
+    for proyecto_id, cotizacion_id, etapa_actual, fecha_inicio in filas:
+        etapa = etapas.get(cotizacion_id, 'PENDIENTE_MUESTRAS')
+        if etapa != etapa_actual:
+            cambios.setdefault(etapa, []).append(proyecto_id)
+            afectados.append((proyecto_id, fecha_inicio))
+
+    for etapa, ids in cambios.items():
+        Proyecto.objects.filter(pk__in=ids).update(etapa_operativa=etapa)
+
+    if afectados:
+        etapas_operativas_actualizadas.send(sender=Proyecto, proyectos=afectados)
+
+    return len(afectados)
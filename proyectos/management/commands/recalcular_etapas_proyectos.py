@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from proyectos.etapas import actualizar_etapas_operativas
+from proyectos.models import Proyecto
+
+
+class Command(BaseCommand):
+    help = "Recalcula la etapa operativa guardada en todos los proyectos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help="Proyectos por lote.")
+
+    def handle(self, *args, **options):
+        lote = max(options['lote'], 1)
+        ids = list(Proyecto.objects.order_by('pk').values_list('pk', flat=True))
+
+        actualizados = 0
+        for inicio in range(0, len(ids), lote):
+            actualizados += actualizar_etapas_operativas(proyecto_ids=ids[inicio:inicio + lote])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(ids)} proyecto(s) revisados, {actualizados} con etapa actualizada."
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.29 on 2026-10-18 10:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proyecto',
+            name='etapa_operativa',
+            field=models.CharField(choices=[('PENDIENTE_MUESTRAS', 'Pendiente de muestras'), ('MUESTRAS_REGISTRADAS', 'Muestras registradas'), ('ENSAYOS_EN_PROCESO', 'Ensayos en proceso'), ('PENDIENTE_INFORME', 'Pendiente de informe'), ('INFORME_EMITIDO', 'Informe emitido')], db_index=True, default='PENDIENTE_MUESTRAS', max_length=30, verbose_name='Etapa Operativa'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.29 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0002_proyecto_etapa_operativa'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='informefinal',
+            index=models.Index(fields=['fecha_emision', 'id'], name='proyectos_i_fecha_e_c6f16f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proyecto',
+            index=models.Index(fields=['creado_en', 'id'], name='proyectos_p_creado__ad5d4f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recepcionmuestra',
+            index=models.Index(fields=['fecha_recepcion', 'id'], name='proyectos_r_fecha_r_19ef1c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitudensayo',
+            index=models.Index(fields=['fecha_solicitud', 'id'], name='proyectos_s_fecha_s_308794_idx'),
+        ),
+    ]
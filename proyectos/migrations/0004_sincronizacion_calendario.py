@@ -0,0 +1,22 @@
+# Generated by Django 4.2.29 on 2026-10-18 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0003_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detallesolicitudensayo',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='detallesolicitudensayo',
+            index=models.Index(fields=['actualizado_en'], name='proyectos_d_actuali_578a47_idx'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from collections import defaultdict
+
 from django.db import models
 import uuid
 import qrcode
@@ -15,6 +17,8 @@ from reportlab.lib.pagesizes import letter
 from django.db import transaction
 from django.core.validators import MinValueValidator
 from clientes.models import Cliente
+from core.correlativos import reservar_codigos, siguiente_codigo
+from core.transacciones import acumular_al_confirmar
 from trabajadores.models import TrabajadorProfile 
 from servicios.models import Cotizacion, CotizacionDetalle, Servicio, CategoriaServicio, Subcategoria
 import os
@@ -41,6 +45,14 @@ class Proyecto(models.Model):
         ('CANCELADO', 'Cancelado'),
     ]
 
+    ETAPAS_OPERATIVAS = [
+        ('PENDIENTE_MUESTRAS', 'Pendiente de muestras'),
+        ('MUESTRAS_REGISTRADAS', 'Muestras registradas'),
+        ('ENSAYOS_EN_PROCESO', 'Ensayos en proceso'),
+        ('PENDIENTE_INFORME', 'Pendiente de informe'),
+        ('INFORME_EMITIDO', 'Informe emitido'),
+    ]
+
     cotizacion = models.ForeignKey(
         Cotizacion, 
         on_delete=models.SET_NULL, 
@@ -65,6 +77,14 @@ class Proyecto(models.Model):
     fecha_inicio = models.DateField(default=timezone.now, verbose_name="Fecha de Inicio Real")
     fecha_entrega_estimada = models.DateField(blank=True, null=True, verbose_name="Fecha de Entrega Estimada")
     estado = models.CharField(max_length=20, choices=ESTADOS_PROYECTO, default='PENDIENTE', verbose_name="Estado del Proyecto")
+    # Se mantiene desde proyectos.signals a partir de muestras, solicitudes e informes
+    etapa_operativa = models.CharField(
+        max_length=30,
+        choices=ETAPAS_OPERATIVAS,
+        default='PENDIENTE_MUESTRAS',
+        db_index=True,
+        verbose_name="Etapa Operativa"
+    )
     
     numero_muestras = models.PositiveIntegerField(default=0, verbose_name="Número Total de Muestras (Según Cotización)")
     numero_muestras_registradas = models.PositiveIntegerField(default=0, verbose_name="Número de Muestras con Resultados Finales")
@@ -72,6 +92,10 @@ class Proyecto(models.Model):
     creado_en = models.DateTimeField(auto_now_add=True)
     modificado_en = models.DateTimeField(auto_now=True)
     
+    @property
+    def etapa_operativa_label(self):
+        return self.get_etapa_operativa_display()
+
     @property
     def muestras_registradas_reales(self):
         return self.muestras.count()
@@ -126,6 +150,9 @@ class Proyecto(models.Model):
         verbose_name = "Proyecto"
         verbose_name_plural = "Proyectos"
         ordering = ['-fecha_inicio']
+        indexes = [
+            models.Index(fields=['creado_en', 'id']),
+        ]
         
 class TipoMuestra(models.Model):
     nombre = models.CharField(max_length=100)
@@ -156,7 +183,12 @@ class RecepcionMuestra(models.Model):
     fecha_ensayo_programado = models.DateField(null=True, blank=True)
     
     responsable_recepcion = models.ForeignKey(User, on_delete=models.PROTECT)
-    
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['fecha_recepcion', 'id']),
+        ]
+
 class MuestraDetalle(models.Model):
     recepcion = models.ForeignKey(RecepcionMuestra, related_name='muestras', on_delete=models.CASCADE)
     tipo_muestra = models.ForeignKey(TipoMuestra, on_delete=models.PROTECT)
@@ -170,36 +202,79 @@ class MuestraDetalle(models.Model):
 
     codigo_laboratorio = models.CharField(max_length=50, unique=True, blank=True)
 
-    def generar_codigo_laboratorio(self):
-        anio = timezone.now().year
-        sigla = self.tipo_muestra.sigla.upper()
-        prefijo = f"V-M-{anio}-{sigla}-"
+    @staticmethod
+    def prefijo_laboratorio(sigla):
+        return f"V-M-{timezone.now().year}-{sigla.upper()}-"
 
-        ultimo = MuestraDetalle.objects.filter(
-            codigo_laboratorio__startswith=prefijo
-        ).order_by('codigo_laboratorio').last()
+    def generar_codigo_laboratorio(self):
+        return siguiente_codigo(
+            self.prefijo_laboratorio(self.tipo_muestra.sigla),
+            MuestraDetalle.objects.all(),
+            'codigo_laboratorio',
+        )
+
+    @classmethod
+    def crear_en_lote(cls, muestras):
+        """
+        Guarda muestras nuevas con un INSERT en bloque. Los códigos de
+        laboratorio se reservan como un bloque contiguo por sigla, así el
+        costo no depende del número de muestras.
+        """
+        if not muestras:
+            return []
+
+        with transaction.atomic():
+            pendientes = [muestra for muestra in muestras if not muestra.codigo_laboratorio]
+            siglas = dict(TipoMuestra.objects.filter(
+                pk__in={int(muestra.tipo_muestra_id) for muestra in pendientes}
+            ).values_list('pk', 'sigla'))
+
+            por_prefijo = defaultdict(list)
+            for muestra in pendientes:
+                sigla = siglas.get(int(muestra.tipo_muestra_id))
+                if sigla is None:
+                    raise TipoMuestra.DoesNotExist(f"No existe el tipo de muestra con id {muestra.tipo_muestra_id}.")
+                por_prefijo[cls.prefijo_laboratorio(sigla)].append(muestra)
+
+            for prefijo, grupo in por_prefijo.items():
+                codigos = reservar_codigos(prefijo, len(grupo), cls.objects.all(), 'codigo_laboratorio')
+                for muestra, codigo in zip(grupo, codigos):
+                    muestra.codigo_laboratorio = codigo
+
+            creadas = cls.objects.bulk_create(muestras)
+            cls._programar_por_recepciones({muestra.recepcion_id for muestra in creadas})
+
+        return creadas
+
+    @staticmethod
+    def _programar_por_recepciones(recepcion_ids):
+        """
+        bulk_create no emite post_save: programa lo que harían los receptores
+        de una muestra nueva (etapa del proyecto e indicadores diarios), una
+        vez por recepción.
+        """
+        # Ambos módulos importan este.
+        from core.indicadores import programar_recalculo, programar_recalculo_cobertura
+        from .signals import _actualizar_por_cotizacion
 
-        if ultimo and ultimo.codigo_laboratorio:
-            ultimo_nro = int(ultimo.codigo_laboratorio.split('-')[-1]) + 1
-        else:
-            ultimo_nro = 1
+        recepciones = list(
+            RecepcionMuestra.objects.filter(pk__in=recepcion_ids).values_list('fecha_recepcion', 'cotizacion_id')
+        )
+        fechas = {fecha for fecha, _ in recepciones}
+        cotizacion_ids = {cotizacion_id for _, cotizacion_id in recepciones if cotizacion_id}
 
-        return f"{prefijo}{ultimo_nro:04d}"
+        acumular_al_confirmar(_actualizar_por_cotizacion, *cotizacion_ids)
+        programar_recalculo('muestras', *fechas)
+        programar_recalculo_cobertura(*cotizacion_ids)
 
     def save(self, *args, **kwargs):
         if self.codigo_laboratorio:
             return super().save(*args, **kwargs)
 
-        for _ in range(10):
+        with transaction.atomic():
             self.codigo_laboratorio = self.generar_codigo_laboratorio()
-            try:
-                with transaction.atomic():
-                    return super().save(*args, **kwargs)
-            except IntegrityError:
-                self.codigo_laboratorio = None
+            return super().save(*args, **kwargs)
 
-        raise IntegrityError("No se pudo generar un código_laboratorio único después de varios intentos.")
-              
 class SolicitudEnsayo(models.Model):
     """
     Cabecera del registro VCF-LAB-FOR-068.
@@ -257,6 +332,9 @@ class SolicitudEnsayo(models.Model):
         verbose_name = "Solicitud de Ensayo"
         verbose_name_plural = "Solicitudes de Ensayo"
         ordering = ['-fecha_solicitud']
+        indexes = [
+            models.Index(fields=['fecha_solicitud', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.codigo_solicitud} - {self.cotizacion.cliente.razon_social}"
@@ -306,9 +384,14 @@ class DetalleSolicitudEnsayo(models.Model):
     
     observaciones = models.TextField(blank=True, null=True, verbose_name="Observaciones")
 
+    actualizado_en = models.DateTimeField(auto_now=True)
+
     class Meta:
         verbose_name = "Detalle de Solicitud"
         verbose_name_plural = "Detalles de Solicitudes"
+        indexes = [
+            models.Index(fields=['actualizado_en']),
+        ]
 
     def __str__(self):
         return f"{self.muestra.codigo_laboratorio} - {self.descripcion_ensayo}"
@@ -405,17 +488,23 @@ class InformeFinal(models.Model):
     class Meta:
         verbose_name = "Informe Final"
         verbose_name_plural = "Informes Finales"
+        indexes = [
+            models.Index(fields=['fecha_emision', 'id']),
+        ]
 
     def save(self, *args, **kwargs):
-        if not self.codigo_informe:
-            anio = now().year
-            ultimo = InformeFinal.objects.filter(fecha_emision__year=anio).count()
-            self.codigo_informe = f"INF-{anio}-{(ultimo + 1):04d}"
-        
-        if not self.qr_code:
-            self.generar_qr_validacion()
-            
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            if not self.codigo_informe:
+                self.codigo_informe = siguiente_codigo(
+                    f"INF-{now().year}-",
+                    InformeFinal.objects.all(),
+                    'codigo_informe',
+                )
+
+            if not self.qr_code:
+                self.generar_qr_validacion()
+
+            super().save(*args, **kwargs)
 
     def generar_qr_validacion(self):
         from django.conf import settings
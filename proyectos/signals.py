@@ -0,0 +1,82 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from core.tiempo_real import publicar
+from core.transacciones import acumular_al_confirmar
+from servicios.models import Cotizacion
+from .etapas import actualizar_etapas_operativas, calcular_etapas_operativas, etapas_operativas_actualizadas
+from .models import Proyecto, RecepcionMuestra, MuestraDetalle, SolicitudEnsayo, InformeFinal
+
+
+def _actualizar_por_cotizacion(cotizacion_ids):
+    actualizar_etapas_operativas(cotizacion_ids=cotizacion_ids)
+
+
+def _actualizar_por_proyecto(proyecto_ids):
+    actualizar_etapas_operativas(proyecto_ids=proyecto_ids)
+
+
+# Un NOTIFY de PostgreSQL admite hasta 8000 bytes; con más proyectos el
+# aviso va sin ids y la página los trata como si fueran todos.
+AVISO_MAXIMO_PROYECTOS = 200
+
+
+def _avisar_proyectos(proyecto_ids):
+    ids = sorted(proyecto_ids) if len(proyecto_ids) <= AVISO_MAXIMO_PROYECTOS else None
+    publicar('proyectos', {'proyectos': ids})
+
+
+@receiver(pre_save, sender=Proyecto)
+def etapa_proyecto_antes_de_guardar(sender, instance, **kwargs):
+    if not instance._state.adding:
+        cotizacion_anterior = Proyecto.objects.filter(pk=instance.pk).values_list('cotizacion_id', flat=True).first()
+        if cotizacion_anterior == instance.cotizacion_id:
+            return
+
+    etapas = calcular_etapas_operativas([instance.cotizacion_id])
+    instance.etapa_operativa = etapas.get(instance.cotizacion_id, 'PENDIENTE_MUESTRAS')
+
+
+@receiver(post_save, sender=MuestraDetalle)
+@receiver(post_delete, sender=MuestraDetalle)
+def etapa_por_muestra(sender, instance, **kwargs):
+    cotizacion_id = RecepcionMuestra.objects.filter(pk=instance.recepcion_id).values_list(
+        'cotizacion_id', flat=True
+    ).first()
+    if cotizacion_id:
+        acumular_al_confirmar(_actualizar_por_cotizacion, cotizacion_id)
+
+
+@receiver(post_save, sender=SolicitudEnsayo)
+@receiver(post_delete, sender=SolicitudEnsayo)
+def etapa_por_solicitud(sender, instance, **kwargs):
+    acumular_al_confirmar(_actualizar_por_cotizacion, instance.cotizacion_id)
+
+
+@receiver(post_save, sender=InformeFinal)
+@receiver(post_delete, sender=InformeFinal)
+def etapa_por_informe(sender, instance, **kwargs):
+    cotizacion_id = SolicitudEnsayo.objects.filter(pk=instance.solicitud_id).values_list(
+        'cotizacion_id', flat=True
+    ).first()
+    if cotizacion_id:
+        acumular_al_confirmar(_actualizar_por_cotizacion, cotizacion_id)
+
+
+@receiver(pre_delete, sender=Cotizacion)
+def etapa_por_cotizacion_eliminada(sender, instance, **kwargs):
+    proyecto_ids = list(Proyecto.objects.filter(cotizacion=instance).values_list('id', flat=True))
+    acumular_al_confirmar(_actualizar_por_proyecto, *proyecto_ids)
+
+
+# El panel de proyectos abierto recibe un aviso en vivo de los proyectos
+# nuevos, editados o que cambiaron de etapa.
+@receiver(post_save, sender=Proyecto)
+@receiver(post_delete, sender=Proyecto)
+def proyecto_en_vivo(sender, instance, **kwargs):
+    acumular_al_confirmar(_avisar_proyectos, instance.pk)
+
+
+@receiver(etapas_operativas_actualizadas)
+def etapas_en_vivo(sender, proyectos, **kwargs):
+    acumular_al_confirmar(_avisar_proyectos, *[proyecto_id for proyecto_id, _ in proyectos])
@@ -1,3 +1,159 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from clientes.models import Cliente
+from core.models import IndicadorDiario
+from servicios.models import Cotizacion
+from .models import Proyecto, RecepcionMuestra, MuestraDetalle, TipoMuestra
+
+
+class ListaProyectosPendientesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@vicaf.pe', 'clave')
+        cls.cliente = Cliente.objects.create(
+            ruc='20123456789',
+            razon_social='Cliente de Prueba SAC',
+            persona_contacto='Contacto',
+            celular_contacto='999999999',
+            correo_contacto='contacto@cliente.pe',
+        )
+        cls.tipo_muestra = TipoMuestra.objects.create(nombre='Suelo', sigla='SU')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def crear_proyectos(self, cantidad, con_muestras=False):
+        inicio = Proyecto.objects.count()
+        # La etapa se recalcula al confirmar la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(inicio, inicio + cantidad):
+                cotizacion = Cotizacion.objects.create(
+                    cliente=self.cliente,
+                    numero_oferta=f'VCF-OTE-2026-{i:03d}',
+                    asunto_servicio='Ensayos',
+                    persona_contacto='Contacto',
+                    correo_contacto='contacto@cliente.pe',
+                    telefono_contacto='999999999',
+                    tasa_igv=Decimal('0.18'),
+                )
+                Proyecto.objects.create(
+                    cotizacion=cotizacion,
+                    cliente=self.cliente,
+                    nombre_proyecto=f'Proyecto {i}',
+                    codigo_proyecto=f'PRY-{i:04d}',
+                )
+                if con_muestras:
+                    recepcion = RecepcionMuestra.objects.create(
+                        cotizacion=cotizacion,
+                        procedencia='Obra',
+                        responsable_cliente='Contacto',
+                        telefono='999999999',
+                        responsable_recepcion=self.usuario,
+                    )
+                    MuestraDetalle.objects.create(
+                        recepcion=recepcion,
+                        tipo_muestra=self.tipo_muestra,
+                        descripcion='Muestra',
+                        masa_aprox=Decimal('1.00'),
+                    )
+
+    def contar_consultas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(reverse('proyectos:lista_proyectos_pendientes'))
+        self.assertEqual(respuesta.status_code, 200)
+        return len(consultas)
+
+    def test_consultas_constantes_sin_importar_cantidad_de_proyectos(self):
+        self.crear_proyectos(3, con_muestras=True)
+        consultas_pocos = self.contar_consultas()
+
+        self.crear_proyectos(30, con_muestras=True)
+        self.crear_proyectos(10)
+        consultas_muchos = self.contar_consultas()
+
+        self.assertEqual(consultas_pocos, consultas_muchos)
+
+    def test_etapa_operativa_se_actualiza_con_las_muestras(self):
+        self.crear_proyectos(1, con_muestras=True)
+        self.crear_proyectos(1)
+
+        respuesta = self.client.get(
+            reverse('proyectos:lista_proyectos_pendientes'),
+            {'etapa': 'MUESTRAS_REGISTRADAS'},
+        )
+
+        proyectos = list(respuesta.context['proyectos_pendientes'])
+        self.assertEqual([p.codigo_proyecto for p in proyectos], ['PRY-0000'])
+        self.assertEqual(proyectos[0].etapa_operativa_label, 'Muestras registradas')
+
+    def test_exportar_respeta_los_filtros_de_la_lista(self):
+        self.crear_proyectos(2, con_muestras=True)
+        self.crear_proyectos(3)
+
+        respuesta = self.client.get(reverse('proyectos:exportar_proyectos'), {'etapa': 'MUESTRAS_REGISTRADAS'})
+        contenido = b''.join(respuesta.streaming_content).decode('utf-8')
+
+        self.assertTrue(contenido.startswith('\ufeffCódigo,Proyecto,Cliente,'))
+        filas = contenido.strip().splitlines()[1:]
+        self.assertEqual(sorted(fila.split(',')[0] for fila in filas), ['PRY-0000', 'PRY-0001'])
+
+    def test_recepcion_en_lote_actualiza_etapa_e_indicador_diario(self):
+        self.crear_proyectos(2)
+        proyectos = list(Proyecto.objects.order_by('codigo_proyecto'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recepciones = [
+                RecepcionMuestra.objects.create(
+                    cotizacion=proyecto.cotizacion,
+                    procedencia='Obra',
+                    responsable_cliente='Contacto',
+                    telefono='999999999',
+                    responsable_recepcion=self.usuario,
+                )
+                for proyecto in proyectos
+            ]
+
+        # Las muestras llegan después, en su propia transacción y sin post_save.
+        with self.captureOnCommitCallbacks(execute=True):
+            MuestraDetalle.crear_en_lote([
+                MuestraDetalle(
+                    recepcion=recepcion,
+                    tipo_muestra=self.tipo_muestra,
+                    descripcion=f'Muestra {n}',
+                    masa_aprox=Decimal('1.00'),
+                )
+                for recepcion, cantidad in zip(recepciones, (3, 2))
+                for n in range(cantidad)
+            ])
+
+        self.assertEqual(
+            [p.etapa_operativa for p in Proyecto.objects.order_by('codigo_proyecto')],
+            ['MUESTRAS_REGISTRADAS', 'MUESTRAS_REGISTRADAS'],
+        )
+        muestras_hoy = IndicadorDiario.objects.filter(indicador='muestras', fecha=timezone.localdate())
+        self.assertEqual(sum(muestras_hoy.values_list('valor', flat=True)), 5)
+
+    def test_fechas_invalidas_en_los_filtros_se_ignoran(self):
+        self.crear_proyectos(2, con_muestras=True)
+
+        for nombre in ('proyectos:exportar_proyectos', 'proyectos:exportar_muestras', 'proyectos:exportar_ensayos'):
+            for fechas in ({'fecha_inicio': 'x', 'fecha_fin': 'y'}, {'fecha_inicio': '2026-02-30', 'fecha_fin': '2026-03-01'}):
+                with self.subTest(nombre=nombre, **fechas):
+                    respuesta = self.client.get(reverse(nombre), fechas)
+                    self.assertEqual(respuesta.status_code, 200)
+                    b''.join(respuesta.streaming_content)
+
+        respuesta = self.client.get(reverse('proyectos:exportar_proyectos'), {'fecha_inicio': 'x', 'fecha_fin': 'y'})
+        contenido = b''.join(respuesta.streaming_content).decode('utf-8')
+        self.assertEqual(len(contenido.strip().splitlines()) - 1, 2)
 
-# Create your tests here.
+        respuesta = self.client.get(reverse('proyectos:lista_proyectos_pendientes'), {'fecha_inicio': 'x', 'fecha_fin': 'y'})
+        self.assertEqual(len(respuesta.context['proyectos_pendientes']), 2)
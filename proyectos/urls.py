@@ -7,11 +7,13 @@ app_name = 'proyectos'
 urlpatterns = [
     # --- PROYECTOS Y API ---
     path('pendientes/', views.lista_proyectos_pendientes, name='lista_proyectos_pendientes'),
+    path('pendientes/exportar/', views.exportar_proyectos_csv, name='exportar_proyectos'),
     path('api/cotizacion-detalles/<int:cotizacion_id>/', views.api_obtener_detalles_cotizacion, name='api_cotizacion_detalles'),
     path('tipo-muestra/crear-ajax/', views.crear_tipo_muestra_ajax, name='crear_tipo_muestra_ajax'),
 
     # --- RECEPCIÓN DE MUESTRAS ---
     path('recepciones/', views.RecepcionMuestraListView.as_view(), name='lista_recepciones'),
+    path('muestras/exportar/', views.exportar_muestras_csv, name='exportar_muestras'),
     path('recepcion/nueva/', views.gestionar_recepcion_muestra, name='crear_recepcion'),
     path('recepcion/nueva/<int:proyecto_id>/', views.gestionar_recepcion_muestra, name='crear_recepcion_desde_proyecto'),
     path('recepcion/editar/<int:pk>/', views.gestionar_recepcion_muestra, name='editar_recepcion'),
@@ -21,6 +23,7 @@ urlpatterns = [
 
     # --- SOLICITUDES DE ENSAYO ---
     path('solicitudes/', views.lista_solicitudes, name='lista_solicitudes'),
+    path('solicitudes/exportar/', views.exportar_ensayos_csv, name='exportar_ensayos'),
     path('ensayo/nuevo/', views.gestionar_solicitud_ensayo, name='crear_solicitud'),
     path('ensayo/editar/<int:pk>/', views.gestionar_solicitud_ensayo, name='editar_solicitud'),
     path('ensayo/<int:solicitud_id>/pdf/', views.generar_pdf_ensayo, name='generar_pdf_ensayo'),
@@ -1,6 +1,7 @@
 from django.views.generic import ListView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from datetime import datetime
+import hashlib
 import json
 import io
 import logging
@@ -9,16 +10,21 @@ from urllib.parse import quote
 from decimal import Decimal, InvalidOperation
 
 from django.db import IntegrityError, transaction
-from django.db.models import Q, Max, Exists, OuterRef
-from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, Http404, FileResponse
+from django.db.models import Q, Exists, OuterRef
+from django.http import JsonResponse, HttpResponseForbidden, Http404, FileResponse
 from django.template.loader import render_to_string, get_template
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.contrib import messages
 from django.utils import timezone
 from django.views.decorators.http import require_POST
 
+from core.busqueda import filtrar_busqueda
+from core.correlativos import siguiente_codigo
+from core.exportacion import FILAS_POR_BLOQUE, fechas_filtro, respuesta_csv
+from core.indicadores import programar_recalculo
+from core.paginacion import paginar
+from core.pdf import solicitar_pdf
 from trabajadores.permissions import permiso_requerido, trabajador_tiene_permiso
 from .utils import enviar_whatsapp_pdf
 
@@ -44,7 +50,6 @@ from servicios.models import (
 )
 
 from trabajadores.models import TrabajadorProfile
-from weasyprint import HTML
 
 
 logger = logging.getLogger(__name__)
@@ -87,66 +92,87 @@ def generar_codigo_vicaf(servicio_obj):
     return f"{prefijo}-{anio}-{numero:03d}"
 
 
-@login_required
-@permiso_requerido('proyectos.ver')
-def lista_proyectos_pendientes(request):
-    proyectos_qs = Proyecto.objects.select_related('cliente', 'cotizacion').filter(
-        ~Q(estado__in=['FINALIZADO', 'CANCELADO'])
-    )
+def _proyectos_pendientes(request):
+    """
+    Proyectos en curso con los filtros de la lista: search (o q), etapa,
+    estado y fecha_inicio/fecha_fin sobre la fecha de inicio.
+    """
+    proyectos = Proyecto.objects.filter(~Q(estado__in=['FINALIZADO', 'CANCELADO']))
 
-    search_query = request.GET.get('search', '')
+    busqueda = request.GET.get('search') or request.GET.get('q', '')
+    if busqueda:
+        proyectos = filtrar_busqueda(proyectos, 'proyecto', busqueda)
 
-    if search_query:
-        proyectos_qs = proyectos_qs.filter(
-            Q(nombre_proyecto__icontains=search_query) |
-            Q(codigo_proyecto__icontains=search_query) |
-            Q(cliente__razon_social__icontains=search_query)
-        )
+    etapa_filtro = request.GET.get('etapa', '')
+    if etapa_filtro in dict(Proyecto.ETAPAS_OPERATIVAS):
+        proyectos = proyectos.filter(etapa_operativa=etapa_filtro)
 
-    proyectos_list = proyectos_qs.order_by('-creado_en')
+    estado_filtro = request.GET.get('estado')
+    if estado_filtro:
+        proyectos = proyectos.filter(estado=estado_filtro)
 
-    for proyecto in proyectos_list:
-        proyecto.etapa_operativa = 'PENDIENTE_MUESTRAS'
-        proyecto.etapa_operativa_label = 'Pendiente de muestras'
+    fecha_inicio, fecha_fin = fechas_filtro(request)
+    if fecha_inicio and fecha_fin:
+        proyectos = proyectos.filter(fecha_inicio__range=[fecha_inicio, fecha_fin])
 
-        if proyecto.cotizacion:
-            tiene_muestras = MuestraDetalle.objects.filter(
-                recepcion__cotizacion=proyecto.cotizacion
-            ).exists()
+    return proyectos.order_by('-creado_en', '-id')
 
-            if tiene_muestras:
-                proyecto.etapa_operativa = 'MUESTRAS_REGISTRADAS'
-                proyecto.etapa_operativa_label = 'Muestras registradas'
 
-                solicitud = SolicitudEnsayo.objects.filter(
-                    cotizacion=proyecto.cotizacion
-                ).order_by('-id').first()
+@login_required
+@permiso_requerido('proyectos.ver')
+def lista_proyectos_pendientes(request):
+    # La etapa se lee de la columna guardada: la página completa cuesta
+    # un conteo y una consulta, sin importar cuántos proyectos haya.
+    proyectos_list = _proyectos_pendientes(request).select_related('cliente')
 
-                if solicitud:
-                    if solicitud.estado in ['pendiente', 'proceso']:
-                        proyecto.etapa_operativa = 'ENSAYOS_EN_PROCESO'
-                        proyecto.etapa_operativa_label = 'Ensayos en proceso'
-                    elif solicitud.estado == 'finalizado':
-                        informe = InformeFinal.objects.filter(solicitud=solicitud).first()
-                        if informe:
-                            proyecto.etapa_operativa = 'INFORME_EMITIDO'
-                            proyecto.etapa_operativa_label = 'Informe emitido'
-                        else:
-                            proyecto.etapa_operativa = 'PENDIENTE_INFORME'
-                            proyecto.etapa_operativa_label = 'Pendiente de informe'
-
-    paginator = Paginator(proyectos_list, 10)
-    proyectos_paginados = paginator.get_page(request.GET.get('page'))
+    search_query = request.GET.get('search', '')
+
+    etapa_filtro = request.GET.get('etapa', '')
+    if etapa_filtro not in dict(Proyecto.ETAPAS_OPERATIVAS):
+        etapa_filtro = ''
+
+    proyectos_paginados = paginar(request, proyectos_list, 10, contar_total=True)
 
     context = {
         'proyectos_pendientes': proyectos_paginados,
         'search_query': search_query,
+        'etapa_filtro': etapa_filtro,
+        'etapas_operativas': Proyecto.ETAPAS_OPERATIVAS,
         'titulo_lista': 'Panel de Control de Proyectos',
     }
 
     return render(request, 'proyectos/lista_proyectos_pendientes.html', context)
 
 
+@login_required
+@permiso_requerido('proyectos.ver')
+def exportar_proyectos_csv(request):
+    estados = dict(Proyecto.ESTADOS_PROYECTO)
+    etapas = dict(Proyecto.ETAPAS_OPERATIVAS)
+
+    filas = (
+        (codigo, nombre, cliente, cotizacion, estados.get(estado, estado), etapas.get(etapa, etapa), *resto)
+        for codigo, nombre, cliente, cotizacion, estado, etapa, *resto in _proyectos_pendientes(request).values_list(
+            'codigo_proyecto',
+            'nombre_proyecto',
+            'cliente__razon_social',
+            'cotizacion__numero_oferta',
+            'estado',
+            'etapa_operativa',
+            'fecha_inicio',
+            'fecha_entrega_estimada',
+            'numero_muestras',
+            'monto_cotizacion',
+        ).iterator(chunk_size=FILAS_POR_BLOQUE)
+    )
+
+    return respuesta_csv(
+        f"proyectos_{timezone.localdate():%Y%m%d}.csv",
+        ['Código', 'Proyecto', 'Cliente', 'Cotización', 'Estado', 'Etapa', 'Inicio', 'Entrega estimada', 'Muestras', 'Monto'],
+        filas,
+    )
+
+
 @require_POST
 @login_required
 @permiso_requerido('muestras.crear')
@@ -256,6 +282,7 @@ def gestionar_recepcion_muestra(request, proyecto_id=None, pk=None):
                 observaciones_list = request.POST.getlist('observaciones[]')
 
                 muestras_a_crear = []
+                muestras_previas = recepcion.muestras.count() if is_editing else 0
 
                 for i in range(len(tipos_ids)):
                     if tipos_ids[i]:
@@ -277,7 +304,7 @@ def gestionar_recepcion_muestra(request, proyecto_id=None, pk=None):
                         muestra = MuestraDetalle(
                             recepcion=recepcion,
                             tipo_muestra_id=tipos_ids[i],
-                            nro_item=recepcion.muestras.count() + i + 1,
+                            nro_item=muestras_previas + i + 1,
                             descripcion=descripciones[i][:255] if i < len(descripciones) else '',
                             masa_aprox=masa_val,
                             cantidad=cant_val,
@@ -287,8 +314,7 @@ def gestionar_recepcion_muestra(request, proyecto_id=None, pk=None):
 
                         muestras_a_crear.append(muestra)
 
-                for m in muestras_a_crear:
-                    m.save()
+                MuestraDetalle.crear_en_lote(muestras_a_crear)
 
                 action_text = "agregadas" if is_editing else "registradas"
 
@@ -383,7 +409,7 @@ class RecepcionMuestraListView(LoginRequiredMixin, ListView):
     model = RecepcionMuestra
     template_name = 'proyectos/lista_general_recepciones.html'
     context_object_name = 'recepciones'
-    paginate_by = 20
+    por_pagina = 20
 
     def dispatch(self, request, *args, **kwargs):
         if not trabajador_tiene_permiso(request.user, 'muestras.ver'):
@@ -394,31 +420,94 @@ class RecepcionMuestraListView(LoginRequiredMixin, ListView):
         queryset = RecepcionMuestra.objects.select_related(
             'cotizacion__cliente',
             'responsable_recepcion'
-        ).prefetch_related('muestras').order_by('-fecha_recepcion')
+        ).prefetch_related('muestras').order_by('-fecha_recepcion', '-id')
 
         query = self.request.GET.get('q')
 
         if query:
             queryset = queryset.filter(
-                Q(cotizacion__cliente__nombre__icontains=query) |
+                Q(cotizacion__cliente__razon_social__icontains=query) |
                 Q(id__icontains=query) |
                 Q(procedencia__icontains=query)
             )
 
         return queryset
 
+    def get_context_data(self, **kwargs):
+        pagina = paginar(self.request, self.object_list, self.por_pagina)
+        return super().get_context_data(object_list=pagina, **kwargs)
+
 
 @login_required
 @permiso_requerido('muestras.ver')
-def generar_pdf_recepcion(request, recepcion_id):
-    recepcion = get_object_or_404(
-        RecepcionMuestra.objects.select_related(
-            'cotizacion__cliente',
-            'responsable_recepcion'
-        ).prefetch_related('muestras__tipo_muestra'),
-        id=recepcion_id
+def exportar_muestras_csv(request):
+    """ Exporta las muestras registradas filtradas por q y fecha_inicio/fecha_fin de recepción. """
+    muestras = MuestraDetalle.objects.all()
+
+    q = request.GET.get('q', '').strip()
+    if q:
+        muestras = muestras.filter(
+            Q(codigo_laboratorio__icontains=q) |
+            Q(descripcion__icontains=q) |
+            Q(recepcion__procedencia__icontains=q) |
+            Q(recepcion__cotizacion__numero_oferta__icontains=q) |
+            Q(recepcion__cotizacion__cliente__razon_social__icontains=q)
+        )
+
+    fecha_inicio, fecha_fin = fechas_filtro(request)
+    if fecha_inicio and fecha_fin:
+        muestras = muestras.filter(recepcion__fecha_recepcion__date__range=[fecha_inicio, fecha_fin])
+
+    filas = muestras.order_by('-recepcion__fecha_recepcion', '-recepcion_id', 'id').values_list(
+        'codigo_laboratorio',
+        'recepcion_id',
+        'recepcion__fecha_recepcion',
+        'recepcion__cotizacion__numero_oferta',
+        'recepcion__cotizacion__cliente__razon_social',
+        'recepcion__procedencia',
+        'tipo_muestra__nombre',
+        'descripcion',
+        'masa_aprox',
+        'cantidad',
+        'unidad_medida__nombre',
+        'observaciones',
+    ).iterator(chunk_size=FILAS_POR_BLOQUE)
+
+    return respuesta_csv(
+        f"muestras_{timezone.localdate():%Y%m%d}.csv",
+        ['Código laboratorio', 'Recepción', 'Fecha recepción', 'Cotización', 'Cliente', 'Procedencia',
+         'Tipo de muestra', 'Descripción', 'Masa aprox.', 'Cantidad', 'Unidad', 'Observaciones'],
+        filas,
     )
 
+
+def huella_pdf_recepcion(recepcion, user):
+    muestras = list(
+        recepcion.muestras.order_by('id').values_list(
+            'id', 'codigo_laboratorio', 'tipo_muestra_id', 'descripcion',
+            'masa_aprox', 'cantidad', 'unidad_medida_id', 'observaciones'
+        )
+    )
+    firma = repr((
+        recepcion.pk,
+        recepcion.procedencia,
+        recepcion.responsable_cliente,
+        recepcion.telefono,
+        recepcion.fecha_recepcion,
+        recepcion.fecha_muestreo,
+        recepcion.responsable_recepcion_id,
+        user.pk,
+        muestras,
+    ))
+    return hashlib.sha1(firma.encode('utf-8')).hexdigest()
+
+
+def construir_html_pdf_recepcion(recepcion_id, base_url, user):
+    recepcion = RecepcionMuestra.objects.select_related(
+        'cotizacion__cliente',
+        'responsable_recepcion'
+    ).prefetch_related('muestras__tipo_muestra').get(id=recepcion_id)
+
     proyecto = Proyecto.objects.filter(cotizacion=recepcion.cotizacion).first()
 
     context = {
@@ -426,17 +515,24 @@ def generar_pdf_recepcion(request, recepcion_id):
         'muestras': recepcion.muestras.all(),
         'proyecto': proyecto,
         'cliente': recepcion.cotizacion.cliente,
-        'user': request.user,
+        'user': user,
     }
 
-    html_string = render_to_string('proyectos/muestras_pdf.html', context)
-    html = HTML(string=html_string, base_url=request.build_absolute_uri('/'))
-    pdf_file = html.write_pdf()
+    return render_to_string('proyectos/muestras_pdf.html', context)
 
-    response = HttpResponse(pdf_file, content_type='application/pdf')
-    response['Content-Disposition'] = f'inline; filename="Cargo_Recepcion_{recepcion.id}.pdf"'
 
-    return response
+@login_required
+@permiso_requerido('muestras.ver')
+def generar_pdf_recepcion(request, recepcion_id):
+    recepcion = get_object_or_404(RecepcionMuestra, id=recepcion_id)
+
+    return solicitar_pdf(
+        request,
+        'recepcion',
+        recepcion.pk,
+        huella_pdf_recepcion(recepcion, request.user),
+        f"Cargo_Recepcion_{recepcion.id}.pdf",
+    )
 
 
 def limpiar_numero_whatsapp(numero: str) -> str:
@@ -681,22 +777,13 @@ def gestionar_solicitud_ensayo(request, pk=None):
                     cotizacion = get_object_or_404(Cotizacion, pk=cotizacion_id)
                     year_part = str(timezone.now().year)
                     cot_num = cotizacion.numero_oferta.split('-')[-1] if cotizacion.numero_oferta else '000'
-                    prefix_sol = f'SOL-{cot_num}-{year_part}'
-
-                    max_result = SolicitudEnsayo.objects.filter(
-                        codigo_solicitud__startswith=f'{prefix_sol}-'
-                    ).aggregate(Max('codigo_solicitud'))
-
-                    last_num_sol = max_result.get('codigo_solicitud__max')
-                    next_order_num = 1
-
-                    if last_num_sol:
-                        try:
-                            next_order_num = int(last_num_sol.split('-')[-1]) + 1
-                        except (IndexError, ValueError):
-                            next_order_num = 1
 
-                    codigo_solicitud = f'{prefix_sol}-{str(next_order_num).zfill(3)}'
+                    codigo_solicitud = siguiente_codigo(
+                        f'SOL-{cot_num}-{year_part}-',
+                        SolicitudEnsayo.objects.all(),
+                        'codigo_solicitud',
+                        ancho=3,
+                    )
 
                     solicitud = SolicitudEnsayo.objects.create(
                         codigo_solicitud=codigo_solicitud,
@@ -803,6 +890,8 @@ def gestionar_solicitud_ensayo(request, pk=None):
 
                 if ensayos_list:
                     DetalleSolicitudEnsayo.objects.bulk_create(ensayos_list)
+                    # bulk_create no emite post_save
+                    programar_recalculo('ensayos', solicitud.fecha_solicitud)
 
                 inc_detalles = request.POST.getlist('incidencia_detalle[]')
                 inc_fechas = request.POST.getlist('incidencia_fecha[]')
@@ -1014,36 +1103,109 @@ def cambiar_estado_solicitud(request, pk, nuevo_estado):
     return redirect('proyectos:lista_solicitudes')
 
 
+def _filtro_solicitudes(request, prefijo=''):
+    """
+    Filtros de la lista de solicitudes (q, estado, fecha_inicio/fecha_fin)
+    como un Q; con `prefijo` se aplican a un modelo relacionado.
+    """
+    filtro = Q()
+
+    q = request.GET.get('q', '').strip()
+    if q:
+        filtro &= (
+            Q(**{f'{prefijo}codigo_solicitud__icontains': q}) |
+            Q(**{f'{prefijo}cotizacion__cliente__razon_social__icontains': q}) |
+            Q(**{f'{prefijo}cotizacion__numero_oferta__icontains': q})
+        )
+
+    estado = request.GET.get('estado')
+    if estado:
+        filtro &= Q(**{f'{prefijo}estado': estado})
+
+    fecha_inicio, fecha_fin = fechas_filtro(request)
+    if fecha_inicio and fecha_fin:
+        filtro &= Q(**{f'{prefijo}fecha_solicitud__range': [fecha_inicio, fecha_fin]})
+
+    return filtro
+
+
 @login_required
 @permiso_requerido('ensayos.ver')
 def lista_solicitudes(request):
     solicitudes = SolicitudEnsayo.objects.prefetch_related('detalles').select_related(
         'cotizacion__cliente',
         'elaborado_por'
-    ).all().order_by('-fecha_solicitud', '-id')
+    ).filter(_filtro_solicitudes(request)).order_by('-fecha_solicitud', '-id')
 
     q = request.GET.get('q', '').strip()
 
-    if q:
-        solicitudes = solicitudes.filter(
-            Q(codigo_solicitud__icontains=q) |
-            Q(cotizacion__cliente__razon_social__icontains=q) |
-            Q(cotizacion__numero_oferta__icontains=q)
-        ).distinct()
-
     return render(request, 'proyectos/ensayos_list.html', {
-        'solicitudes': solicitudes,
+        'solicitudes': paginar(request, solicitudes, 20, contar_total=True),
         'q': q
     })
 
 
 @login_required
 @permiso_requerido('ensayos.ver')
-def generar_pdf_ensayo(request, solicitud_id):
-    solicitud = get_object_or_404(
-        SolicitudEnsayo.objects.select_related('cotizacion__cliente'),
-        id=solicitud_id
+def exportar_ensayos_csv(request):
+    """ Exporta los ensayos de las solicitudes de la lista con su técnico asignado. """
+    estados = dict(SolicitudEnsayo.ESTADOS)
+
+    detalles = DetalleSolicitudEnsayo.objects.filter(
+        _filtro_solicitudes(request, prefijo='solicitud__')
+    ).order_by('-solicitud__fecha_solicitud', '-solicitud_id', 'id').values_list(
+        'solicitud__codigo_solicitud',
+        'solicitud__fecha_solicitud',
+        'solicitud__estado',
+        'solicitud__cotizacion__numero_oferta',
+        'solicitud__cotizacion__cliente__razon_social',
+        'muestra__codigo_laboratorio',
+        'descripcion_ensayo',
+        'norma',
+        'metodo',
+        'tecnico_asignado__nombre_completo',
+        'fecha_entrega_programada',
+        'fecha_entrega_real',
+        'aceptado_tecnico',
+    ).iterator(chunk_size=FILAS_POR_BLOQUE)
+    filas = (
+        (codigo, fecha, estados.get(estado, estado), *resto)
+        for codigo, fecha, estado, *resto in detalles
+    )
+
+    return respuesta_csv(
+        f"ensayos_{timezone.localdate():%Y%m%d}.csv",
+        ['Solicitud', 'Fecha solicitud', 'Estado', 'Cotización', 'Cliente', 'Muestra', 'Ensayo', 'Norma',
+         'Método', 'Técnico asignado', 'Entrega programada', 'Entrega real', 'Aceptado por técnico'],
+        filas,
+    )
+
+
+def huella_pdf_ensayo(solicitud, user):
+    detalles = list(
+        solicitud.detalles.order_by('id').values_list(
+            'id', 'muestra_id', 'servicio_cotizado_id', 'descripcion_ensayo', 'norma',
+            'metodo', 'tecnico_asignado_id', 'fecha_entrega_programada',
+            'fecha_entrega_real', 'aceptado_tecnico', 'observaciones'
+        )
     )
+    firma = repr((
+        solicitud.pk,
+        solicitud.codigo_solicitud,
+        solicitud.estado,
+        solicitud.fecha_solicitud,
+        solicitud.fecha_entrega_programada,
+        solicitud.fecha_entrega_real,
+        solicitud.elaborado_por_id,
+        solicitud.revisado_por_id,
+        user.pk,
+        detalles,
+    ))
+    return hashlib.sha1(firma.encode('utf-8')).hexdigest()
+
+
+def construir_html_pdf_ensayo(solicitud_id, base_url, user):
+    solicitud = SolicitudEnsayo.objects.select_related('cotizacion__cliente').get(id=solicitud_id)
 
     proyecto = Proyecto.objects.filter(cotizacion=solicitud.cotizacion).first()
 
@@ -1056,28 +1218,33 @@ def generar_pdf_ensayo(request, solicitud_id):
         'solicitud': solicitud,
         'proyecto': proyecto,
         'detalles': detalles,
-        'user': request.user,
+        'user': user,
     }
 
-    html_string = render_to_string('proyectos/ensayos_pdf.html', context)
-
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf_file = html.write_pdf()
+    return render_to_string('proyectos/ensayos_pdf.html', context)
 
-    response = HttpResponse(pdf_file, content_type='application/pdf')
-    filename = f"Solicitud_Ensayo_{solicitud.id}.pdf"
-    response['Content-Disposition'] = f'inline; filename="{filename}"'
 
-    return response
+@login_required
+@permiso_requerido('ensayos.ver')
+def generar_pdf_ensayo(request, solicitud_id):
+    solicitud = get_object_or_404(SolicitudEnsayo, id=solicitud_id)
+
+    return solicitar_pdf(
+        request,
+        'solicitud',
+        solicitud.pk,
+        huella_pdf_ensayo(solicitud, request.user),
+        f"Solicitud_Ensayo_{solicitud.id}.pdf",
+    )
 
 
 @login_required
 @permiso_requerido('informes.ver')
 def lista_informes_finales(request):
-    informes = InformeFinal.objects.all().order_by('-fecha_emision')
+    informes = InformeFinal.objects.all().order_by('-fecha_emision', '-id')
 
     return render(request, 'proyectos/informes_list.html', {
-        'informes': informes
+        'informes': paginar(request, informes, 20, contar_total=True)
     })
 
 
@@ -0,0 +1,317 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core.pdf import invalidar_pdfs
+from core.versiones import leer_version, subir_version
+from .models import (
+    Cotizacion,
+    PlantillaCotizacion,
+    CatalogoCondicionSeccion,
+    CatalogoCondicionItem,
+    CotizacionCondicionSeccion,
+    CotizacionCondicionItem,
+    PlantillaCondicionSeccion,
+    PlantillaCondicionItem,
+)
+from .sincronizacion import Sincronizador, clave_fila, insertar_filas
+
+
+CAMPOS_SECCION = ['catalogo_seccion', 'codigo', 'titulo', 'tipo', 'orden', 'seleccionada']
+CAMPOS_ITEM = [
+    'seccion',
+    'catalogo_item',
+    'parent',
+    'tipo_nodo',
+    'titulo',
+    'texto_base',
+    'texto_final',
+    'orden',
+    'nivel',
+    'seleccionado',
+    'es_obligatorio',
+    'editable_en_cotizacion',
+    'fue_editado',
+]
+
+SNAPSHOTS_CONDICIONES = {
+    Cotizacion: {
+        'modelo_seccion': CotizacionCondicionSeccion,
+        'modelo_item': CotizacionCondicionItem,
+        'campo_padre': 'cotizacion',
+        'seleccionada_por_defecto': True,
+        'tipo_pdf': 'cotizacion',
+    },
+    PlantillaCotizacion: {
+        'modelo_seccion': PlantillaCondicionSeccion,
+        'modelo_item': PlantillaCondicionItem,
+        'campo_padre': 'plantilla',
+        'seleccionada_por_defecto': False,
+        'tipo_pdf': None,
+    },
+}
+
+CATALOGO_CACHE_TIMEOUT = 60 * 60 * 24
+CATALOGO_VERSION_KEY = 'servicios:catalogo_condiciones:version'
+
+# Copia del catálogo serializado en memoria del proceso, como
+# (version, secciones). Mientras la versión no cambie se sirve sin leer
+# la caché compartida ni la base de datos.
+_catalogo_local = (None, None)
+
+
+def arbol_condiciones(items):
+    """
+    Arma en memoria el árbol de un conjunto de ítems de condición (catálogo
+    o snapshot) leídos con una sola consulta. Cada ítem queda con sus hijos
+    ordenados en `item.hijos` y se devuelve {seccion_id: [ítems raíz]}.
+    Los ítems cuyo padre no está en el conjunto se descartan, igual que al
+    recorrer la relación `children` desde las raíces.
+    """
+    items = list(items.order_by('orden', 'id'))
+    por_id = {item.pk: item for item in items}
+    raices = defaultdict(list)
+
+    for item in items:
+        item.hijos = []
+
+    for item in items:
+        if item.parent_id is None:
+            raices[item.seccion_id].append(item)
+        elif item.parent_id in por_id:
+            por_id[item.parent_id].hijos.append(item)
+
+    return raices
+
+
+def version_catalogo_condiciones():
+    return leer_version(CATALOGO_VERSION_KEY)
+
+
+def invalidar_catalogo_condiciones():
+    """Invalida el catálogo cacheado en todos los procesos."""
+    subir_version(CATALOGO_VERSION_KEY)
+
+
+def _serializar_item_catalogo(item):
+    return {
+        "id": item.id,
+        "titulo": item.titulo,
+        "texto_base": item.texto,
+        "texto_final": item.texto,
+        "seleccionado": item.seleccionado_por_defecto,
+        "editable_en_cotizacion": item.editable_en_cotizacion,
+        "es_obligatorio": item.es_obligatorio,
+        "tipo_nodo": item.tipo_nodo,
+        "children": [_serializar_item_catalogo(c) for c in item.hijos]
+    }
+
+
+def _serializar_catalogo():
+    secciones = CatalogoCondicionSeccion.objects.filter(activo=True).order_by('orden')
+    raices = arbol_condiciones(
+        CatalogoCondicionItem.objects.filter(seccion__activo=True, activo=True)
+    )
+
+    return [
+        {
+            "catalogo_seccion_id": seccion.id,
+            "codigo": seccion.codigo,
+            "titulo": seccion.titulo,
+            "tipo": seccion.tipo,
+            "orden": seccion.orden,
+            "seleccionada": True,
+            "items": [_serializar_item_catalogo(i) for i in raices.get(seccion.id, [])]
+        }
+        for seccion in secciones
+    ]
+
+
+def catalogo_condiciones():
+    """
+    Devuelve (version, secciones) del catálogo activo ya serializado.
+
+    Cada versión se serializa una sola vez y se guarda en la caché
+    compartida; cada proceso conserva además su propia copia. Las
+    secciones se comparten entre peticiones: no deben modificarse.
+    """
+    global _catalogo_local
+
+    version = version_catalogo_condiciones()
+    version_local, secciones = _catalogo_local
+    if version_local == version:
+        return version, secciones
+
+    clave = f'servicios:catalogo_condiciones:v{version}'
+    secciones = cache.get(clave)
+    if secciones is None:
+        secciones = _serializar_catalogo()
+        cache.set(clave, secciones, CATALOGO_CACHE_TIMEOUT)
+
+    _catalogo_local = (version, secciones)
+    return version, secciones
+
+
+def _referencias_catalogo(secciones_data):
+    """
+    Resuelve con un `in_bulk` por modelo todas las secciones e ítems del
+    catálogo citados en el árbol enviado.
+    """
+    secciones_ids = set()
+    items_ids = set()
+    pendientes = []
+
+    for seccion_data in secciones_data:
+        secciones_ids.add(clave_fila(seccion_data, 'catalogo_seccion_id'))
+        pendientes.extend(seccion_data.get('items') or [])
+
+    while pendientes:
+        item_data = pendientes.pop()
+        items_ids.add(clave_fila(item_data, 'catalogo_item_id'))
+        pendientes.extend(item_data.get('children') or [])
+
+    secciones_ids.discard(None)
+    items_ids.discard(None)
+    return (
+        CatalogoCondicionSeccion.objects.in_bulk(secciones_ids),
+        CatalogoCondicionItem.objects.in_bulk(items_ids),
+    )
+
+
+def _construir_seccion(config, padre, seccion_data, catalogo_secciones):
+    catalogo_seccion = catalogo_secciones.get(clave_fila(seccion_data, 'catalogo_seccion_id'))
+
+    return config['modelo_seccion'](
+        pk=clave_fila(seccion_data),
+        catalogo_seccion=catalogo_seccion,
+        codigo=seccion_data.get('codigo') or (catalogo_seccion.codigo if catalogo_seccion else ''),
+        titulo=seccion_data.get('titulo') or (catalogo_seccion.titulo if catalogo_seccion else ''),
+        tipo=seccion_data.get('tipo') or (catalogo_seccion.tipo if catalogo_seccion else 'lista'),
+        orden=seccion_data.get('orden') or (catalogo_seccion.orden if catalogo_seccion else 1),
+        seleccionada=bool(seccion_data.get('seleccionada', config['seleccionada_por_defecto'])),
+        **{config['campo_padre']: padre}
+    )
+
+
+def _construir_item(config, seccion, parent, item_data, catalogo_items):
+    catalogo_item = catalogo_items.get(clave_fila(item_data, 'catalogo_item_id'))
+
+    texto_base = item_data.get('texto_base')
+    texto_final = item_data.get('texto_final')
+
+    if not texto_base and catalogo_item:
+        texto_base = catalogo_item.texto
+
+    if not texto_final:
+        texto_final = texto_base or item_data.get('texto') or ''
+
+    item = config['modelo_item'](
+        pk=clave_fila(item_data),
+        seccion=seccion,
+        catalogo_item=catalogo_item,
+        parent=parent,
+        tipo_nodo=item_data.get('tipo_nodo') or (catalogo_item.tipo_nodo if catalogo_item else 'item'),
+        titulo=item_data.get('titulo') or (catalogo_item.titulo if catalogo_item else ''),
+        texto_base=texto_base or '',
+        texto_final=texto_final or '',
+        orden=item_data.get('orden') or (catalogo_item.orden if catalogo_item else 1),
+        nivel=item_data.get('nivel') if item_data.get('nivel') is not None else (catalogo_item.nivel if catalogo_item else 0),
+        seleccionado=bool(item_data.get('seleccionado', False)),
+        es_obligatorio=bool(
+            item_data.get('es_obligatorio', False) or
+            (catalogo_item.es_obligatorio if catalogo_item else False)
+        ),
+        editable_en_cotizacion=bool(
+            item_data.get('editable_en_cotizacion', True) if item_data.get('editable_en_cotizacion') is not None
+            else (catalogo_item.editable_en_cotizacion if catalogo_item else True)
+        ),
+    )
+    item.normalizar_textos()
+    return item
+
+
+def guardar_snapshot_condiciones(padre, secciones_data):
+    """
+    Sincroniza el snapshot de condiciones de una cotización o plantilla con
+    `secciones_data`. Las secciones e ítems que traen el `id` de un registro
+    existente se actualizan solo si cambiaron; los demás se insertan y los
+    que ya no aparecen se eliminan. Devuelve (total_secciones, total_items).
+    """
+    config = SNAPSHOTS_CONDICIONES[type(padre)]
+    modelo_seccion = config['modelo_seccion']
+    modelo_item = config['modelo_item']
+    campo_padre = config['campo_padre']
+
+    with transaction.atomic():
+        secciones = Sincronizador(
+            modelo_seccion,
+            modelo_seccion.objects.filter(**{campo_padre: padre}),
+            CAMPOS_SECCION,
+        )
+
+        catalogo_secciones, catalogo_items = _referencias_catalogo(secciones_data)
+
+        filas = []
+        secciones_nuevas = []
+        for seccion_data in secciones_data:
+            seccion = _construir_seccion(config, padre, seccion_data, catalogo_secciones)
+            if not secciones.registrar(seccion):
+                secciones_nuevas.append(seccion)
+            filas.append((seccion, seccion_data))
+
+        # Los ítems de las secciones sobrantes se borran en cascada con
+        # ellas: si vuelven bajo otra sección se insertan como nuevos.
+        items = Sincronizador(
+            modelo_item,
+            modelo_item.objects.filter(**{f'seccion__{campo_padre}': padre}).exclude(
+                seccion_id__in=secciones.sobrantes
+            ),
+            CAMPOS_ITEM,
+        )
+
+        # Primero se liberan los códigos de las secciones que ya no están:
+        # (padre, codigo) es único.
+        secciones_eliminadas = secciones.eliminar_sobrantes()
+        secciones.actualizar()
+        insertar_filas(modelo_seccion, secciones_nuevas)
+
+        # Los ítems se insertan nivel por nivel: al construir un nivel sus
+        # padres ya tienen pk, así parent_id queda resuelto sin otra consulta.
+        nivel = [
+            (seccion, None, item_data)
+            for seccion, seccion_data in filas
+            for item_data in seccion_data.get('items') or []
+        ]
+        items_nuevos = 0
+        total_items = 0
+        while nivel:
+            nuevos = []
+            siguiente = []
+            for seccion, parent, item_data in nivel:
+                item = _construir_item(config, seccion, parent, item_data, catalogo_items)
+                if not items.registrar(item):
+                    nuevos.append(item)
+                siguiente.extend((seccion, item, hijo) for hijo in item_data.get('children') or [])
+
+            insertar_filas(modelo_item, nuevos)
+            items_nuevos += len(nuevos)
+            total_items += len(nivel)
+            nivel = siguiente
+
+        items.actualizar()
+        items_eliminados = items.eliminar_sobrantes()
+
+        hubo_cambios = any([
+            secciones_nuevas,
+            secciones.modificadas,
+            secciones_eliminadas,
+            items_nuevos,
+            items.modificadas,
+            items_eliminados,
+        ])
+        if hubo_cambios and config['tipo_pdf']:
+            # bulk_create y bulk_update no emiten post_save: el PDF se invalida aquí.
+            transaction.on_commit(lambda: invalidar_pdfs(config['tipo_pdf'], padre.pk))
+
+    return len(filas), total_items
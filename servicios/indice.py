@@ -0,0 +1,154 @@
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from core.busqueda import FUENTES_BUSQUEDA, componer_documento, filtrar_busqueda, normalizar_busqueda
+from core.versiones import leer_version, subir_version
+from .models import Servicio
+
+
+INDICE_CACHE_TIMEOUT = 60 * 60 * 24
+INDICE_VERSION_KEY = 'servicios:indice_servicios:version'
+
+# El buscador rechaza consultas más largas; los sufijos se recortan a
+# esta longitud para acotar la memoria del índice.
+LONGITUD_MAXIMA_TERMINO = 100
+
+LIMITE_RESULTADOS = 50
+
+# Índice de la versión vigente en este proceso, o None mientras no se
+# haya construido.
+_indice_local = None
+
+
+def version_indice_servicios():
+    return leer_version(INDICE_VERSION_KEY)
+
+
+def invalidar_indice_servicios():
+    """Invalida el índice de servicios en todos los procesos."""
+    subir_version(INDICE_VERSION_KEY)
+
+
+def serializar_servicio(servicio):
+    return {
+        'pk': servicio.pk,
+        'nombre': servicio.nombre,
+        'codigo_facturacion': servicio.codigo_facturacion,
+        'unidad_base': servicio.unidad_base,
+        'precio_base': str(servicio.precio_base),
+        'norma_pk': servicio.norma_id,
+        'norma_codigo': servicio.norma.codigo if servicio.norma else None,
+        'metodo_pk': servicio.metodo_id,
+        'metodo_codigo': servicio.metodo.codigo if servicio.metodo else None,
+    }
+
+
+class IndiceServicios:
+    """
+    Catálogo de servicios en memoria para el autocompletado.
+
+    Cada servicio aporta todos los sufijos de su documento de búsqueda
+    (nombre y código de facturación normalizados) a un arreglo ordenado.
+    Un servicio contiene el término si alguno de sus sufijos empieza por
+    él, así la búsqueda es un `bisect` y coincide con la de `filtrar_busqueda`.
+    """
+
+    def __init__(self, version, servicios):
+        self.version = version
+        self.servicios = sorted(servicios, key=lambda servicio: (servicio['nombre'], servicio['pk']))
+
+        campos = FUENTES_BUSQUEDA['servicio']['campos']
+        sufijos = []
+        for posicion, servicio in enumerate(self.servicios):
+            documento = componer_documento(servicio[campo] for campo in campos)
+            sufijos.extend(
+                (documento[inicio:inicio + LONGITUD_MAXIMA_TERMINO], posicion)
+                for inicio in range(len(documento))
+            )
+        sufijos.sort()
+
+        self.sufijos = [sufijo for sufijo, _ in sufijos]
+        self.posiciones = [posicion for _, posicion in sufijos]
+
+    def buscar(self, termino, limite=LIMITE_RESULTADOS):
+        """Servicios cuyo documento contiene `termino`, ordenados por nombre."""
+        termino = normalizar_busqueda(termino)[:LONGITUD_MAXIMA_TERMINO]
+        if not termino:
+            return []
+
+        encontrados = set()
+        i = bisect_left(self.sufijos, termino)
+        while i < len(self.sufijos) and self.sufijos[i].startswith(termino):
+            encontrados.add(self.posiciones[i])
+            i += 1
+
+        return [self.servicios[posicion] for posicion in sorted(encontrados)[:limite]]
+
+
+def indice_servicios():
+    """
+    Devuelve el índice vigente sin consultar la base de datos, o None si
+    está frío: ni este proceso ni la caché compartida tienen la versión actual.
+    """
+    global _indice_local
+
+    version = version_indice_servicios()
+    if _indice_local is not None and _indice_local.version == version:
+        return _indice_local
+
+    servicios = cache.get(f'servicios:indice_servicios:v{version}')
+    if servicios is None:
+        return None
+
+    _indice_local = IndiceServicios(version, servicios)
+    return _indice_local
+
+
+def construir_indice_servicios():
+    """Lee el catálogo con una consulta y publica el índice de la versión actual."""
+    global _indice_local
+
+    # La versión se lee antes que los datos: si el catálogo cambia en
+    # medio, la versión sube al confirmar y el índice se vuelve a construir.
+    version = version_indice_servicios()
+    servicios = [
+        serializar_servicio(servicio)
+        for servicio in Servicio.objects.select_related('norma', 'metodo')
+    ]
+    cache.set(f'servicios:indice_servicios:v{version}', servicios, INDICE_CACHE_TIMEOUT)
+
+    _indice_local = IndiceServicios(version, servicios)
+    return _indice_local
+
+
+def catalogo_servicios():
+    """
+    Todos los servicios serializados y ordenados por nombre. Las filas se
+    comparten entre peticiones: no deben modificarse.
+    """
+    indice = indice_servicios() or construir_indice_servicios()
+    return indice.servicios
+
+
+def buscar_servicios(termino, limite=LIMITE_RESULTADOS):
+    """
+    Servicios cuyo nombre o código de facturación contienen `termino`,
+    ordenados por nombre. Con el índice caliente se responde sin tocar la
+    base de datos; en frío se responde con SQL y el índice queda construido
+    para la siguiente consulta.
+    """
+    if not normalizar_busqueda(termino):
+        return []
+
+    indice = indice_servicios()
+    if indice is not None:
+        return indice.buscar(termino, limite)
+
+    servicios = filtrar_busqueda(
+        Servicio.objects.select_related('norma', 'metodo').order_by('nombre', 'pk'), 'servicio', termino
+    )[:limite]
+    resultados = [serializar_servicio(servicio) for servicio in servicios]
+
+    construir_indice_servicios()
+    return resultados
@@ -0,0 +1,222 @@
+from abc import ABC, abstractmethod
+from decimal import Decimal
+
+from django.db import transaction
+
+from core.pdf import invalidar_pdfs
+from .sincronizacion import Sincronizador, clave_fila, insertar_filas
+from .models import (
+    Servicio,
+    Norma,
+    Metodo,
+    CotizacionGrupo,
+    CotizacionDetalle,
+    PlantillaGrupo,
+    PlantillaDetalle,
+)
+
+
+GRUPO_POR_DEFECTO = "ENSAYOS DE LABORATORIO"
+
+
+def _decimal(valor, defecto):
+    return Decimal(str(valor if valor is not None else defecto).replace(',', '.'))
+
+
+def _ids_numericos(detalles_data, campo):
+    return {int(item[campo]) for item in detalles_data if str(item.get(campo) or '').isdigit()}
+
+
+class ConstructorLineas(ABC):
+    """
+    Arma los grupos y detalles de una cotización o plantilla a partir del
+    `detalles_json` del formulario. Los servicios, normas y métodos citados
+    se resuelven con un `in_bulk` por modelo y las filas se guardan en
+    bloque, así el costo no depende del número de líneas.
+
+    Las filas que traen el `id` de un grupo o detalle existente se
+    actualizan en su lugar; editar una línea solo escribe esa línea.
+    """
+    modelo_grupo = None
+    modelo_detalle = None
+    campo_padre = None
+    desplazamiento_orden = 0
+    campos_grupo = ['nombre_grupo', 'orden']
+    campos_detalle = [
+        'grupo',
+        'servicio',
+        'norma_manual',
+        'metodo_manual',
+        'descripcion_especifica',
+        'unidad_medida',
+        'cantidad',
+        'precio_unitario',
+        'total_detalle',
+    ]
+
+    def __init__(self, detalles_data):
+        self.detalles_data = detalles_data
+
+        self.servicios = Servicio.objects.in_bulk({
+            int(item['servicio_id'])
+            for item in self.detalles_data
+            if item.get('tipo_fila') not in ['categoria', 'subcategoria'] and item.get('servicio_id')
+        })
+        self.normas = Norma.objects.in_bulk(_ids_numericos(self.detalles_data, 'norma_id'))
+        self.metodos = Metodo.objects.in_bulk(_ids_numericos(self.detalles_data, 'metodo_id'))
+
+    def obtener_servicio(self, servicio_id):
+        servicio = self.servicios.get(int(servicio_id))
+        if servicio is None:
+            raise Servicio.DoesNotExist(f"No existe el servicio con id {servicio_id}.")
+        return servicio
+
+    @abstractmethod
+    def datos_detalle(self, item, servicio):
+        """Campos del detalle propios de cada documento, salvo `servicio`."""
+
+    def construir(self, padre):
+        """
+        Devuelve [(grupo, [detalles])] sin tocar la base de datos. El `pk`
+        de cada instancia es el id que envió el cliente, si lo hay.
+        """
+        grupo_actual = self.modelo_grupo(nombre_grupo=GRUPO_POR_DEFECTO, orden=0, **{self.campo_padre: padre})
+        bloques = [(grupo_actual, [])]
+
+        for index, item in enumerate(self.detalles_data):
+            tipo_fila = item.get('tipo_fila')
+
+            if tipo_fila in ['categoria', 'subcategoria']:
+                grupo_actual = self.modelo_grupo(
+                    pk=clave_fila(item),
+                    nombre_grupo=item.get('descripcion_especifica', '').upper(),
+                    orden=index + self.desplazamiento_orden,
+                    **{self.campo_padre: padre}
+                )
+                bloques.append((grupo_actual, []))
+                continue
+
+            servicio_id = item.get('servicio_id')
+            if not servicio_id:
+                continue
+
+            servicio = self.obtener_servicio(servicio_id)
+            detalle = self.modelo_detalle(
+                pk=clave_fila(item),
+                servicio=servicio,
+                **self.datos_detalle(item, servicio)
+            )
+            detalle.calcular_total()
+            bloques[-1][1].append(detalle)
+
+        return bloques
+
+    def guardar(self, padre):
+        """
+        Sincroniza los grupos y detalles de `padre` con las filas enviadas:
+        inserta las nuevas, actualiza las que cambiaron y elimina las que
+        ya no están. Devuelve True si se escribió algo.
+        """
+        bloques = self.construir(padre)
+
+        grupos = Sincronizador(
+            self.modelo_grupo,
+            self.modelo_grupo.objects.filter(**{self.campo_padre: padre}),
+            self.campos_grupo,
+        )
+        detalles = Sincronizador(
+            self.modelo_detalle,
+            self.modelo_detalle.objects.filter(**{f'grupo__{self.campo_padre}': padre}),
+            self.campos_detalle,
+        )
+
+        # El grupo por defecto no viaja como fila; se reutiliza el existente.
+        grupo_defecto = bloques[0][0]
+        reclamados = {grupo.pk for grupo, _ in bloques[1:]}
+        grupo_defecto.pk = next((
+            grupo.pk
+            for grupo in sorted(grupos.existentes.values(), key=lambda g: (g.orden, g.pk))
+            if grupo.nombre_grupo == GRUPO_POR_DEFECTO and grupo.pk not in reclamados
+        ), None)
+
+        grupos_nuevos = [grupo for grupo, _ in bloques if not grupos.registrar(grupo)]
+        insertar_filas(self.modelo_grupo, grupos_nuevos)
+        grupos.actualizar()
+
+        detalles_nuevos = []
+        for grupo, detalles_grupo in bloques:
+            for detalle in detalles_grupo:
+                detalle.grupo = grupo
+                if not detalles.registrar(detalle):
+                    detalles_nuevos.append(detalle)
+
+        self.modelo_detalle.objects.bulk_create(detalles_nuevos)
+        detalles.actualizar()
+
+        eliminados = detalles.eliminar_sobrantes() + grupos.eliminar_sobrantes()
+
+        return bool(
+            grupos_nuevos or detalles_nuevos or grupos.modificadas or detalles.modificadas or eliminados
+        )
+
+
+class LineasCotizacion(ConstructorLineas):
+    modelo_grupo = CotizacionGrupo
+    modelo_detalle = CotizacionDetalle
+    campo_padre = 'cotizacion'
+
+    def datos_detalle(self, item, servicio):
+        partes_desc = []
+        cat_nom = item.get('categoria_nom', '')
+        subcat_nom = item.get('subcategoria_nom', '')
+
+        if cat_nom:
+            partes_desc.append(cat_nom.upper())
+        if subcat_nom:
+            partes_desc.append(subcat_nom)
+
+        desc_generada = f"{' - '.join(partes_desc)}: {servicio.nombre}" if partes_desc else servicio.nombre
+
+        norma_txt = ""
+        norma_id = item.get('norma_id')
+        if norma_id and str(norma_id).isdigit():
+            n = self.normas.get(int(norma_id))
+            norma_txt = n.codigo if n else ""
+
+        metodo_txt = ""
+        metodo_id = item.get('metodo_id')
+        if metodo_id and str(metodo_id).isdigit():
+            m = self.metodos.get(int(metodo_id))
+            metodo_txt = m.codigo if m else ""
+
+        return {
+            'norma_manual': norma_txt or item.get('norma_manual', ''),
+            'metodo_manual': metodo_txt or item.get('metodo_manual', ''),
+            'descripcion_especifica': item.get('descripcion_especifica') or desc_generada,
+            'unidad_medida': item.get('unidad_medida') or servicio.unidad_base,
+            'cantidad': _decimal(item.get('cantidad'), '1'),
+            'precio_unitario': _decimal(item.get('precio_unitario'), '0'),
+        }
+
+    def guardar(self, padre):
+        hubo_cambios = super().guardar(padre)
+        # bulk_create y bulk_update no emiten post_save: el PDF se invalida aquí.
+        if hubo_cambios:
+            transaction.on_commit(lambda: invalidar_pdfs('cotizacion', padre.pk))
+        return hubo_cambios
+
+
+class LineasPlantilla(ConstructorLineas):
+    modelo_grupo = PlantillaGrupo
+    modelo_detalle = PlantillaDetalle
+    campo_padre = 'plantilla'
+    desplazamiento_orden = 1
+
+    def datos_detalle(self, item, servicio):
+        return {
+            'norma_manual': item.get('norma_nombre', ''),
+            'descripcion_especifica': item.get('descripcion_especifica') or servicio.nombre,
+            'unidad_medida': item.get('unidad_medida') or servicio.unidad_base,
+            'cantidad': _decimal(item.get('cantidad'), '1'),
+            'precio_unitario': _decimal(item.get('precio_unitario'), '0'),
+        }
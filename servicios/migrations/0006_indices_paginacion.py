@@ -0,0 +1,25 @@
+# Generated by Django 4.2.29 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servicios', '0005_plantillacondicionseccion_plantillacondicionitem_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cotizacion',
+            index=models.Index(fields=['fecha_creacion', 'id'], name='servicios_c_fecha_c_5ffa2a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plantillacotizacion',
+            index=models.Index(fields=['fecha_creacion', 'id'], name='servicios_p_fecha_c_97f22a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicio',
+            index=models.Index(fields=['nombre', 'id'], name='servicios_s_nombre_fa734e_idx'),
+        ),
+    ]
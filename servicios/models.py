@@ -80,6 +80,9 @@ class Servicio(models.Model):
         verbose_name = "3. Servicio / Ensayo"
         verbose_name_plural = "3. Servicios / Ensayos"
         ordering = ['nombre']
+        indexes = [
+            models.Index(fields=['nombre', 'id']),
+        ]
 
 class Cotizacion(models.Model):
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='cotizaciones', verbose_name="Cliente")
@@ -172,6 +175,16 @@ class Cotizacion(models.Model):
         self.impuesto_igv = self.subtotal * self.tasa_igv
         self.monto_total = self.subtotal + self.impuesto_igv
 
+    def guardar_totales(self):
+        """Recalcula y guarda solo los totales, sin repetir el save completo."""
+        self.calcular_totales()
+        super().save(update_fields=[
+            'subtotal',
+            'impuesto_igv',
+            'monto_total',
+            'fecha_actualizacion',
+        ])
+
     def puede_editar_contenido_condiciones(self):
         return not self.contenido_condiciones_bloqueado and self.estado not in ('Aceptada', 'Anulada')
 
@@ -210,6 +223,9 @@ class Cotizacion(models.Model):
     class Meta:
         verbose_name = "Cotización"
         ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['fecha_creacion', 'id']),
+        ]
         
 class CotizacionGrupo(models.Model):
     cotizacion = models.ForeignKey(Cotizacion, on_delete=models.CASCADE, related_name='grupos')
@@ -239,18 +255,20 @@ class CotizacionDetalle(models.Model):
     
     total_detalle = models.DecimalField(max_digits=12, decimal_places=2, editable=False)
 
-    def save(self, *args, **kwargs):
+    def calcular_total(self):
         self.total_detalle = Decimal(self.cantidad) * self.precio_unitario
-        
-        from django.db import transaction
+
+    def save(self, *args, **kwargs):
+        self.calcular_total()
+
         with transaction.atomic():
             super().save(*args, **kwargs)
-            self.grupo.cotizacion.save()
+            self.grupo.cotizacion.guardar_totales()
 
     def delete(self, *args, **kwargs):
         cotizacion_padre = self.grupo.cotizacion
         super().delete(*args, **kwargs)
-        cotizacion_padre.save()
+        cotizacion_padre.guardar_totales()
 
     class Meta:
         verbose_name = "Detalle de Cotización"
@@ -318,6 +336,9 @@ class PlantillaCotizacion(models.Model):
     class Meta:
         verbose_name = "Plantilla de Cotización"
         verbose_name_plural = "Plantillas de Cotizaciones"
+        indexes = [
+            models.Index(fields=['fecha_creacion', 'id']),
+        ]
 
 class PlantillaGrupo(models.Model):
     plantilla = models.ForeignKey(PlantillaCotizacion, on_delete=models.CASCADE, related_name='grupos')
@@ -341,8 +362,11 @@ class PlantillaDetalle(models.Model):
     
     total_detalle = models.DecimalField(max_digits=12, decimal_places=2, editable=False)
 
-    def save(self, *args, **kwargs):
+    def calcular_total(self):
         self.total_detalle = Decimal(self.cantidad) * self.precio_unitario
+
+    def save(self, *args, **kwargs):
+        self.calcular_total()
         super().save(*args, **kwargs)
         self.grupo.plantilla.calcular_totales()
 
@@ -350,6 +374,7 @@ class PlantillaDetalle(models.Model):
         plantilla = self.grupo.plantilla
         super().delete(*args, **kwargs)
         plantilla.calcular_totales()
+
         
 class CatalogoCondicionSeccion(models.Model):
     TIPO_CHOICES = [
@@ -560,11 +585,14 @@ class CotizacionCondicionItem(models.Model):
         if self.parent and self.parent_id == self.id:
             raise ValidationError("Un ítem no puede ser padre de sí mismo.")
 
-    def save(self, *args, **kwargs):
+    def normalizar_textos(self):
         if not self.texto_final:
             self.texto_final = self.texto_base
 
         self.fue_editado = (self.texto_base or '').strip() != (self.texto_final or '').strip()
+
+    def save(self, *args, **kwargs):
+        self.normalizar_textos()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -679,10 +707,13 @@ class PlantillaCondicionItem(models.Model):
         if self.parent and self.parent_id == self.id:
             raise ValidationError("Un ítem no puede ser padre de sí mismo.")
 
-    def save(self, *args, **kwargs):
+    def normalizar_textos(self):
         if not self.texto_final:
             self.texto_final = self.texto_base
         self.fue_editado = (self.texto_base or '').strip() != (self.texto_final or '').strip()
+
+    def save(self, *args, **kwargs):
+        self.normalizar_textos()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -0,0 +1,85 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.pdf import invalidar_pdfs
+from core.transacciones import acumular_al_confirmar
+from .condiciones import invalidar_catalogo_condiciones
+from .indice import invalidar_indice_servicios
+from .models import (
+    Servicio,
+    Norma,
+    Metodo,
+    CatalogoCondicionSeccion,
+    CatalogoCondicionItem,
+    Cotizacion,
+    CotizacionGrupo,
+    CotizacionDetalle,
+    CotizacionCondicionSeccion,
+    CotizacionCondicionItem,
+)
+
+
+def _invalidar_pdfs_cotizaciones(cotizacion_ids):
+    for cotizacion_id in cotizacion_ids:
+        invalidar_pdfs('cotizacion', cotizacion_id)
+
+
+def _invalidar_pdf_cotizacion(cotizacion_id):
+    # Un borrado en cascada emite una señal por fila; basta invalidar una vez.
+    if cotizacion_id:
+        acumular_al_confirmar(_invalidar_pdfs_cotizaciones, cotizacion_id)
+
+
+def _invalidar_catalogo(modelos):
+    invalidar_catalogo_condiciones()
+
+
+@receiver(post_save, sender=CatalogoCondicionSeccion)
+@receiver(post_delete, sender=CatalogoCondicionSeccion)
+@receiver(post_save, sender=CatalogoCondicionItem)
+@receiver(post_delete, sender=CatalogoCondicionItem)
+def catalogo_condiciones_modificado(sender, instance, **kwargs):
+    # La versión se sube al confirmar: así ningún proceso guarda el
+    # catálogo anterior bajo la versión nueva.
+    acumular_al_confirmar(_invalidar_catalogo, sender)
+
+
+def _invalidar_indice(modelos):
+    invalidar_indice_servicios()
+
+
+@receiver(post_save, sender=Servicio)
+@receiver(post_delete, sender=Servicio)
+@receiver(post_save, sender=Norma)
+@receiver(post_delete, sender=Norma)
+@receiver(post_save, sender=Metodo)
+@receiver(post_delete, sender=Metodo)
+def catalogo_servicios_modificado(sender, instance, **kwargs):
+    acumular_al_confirmar(_invalidar_indice, sender)
+
+
+@receiver(post_delete, sender=Cotizacion)
+def cotizacion_eliminada(sender, instance, **kwargs):
+    _invalidar_pdf_cotizacion(instance.pk)
+
+
+@receiver(post_save, sender=CotizacionGrupo)
+@receiver(post_delete, sender=CotizacionGrupo)
+@receiver(post_save, sender=CotizacionCondicionSeccion)
+@receiver(post_delete, sender=CotizacionCondicionSeccion)
+def contenido_cotizacion_modificado(sender, instance, **kwargs):
+    _invalidar_pdf_cotizacion(instance.cotizacion_id)
+
+
+@receiver(post_save, sender=CotizacionDetalle)
+@receiver(post_delete, sender=CotizacionDetalle)
+def detalle_cotizacion_modificado(sender, instance, **kwargs):
+    cotizacion_id = CotizacionGrupo.objects.filter(pk=instance.grupo_id).values_list('cotizacion_id', flat=True).first()
+    _invalidar_pdf_cotizacion(cotizacion_id)
+
+
+@receiver(post_save, sender=CotizacionCondicionItem)
+@receiver(post_delete, sender=CotizacionCondicionItem)
+def condicion_cotizacion_modificada(sender, instance, **kwargs):
+    cotizacion_id = CotizacionCondicionSeccion.objects.filter(pk=instance.seccion_id).values_list('cotizacion_id', flat=True).first()
+    _invalidar_pdf_cotizacion(cotizacion_id)
@@ -0,0 +1,80 @@
+from django.db import connection
+from django.utils import timezone
+
+
+def clave_fila(datos, campo='id'):
+    """Devuelve el id que envía el cliente para una fila ya guardada, o None."""
+    valor = datos.get(campo) if isinstance(datos, dict) else None
+    return int(valor) if str(valor or '').isdigit() else None
+
+
+def insertar_filas(modelo, filas):
+    """
+    Inserta `filas` en bloque dejando el pk asignado en cada instancia. Si
+    el motor no devuelve los ids de un INSERT múltiple, se guardan una a una.
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        modelo.objects.bulk_create(filas)
+    else:
+        for fila in filas:
+            fila.save()
+    return len(filas)
+
+
+class Sincronizador:
+    """
+    Empareja las filas enviadas por el formulario con las ya guardadas.
+
+    Cada fila llega como instancia sin guardar cuyo `pk` es la clave que
+    envió el cliente. Si esa clave pertenece a `existentes` la fila se
+    trata como actualización y solo se escribe si cambió algún campo de
+    `campos`; si no, se inserta como nueva. Los registros existentes que
+    ninguna fila reclama quedan como sobrantes para eliminarse.
+    """
+
+    def __init__(self, modelo, existentes, campos):
+        self.modelo = modelo
+        self.campos = list(campos)
+        self.existentes = {fila.pk: fila for fila in existentes}
+        self.atributos = [modelo._meta.get_field(campo).attname for campo in self.campos]
+        self.campos_auto_now = [
+            campo.name for campo in modelo._meta.concrete_fields if getattr(campo, 'auto_now', False)
+        ]
+        self.usados = set()
+        self.modificadas = []
+
+    def registrar(self, fila):
+        """Clasifica la fila. Devuelve True si corresponde a un registro existente."""
+        actual = self.existentes.get(fila.pk)
+        if actual is None or fila.pk in self.usados:
+            fila.pk = None
+            return False
+
+        self.usados.add(fila.pk)
+        fila._state.adding = False
+        fila._state.db = actual._state.db
+
+        if any(getattr(fila, atributo) != getattr(actual, atributo) for atributo in self.atributos):
+            self.modificadas.append(fila)
+        return True
+
+    @property
+    def sobrantes(self):
+        return [pk for pk in self.existentes if pk not in self.usados]
+
+    def actualizar(self):
+        if not self.modificadas:
+            return 0
+
+        ahora = timezone.now()
+        for fila in self.modificadas:
+            for campo in self.campos_auto_now:
+                setattr(fila, campo, ahora)
+
+        return self.modelo.objects.bulk_update(self.modificadas, self.campos + self.campos_auto_now)
+
+    def eliminar_sobrantes(self):
+        sobrantes = self.sobrantes
+        if sobrantes:
+            self.modelo.objects.filter(pk__in=sobrantes).delete()
+        return len(sobrantes)
@@ -1,3 +1,647 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from clientes.models import Cliente
+from core.models import TrabajoPDF
+from core.pdf import encolar_pdf
+from . import condiciones, indice
+from .condiciones import arbol_condiciones, catalogo_condiciones, guardar_snapshot_condiciones, version_catalogo_condiciones
+from .lineas import GRUPO_POR_DEFECTO, LineasCotizacion
+from .models import (
+    CatalogoCondicionItem,
+    CatalogoCondicionSeccion,
+    Cotizacion,
+    CotizacionCondicionItem,
+    CotizacionCondicionSeccion,
+    CotizacionDetalle,
+    CotizacionGrupo,
+    Metodo,
+    Norma,
+    Servicio,
+)
+from .sincronizacion import insertar_filas
+from .views import _obtener_condiciones_desde_snapshot, huella_pdf_cotizacion
+
+
+class IndiceServiciosTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@vicaf.pe', 'clave')
+        # Los documentos de búsqueda se escriben al confirmar la transacción
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.norma = Norma.objects.create(codigo='ASTM D2216', nombre='Contenido de humedad')
+            cls.metodo = Metodo.objects.create(codigo='M-01', nombre='Gravimétrico')
+            for codigo, nombre in [
+                ('ENS-001', 'Compactación Proctor modificado'),
+                ('ENS-002', 'Contenido de humedad'),
+                ('ENS-003', 'Análisis granulométrico por tamizado'),
+                ('ENS-004', 'Compresión de testigos de concreto'),
+                ('ENS-005', 'Límites de Atterberg'),
+            ]:
+                Servicio.objects.create(
+                    codigo_facturacion=codigo,
+                    nombre=nombre,
+                    norma=cls.norma,
+                    metodo=cls.metodo,
+                    precio_base=Decimal('50.00'),
+                )
+
+    def setUp(self):
+        cache.clear()
+        indice._indice_local = None
+        self.client.force_login(self.usuario)
+
+    def buscar(self, termino):
+        respuesta = self.client.get(reverse('servicios:buscar_servicios_api'), {'q': termino})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def consultas_a_servicios(self, termino):
+        with CaptureQueriesContext(connection) as consultas:
+            resultados = self.buscar(termino)
+        tabla = Servicio._meta.db_table
+        return resultados, [c['sql'] for c in consultas if tabla in c['sql']]
+
+    def test_en_frio_responde_con_sql_y_calienta_el_indice(self):
+        self.assertIsNone(indice.indice_servicios())
+
+        resultados_sql, consultas = self.consultas_a_servicios('COMPAC')
+        self.assertTrue(consultas)
+        self.assertIsNotNone(indice.indice_servicios())
+
+        resultados_indice, consultas = self.consultas_a_servicios('COMPAC')
+        self.assertEqual(consultas, [])
+        self.assertEqual(resultados_indice, resultados_sql)
+        self.assertEqual([r['codigo_facturacion'] for r in resultados_sql], ['ENS-001'])
+
+    def test_indice_y_sql_devuelven_lo_mismo(self):
+        terminos = ['co', 'ción', 'ENS-00', 'ens-004', 'de', 'atterberg', 'xyz', 'ñ']
+        en_frio = {}
+        for termino in terminos:
+            cache.clear()
+            indice._indice_local = None
+            en_frio[termino] = self.buscar(termino)
+
+        self.assertTrue(en_frio['ENS-00'])
+        for termino in terminos:
+            self.assertEqual(self.buscar(termino), en_frio[termino], termino)
+
+    def test_cambios_en_el_catalogo_reconstruyen_el_indice(self):
+        self.buscar('ensayo')
+        version = indice.version_indice_servicios()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Servicio.objects.create(codigo_facturacion='ENS-006', nombre='Ensayo de corte directo')
+        self.assertGreater(indice.version_indice_servicios(), version)
+
+        resultados, consultas = self.consultas_a_servicios('corte')
+        self.assertTrue(consultas)
+        self.assertEqual([r['codigo_facturacion'] for r in resultados], ['ENS-006'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.norma.delete()
+        self.assertTrue(all(s['norma_codigo'] is None for s in indice.catalogo_servicios()))
+
+
+class LineasCotizacionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@vicaf.pe', 'clave')
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.cliente = Cliente.objects.create(
+                ruc='20123456789', razon_social='Cliente de Prueba SAC', persona_contacto='Contacto',
+                celular_contacto='999999999', correo_contacto='contacto@cliente.pe',
+            )
+            cls.proctor = Servicio.objects.create(codigo_facturacion='ENS-001', nombre='Proctor modificado')
+            cls.humedad = Servicio.objects.create(codigo_facturacion='ENS-002', nombre='Contenido de humedad')
+
+            cls.cotizacion = cls.crear_cotizacion('VCF-OTE-2026-001', [
+                {'tipo_fila': 'servicio', 'servicio_id': cls.proctor.pk, 'cantidad': '2', 'precio_unitario': '100'},
+                {'tipo_fila': 'categoria', 'descripcion_especifica': 'Suelos'},
+                {'tipo_fila': 'servicio', 'servicio_id': cls.humedad.pk, 'cantidad': '3', 'precio_unitario': '20'},
+            ])
+            cls.otra = cls.crear_cotizacion('VCF-OTE-2026-002', [
+                {'tipo_fila': 'servicio', 'servicio_id': cls.humedad.pk, 'cantidad': '1', 'precio_unitario': '25'},
+            ])
+
+    @classmethod
+    def crear_cotizacion(cls, numero, filas):
+        cotizacion = Cotizacion.objects.create(
+            cliente=cls.cliente, numero_oferta=numero, asunto_servicio='Ensayos',
+            persona_contacto='Contacto', correo_contacto='contacto@cliente.pe', telefono_contacto='999999999',
+            tasa_igv=Decimal('0.18'),
+        )
+        LineasCotizacion(filas).guardar(cotizacion)
+        cotizacion.guardar_totales()
+        return cotizacion
+
+    def filas(self, cotizacion):
+        """Las filas tal como las devuelve el formulario de edición."""
+        filas = []
+        for grupo in cotizacion.grupos.order_by('orden'):
+            if grupo.nombre_grupo != GRUPO_POR_DEFECTO:
+                filas.append({'id': grupo.pk, 'tipo_fila': 'categoria', 'descripcion_especifica': grupo.nombre_grupo})
+            for detalle in grupo.detalles_items.all():
+                filas.append({
+                    'id': detalle.pk,
+                    'tipo_fila': 'servicio',
+                    'servicio_id': detalle.servicio_id,
+                    'descripcion_especifica': detalle.descripcion_especifica,
+                    'norma_manual': detalle.norma_manual,
+                    'metodo_manual': detalle.metodo_manual,
+                    'unidad_medida': detalle.unidad_medida,
+                    'cantidad': str(detalle.cantidad),
+                    'precio_unitario': str(detalle.precio_unitario),
+                })
+        return filas
+
+    def detalles(self, cotizacion):
+        return list(
+            CotizacionDetalle.objects.filter(grupo__cotizacion=cotizacion)
+            .order_by('pk').values_list('pk', 'grupo__nombre_grupo', 'cantidad', 'precio_unitario')
+        )
+
+    def test_filas_sin_cambios_no_escriben_nada(self):
+        with CaptureQueriesContext(connection) as consultas:
+            hubo_cambios = LineasCotizacion(self.filas(self.cotizacion)).guardar(self.cotizacion)
+
+        self.assertFalse(hubo_cambios)
+        escrituras = [c['sql'] for c in consultas if c['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+        self.assertEqual(escrituras, [])
+
+    def test_editar_una_linea_solo_actualiza_esa_linea(self):
+        antes = self.detalles(self.cotizacion)
+        filas = self.filas(self.cotizacion)
+        filas[-1]['cantidad'] = '5'
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertTrue(LineasCotizacion(filas).guardar(self.cotizacion))
+
+        escrituras = [c['sql'] for c in consultas if c['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+        self.assertEqual(len(escrituras), 1)
+        self.assertTrue(escrituras[0].startswith('UPDATE'))
+        self.assertEqual(self.detalles(self.cotizacion), antes[:-1] + [antes[-1][:2] + (5, antes[-1][3])])
+
+    def test_id_de_otra_cotizacion_se_inserta_como_nuevo(self):
+        ajeno = CotizacionDetalle.objects.get(grupo__cotizacion=self.otra)
+        filas = self.filas(self.cotizacion)
+        filas.append({
+            'id': ajeno.pk, 'tipo_fila': 'servicio', 'servicio_id': self.proctor.pk,
+            'cantidad': '9', 'precio_unitario': '1',
+        })
+
+        LineasCotizacion(filas).guardar(self.cotizacion)
+
+        ajeno.refresh_from_db()
+        self.assertEqual((ajeno.grupo.cotizacion_id, ajeno.cantidad), (self.otra.pk, 1))
+        nuevo = self.detalles(self.cotizacion)[-1]
+        self.assertNotEqual(nuevo[0], ajeno.pk)
+        self.assertEqual(nuevo[2:], (9, Decimal('1.00')))
+
+    def test_id_repetido_actualiza_una_fila_e_inserta_la_otra(self):
+        filas = self.filas(self.cotizacion)
+        copia = dict(filas[0], cantidad='7')
+        filas.insert(1, copia)
+
+        LineasCotizacion(filas).guardar(self.cotizacion)
+
+        detalles = self.detalles(self.cotizacion)
+        self.assertEqual(len(detalles), 3)
+        self.assertEqual([d[2] for d in detalles if d[1] == GRUPO_POR_DEFECTO], [2, 7])
+
+    def test_filas_quitadas_se_eliminan(self):
+        grupo_suelos = CotizacionGrupo.objects.get(cotizacion=self.cotizacion, nombre_grupo='SUELOS')
+        filas = [fila for fila in self.filas(self.cotizacion) if fila['tipo_fila'] != 'categoria'][:1]
+
+        LineasCotizacion(filas).guardar(self.cotizacion)
+
+        self.assertEqual([d[1] for d in self.detalles(self.cotizacion)], [GRUPO_POR_DEFECTO])
+        self.assertFalse(CotizacionGrupo.objects.filter(pk=grupo_suelos.pk).exists())
+
+    def test_insertar_filas_asigna_pk_aunque_el_motor_no_los_devuelva(self):
+        for devuelve_ids in (True, False):
+            with self.subTest(devuelve_ids=devuelve_ids):
+                grupos = [CotizacionGrupo(cotizacion=self.otra, nombre_grupo=f'G{n}', orden=n) for n in (1, 2)]
+                with mock.patch.object(
+                    type(connection.features), 'can_return_rows_from_bulk_insert',
+                    new_callable=mock.PropertyMock, return_value=devuelve_ids,
+                ):
+                    self.assertEqual(insertar_filas(CotizacionGrupo, grupos), 2)
+                self.assertTrue(all(grupo.pk for grupo in grupos))
+
+    def test_solo_un_cambio_en_las_lineas_invalida_el_pdf(self):
+        TrabajoPDF.objects.create(
+            tipo='cotizacion', objeto_id=self.cotizacion.pk, huella='anterior',
+            estado='error', nombre_archivo='cotizacion.pdf',
+        )
+        filas = self.filas(self.cotizacion)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            LineasCotizacion(filas).guardar(self.cotizacion)
+        self.assertTrue(TrabajoPDF.objects.filter(objeto_id=self.cotizacion.pk).exists())
+
+        # bulk_update no emite post_save: la invalidación la hace el constructor.
+        filas[0]['cantidad'] = '4'
+        with self.captureOnCommitCallbacks(execute=True):
+            LineasCotizacion(filas).guardar(self.cotizacion)
+        self.assertFalse(TrabajoPDF.objects.filter(objeto_id=self.cotizacion.pk).exists())
+
+    def test_editar_desde_la_vista_recalcula_totales_e_invalida_el_pdf(self):
+        TrabajoPDF.objects.create(
+            tipo='cotizacion', objeto_id=self.cotizacion.pk, huella='anterior',
+            estado='error', nombre_archivo='cotizacion.pdf',
+        )
+        filas = self.filas(self.cotizacion)
+        filas[0]['precio_unitario'] = '150'
+
+        self.client.force_login(self.usuario)
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post(reverse('servicios:editar_cotizacion', args=[self.cotizacion.pk]), {
+                'cliente': self.cliente.pk,
+                'asunto_servicio': 'Ensayos',
+                'persona_contacto': 'Contacto',
+                'correo_contacto': 'contacto@cliente.pe',
+                'telefono_contacto': '999999999',
+                'tasa_igv': '0.18',
+                'forma_pago': 'Contado',
+                'detalles_json': json.dumps(filas),
+            })
+
+        self.assertEqual(respuesta.status_code, 302)
+        self.cotizacion.refresh_from_db()
+        self.assertEqual(self.cotizacion.subtotal, Decimal('360.00'))
+        self.assertEqual(self.cotizacion.monto_total, Decimal('424.80'))
+        self.assertFalse(TrabajoPDF.objects.filter(tipo='cotizacion', objeto_id=self.cotizacion.pk).exists())
+
+
+class ExportarCotizacionesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@vicaf.pe', 'clave')
+        cliente = Cliente.objects.create(
+            ruc='20123456789', razon_social='Cliente de Prueba SAC', persona_contacto='Contacto',
+            celular_contacto='999999999', correo_contacto='contacto@cliente.pe',
+        )
+        for numero, estado, asunto in [
+            (1, 'Pendiente', 'Ensayos de suelos'),
+            (2, 'Aceptada', '=HYPERLINK("http://ejemplo.com","clic")'),
+            (3, 'Aceptada', 'Ensayos de concreto'),
+        ]:
+            Cotizacion.objects.create(
+                cliente=cliente, numero_oferta=f'VCF-OTE-2026-{numero:03d}', asunto_servicio=asunto, estado=estado,
+                persona_contacto='Contacto', correo_contacto='contacto@cliente.pe',
+                telefono_contacto='999999999', tasa_igv=Decimal('0.18'),
+            )
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def exportar(self, **filtros):
+        respuesta = self.client.get(reverse('servicios:exportar_cotizaciones'), filtros)
+        self.assertEqual(respuesta.status_code, 200)
+        contenido = b''.join(respuesta.streaming_content).decode('utf-8')
+        return respuesta, contenido
+
+    def filas(self, contenido):
+        """Filas de datos del CSV, sin el BOM ni los encabezados."""
+        return list(csv.reader(io.StringIO(contenido.lstrip('\ufeff'))))[1:]
+
+    def test_exporta_con_bom_encabezados_y_una_fila_por_cotizacion(self):
+        respuesta, contenido = self.exportar()
+
+        self.assertEqual(respuesta['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn(f'cotizaciones_{timezone.localdate():%Y%m%d}.csv', respuesta['Content-Disposition'])
+        self.assertTrue(contenido.startswith('\ufeff'))
+
+        self.assertTrue(contenido.lstrip('\ufeff').startswith('N° Oferta,Fecha,Cliente,RUC,Asunto,'))
+        self.assertEqual(len(self.filas(contenido)), 3)
+
+    def test_respeta_los_filtros_de_la_lista(self):
+        _, contenido = self.exportar(estado='Aceptada')
+
+        self.assertEqual([fila[0] for fila in self.filas(contenido)], ['VCF-OTE-2026-003', 'VCF-OTE-2026-002'])
+
+    def test_una_fecha_invalida_no_filtra(self):
+        for fechas in ({'fecha_inicio': 'x', 'fecha_fin': 'y'}, {'fecha_inicio': '2026-13-01', 'fecha_fin': '2026-12-31'}):
+            with self.subTest(**fechas):
+                _, contenido = self.exportar(**fechas)
+                self.assertEqual(len(self.filas(contenido)), 3)
+
+    def test_el_texto_que_parece_formula_se_exporta_como_texto(self):
+        _, contenido = self.exportar(estado='Aceptada')
+
+        asuntos = [fila[4] for fila in self.filas(contenido)]
+        self.assertIn("'" + '=HYPERLINK("http://ejemplo.com","clic")', asuntos)
+
+
+class SnapshotCondicionesTests(TestCase):
+
+    # Lo que guarda `arbol()`: nivel por nivel y, dentro de cada nivel, en orden de inserción.
+    ARBOL_GUARDADO = [('pagos', [
+        ('Formas de pago', None),
+        ('Moneda', None),
+        ('Crédito', 'Formas de pago'),
+        ('Contado', 'Formas de pago'),
+        ('Treinta días', 'Crédito'),
+        ('Sesenta días', 'Crédito'),
+    ])]
+
+    @classmethod
+    def setUpTestData(cls):
+        cliente = Cliente.objects.create(
+            ruc='20123456789', razon_social='Cliente de Prueba SAC', persona_contacto='Contacto',
+            celular_contacto='999999999', correo_contacto='contacto@cliente.pe',
+        )
+        cls.cotizacion = Cotizacion.objects.create(
+            cliente=cliente, numero_oferta='VCF-OTE-2026-001', asunto_servicio='Ensayos',
+            persona_contacto='Contacto', correo_contacto='contacto@cliente.pe',
+            telefono_contacto='999999999', tasa_igv=Decimal('0.18'),
+        )
+
+    def seccion(self, codigo, items, **datos):
+        return {'codigo': codigo, 'titulo': codigo.title(), 'tipo': 'lista', 'items': items, **datos}
+
+    def item(self, titulo, hijos=(), **datos):
+        return {'titulo': titulo, 'texto_base': f'Texto de {titulo}', 'children': list(hijos), **datos}
+
+    def guardar(self, secciones):
+        with self.captureOnCommitCallbacks(execute=True):
+            return guardar_snapshot_condiciones(self.cotizacion, secciones)
+
+    def snapshot(self):
+        """El snapshot guardado como [(sección, [(ítem, padre)])]."""
+        return [
+            (seccion.codigo, [
+                (item.titulo, item.parent.titulo if item.parent_id else None)
+                for item in seccion.items.order_by('nivel', 'orden', 'id')
+            ])
+            for seccion in CotizacionCondicionSeccion.objects.filter(cotizacion=self.cotizacion).order_by('orden')
+        ]
+
+    def test_un_item_que_pasa_a_otra_seccion_no_se_pierde(self):
+        self.guardar([
+            self.seccion('pagos', [self.item('Contado', [self.item('Adelanto')])], orden=1),
+            self.seccion('plazos', [self.item('Treinta días')], orden=2),
+        ])
+        contado = CotizacionCondicionItem.objects.get(titulo='Contado')
+        adelanto = CotizacionCondicionItem.objects.get(titulo='Adelanto')
+        plazos = CotizacionCondicionSeccion.objects.get(codigo='plazos')
+        treinta = CotizacionCondicionItem.objects.get(titulo='Treinta días')
+
+        # Se quita la sección de pagos y sus ítems pasan a la de plazos.
+        total = self.guardar([
+            self.seccion('plazos', [
+                self.item('Treinta días', id=treinta.pk),
+                self.item('Contado', [self.item('Adelanto', id=adelanto.pk)], id=contado.pk),
+            ], id=plazos.pk, orden=2),
+        ])
+
+        self.assertEqual(total, (1, 3))
+        self.assertEqual(self.snapshot(), [
+            ('plazos', [('Treinta días', None), ('Contado', None), ('Adelanto', 'Contado')]),
+        ])
+
+
+    def arbol(self):
+        """Una sección con tres niveles de ítems."""
+        return [self.seccion('pagos', [
+            self.item('Formas de pago', [
+                self.item('Crédito', [self.item('Treinta días'), self.item('Sesenta días')]),
+                self.item('Contado'),
+            ]),
+            self.item('Moneda'),
+        ])]
+
+    def inserciones_de_items(self, consultas):
+        tabla = CotizacionCondicionItem._meta.db_table
+        return [c['sql'] for c in consultas if c['sql'].startswith('INSERT') and tabla in c['sql']]
+
+    @skipUnlessDBFeature('can_return_rows_from_bulk_insert')
+    def test_los_items_se_insertan_con_un_insert_por_nivel(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.guardar(self.arbol()), (1, 6))
+
+        self.assertEqual(len(self.inserciones_de_items(consultas)), 3)
+        self.assertEqual(self.snapshot(), self.ARBOL_GUARDADO)
+
+    def test_sin_returning_los_padres_se_resuelven_igual(self):
+        with mock.patch.object(
+            type(connection.features), 'can_return_rows_from_bulk_insert',
+            new_callable=mock.PropertyMock, return_value=False,
+        ), CaptureQueriesContext(connection) as consultas:
+            self.guardar(self.arbol())
+
+        self.assertEqual(len(self.inserciones_de_items(consultas)), 6)
+        self.assertEqual(self.snapshot(), self.ARBOL_GUARDADO)
+
+    def test_el_pdf_se_invalida_solo_si_algo_cambio(self):
+        self.guardar(self.arbol())
+        pdf = TrabajoPDF.objects.create(
+            tipo='cotizacion', objeto_id=self.cotizacion.pk, huella='v1', estado='listo', nombre_archivo='doc.pdf',
+        )
+
+        # El editor devuelve el snapshot tal como lo recibió.
+        self.guardar(_obtener_condiciones_desde_snapshot(self.cotizacion))
+        self.assertTrue(TrabajoPDF.objects.filter(pk=pdf.pk).exists())
+
+        secciones = _obtener_condiciones_desde_snapshot(self.cotizacion)
+        secciones[0]['items'][0]['children'][0]['texto_final'] = 'Crédito a noventa días'
+        self.guardar(secciones)
+        self.assertFalse(TrabajoPDF.objects.filter(pk=pdf.pk).exists())
+
+class HuellaPdfCotizacionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cliente = Cliente.objects.create(
+            ruc='20123456789', razon_social='Cliente de Prueba SAC', persona_contacto='Contacto',
+            celular_contacto='999999999', correo_contacto='contacto@cliente.pe',
+        )
+        servicio = Servicio.objects.create(codigo_facturacion='ENS-001', nombre='Proctor modificado')
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.cotizacion = Cotizacion.objects.create(
+                cliente=cliente, numero_oferta='VCF-OTE-2026-001', asunto_servicio='Ensayos',
+                persona_contacto='Contacto', correo_contacto='contacto@cliente.pe',
+                telefono_contacto='999999999', tasa_igv=Decimal('0.18'),
+            )
+            LineasCotizacion([
+                {'tipo_fila': 'categoria', 'descripcion_especifica': 'Suelos'},
+                {'tipo_fila': 'servicio', 'servicio_id': servicio.pk, 'cantidad': '2', 'precio_unitario': '100'},
+            ]).guardar(cls.cotizacion)
+            guardar_snapshot_condiciones(cls.cotizacion, [{
+                'codigo': 'pagos', 'titulo': 'Pagos', 'tipo': 'lista',
+                'items': [{'titulo': 'Contado', 'texto_base': 'Pago al contado', 'children': []}],
+            }])
+
+    def test_sin_cambios_se_reutiliza_el_pdf(self):
+        huella = huella_pdf_cotizacion(self.cotizacion)
+        self.assertEqual(huella_pdf_cotizacion(self.cotizacion), huella)
+
+        trabajo = encolar_pdf('cotizacion', self.cotizacion.pk, huella, 'cotizacion.pdf')
+        self.assertEqual(
+            encolar_pdf('cotizacion', self.cotizacion.pk, huella_pdf_cotizacion(self.cotizacion), 'cotizacion.pdf'),
+            trabajo,
+        )
+
+    def test_cambiar_grupos_detalles_o_condiciones_cambia_la_huella(self):
+        huellas = {huella_pdf_cotizacion(self.cotizacion)}
+        cambios = [
+            lambda: CotizacionGrupo.objects.filter(cotizacion=self.cotizacion).update(nombre_grupo='Concreto'),
+            lambda: CotizacionDetalle.objects.filter(grupo__cotizacion=self.cotizacion).update(cantidad=3),
+            lambda: CotizacionCondicionItem.objects.filter(seccion__cotizacion=self.cotizacion).update(
+                texto_final='Pago a treinta días',
+            ),
+        ]
+        for cambio in cambios:
+            cambio()
+            huellas.add(huella_pdf_cotizacion(self.cotizacion))
+
+        self.assertEqual(len(huellas), len(cambios) + 1)
+
+
+class CatalogoCondicionesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@vicaf.pe', 'clave')
+        with cls.captureOnCommitCallbacks(execute=True):
+            cliente = Cliente.objects.create(
+                ruc='20123456789', razon_social='Cliente de Prueba SAC', persona_contacto='Contacto',
+                celular_contacto='999999999', correo_contacto='contacto@cliente.pe',
+            )
+            cls.cotizacion = Cotizacion.objects.create(
+                cliente=cliente, numero_oferta='VCF-OTE-2026-001', asunto_servicio='Ensayos',
+                persona_contacto='Contacto', correo_contacto='contacto@cliente.pe',
+                telefono_contacto='999999999', tasa_igv=Decimal('0.18'),
+            )
+            cls.seccion = CatalogoCondicionSeccion.objects.create(codigo='prueba_pagos', titulo='Pagos')
+            cls.item = CatalogoCondicionItem.objects.create(seccion=cls.seccion, titulo='Contado', texto='Pago al contado')
+
+    def setUp(self):
+        cache.clear()
+        condiciones._catalogo_local = (None, None)
+        self.addCleanup(setattr, condiciones, '_catalogo_local', (None, None))
+        self.client.force_login(self.usuario)
+
+    def textos(self, secciones):
+        seccion = next(s for s in secciones if s['codigo'] == 'prueba_pagos')
+        return [item['texto_base'] for item in seccion['items']]
+
+    def editar_item(self, texto):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.texto = texto
+            self.item.save()
+
+    def test_cada_proceso_guarda_su_copia_del_catalogo(self):
+        version, secciones = catalogo_condiciones()
+        self.assertEqual(self.textos(secciones), ['Pago al contado'])
+
+        with self.assertNumQueries(0):
+            self.assertIs(catalogo_condiciones()[1], secciones)
+
+        # Otro proceso, sin copia propia, lo toma de la caché compartida.
+        condiciones._catalogo_local = (None, None)
+        with self.assertNumQueries(0):
+            self.assertEqual(catalogo_condiciones(), (version, secciones))
+
+    def test_editar_el_catalogo_sube_la_version_al_confirmar(self):
+        version, secciones = catalogo_condiciones()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.texto = 'Pago a treinta días'
+            self.item.save()
+            self.assertEqual(version_catalogo_condiciones(), version)
+
+        nueva_version, secciones = catalogo_condiciones()
+        self.assertNotEqual(nueva_version, version)
+        self.assertEqual(self.textos(secciones), ['Pago a treinta días'])
+
+    def test_etag_del_catalogo(self):
+        url = reverse('servicios:condiciones_cotizacion_json', args=[self.cotizacion.pk])
+
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertFalse(respuesta.json()['usa_snapshot'])
+        etag = respuesta['ETag']
+
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta['ETag'], etag)
+
+        self.editar_item('Pago a treinta días')
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+    def test_etag_del_snapshot(self):
+        url = reverse('servicios:condiciones_cotizacion_json', args=[self.cotizacion.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            guardar_snapshot_condiciones(self.cotizacion, catalogo_condiciones()[1])
+
+        respuesta = self.client.get(url)
+        self.assertTrue(respuesta.json()['usa_snapshot'])
+        etag = respuesta['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # El snapshot ya no depende del catálogo.
+        self.editar_item('Pago a treinta días')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        CotizacionCondicionItem.objects.filter(seccion__cotizacion=self.cotizacion).update(texto_final='Otro texto')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ArbolCondicionesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.pagos = CatalogoCondicionSeccion.objects.create(codigo='prueba_pagos', titulo='Pagos')
+        cls.plazos = CatalogoCondicionSeccion.objects.create(codigo='prueba_plazos', titulo='Plazos', orden=2)
+
+        def item(seccion, titulo, orden, parent=None, **datos):
+            return CatalogoCondicionItem.objects.create(
+                seccion=seccion, parent=parent, titulo=titulo, texto=titulo, orden=orden, **datos
+            )
+
+        formas = item(cls.pagos, 'Formas de pago', 1, tipo_nodo='grupo')
+        item(cls.pagos, 'Moneda', 2)
+        credito = item(cls.pagos, 'Crédito', 2, formas)
+        item(cls.pagos, 'Contado', 1, formas)
+        item(cls.pagos, 'Treinta días', 2, credito)
+        item(cls.pagos, 'Quince días', 1, credito)
+        retirado = item(cls.pagos, 'Cheque', 3, formas, activo=False)
+        item(cls.pagos, 'Cheque diferido', 1, retirado)
+        item(cls.plazos, 'Entrega', 1)
+
+    def esquema(self, items):
+        return [(item.titulo, self.esquema(item.hijos)) for item in items]
+
+    def test_arma_el_arbol_ordenado_con_una_consulta(self):
+        with self.assertNumQueries(1):
+            raices = arbol_condiciones(CatalogoCondicionItem.objects.filter(
+                seccion__in=[self.pagos, self.plazos], activo=True,
+            ))
+
+        # 'Cheque diferido' cuelga de un ítem inactivo: queda fuera, como al recorrer `children`.
+        self.assertEqual(self.esquema(raices[self.pagos.pk]), [
+            ('Formas de pago', [
+                ('Contado', []),
+                ('Crédito', [('Quince días', []), ('Treinta días', [])]),
+            ]),
+            ('Moneda', []),
+        ])
+        self.assertEqual(self.esquema(raices[self.plazos.pk]), [('Entrega', [])])
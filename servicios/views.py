@@ -1,24 +1,26 @@
 import os
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.decorators.http import require_POST
-from django.http import JsonResponse, HttpResponse, HttpResponseForbidden
+from django.http import JsonResponse, HttpResponseForbidden
 from django.template.loader import get_template
-from django.core.paginator import Paginator
-from django.db.models import Q, Sum
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.db.models import Count, Q, Sum
 from django.db import transaction 
 from datetime import date
-from django.db.models import Max
 from django.contrib.auth.decorators import login_required
-from weasyprint import HTML
 from django.forms.models import model_to_dict
 from django.contrib import messages
 from django.template.loader import get_template
 from django.forms.models import model_to_dict 
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import hashlib
 import json
 import logging
+from functools import lru_cache
+from urllib.parse import urljoin
 from django.conf import settings
-from xhtml2pdf import pisa
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.contrib.messages.views import SuccessMessageMixin
@@ -40,6 +42,11 @@ class PermisoModuloMixin:
 
 
 
+from core.busqueda import filtrar_busqueda
+from core.correlativos import siguiente_codigo
+from core.exportacion import FILAS_POR_BLOQUE, fechas_filtro, respuesta_csv
+from core.paginacion import con_enlaces, paginar
+from core.pdf import solicitar_pdf
 from proyectos.models import Proyecto
 from trabajadores.models import TrabajadorProfile
 from trabajadores.permissions import permiso_requerido, trabajador_tiene_permiso
@@ -55,15 +62,13 @@ from .models import (
     Subcategoria,
     CotizacionGrupo,
     PlantillaCotizacion,
-    PlantillaGrupo,
-    PlantillaDetalle,
-    CatalogoCondicionSeccion,
-    CatalogoCondicionItem,
     CotizacionCondicionSeccion,
     CotizacionCondicionItem,
-    PlantillaCondicionSeccion,
     PlantillaCondicionItem,
 )
+from .condiciones import arbol_condiciones, catalogo_condiciones, guardar_snapshot_condiciones
+from .indice import buscar_servicios, catalogo_servicios
+from .lineas import LineasCotizacion, LineasPlantilla
 
 @login_required
 @permiso_requerido('servicios.ver')
@@ -74,15 +79,9 @@ def lista_servicios(request):
     servicios_list = Servicio.objects.all().select_related('norma', 'metodo').order_by('nombre')
     
     if query:
-        servicios_list = servicios_list.filter(
-            Q(nombre__icontains=query) | 
-            Q(codigo_facturacion__icontains=query)
-        )
+        servicios_list = filtrar_busqueda(servicios_list, 'servicio', query)
 
-    paginator = Paginator(servicios_list, 11) 
-    
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginar(request, servicios_list, 11, contar_total=True)
     
     categorias_disponibles = CategoriaServicio.objects.all().order_by('nombre')
 
@@ -412,87 +411,78 @@ def crear_subcategoria_ajax(request):
         logger.error(f"Error al crear subcategoría por usuario {request.user.username}: {str(e)}")
         return JsonResponse({'status': 'error', 'message': 'Error interno del servidor.'}, status=400)
     
-@login_required
-@permiso_requerido('cotizaciones.ver')
-def lista_cotizaciones(request):
+def _filtrar_cotizaciones(request, cotizaciones):
+    """ Filtros de las listas de cotizaciones: q, estado y fecha_inicio/fecha_fin. """
     query = request.GET.get('q')
     estado_filtro = request.GET.get('estado')
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
-
-    cotizaciones_list = Cotizacion.objects.select_related('cliente')\
-                                          .filter(es_plantilla=False)\
-                                          .order_by('-fecha_creacion')
+    fecha_inicio, fecha_fin = fechas_filtro(request)
 
     if query:
-        cotizaciones_list = cotizaciones_list.filter(
-            Q(numero_oferta__icontains=query) |
-            Q(cliente__razon_social__icontains=query) |
-            Q(asunto_servicio__icontains=query)
-        )
+        cotizaciones = filtrar_busqueda(cotizaciones, 'cotizacion', query)
 
     if estado_filtro:
-        cotizaciones_list = cotizaciones_list.filter(estado=estado_filtro)
+        cotizaciones = cotizaciones.filter(estado=estado_filtro)
 
     if fecha_inicio and fecha_fin:
-        cotizaciones_list = cotizaciones_list.filter(
+        cotizaciones = cotizaciones.filter(
             fecha_generacion__range=[fecha_inicio, fecha_fin]
         )
 
-    paginator = Paginator(cotizaciones_list, 9)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    return cotizaciones
+
+@login_required
+@permiso_requerido('cotizaciones.ver')
+def lista_cotizaciones(request):
+    query = request.GET.get('q')
 
-    get_params = request.GET.copy()
+    cotizaciones_list = _filtrar_cotizaciones(
+        request,
+        Cotizacion.objects.select_related('cliente').filter(es_plantilla=False),
+    ).order_by('-fecha_creacion', '-id')
 
-    if 'page' in get_params:
-        del get_params['page']
+    page_obj = paginar(request, cotizaciones_list, 9, contar_total=True)
 
     context = {
         'cotizaciones': page_obj,
         'query': query,
         'estados_disponibles': Cotizacion.ESTADO_CHOICES,
-        'get_params': get_params.urlencode(),
     }
 
     return render(request, 'servicios/cotizacion_list.html', context)
 
+@login_required
+@permiso_requerido('cotizaciones.ver')
+def exportar_cotizaciones_csv(request):
+    """ Exporta las cotizaciones de la lista, con sus filtros, sin cargarlas en memoria. """
+    cotizaciones = _filtrar_cotizaciones(
+        request,
+        Cotizacion.objects.filter(es_plantilla=False),
+    ).order_by('-fecha_creacion', '-id')
+
+    filas = cotizaciones.values_list(
+        'numero_oferta',
+        'fecha_generacion',
+        'cliente__razon_social',
+        'cliente__ruc',
+        'asunto_servicio',
+        'estado',
+        'forma_pago',
+        'subtotal',
+        'impuesto_igv',
+        'monto_total',
+    ).iterator(chunk_size=FILAS_POR_BLOQUE)
+
+    return respuesta_csv(
+        f"cotizaciones_{timezone.localdate():%Y%m%d}.csv",
+        ['N° Oferta', 'Fecha', 'Cliente', 'RUC', 'Asunto', 'Estado', 'Forma de pago', 'Subtotal', 'IGV', 'Total'],
+        filas,
+    )
+
 def _guardar_snapshot_condiciones_cotizacion(cotizacion, secciones_data):
     if not isinstance(secciones_data, list):
         return
 
-    cotizacion.condiciones_secciones.all().delete()
-
-    total_items = 0
-
-    for seccion_data in secciones_data:
-        catalogo_seccion = None
-        catalogo_seccion_id = seccion_data.get('catalogo_seccion_id')
-
-        if catalogo_seccion_id:
-            catalogo_seccion = CatalogoCondicionSeccion.objects.filter(pk=catalogo_seccion_id).first()
-
-        seccion_snapshot = CotizacionCondicionSeccion.objects.create(
-            cotizacion=cotizacion,
-            catalogo_seccion=catalogo_seccion,
-            codigo=seccion_data.get('codigo') or (catalogo_seccion.codigo if catalogo_seccion else ''),
-            titulo=seccion_data.get('titulo') or (catalogo_seccion.titulo if catalogo_seccion else ''),
-            tipo=seccion_data.get('tipo') or (catalogo_seccion.tipo if catalogo_seccion else 'lista'),
-            orden=seccion_data.get('orden') or (catalogo_seccion.orden if catalogo_seccion else 1),
-            seleccionada=bool(seccion_data.get('seleccionada', True)),
-        )
-
-        root_items = seccion_data.get('items', []) or []
-        for item_data in root_items:
-            _crear_item_snapshot_recursivo(
-                seccion_snapshot=seccion_snapshot,
-                item_data=item_data,
-                parent_snapshot=None
-            )
-
-    total_items = CotizacionCondicionItem.objects.filter(
-        seccion__cotizacion=cotizacion
-    ).count()
+    _, total_items = guardar_snapshot_condiciones(cotizacion, secciones_data)
 
     cotizacion.contenido_condiciones_configurado = total_items > 0
     cotizacion.save(update_fields=[
@@ -517,8 +507,7 @@ def crear_editar_cotizacion(request, pk=None):
     if is_editing:
         cotizacion = get_object_or_404(
             Cotizacion.objects.prefetch_related(
-                'grupos__detalles_items__servicio',
-                'condiciones_secciones__items__children'
+                'grupos__detalles_items__servicio'
             ),
             pk=pk
         )
@@ -622,88 +611,19 @@ def crear_editar_cotizacion(request, pk=None):
                 cotizacion.tasa_igv = Decimal(tasa_igv_str)
 
                 if not is_editing and not cotizacion.es_plantilla:
-                    prefix = 'VCF-OTE'
-                    year_part = str(cotizacion.fecha_generacion.year)
-                    max_result = Cotizacion.objects.filter(
-                        numero_oferta__startswith=f'{prefix}-{year_part}-'
-                    ).aggregate(Max('numero_oferta'))
-
-                    last_num_oferta = max_result.get('numero_oferta__max')
-                    next_order_num = 1
-                    if last_num_oferta:
-                        try:
-                            next_order_num = int(last_num_oferta.split('-')[-1]) + 1
-                        except (IndexError, ValueError):
-                            next_order_num = 1
-                    cotizacion.numero_oferta = f'{prefix}-{year_part}-{str(next_order_num).zfill(3)}'
+                    cotizacion.numero_oferta = siguiente_codigo(
+                        f'VCF-OTE-{cotizacion.fecha_generacion.year}-',
+                        Cotizacion.objects.all(),
+                        'numero_oferta',
+                        ancho=3,
+                    )
                 elif cotizacion.es_plantilla:
                     cotizacion.numero_oferta = None
 
                 cotizacion.save()
 
-                if is_editing:
-                    cotizacion.grupos.all().delete()
-
-                grupo_actual = CotizacionGrupo.objects.create(
-                    cotizacion=cotizacion,
-                    nombre_grupo="ENSAYOS DE LABORATORIO",
-                    orden=0
-                )
-
-                for index, item in enumerate(detalles_data):
-                    tipo_fila = item.get('tipo_fila')
-
-                    if tipo_fila in ['categoria', 'subcategoria']:
-                        grupo_actual = CotizacionGrupo.objects.create(
-                            cotizacion=cotizacion,
-                            nombre_grupo=item.get('descripcion_especifica', '').upper(),
-                            orden=index
-                        )
-                        continue
-
-                    servicio_id = item.get('servicio_id')
-                    if not servicio_id:
-                        continue
-
-                    servicio = Servicio.objects.get(pk=int(servicio_id))
-
-                    partes_desc = []
-                    cat_nom = item.get('categoria_nom', '')
-                    subcat_nom = item.get('subcategoria_nom', '')
-
-                    if cat_nom:
-                        partes_desc.append(cat_nom.upper())
-                    if subcat_nom:
-                        partes_desc.append(subcat_nom)
-
-                    desc_generada = f"{' - '.join(partes_desc)}: {servicio.nombre}" if partes_desc else servicio.nombre
-                    desc_final = item.get('descripcion_especifica') or desc_generada
-
-                    norma_txt = ""
-                    norma_id = item.get('norma_id')
-                    if norma_id and str(norma_id).isdigit():
-                        n = Norma.objects.filter(pk=norma_id).first()
-                        norma_txt = n.codigo if n else ""
-
-                    metodo_txt = ""
-                    metodo_id = item.get('metodo_id')
-                    if metodo_id and str(metodo_id).isdigit():
-                        m = Metodo.objects.filter(pk=metodo_id).first()
-                        metodo_txt = m.codigo if m else ""
-
-                    CotizacionDetalle.objects.create(
-                        grupo=grupo_actual,
-                        servicio=servicio,
-                        norma_manual=norma_txt or item.get('norma_manual', ''),
-                        metodo_manual=metodo_txt or item.get('metodo_manual', ''),
-                        descripcion_especifica=desc_final,
-                        unidad_medida=item.get('unidad_medida') or servicio.unidad_base,
-                        cantidad=Decimal(str(item.get('cantidad', '1')).replace(',', '.')),
-                        precio_unitario=Decimal(str(item.get('precio_unitario', '0')).replace(',', '.')),
-                    )
-
-                cotizacion.calcular_totales()
-                cotizacion.save()
+                LineasCotizacion(detalles_data).guardar(cotizacion)
+                cotizacion.guardar_totales()
 
                 if condiciones_data:
                     _guardar_snapshot_condiciones_cotizacion(cotizacion, condiciones_data)
@@ -726,30 +646,29 @@ def crear_editar_cotizacion(request, pk=None):
             if is_editing and pk:
                 cotizacion = get_object_or_404(
                     Cotizacion.objects.prefetch_related(
-                        'grupos__detalles_items__servicio',
-                        'condiciones_secciones__items__children'
+                        'grupos__detalles_items__servicio'
                     ),
                     pk=pk
                 )
 
     clientes = Cliente.objects.all().order_by('razon_social')
-    servicios_queryset = Servicio.objects.all().select_related('norma', 'metodo')
+    servicios = catalogo_servicios()
     categorias_principales = CategoriaServicio.objects.all()
     subcategorias_list = Subcategoria.objects.all()
     trabajadores = TrabajadorProfile.objects.all().select_related('user')
     plantillas = PlantillaCotizacion.objects.filter(activo=True).order_by('nombre_plantilla')
 
     servicios_list = []
-    for s in servicios_queryset:
+    for s in servicios:
         servicios_list.append({
-            'pk': s.pk,
-            'nombre': s.nombre,
-            'unidad_base': s.unidad_base,
-            'precio_base': str(s.precio_base),
-            'norma_codigo': s.norma.codigo if s.norma else 'N/A',
-            'metodo_codigo': s.metodo.codigo if s.metodo else 'N/A',
-            'norma_pk': s.norma.pk if s.norma else None,
-            'metodo_pk': s.metodo.pk if s.metodo else None,
+            'pk': s['pk'],
+            'nombre': s['nombre'],
+            'unidad_base': s['unidad_base'],
+            'precio_base': s['precio_base'],
+            'norma_codigo': s['norma_codigo'] or 'N/A',
+            'metodo_codigo': s['metodo_codigo'] or 'N/A',
+            'norma_pk': s['norma_pk'],
+            'metodo_pk': s['metodo_pk'],
         })
 
     detalles_list = []
@@ -757,11 +676,13 @@ def crear_editar_cotizacion(request, pk=None):
         for grupo in cotizacion.grupos.all().order_by('orden'):
             if grupo.nombre_grupo != "ENSAYOS DE LABORATORIO":
                 detalles_list.append({
+                    'id': grupo.pk,
                     'tipo_fila': 'categoria',
                     'descripcion_especifica': grupo.nombre_grupo
                 })
             for detalle in grupo.detalles_items.all():
                 detalles_list.append({
+                    'id': detalle.pk,
                     'tipo_fila': 'servicio',
                     'servicio_id': detalle.servicio.pk,
                     'descripcion_especifica': detalle.descripcion_especifica,
@@ -781,7 +702,7 @@ def crear_editar_cotizacion(request, pk=None):
     context = {
         'cotizacion': cotizacion,
         'clientes': clientes,
-        'servicios': servicios_queryset,
+        'servicios': servicios,
         'servicio_grupos': categorias_principales,
         'subcategorias': subcategorias_list,
         'servicios_con_detalles_json': json.dumps(servicios_list),
@@ -825,23 +746,6 @@ def eliminar_cotizacion(request, pk):
 
     return render(request, 'servicios/cotizacion_confirm_delete.html', {'cotizacion': cotizacion})
 
-def link_callback(uri, rel):
-    """
-    Convierte rutas de recursos HTML (CSS, imágenes) a rutas del sistema de archivos.
-    Esto es necesario para que xhtml2pdf pueda incrustar archivos STATIC y MEDIA.
-    """
-    if uri.startswith(settings.MEDIA_URL):
-        path = os.path.join(settings.MEDIA_ROOT, uri.replace(settings.MEDIA_URL, ""))
-    elif uri.startswith(settings.STATIC_URL):
-        path = os.path.join(settings.STATIC_ROOT, uri.replace(settings.STATIC_URL, ""))
-    else:
-        return uri 
-        
-    if not os.path.isfile(path):
-        return uri
-        
-    return path
-
 def header_footer_callback(canvas, doc):
     from reportlab.lib.styles import getSampleStyleSheet
     from reportlab.platypus import Paragraph
@@ -871,15 +775,15 @@ def header_footer_callback(canvas, doc):
 def _build_condiciones_pdf_data(cotizacion):
     secciones_pdf = []
 
-    secciones = cotizacion.condiciones_secciones.prefetch_related(
-        'items__children__children'
-    ).all().order_by('orden', 'id')
+    secciones = cotizacion.condiciones_secciones.all().order_by('orden', 'id')
+    raices = arbol_condiciones(
+        CotizacionCondicionItem.objects.filter(seccion__cotizacion=cotizacion)
+    )
 
     def build_selected_node(item):
-        children_qs = item.children.all().order_by('orden', 'id')
         children_blocks = []
 
-        for child in children_qs:
+        for child in item.hijos:
             child_block = build_selected_node(child)
             if child_block:
                 children_blocks.append(child_block)
@@ -913,7 +817,7 @@ def _build_condiciones_pdf_data(cotizacion):
         return rows
 
     for seccion in secciones:
-        root_items = seccion.items.filter(parent__isnull=True).order_by('orden', 'id')
+        root_items = raices.get(seccion.id, [])
 
         bloques = []
         for item in root_items:
@@ -963,27 +867,102 @@ def reemplazar_tokens_condicion(texto, cotizacion):
 
     return texto_final
 
-@login_required
-@permiso_requerido('cotizaciones.ver')
-def generar_pdf_cotizacion(request, pk):
-    cotizacion = get_object_or_404(
-        Cotizacion.objects.prefetch_related(
-            'grupos__detalles_items__servicio__norma',
-            'condiciones_secciones__items__children'
-        ).select_related(
-            'cliente',
-            'trabajador_responsable',
-            'servicio_general'
-        ),
-        pk=pk
-    )
+COTIZACION_PDF_PLANTILLA = 'servicios/cotizacion_pdf.html'
+CAMPOS_FIRMA_APROBACION = ['firma', 'firma_digital', 'imagen_firma']
+
+
+def _obtener_jefe_laboratorio(cotizacion):
+    if cotizacion.trabajador_responsable_id:
+        return cotizacion.trabajador_responsable
 
-    jefe_laboratorio = cotizacion.trabajador_responsable
+    try:
+        return TrabajadorProfile.objects.select_related('user').get(user__username='raquel')
+    except (TrabajadorProfile.DoesNotExist, TrabajadorProfile.MultipleObjectsReturned):
+        return None
+
+
+def _archivo_firma_aprobacion(jefe_laboratorio):
     if not jefe_laboratorio:
-        try:
-            jefe_laboratorio = TrabajadorProfile.objects.select_related('user').get(user__username='raquel')
-        except (TrabajadorProfile.DoesNotExist, TrabajadorProfile.MultipleObjectsReturned):
-            jefe_laboratorio = None
+        return None
+
+    for campo in CAMPOS_FIRMA_APROBACION:
+        archivo = getattr(jefe_laboratorio, campo, None)
+        if archivo:
+            return archivo
+    return None
+
+
+@lru_cache(maxsize=1)
+def _version_plantilla_pdf_cotizacion():
+    plantilla = get_template(COTIZACION_PDF_PLANTILLA)
+    return hashlib.sha256(plantilla.template.source.encode('utf-8')).hexdigest()
+
+
+def huella_pdf_cotizacion(cotizacion):
+    """
+    Huella del contenido que se imprime en el PDF de la cotización:
+    cabecera, grupos, detalles, condiciones congeladas, firma y versión de
+    la plantilla. Si nada de eso cambia, el PDF ya generado sigue siendo válido.
+    """
+    cabecera = Cotizacion.objects.filter(pk=cotizacion.pk).values_list(
+        'numero_oferta', 'fecha_generacion', 'asunto_servicio', 'persona_contacto',
+        'correo_contacto', 'telefono_contacto', 'forma_pago', 'validez_oferta_dias',
+        'plazo_entrega_dias', 'tasa_igv', 'subtotal', 'impuesto_igv', 'monto_total',
+        'cliente__razon_social', 'cliente__ruc', 'servicio_general__nombre',
+        'trabajador_responsable_id',
+    ).first()
+
+    grupos = list(
+        CotizacionGrupo.objects.filter(cotizacion=cotizacion)
+        .order_by('orden', 'id')
+        .values_list('id', 'nombre_grupo', 'orden')
+    )
+    detalles = list(
+        CotizacionDetalle.objects.filter(grupo__cotizacion=cotizacion)
+        .order_by('grupo_id', 'id')
+        .values_list(
+            'id', 'grupo_id', 'servicio__nombre', 'servicio__norma__codigo',
+            'norma_manual', 'descripcion_especifica', 'unidad_medida',
+            'cantidad', 'precio_unitario', 'total_detalle',
+        )
+    )
+    secciones = list(
+        CotizacionCondicionSeccion.objects.filter(cotizacion=cotizacion)
+        .order_by('orden', 'id')
+        .values_list('id', 'codigo', 'titulo', 'orden')
+    )
+    items = list(
+        CotizacionCondicionItem.objects.filter(seccion__cotizacion=cotizacion)
+        .order_by('seccion_id', 'orden', 'id')
+        .values_list('id', 'seccion_id', 'parent_id', 'orden', 'seleccionado', 'texto_final')
+    )
+
+    jefe_laboratorio = _obtener_jefe_laboratorio(cotizacion)
+    firma = _archivo_firma_aprobacion(jefe_laboratorio)
+
+    revision = json.dumps([
+        cabecera,
+        grupos,
+        detalles,
+        secciones,
+        items,
+        getattr(jefe_laboratorio, 'pk', None),
+        firma.name if firma else None,
+        _version_plantilla_pdf_cotizacion(),
+    ], default=str, ensure_ascii=False)
+
+    return hashlib.sha256(revision.encode('utf-8')).hexdigest()
+
+def construir_html_pdf_cotizacion(cotizacion_id, base_url, user=None):
+    cotizacion = Cotizacion.objects.prefetch_related(
+        'grupos__detalles_items__servicio__norma',
+    ).select_related(
+        'cliente',
+        'trabajador_responsable',
+        'servicio_general'
+    ).get(pk=cotizacion_id)
+
+    jefe_laboratorio = _obtener_jefe_laboratorio(cotizacion)
 
     tasa_igv_decimal = cotizacion.tasa_igv if cotizacion.tasa_igv is not None else Decimal('0.18')
     subtotal = cotizacion.subtotal if cotizacion.subtotal is not None else Decimal('0.00')
@@ -997,10 +976,10 @@ def generar_pdf_cotizacion(request, pk):
     if not grupos_visibles:
         grupos_visibles = list(grupos_qs)
 
-    def serializar_items_pdf(items_queryset):
+    def serializar_items_pdf(root_items):
         items_pdf = []
 
-        for item in items_queryset.order_by('orden', 'id'):
+        for item in root_items:
             if item.seleccionado and (item.texto_final or '').strip():
                 items_pdf.append({
                     'texto': reemplazar_tokens_condicion(
@@ -1009,8 +988,7 @@ def generar_pdf_cotizacion(request, pk):
                     )
                 })
 
-            children = item.children.all().order_by('orden', 'id')
-            for child in children:
+            for child in item.hijos:
                 if child.seleccionado and (child.texto_final or '').strip():
                     items_pdf.append({
                         'texto': reemplazar_tokens_condicion(
@@ -1023,10 +1001,13 @@ def generar_pdf_cotizacion(request, pk):
 
     secciones_condiciones_pdf = []
 
-    if cotizacion.condiciones_secciones.exists():
-        for seccion in cotizacion.condiciones_secciones.all().order_by('orden', 'id'):
-            root_items = seccion.items.filter(parent__isnull=True)
-            items_pdf = serializar_items_pdf(root_items)
+    secciones_condiciones = cotizacion.condiciones_secciones.all().order_by('orden', 'id')
+    if secciones_condiciones:
+        raices = arbol_condiciones(
+            CotizacionCondicionItem.objects.filter(seccion__cotizacion=cotizacion)
+        )
+        for seccion in secciones_condiciones:
+            items_pdf = serializar_items_pdf(raices.get(seccion.id, []))
 
             if items_pdf:
                 secciones_condiciones_pdf.append({
@@ -1036,16 +1017,12 @@ def generar_pdf_cotizacion(request, pk):
                 })
 
     firma_aprobacion = None
-    if jefe_laboratorio:
-        posibles_campos = ['firma', 'firma_digital', 'imagen_firma']
-        for campo in posibles_campos:
-            archivo = getattr(jefe_laboratorio, campo, None)
-            if archivo:
-                try:
-                    firma_aprobacion = request.build_absolute_uri(archivo.url)
-                    break
-                except Exception:
-                    firma_aprobacion = None
+    archivo_firma = _archivo_firma_aprobacion(jefe_laboratorio)
+    if archivo_firma:
+        try:
+            firma_aprobacion = urljoin(base_url, archivo_firma.url)
+        except Exception:
+            firma_aprobacion = None
 
     context = {
         'cotizacion': cotizacion,
@@ -1059,24 +1036,23 @@ def generar_pdf_cotizacion(request, pk):
         'firma_aprobacion': firma_aprobacion,
     }
 
-    template = get_template('servicios/cotizacion_pdf.html')
-    html = template.render(context)
+    template = get_template(COTIZACION_PDF_PLANTILLA)
+    return template.render(context)
 
-    response = HttpResponse(content_type='application/pdf')
+@login_required
+@permiso_requerido('cotizaciones.ver')
+def generar_pdf_cotizacion(request, pk):
+    cotizacion = get_object_or_404(Cotizacion, pk=pk)
     nombre_archivo = f"{cotizacion.numero_oferta}.pdf" if cotizacion.numero_oferta else f"Cotizacion_{pk}.pdf"
-    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
 
-    pisa_status = pisa.CreatePDF(
-        html,
-        dest=response,
-        link_callback=link_callback
+    return solicitar_pdf(
+        request,
+        'cotizacion',
+        cotizacion.pk,
+        huella_pdf_cotizacion(cotizacion),
+        nombre_archivo,
     )
 
-    if pisa_status.err:
-        return HttpResponse('Tuvimos errores al generar el PDF.', status=500)
-
-    return response
-
 @login_required
 @transaction.atomic 
 def aprobar_cotizacion(request, pk):
@@ -1218,17 +1194,14 @@ def buscar_servicios_api(request):
 
         servicios = []
         if query:
-            servicios_qs = Servicio.objects.filter(
-                Q(nombre__icontains=query) | Q(codigo_facturacion__icontains=query)
-            ).order_by('nombre')[:50]  # Limitar resultados
-            
-            for servicio in servicios_qs:
+            # Se responde desde el índice en memoria; en frío, con SQL.
+            for servicio in buscar_servicios(query):
                 servicios.append({
-                    'pk': servicio.pk,
-                    'nombre': servicio.nombre,
-                    'codigo_facturacion': servicio.codigo_facturacion,
-                    'unidad_base': servicio.unidad_base,
-                    'precio_base': str(servicio.precio_base),
+                    'pk': servicio['pk'],
+                    'nombre': servicio['nombre'],
+                    'codigo_facturacion': servicio['codigo_facturacion'],
+                    'unidad_base': servicio['unidad_base'],
+                    'precio_base': servicio['precio_base'],
                 })
         
         if len(query) > 50:
@@ -1256,13 +1229,13 @@ def buscar_cotizaciones_api(request):
             return JsonResponse({'error': 'Caracteres no permitidos detectados.'}, status=400)
 
         data = []
+        cotizaciones = None
 
         if query:
-            cotizaciones = Cotizacion.objects.filter(
-                Q(numero_oferta__icontains=query) |
-                Q(cliente__razon_social__icontains=query) |
-                Q(asunto_servicio__icontains=query)
-            ).select_related('cliente')[:50]  # Limitar resultados
+            # 50 resultados por página; la siguiente se anuncia en la cabecera Link.
+            cotizaciones = paginar(request, filtrar_busqueda(
+                Cotizacion.objects.select_related('cliente'), 'cotizacion', query, ordenar=True
+            ), 50)
 
             for cotizacion in cotizaciones:
                 monto_total = cotizacion.monto_total if cotizacion.monto_total is not None else Decimal('0.00')
@@ -1281,7 +1254,8 @@ def buscar_cotizaciones_api(request):
         if len(query) > 50:
             logger.info(f"Consulta larga en buscar_cotizaciones_api por usuario {request.user.username}: {query[:50]}...")
         
-        return JsonResponse(data, safe=False)
+        respuesta = JsonResponse(data, safe=False)
+        return con_enlaces(respuesta, request, cotizaciones) if cotizaciones is not None else respuesta
     except Exception as e:
         logger.error(f"Error en buscar_cotizaciones_api por usuario {request.user.username}: {str(e)}")
         return JsonResponse({'error': 'Error interno del servidor.'}, status=500)
@@ -1291,28 +1265,13 @@ def buscar_cotizaciones_api(request):
 def administracion_view(request):
     estados_disponibles = Cotizacion.ESTADO_CHOICES
 
-    cotizaciones = Cotizacion.objects.select_related('cliente').all()
-
-
-    q = request.GET.get('q')
-    if q:
-        cotizaciones = cotizaciones.filter(
-            models.Q(numero_oferta__icontains=q) | 
-            models.Q(asunto_servicio__icontains=q) |
-            models.Q(cliente__razon_social__icontains=q)
-        )
-
-    estado_filtro = request.GET.get('estado')
-    if estado_filtro:
-        cotizaciones = cotizaciones.filter(estado=estado_filtro)
-
-    f_inicio = request.GET.get('fecha_inicio')
-    f_fin = request.GET.get('fecha_fin')
-    if f_inicio and f_fin:
-        cotizaciones = cotizaciones.filter(fecha_generacion__range=[f_inicio, f_fin])
+    cotizaciones = _filtrar_cotizaciones(
+        request,
+        Cotizacion.objects.select_related('cliente'),
+    ).order_by('-fecha_creacion', '-id')
 
     context = {
-        'cotizaciones': cotizaciones,
+        'cotizaciones': paginar(request, cotizaciones, 50),
         'estados_disponibles': estados_disponibles,
     }
     return render(request, 'administracion.html', context)
@@ -1322,7 +1281,7 @@ def administracion_view(request):
 def lista_plantillas(request):
     query = request.GET.get('q')
     plantillas_list = PlantillaCotizacion.objects.select_related('servicio_general')\
-                                         .order_by('-fecha_creacion')
+                                         .order_by('-fecha_creacion', '-id')
 
     if query:
         plantillas_list = plantillas_list.filter(
@@ -1330,8 +1289,7 @@ def lista_plantillas(request):
             Q(asunto_referencial__icontains=query)
         )
 
-    paginator = Paginator(plantillas_list, 10)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj = paginar(request, plantillas_list, 10, contar_total=True)
 
     context = {
         'plantillas': page_obj,
@@ -1355,8 +1313,7 @@ def crear_editar_plantilla(request, pk=None):
     if is_editing:
         plantilla = get_object_or_404(
             PlantillaCotizacion.objects.prefetch_related(
-                'grupos__detalles_items__servicio',
-                'condiciones_secciones__items__children'
+                'grupos__detalles_items__servicio'
             ),
             pk=pk
         )
@@ -1385,8 +1342,7 @@ def crear_editar_plantilla(request, pk=None):
                 if is_editing:
                     plantilla = get_object_or_404(
                         PlantillaCotizacion.objects.prefetch_related(
-                            'grupos__detalles_items__servicio',
-                            'condiciones_secciones__items__children'
+                            'grupos__detalles_items__servicio'
                         ),
                         pk=pk
                     )
@@ -1413,42 +1369,7 @@ def crear_editar_plantilla(request, pk=None):
 
                 plantilla.save()
 
-                if is_editing:
-                    plantilla.grupos.all().delete()
-
-                grupo_actual = PlantillaGrupo.objects.create(
-                    plantilla=plantilla,
-                    nombre_grupo="ENSAYOS DE LABORATORIO",
-                    orden=0
-                )
-
-                for index, item in enumerate(detalles_data):
-                    tipo_fila = item.get('tipo_fila')
-
-                    if tipo_fila in ['categoria', 'subcategoria']:
-                        grupo_actual = PlantillaGrupo.objects.create(
-                            plantilla=plantilla,
-                            nombre_grupo=item.get('descripcion_especifica', '').upper(),
-                            orden=index + 1
-                        )
-                        continue
-
-                    servicio_id = item.get('servicio_id')
-                    if not servicio_id:
-                        continue
-
-                    servicio = Servicio.objects.get(pk=int(servicio_id))
-
-                    PlantillaDetalle.objects.create(
-                        grupo=grupo_actual,
-                        servicio=servicio,
-                        norma_manual=item.get('norma_nombre', ''),
-                        descripcion_especifica=item.get('descripcion_especifica') or servicio.nombre,
-                        unidad_medida=item.get('unidad_medida') or servicio.unidad_base,
-                        cantidad=Decimal(str(item.get('cantidad', '1')).replace(',', '.')),
-                        precio_unitario=Decimal(str(item.get('precio_unitario', '0')).replace(',', '.')),
-                    )
-
+                LineasPlantilla(detalles_data).guardar(plantilla)
                 plantilla.calcular_totales()
 
                 if condiciones_data:
@@ -1464,21 +1385,20 @@ def crear_editar_plantilla(request, pk=None):
             if is_editing and pk:
                 plantilla = get_object_or_404(
                     PlantillaCotizacion.objects.prefetch_related(
-                        'grupos__detalles_items__servicio',
-                        'condiciones_secciones__items__children'
+                        'grupos__detalles_items__servicio'
                     ),
                     pk=pk
                 )
 
     servicios_data = []
-    for s in Servicio.objects.all().select_related('norma', 'metodo'):
+    for s in catalogo_servicios():
         servicios_data.append({
-            'pk': s.pk,
-            'nombre': s.nombre,
-            'precio_base': str(s.precio_base),
-            'norma_codigo': s.norma.codigo if s.norma else '',
-            'metodo_codigo': s.metodo.codigo if s.metodo else '',
-            'unidad_base': s.unidad_base
+            'pk': s['pk'],
+            'nombre': s['nombre'],
+            'precio_base': s['precio_base'],
+            'norma_codigo': s['norma_codigo'] or '',
+            'metodo_codigo': s['metodo_codigo'] or '',
+            'unidad_base': s['unidad_base']
         })
 
     detalles_list = []
@@ -1486,12 +1406,14 @@ def crear_editar_plantilla(request, pk=None):
         for grupo in plantilla.grupos.all().order_by('orden'):
             if grupo.nombre_grupo != "ENSAYOS DE LABORATORIO":
                 detalles_list.append({
+                    'id': grupo.pk,
                     'tipo_fila': 'categoria',
                     'descripcion_especifica': grupo.nombre_grupo
                 })
 
             for detalle in grupo.detalles_items.all():
                 detalles_list.append({
+                    'id': detalle.pk,
                     'tipo_fila': 'servicio',
                     'servicio_id': detalle.servicio.pk,
                     'descripcion_especifica': detalle.descripcion_especifica,
@@ -1522,8 +1444,7 @@ def crear_editar_plantilla(request, pk=None):
 def obtener_detalle_plantilla_json(request, pk):
     plantilla = get_object_or_404(
         PlantillaCotizacion.objects.prefetch_related(
-            'grupos__detalles_items__servicio',
-            'condiciones_secciones__items__children'
+            'grupos__detalles_items__servicio'
         ).select_related('servicio_general'),
         pk=pk
     )
@@ -1588,10 +1509,8 @@ def _parse_json_request_body(request):
 
 def _serializar_catalogo_item(item):
     """
-    Serializa un ítem del catálogo con sus hijos.
+    Serializa un ítem del catálogo con sus hijos (armados por arbol_condiciones).
     """
-    children = item.children.filter(activo=True).order_by('orden', 'id')
-
     return {
         'id': item.id,
         'catalogo_item_id': item.id,
@@ -1607,15 +1526,13 @@ def _serializar_catalogo_item(item):
         'es_obligatorio': item.es_obligatorio,
         'editable_en_cotizacion': item.editable_en_cotizacion,
         'fue_editado': False,
-        'children': [_serializar_catalogo_item(child) for child in children],
+        'children': [_serializar_catalogo_item(child) for child in item.hijos],
     }
 
 def _serializar_snapshot_item(item):
     """
-    Serializa un ítem snapshot con sus hijos.
+    Serializa un ítem snapshot con sus hijos (armados por arbol_condiciones).
     """
-    children = item.children.all().order_by('orden', 'id')
-
     return {
         'id': item.id,
         'catalogo_item_id': item.catalogo_item_id,
@@ -1631,20 +1548,20 @@ def _serializar_snapshot_item(item):
         'es_obligatorio': item.es_obligatorio,
         'editable_en_cotizacion': item.editable_en_cotizacion,
         'fue_editado': item.fue_editado,
-        'children': [_serializar_snapshot_item(child) for child in children],
+        'children': [_serializar_snapshot_item(child) for child in item.hijos],
     }
 
 
-def _obtener_condiciones_desde_snapshot(cotizacion):
+def _serializar_snapshot_condiciones(secciones, items):
     """
-    Devuelve la estructura de condiciones desde el snapshot guardado
-    de la cotización.
+    Serializa las secciones de un snapshot (de cotización o plantilla) con
+    sus ítems: una consulta para las secciones y otra para todos los ítems.
     """
-    secciones = cotizacion.condiciones_secciones.all().order_by('orden', 'id')
+    raices = arbol_condiciones(items)
     resultado = []
 
-    for seccion in secciones:
-        root_items = seccion.items.filter(parent__isnull=True).order_by('orden', 'id')
+    for seccion in secciones.order_by('orden', 'id'):
+        root_items = raices.get(seccion.id, [])
         resultado.append({
             'id': seccion.id,
             'catalogo_seccion_id': seccion.catalogo_seccion_id,
@@ -1658,97 +1575,40 @@ def _obtener_condiciones_desde_snapshot(cotizacion):
 
     return resultado
 
-def _obtener_condiciones_desde_catalogo():
-    secciones = CatalogoCondicionSeccion.objects.filter(activo=True).order_by('orden')
-
-    resultado = []
 
-    for seccion in secciones:
-        items_root = CatalogoCondicionItem.objects.filter(
-            seccion=seccion,
-            parent__isnull=True,
-            activo=True
-        ).order_by('orden')
-
-        def build_item(item):
-            children = CatalogoCondicionItem.objects.filter(
-                parent=item,
-                activo=True
-            ).order_by('orden')
-
-            return {
-                "id": item.id,
-                "titulo": item.titulo,
-                "texto_base": item.texto,
-                "texto_final": item.texto,
-                "seleccionado": item.seleccionado_por_defecto,
-                "editable_en_cotizacion": item.editable_en_cotizacion,
-                "es_obligatorio": item.es_obligatorio,
-                "tipo_nodo": item.tipo_nodo,
-                "children": [build_item(c) for c in children]
-            }
+def _obtener_condiciones_desde_snapshot(cotizacion):
+    """
+    Devuelve la estructura de condiciones desde el snapshot guardado
+    de la cotización.
+    """
+    return _serializar_snapshot_condiciones(
+        cotizacion.condiciones_secciones.all(),
+        CotizacionCondicionItem.objects.filter(seccion__cotizacion=cotizacion),
+    )
 
-        resultado.append({
-            "catalogo_seccion_id": seccion.id,
-            "codigo": seccion.codigo,
-            "titulo": seccion.titulo,
-            "tipo": seccion.tipo,
-            "orden": seccion.orden,
-            "seleccionada": True,
-            "items": [build_item(i) for i in items_root]
-        })
+def _obtener_condiciones_desde_catalogo():
+    return catalogo_condiciones()[1]
 
-    return resultado
 
-def _crear_item_snapshot_recursivo(seccion_snapshot, item_data, parent_snapshot=None):
+def _respuesta_condiciones_json(request, datos, version_catalogo=None):
     """
-    Crea un ítem snapshot y sus hijos de forma recursiva.
+    JsonResponse del editor de condiciones con ETag, o 304 si el navegador
+    ya tiene esa versión. Cuando las secciones vienen del catálogo la
+    etiqueta sale de su versión y de la cabecera, sin codificar el cuerpo.
     """
-    catalogo_item = None
-    catalogo_item_id = item_data.get('catalogo_item_id')
-
-    if catalogo_item_id:
-        catalogo_item = CatalogoCondicionItem.objects.filter(pk=catalogo_item_id).first()
-
-    texto_base = item_data.get('texto_base')
-    texto_final = item_data.get('texto_final')
-
-    if not texto_base and catalogo_item:
-        texto_base = catalogo_item.texto
-
-    if not texto_final:
-        texto_final = texto_base or item_data.get('texto') or ''
-
-    snapshot_item = CotizacionCondicionItem.objects.create(
-        seccion=seccion_snapshot,
-        catalogo_item=catalogo_item,
-        parent=parent_snapshot,
-        tipo_nodo=item_data.get('tipo_nodo') or (catalogo_item.tipo_nodo if catalogo_item else 'item'),
-        titulo=item_data.get('titulo') or (catalogo_item.titulo if catalogo_item else ''),
-        texto_base=texto_base or '',
-        texto_final=texto_final or '',
-        orden=item_data.get('orden') or (catalogo_item.orden if catalogo_item else 1),
-        nivel=item_data.get('nivel') if item_data.get('nivel') is not None else (catalogo_item.nivel if catalogo_item else 0),
-        seleccionado=bool(item_data.get('seleccionado', False)),
-        es_obligatorio=bool(
-            item_data.get('es_obligatorio', False) or
-            (catalogo_item.es_obligatorio if catalogo_item else False)
-        ),
-        editable_en_cotizacion=bool(
-            item_data.get('editable_en_cotizacion', True) if item_data.get('editable_en_cotizacion') is not None
-            else (catalogo_item.editable_en_cotizacion if catalogo_item else True)
-        ),
-    )
-
-    children = item_data.get('children', []) or []
-    for child in children:
-        _crear_item_snapshot_recursivo(
-            seccion_snapshot=seccion_snapshot,
-            item_data=child,
-            parent_snapshot=snapshot_item
-        )
+    if version_catalogo is not None:
+        cabecera = sorted((clave, valor) for clave, valor in datos.items() if clave != 'secciones')
+        firma = repr(('catalogo', version_catalogo, cabecera))
+        response = None
+    else:
+        response = JsonResponse(datos)
+        firma = response.content.decode('utf-8')
 
-    return snapshot_item
+    etag = quote_etag(hashlib.sha1(firma.encode('utf-8')).hexdigest())
+    response = get_conditional_response(request, etag=etag) or response or JsonResponse(datos)
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 @login_required
 @permiso_requerido('cotizaciones.ver')
@@ -1760,20 +1620,19 @@ def condiciones_cotizacion_json(request, pk):
     """
     try:
         cotizacion = get_object_or_404(
-            Cotizacion.objects.prefetch_related(
-                'condiciones_secciones__items__children'
-            ),
+            Cotizacion,
             pk=pk
         )
 
         tiene_snapshot = cotizacion.condiciones_secciones.exists()
 
         if tiene_snapshot:
+            version_catalogo = None
             secciones = _obtener_condiciones_desde_snapshot(cotizacion)
         else:
-            secciones = _obtener_condiciones_desde_catalogo()
+            version_catalogo, secciones = catalogo_condiciones()
 
-        return JsonResponse({
+        return _respuesta_condiciones_json(request, {
             'success': True,
             'cotizacion_id': cotizacion.id,
             'numero_oferta': cotizacion.numero_oferta,
@@ -1782,7 +1641,7 @@ def condiciones_cotizacion_json(request, pk):
             'puede_editar': cotizacion.puede_editar_contenido_condiciones(),
             'usa_snapshot': tiene_snapshot,
             'secciones': secciones,
-        })
+        }, version_catalogo)
 
     except Exception as e:
         logger.error(f"Error en condiciones_cotizacion_json para cotización {pk}: {str(e)}", exc_info=True)
@@ -1797,7 +1656,7 @@ def condiciones_cotizacion_json(request, pk):
 def guardar_condiciones_cotizacion_json(request, pk):
     """
     Guarda el snapshot de condiciones seleccionado para la cotización.
-    Reemplaza completamente el snapshot anterior si existe.
+    Sincroniza el snapshot anterior: solo escribe lo que cambió.
     """
     try:
         cotizacion = get_object_or_404(Cotizacion, pk=pk)
@@ -1817,41 +1676,7 @@ def guardar_condiciones_cotizacion_json(request, pk):
                 'error': 'El formato de secciones es inválido.'
             }, status=400)
 
-        # Limpieza del snapshot anterior
-        cotizacion.condiciones_secciones.all().delete()
-
-        total_secciones = 0
-        total_items = 0
-
-        for seccion_data in secciones_data:
-            catalogo_seccion = None
-            catalogo_seccion_id = seccion_data.get('catalogo_seccion_id')
-
-            if catalogo_seccion_id:
-                catalogo_seccion = CatalogoCondicionSeccion.objects.filter(pk=catalogo_seccion_id).first()
-
-            seccion_snapshot = CotizacionCondicionSeccion.objects.create(
-                cotizacion=cotizacion,
-                catalogo_seccion=catalogo_seccion,
-                codigo=seccion_data.get('codigo') or (catalogo_seccion.codigo if catalogo_seccion else ''),
-                titulo=seccion_data.get('titulo') or (catalogo_seccion.titulo if catalogo_seccion else ''),
-                tipo=seccion_data.get('tipo') or (catalogo_seccion.tipo if catalogo_seccion else 'lista'),
-                orden=seccion_data.get('orden') or (catalogo_seccion.orden if catalogo_seccion else 1),
-                seleccionada=bool(seccion_data.get('seleccionada', True)),
-            )
-            total_secciones += 1
-
-            root_items = seccion_data.get('items', []) or []
-            for item_data in root_items:
-                _crear_item_snapshot_recursivo(
-                    seccion_snapshot=seccion_snapshot,
-                    item_data=item_data,
-                    parent_snapshot=None
-                )
-
-        total_items = CotizacionCondicionItem.objects.filter(
-            seccion__cotizacion=cotizacion
-        ).count()
+        total_secciones, total_items = guardar_snapshot_condiciones(cotizacion, secciones_data)
 
         cotizacion.contenido_condiciones_configurado = True
         cotizacion.save(update_fields=[
@@ -1881,15 +1706,17 @@ def resumen_condiciones_cotizacion_json(request, pk):
     Devuelve un resumen por sección para mostrar en la UI.
     """
     try:
-        cotizacion = get_object_or_404(
-            Cotizacion.objects.prefetch_related('condiciones_secciones__items'),
-            pk=pk
-        )
+        cotizacion = get_object_or_404(Cotizacion, pk=pk)
+
+        secciones = cotizacion.condiciones_secciones.annotate(
+            total_items_seleccionados=Count('items', filter=Q(items__seleccionado=True, items__tipo_nodo='item')),
+            total_grupos=Count('items', filter=Q(items__tipo_nodo='grupo')),
+        ).order_by('orden', 'id')
 
         resumen = []
-        for seccion in cotizacion.condiciones_secciones.all().order_by('orden', 'id'):
-            items_seleccionados = seccion.items.filter(seleccionado=True, tipo_nodo='item').count()
-            grupos = seccion.items.filter(tipo_nodo='grupo').count()
+        for seccion in secciones:
+            items_seleccionados = seccion.total_items_seleccionados
+            grupos = seccion.total_grupos
 
             resumen.append({
                 'codigo': seccion.codigo,
@@ -1916,142 +1743,41 @@ def resumen_condiciones_cotizacion_json(request, pk):
         }, status=500)
         
 def _obtener_condiciones_desde_snapshot_plantilla(plantilla):
-    secciones = plantilla.condiciones_secciones.all().order_by('orden', 'id')
-    resultado = []
-
-    for seccion in secciones:
-        items_root = seccion.items.filter(parent__isnull=True).order_by('orden', 'id')
-        resultado.append({
-            'id': seccion.id,
-            'catalogo_seccion_id': seccion.catalogo_seccion_id,
-            'codigo': seccion.codigo,
-            'titulo': seccion.titulo,
-            'tipo': seccion.tipo,
-            'orden': seccion.orden,
-            'seleccionada': seccion.seleccionada,
-            'items': [_serializar_snapshot_item_plantilla(item) for item in items_root],
-        })
-
-    return resultado
-
-def _serializar_snapshot_item_plantilla(item):
-    children = item.children.all().order_by('orden', 'id')
-
-    return {
-        'id': item.id,
-        'catalogo_item_id': item.catalogo_item_id,
-        'parent_id': item.parent_id,
-        'tipo_nodo': item.tipo_nodo,
-        'titulo': item.titulo or '',
-        'texto': item.texto_final or '',
-        'texto_base': item.texto_base or '',
-        'texto_final': item.texto_final or '',
-        'orden': item.orden,
-        'nivel': item.nivel,
-        'seleccionado': item.seleccionado,
-        'es_obligatorio': item.es_obligatorio,
-        'editable_en_cotizacion': item.editable_en_cotizacion,
-        'fue_editado': item.fue_editado,
-        'children': [_serializar_snapshot_item_plantilla(child) for child in children],
-    }
-
-def _crear_item_snapshot_recursivo_plantilla(seccion_snapshot, item_data, parent_snapshot=None):
-    catalogo_item = None
-    catalogo_item_id = item_data.get('catalogo_item_id')
-
-    if catalogo_item_id:
-        catalogo_item = CatalogoCondicionItem.objects.filter(pk=catalogo_item_id).first()
-
-    texto_base = item_data.get('texto_base') or (catalogo_item.texto if catalogo_item else '')
-    texto_final = item_data.get('texto_final') or texto_base
-
-    snapshot_item = PlantillaCondicionItem.objects.create(
-        seccion=seccion_snapshot,
-        catalogo_item=catalogo_item,
-        parent=parent_snapshot,
-        tipo_nodo=item_data.get('tipo_nodo') or (catalogo_item.tipo_nodo if catalogo_item else 'item'),
-        titulo=item_data.get('titulo') or (catalogo_item.titulo if catalogo_item else ''),
-        texto_base=texto_base or '',
-        texto_final=texto_final or '',
-        orden=item_data.get('orden') or (catalogo_item.orden if catalogo_item else 1),
-        nivel=item_data.get('nivel') if item_data.get('nivel') is not None else (catalogo_item.nivel if catalogo_item else 0),
-        seleccionado=bool(item_data.get('seleccionado', False)),
-        es_obligatorio=bool(
-            item_data.get('es_obligatorio', False) or
-            (catalogo_item.es_obligatorio if catalogo_item else False)
-        ),
-        editable_en_cotizacion=bool(
-            item_data.get('editable_en_cotizacion', True) if item_data.get('editable_en_cotizacion') is not None
-            else (catalogo_item.editable_en_cotizacion if catalogo_item else True)
-        ),
+    return _serializar_snapshot_condiciones(
+        plantilla.condiciones_secciones.all(),
+        PlantillaCondicionItem.objects.filter(seccion__plantilla=plantilla),
     )
 
-    children = item_data.get('children', []) or []
-    for child in children:
-        _crear_item_snapshot_recursivo_plantilla(
-            seccion_snapshot=seccion_snapshot,
-            item_data=child,
-            parent_snapshot=snapshot_item
-        )
-
-    return snapshot_item
-
 def _guardar_snapshot_condiciones_plantilla(plantilla, secciones_data):
     if not isinstance(secciones_data, list):
         return
 
-    plantilla.condiciones_secciones.all().delete()
-
-    for seccion_data in secciones_data:
-        catalogo_seccion = None
-        catalogo_seccion_id = seccion_data.get('catalogo_seccion_id')
-
-        if catalogo_seccion_id:
-            catalogo_seccion = CatalogoCondicionSeccion.objects.filter(pk=catalogo_seccion_id).first()
-
-        seccion_snapshot = PlantillaCondicionSeccion.objects.create(
-            plantilla=plantilla,
-            catalogo_seccion=catalogo_seccion,
-            codigo=seccion_data.get('codigo') or (catalogo_seccion.codigo if catalogo_seccion else ''),
-            titulo=seccion_data.get('titulo') or (catalogo_seccion.titulo if catalogo_seccion else ''),
-            tipo=seccion_data.get('tipo') or (catalogo_seccion.tipo if catalogo_seccion else 'lista'),
-            orden=seccion_data.get('orden') or (catalogo_seccion.orden if catalogo_seccion else 1),
-            seleccionada=bool(seccion_data.get('seleccionada', False)),
-        )
-
-        root_items = seccion_data.get('items', []) or []
-        for item_data in root_items:
-            _crear_item_snapshot_recursivo_plantilla(
-                seccion_snapshot=seccion_snapshot,
-                item_data=item_data,
-                parent_snapshot=None
-            )
+    guardar_snapshot_condiciones(plantilla, secciones_data)
 
 @login_required
 @permiso_requerido('cotizaciones.ver')
 def condiciones_plantilla_json(request, pk):
     try:
         plantilla = get_object_or_404(
-            PlantillaCotizacion.objects.prefetch_related(
-                'condiciones_secciones__items__children'
-            ),
+            PlantillaCotizacion,
             pk=pk
         )
 
         tiene_snapshot = plantilla.condiciones_secciones.exists()
 
         if tiene_snapshot:
+            version_catalogo = None
             secciones = _obtener_condiciones_desde_snapshot_plantilla(plantilla)
         else:
-            secciones = _obtener_condiciones_desde_catalogo()
+            version_catalogo, secciones = catalogo_condiciones()
 
-        return JsonResponse({
+        return _respuesta_condiciones_json(request, {
             'success': True,
             'plantilla_id': plantilla.id,
             'nombre_plantilla': plantilla.nombre_plantilla,
             'usa_snapshot': tiene_snapshot,
             'secciones': secciones,
-        })
+        }, version_catalogo)
     except Exception as e:
         logger.error(f"Error en condiciones_plantilla_json para plantilla {pk}: {str(e)}", exc_info=True)
         return JsonResponse({
@@ -2075,39 +1801,7 @@ def guardar_condiciones_plantilla_json(request, pk):
                 'error': 'El formato de secciones es inválido.'
             }, status=400)
 
-        plantilla.condiciones_secciones.all().delete()
-
-        total_secciones = 0
-        total_items = 0
-
-        for seccion_data in secciones_data:
-            catalogo_seccion = None
-            catalogo_seccion_id = seccion_data.get('catalogo_seccion_id')
-
-            if catalogo_seccion_id:
-                catalogo_seccion = CatalogoCondicionSeccion.objects.filter(pk=catalogo_seccion_id).first()
-
-            seccion_snapshot = PlantillaCondicionSeccion.objects.create(
-                plantilla=plantilla,
-                catalogo_seccion=catalogo_seccion,
-                codigo=seccion_data.get('codigo') or (catalogo_seccion.codigo if catalogo_seccion else ''),
-                titulo=seccion_data.get('titulo') or (catalogo_seccion.titulo if catalogo_seccion else ''),
-                tipo=seccion_data.get('tipo') or (catalogo_seccion.tipo if catalogo_seccion else 'lista'),
-                orden=seccion_data.get('orden') or (catalogo_seccion.orden if catalogo_seccion else 1),
-                seleccionada=bool(seccion_data.get('seleccionada', False)),
-            )
-            total_secciones += 1
-
-            for item_data in seccion_data.get('items', []) or []:
-                _crear_item_snapshot_recursivo_plantilla(
-                    seccion_snapshot=seccion_snapshot,
-                    item_data=item_data,
-                    parent_snapshot=None
-                )
-
-        total_items = PlantillaCondicionItem.objects.filter(
-            seccion__plantilla=plantilla
-        ).count()
+        total_secciones, total_items = guardar_snapshot_condiciones(plantilla, secciones_data)
 
         return JsonResponse({
             'success': True,
@@ -2128,15 +1822,17 @@ def guardar_condiciones_plantilla_json(request, pk):
 @permiso_requerido('cotizaciones.ver')
 def resumen_condiciones_plantilla_json(request, pk):
     try:
-        plantilla = get_object_or_404(
-            PlantillaCotizacion.objects.prefetch_related('condiciones_secciones__items'),
-            pk=pk
-        )
+        plantilla = get_object_or_404(PlantillaCotizacion, pk=pk)
+
+        secciones = plantilla.condiciones_secciones.annotate(
+            total_items_seleccionados=Count('items', filter=Q(items__seleccionado=True, items__tipo_nodo='item')),
+            total_grupos=Count('items', filter=Q(items__tipo_nodo='grupo')),
+        ).order_by('orden', 'id')
 
         resumen = []
-        for seccion in plantilla.condiciones_secciones.all().order_by('orden', 'id'):
-            items_seleccionados = seccion.items.filter(seleccionado=True, tipo_nodo='item').count()
-            grupos = seccion.items.filter(tipo_nodo='grupo').count()
+        for seccion in secciones:
+            items_seleccionados = seccion.total_items_seleccionados
+            grupos = seccion.total_grupos
 
             resumen.append({
                 'codigo': seccion.codigo,
@@ -353,6 +353,8 @@ document.addEventListener('DOMContentLoaded', () => {
         };
 
         if (EDIT_INDEX !== null) {
+            // Conserva el id para que el servidor actualice la misma fila
+            if (DATA_ARRAY[EDIT_INDEX]?.id) data.id = DATA_ARRAY[EDIT_INDEX].id;
             DATA_ARRAY[EDIT_INDEX] = data;
             window.resetEditor();
         } else {
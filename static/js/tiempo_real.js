@@ -0,0 +1,28 @@
+// Avisos en vivo del servidor (core/tiempo_real.py) por Server-Sent Events.
+// Los avisos solo dicen qué cambió: cada página pide los datos a sus
+// endpoints de siempre. Si el servidor corre bajo WSGI responde 204,
+// EventSource no reintenta y la página sigue con su consulta periódica.
+window.escucharEnVivo = function (canales, manejadores, opciones = {}) {
+    const estado = { conectado: false };
+    if (!window.EventSource) return estado;
+
+    const fuente = new EventSource(`/eventos/?canales=${encodeURIComponent(canales.join(','))}`);
+    let conexiones = 0;
+
+    fuente.addEventListener('open', () => {
+        estado.conectado = true;
+        conexiones += 1;
+        // Al reconectar pudo perderse algún aviso: la página se pone al día.
+        if (conexiones > 1 && opciones.alReconectar) opciones.alReconectar();
+    });
+
+    fuente.addEventListener('error', () => {
+        estado.conectado = false;
+    });
+
+    Object.entries(manejadores).forEach(([canal, manejador]) => {
+        fuente.addEventListener(canal, evento => manejador(JSON.parse(evento.data)));
+    });
+
+    return estado;
+};
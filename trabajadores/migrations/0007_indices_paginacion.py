@@ -0,0 +1,17 @@
+# Generated by Django 4.2.29 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trabajadores', '0006_alter_permisomodulo_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trabajadorprofile',
+            index=models.Index(fields=['nombre_completo', 'id'], name='trabajadore_nombre__cbc107_idx'),
+        ),
+    ]
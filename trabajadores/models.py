@@ -160,5 +160,8 @@ class TrabajadorProfile(models.Model):
         verbose_name = "Perfil de Trabajador"
         verbose_name_plural = "Perfiles de Trabajadores"
         ordering = ['nombre_completo']
+        indexes = [
+            models.Index(fields=['nombre_completo', 'id']),
+        ]
         
         
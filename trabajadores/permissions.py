@@ -1,6 +1,61 @@
 from functools import wraps
+from django.core.cache import cache
 from django.http import HttpResponseForbidden
-from .models import TrabajadorProfile
+
+from core.versiones import leer_version, subir_version
+from .models import TrabajadorProfile, PermisoModulo
+
+
+PERMISOS_CACHE_TIMEOUT = 60 * 15
+PERMISOS_VERSION_KEY = 'trabajadores:permisos:version'
+
+
+def _version_permisos():
+    return leer_version(PERMISOS_VERSION_KEY)
+
+
+def _clave_permisos_rol(rol_id):
+    return f'trabajadores:permisos_rol:{rol_id}:v{_version_permisos()}'
+
+
+def invalidar_cache_permisos():
+    """Invalida los permisos cacheados de todos los roles."""
+    subir_version(PERMISOS_VERSION_KEY)
+
+
+def invalidar_cache_permisos_rol(rol_id):
+    cache.delete(_clave_permisos_rol(rol_id))
+
+
+def obtener_codigos_permisos_rol(rol_id):
+    clave = _clave_permisos_rol(rol_id)
+    codigos = cache.get(clave)
+
+    if codigos is None:
+        codigos = frozenset(
+            PermisoModulo.objects.filter(roles__id=rol_id).values_list('codigo', flat=True)
+        )
+        cache.set(clave, codigos, PERMISOS_CACHE_TIMEOUT)
+
+    return codigos
+
+
+def obtener_permisos_usuario(user):
+    """
+    Devuelve el conjunto de códigos de permiso del usuario.
+    Se memoriza en el objeto user, que vive lo que dura la petición.
+    """
+    codigos = getattr(user, '_permisos_trabajador', None)
+    if codigos is not None:
+        return codigos
+
+    try:
+        codigos = obtener_codigos_permisos_rol(user.trabajadorprofile.rol_id)
+    except TrabajadorProfile.DoesNotExist:
+        codigos = frozenset()
+
+    user._permisos_trabajador = codigos
+    return codigos
 
 
 def trabajador_tiene_permiso(user, codigo_permiso):
@@ -10,11 +65,7 @@ def trabajador_tiene_permiso(user, codigo_permiso):
     if not user.is_authenticated:
         return False
 
-    try:
-        perfil = user.trabajadorprofile
-        return perfil.rol.permisos.filter(codigo=codigo_permiso).exists()
-    except TrabajadorProfile.DoesNotExist:
-        return False
+    return codigo_permiso in obtener_permisos_usuario(user)
 
 
 def permiso_requerido(codigo_permiso):
@@ -25,4 +76,4 @@ def permiso_requerido(codigo_permiso):
                 return HttpResponseForbidden("No tienes permiso para acceder a esta sección.")
             return view_func(request, *args, **kwargs)
         return _wrapped_view
-    return decorator
\ No newline at end of file
+    return decorator
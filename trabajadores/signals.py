@@ -0,0 +1,27 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import PermisoModulo, RolTrabajador
+from .permissions import invalidar_cache_permisos, invalidar_cache_permisos_rol
+
+
+@receiver(m2m_changed, sender=RolTrabajador.permisos.through)
+def permisos_rol_modificados(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        invalidar_cache_permisos()
+    else:
+        invalidar_cache_permisos_rol(instance.pk)
+
+
+@receiver(post_save, sender=PermisoModulo)
+@receiver(post_delete, sender=PermisoModulo)
+def permiso_modulo_modificado(sender, **kwargs):
+    invalidar_cache_permisos()
+
+
+@receiver(post_delete, sender=RolTrabajador)
+def rol_eliminado(sender, instance, **kwargs):
+    invalidar_cache_permisos_rol(instance.pk)
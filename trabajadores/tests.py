@@ -1,3 +1,83 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from .models import AccionPermiso, ModuloSistema, PermisoModulo, RolTrabajador, TrabajadorProfile
+from .permissions import obtener_permisos_usuario, trabajador_tiene_permiso
+
+
+class PermisosTrabajadorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Las migraciones ya cargan el catálogo de módulos y acciones.
+        ver, _ = AccionPermiso.objects.get_or_create(codigo='ver', defaults={'nombre': 'Ver'})
+        editar, _ = AccionPermiso.objects.get_or_create(codigo='editar', defaults={'nombre': 'Editar'})
+        clientes, _ = ModuloSistema.objects.get_or_create(codigo='clientes', defaults={'nombre': 'Clientes'})
+        cls.ver_clientes, _ = PermisoModulo.objects.get_or_create(modulo_sistema=clientes, accion=ver)
+        cls.editar_clientes, _ = PermisoModulo.objects.get_or_create(modulo_sistema=clientes, accion=editar)
+
+        cls.rol = RolTrabajador.objects.create(nombre='Comercial')
+        cls.rol.permisos.add(cls.ver_clientes)
+        cls.tecnico = TrabajadorProfile.objects.create(
+            user=User.objects.create_user('comercial', password='clave'),
+            rol=cls.rol,
+            nombre_completo='Ana Quispe',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def usuario(self):
+        """El usuario tal como llega en una petición nueva, sin nada memorizado."""
+        return User.objects.get(pk=self.tecnico.user_id)
+
+    def consultas_de_permisos(self, consultas):
+        tabla = PermisoModulo._meta.db_table
+        return [c['sql'] for c in consultas if tabla in c['sql']]
+
+    def test_se_memoriza_en_el_usuario_durante_la_peticion(self):
+        usuario = self.usuario()
+
+        # Perfil del trabajador y permisos del rol.
+        with self.assertNumQueries(2):
+            self.assertTrue(trabajador_tiene_permiso(usuario, 'clientes.ver'))
+        with self.assertNumQueries(0):
+            self.assertFalse(trabajador_tiene_permiso(usuario, 'clientes.editar'))
+            self.assertEqual(obtener_permisos_usuario(usuario), {'clientes.ver'})
+
+    def test_los_permisos_del_rol_se_cachean_entre_peticiones(self):
+        obtener_permisos_usuario(self.usuario())
+
+        # Solo el perfil: los códigos del rol salen de la caché.
+        usuario = self.usuario()
+        with self.assertNumQueries(1):
+            self.assertEqual(obtener_permisos_usuario(usuario), {'clientes.ver'})
+
+    def test_una_consulta_de_permisos_por_peticion(self):
+        self.client.force_login(self.tecnico.user)
+        url = reverse('clientes:lista_clientes')
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(len(self.consultas_de_permisos(consultas)), 1)
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.consultas_de_permisos(consultas), [])
+
+    def test_cambiar_los_permisos_del_rol_invalida_la_cache(self):
+        self.assertFalse(trabajador_tiene_permiso(self.usuario(), 'clientes.editar'))
+
+        self.rol.permisos.add(self.editar_clientes)
+        self.assertTrue(trabajador_tiene_permiso(self.usuario(), 'clientes.editar'))
+
+        self.rol.permisos.remove(self.ver_clientes)
+        self.assertFalse(trabajador_tiene_permiso(self.usuario(), 'clientes.ver'))
+
+        # Desde el lado del permiso se invalidan todos los roles.
+        self.editar_clientes.roles.clear()
+        self.assertEqual(obtener_permisos_usuario(self.usuario()), frozenset())
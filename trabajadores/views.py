@@ -1,6 +1,5 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.db.models import Count, Q
-from django.core.paginator import Paginator
 from django.http import JsonResponse, HttpResponseForbidden
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
@@ -10,6 +9,7 @@ import logging
 import re
 import json
 
+from core.paginacion import con_enlaces, paginar
 from trabajadores.permissions import trabajador_tiene_permiso, permiso_requerido
 from .models import (
     TrabajadorProfile,
@@ -204,7 +204,7 @@ def lista_trabajadores(request):
     trabajadores = TrabajadorProfile.objects.select_related(
         'user',
         'rol'
-    ).all().order_by('nombre_completo')
+    ).all().order_by('nombre_completo', 'id')
 
     if query:
         trabajadores = trabajadores.filter(
@@ -214,12 +214,8 @@ def lista_trabajadores(request):
             Q(user__email__icontains=query)
         ).distinct()
 
-    paginator = Paginator(trabajadores, 9)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
     context = {
-        'trabajadores': page_obj,
+        'trabajadores': paginar(request, trabajadores, 9, contar_total=True),
         'query': query,
     }
 
@@ -239,7 +235,7 @@ def buscar_trabajadores_api(request):
             logger.warning(f"Intento de XSS en buscar_trabajadores_api por usuario {request.user.username}")
             return JsonResponse({'error': 'Caracteres no permitidos detectados.'}, status=400)
 
-        trabajadores = TrabajadorProfile.objects.filter(
+        trabajadores = paginar(request, TrabajadorProfile.objects.filter(
             Q(nombre_completo__icontains=query) |
             Q(rol__nombre__icontains=query) |
             Q(user__email__icontains=query)
@@ -250,7 +246,7 @@ def buscar_trabajadores_api(request):
             'creado_en',
             'user__email',
             'user__username'
-        )[:10]
+        ).order_by('nombre_completo', 'pk'), 10)
 
         result = []
 
@@ -267,7 +263,7 @@ def buscar_trabajadores_api(request):
         if len(query) > 50:
             logger.info(f"Consulta larga en buscar_trabajadores_api por usuario {request.user.username}: {query[:50]}...")
 
-        return JsonResponse(result, safe=False)
+        return con_enlaces(JsonResponse(result, safe=False), request, trabajadores)
 
     except Exception as e:
         logger.error(f"Error en buscar_trabajadores_api por usuario {request.user.username}: {str(e)}")
@@ -330,12 +326,8 @@ def lista_roles(request):
             Q(descripcion__icontains=query)
         ).distinct()
 
-    paginator = Paginator(roles, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
     context = {
-        'roles': page_obj,
+        'roles': paginar(request, roles, 10, contar_total=True),
         'query': query,
     }
 